@@ -24,6 +24,7 @@ celery_app.conf.task_default_queue = "default"
 celery_app.conf.task_routes = {
     "functions.tasks.*": {"queue": "functions"},
     "reports.tasks.*": {"queue": "reports"},
+    "tasks.tasks.*": {"queue": "llm"},
 }
 
 # Celery Beat tasks registration
@@ -32,7 +33,15 @@ celery_app.conf.beat_schedule = {
         "task": "send_mail_task",
         "schedule": crontab(minute=0, hour=6),  # execute every day at 6 am
         #'args': (2,) you can pass arguments also if rquired
-    }
+    },
+    "Refresh_analytics_rollups": {
+        "task": "refresh_analytics_rollups",
+        "schedule": crontab(minute="*/5"),  # execute every 5 minutes
+    },
+    "Prune_celery_task_results": {
+        "task": "prune_celery_task_results",
+        "schedule": crontab(minute=30, hour=3),  # execute every day at 3:30 am
+    },
 }
 
 # Celery Task related settings
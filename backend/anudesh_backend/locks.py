@@ -1,133 +1,219 @@
 import os
-import json
-import redis
+import threading
 import time
+import uuid
 from dotenv import load_dotenv
 
+import redis
+
+"""
+Every lock is stored in redis as its own key
+
+lock:<userid>:<taskname> -> token
+
+The key is set with SET NX PX, so acquiring a lock is a single atomic round
+trip and the validity of the lock is the TTL of the key. Locks acquired by an
+instance can only be released or renewed by the same instance (the token is
+checked inside a Lua script), while releaseLock() releases the lock from any
+process, e.g. from the celery task that was scheduled while holding it.
+"""
+
+KEY_PREFIX = "lock"
+
+# Releases/renews the lock only if it is still held with our token
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
 """
-The locks are stored in redis with the format
-userid: {
-    taskname1:validity,
-    taskname2:validity
-}
-userid is the key in redis, and the python dictionary is stored as a JSON string
+RENEW_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
 """
 
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+
+def get_redis_connection():
+    """
+    Returns a redis client backed by a connection pool shared by the process.
+    """
+    global _connection_pool
+    if _connection_pool is None:
+        with _connection_pool_lock:
+            if _connection_pool is None:
+                load_dotenv()
+                _connection_pool = redis.ConnectionPool(
+                    host=os.getenv("REDIS_HOST"),
+                    port=os.getenv("REDIS_PORT"),
+                    db=0,
+                )
+    return redis.StrictRedis(connection_pool=_connection_pool)
+
+
+class LockMetrics:
+    """
+    Per process counters on lock usage.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.acquired = 0
+            self.contended = 0
+            self.timed_out = 0
+            self.released = 0
+            self.total_wait_time = 0.0
+
+    def record_acquire(self, acquired, attempts, wait_time):
+        with self._lock:
+            if acquired:
+                self.acquired += 1
+            else:
+                self.timed_out += 1
+            if attempts > 1 or not acquired:
+                self.contended += 1
+            self.total_wait_time += wait_time
+
+    def record_release(self):
+        with self._lock:
+            self.released += 1
+
+    def as_dict(self):
+        with self._lock:
+            attempts = self.acquired + self.timed_out
+            return {
+                "acquired": self.acquired,
+                "contended": self.contended,
+                "timed_out": self.timed_out,
+                "released": self.released,
+                "total_wait_time": self.total_wait_time,
+                "average_wait_time": self.total_wait_time / attempts
+                if attempts
+                else 0.0,
+            }
+
+
+lock_metrics = LockMetrics()
+
 
 class LockException(Exception):
     pass
 
 
 class Lock:
-    def __init__(self, user_id, task_name):
-        load_dotenv()
-        self.redis_host = os.getenv("REDIS_HOST")
-        self.redis_port = os.getenv("REDIS_PORT")
-        self.redis_connection = redis.StrictRedis(
-            host=self.redis_host, port=self.redis_port, db=0
-        )
+    def __init__(
+        self, user_id, task_name, timeout=None, blocking_timeout=0, retry_interval=0.1
+    ):
+        self.redis_connection = get_redis_connection()
         self.user_id = user_id
         self.task_name = task_name
+        self.key = f"{KEY_PREFIX}:{user_id}:{task_name}"
+        self.token = uuid.uuid4().hex
+        # Used by the context manager API
+        self.timeout = timeout
+        self.blocking_timeout = blocking_timeout
+        self.retry_interval = retry_interval
         # self.logger = logging.getLogger(f"Lock-{self.user_id}-{self.task_name}")
         # self.logger.setLevel(logging.INFO)
 
     # Return 1 if the lock is set and 0 if lock is not set
     def lockStatus(self):
         try:
-            retrieved_json_str = self.redis_connection.get(self.user_id)
-            if retrieved_json_str:
-                retrieved_dict = json.loads(retrieved_json_str.decode("utf-8"))
-                if self.task_name in retrieved_dict:
-                    validity = retrieved_dict[self.task_name]
-                    if time.time() > validity:
-                        return 0  # Lock has expired
-                    else:
-                        return 1  # Lock is valid
-                else:
-                    return 0  # Task name doesn't exist in locks
-            else:
-                return 0  # user id doesn't exist in Redis
+            return 1 if self.redis_connection.exists(self.key) else 0
         except Exception as e:
-            raise LockException(f"Error setting lock: {str(e)}")
+            raise LockException(f"Error getting lock status: {str(e)}")
 
     def setLock(self, timeout):
+        """
+        Sets the lock for timeout seconds if it is not already set.
+        Returns True if the lock was set by this call.
+        """
         try:
-            if self.lockStatus() == 0:
-                retrieved_json_str = self.redis_connection.get(self.user_id)
-                if retrieved_json_str:
-                    # JSON for user already exists, append the task name and validity
-                    retrieved_dict = json.loads(retrieved_json_str.decode("utf-8"))
-                    retrieved_dict[self.task_name] = time.time() + timeout
-                    new_json_str = json.dumps(retrieved_dict)
-                    self.redis_connection.set(self.user_id, new_json_str)
-                    # self.logger.info(f"Lock set for task {self.task_name} and user {self.user_id} for {timeout} seconds")
-
-                else:
-                    # create new JSON for redis entry
-                    new_dict = {self.task_name: time.time() + timeout}
-                    new_json_str = json.dumps(new_dict)
-                    self.redis_connection.set(self.user_id, new_json_str)
-                    # self.logger.info(f"Lock set for task {self.task_name} and user {self.user_id} for {timeout} seconds")
+            return bool(
+                self.redis_connection.set(
+                    self.key, self.token, nx=True, px=int(timeout * 1000)
+                )
+            )
         except Exception as e:
             raise LockException(f"Error setting lock: {str(e)}")
 
     def releaseLock(self):
+        """
+        Releases the lock irrespective of the instance that set it.
+        """
         try:
-            if self.lockStatus() == 1:
-                retrieved_json_str = self.redis_connection.get(self.user_id)
-                retrieved_dict = json.loads(retrieved_json_str.decode("utf-8"))
-                if len(retrieved_dict) > 1:
-                    del retrieved_dict[self.task_name]
-                    new_json_str = json.dumps(retrieved_dict)
-                    self.redis_connection.set(self.user_id, new_json_str)
-                    # self.logger.info(f"Lock released for task {self.task_name} and user {self.user_id}")
-                else:
-                    self.redis_connection.delete(self.user_id)
-                    # self.logger.info(f"Lock released for task {self.task_name} and user {self.user_id}")
+            if self.redis_connection.delete(self.key):
+                lock_metrics.record_release()
         except Exception as e:
             raise LockException(f"Error releasing lock: {str(e)}")
 
     def getRemainingTimeForLock(self):
         try:
-            if self.lockStatus() == 1:
-                retrieved_json_str = self.redis_connection.get(self.user_id)
-                retrieved_dict = json.loads(retrieved_json_str.decode("utf-8"))
-                remaining_time = retrieved_dict[self.task_name] - time.time()
-                return remaining_time
+            remaining_time = self.redis_connection.pttl(self.key)
+            if remaining_time >= 0:
+                return remaining_time / 1000
         except Exception as e:
             raise LockException(f"Error getting remaining time for lock: {str(e)}")
 
+    def acquire(self, timeout, blocking_timeout=0):
+        """
+        Tries to set the lock for timeout seconds, retrying for up to
+        blocking_timeout seconds while it is held by someone else.
+        """
+        start = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            acquired = self.setLock(timeout)
+            wait_time = time.monotonic() - start
+            if acquired or wait_time >= blocking_timeout:
+                lock_metrics.record_acquire(acquired, attempts, wait_time)
+                return acquired
+            time.sleep(min(self.retry_interval, blocking_timeout - wait_time))
+
+    def release(self):
+        """
+        Releases the lock only if it is still held by this instance.
+        """
+        try:
+            released = self.redis_connection.eval(
+                RELEASE_SCRIPT, 1, self.key, self.token
+            )
+        except Exception as e:
+            raise LockException(f"Error releasing lock: {str(e)}")
+        if released:
+            lock_metrics.record_release()
+        return bool(released)
+
+    def renew(self, timeout):
+        """
+        Extends the validity of a lock held by this instance to timeout seconds.
+        """
+        try:
+            return bool(
+                self.redis_connection.eval(
+                    RENEW_SCRIPT, 1, self.key, self.token, int(timeout * 1000)
+                )
+            )
+        except Exception as e:
+            raise LockException(f"Error renewing lock: {str(e)}")
+
+    def __enter__(self):
+        if self.timeout is None:
+            raise LockException(
+                "A timeout is required to use the lock as a context manager"
+            )
+        if not self.acquire(self.timeout, self.blocking_timeout):
+            raise LockException(f"Could not acquire lock for task {self.task_name}")
+        return self
 
-# # testing
-# if __name__ == '__main__':
-#     user_id = "user123"
-#     task_name = "task1"
-#
-#     #test 1
-#     lock = Lock(user_id, task_name)
-#     print(f"Before setting the lock the lock status is {lock.lockStatus()}")
-#
-#     lock.setLock(30)
-#     print(f"After setting the lock the lock status is {lock.lockStatus()}")
-#
-#     time.sleep(31)
-#     print(f"After waiting 30sec the lock status is {lock.lockStatus()}")
-#
-#     lock.releaseLock()
-#     print(f"after releasing the lock the lock status is {lock.lockStatus()}")
-#
-#     #test2 part 1
-#     lock = Lock(user_id, task_name)
-#     print(f"Before setting the lock for 200sec the lock status is {lock.lockStatus()}")
-#     lock.setLock(200)
-#     print(f"Just after setting the lock for 200sec the lock status is {lock.lockStatus()}")
-#
-#     #test2 part2
-#     lock = Lock(user_id, task_name)
-#     print(f"few seconds after setting the lock for 200sec the lock status is {lock.lockStatus()}")
-#
-#     #test 3 for testing remanining time
-#     lock =Lock(user_id,task_name)
-#     lock.setLock(100)
-#     time.sleep(10)
-#     print(f"remaining time = {lock.getRemainingTimeForLock()}")
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
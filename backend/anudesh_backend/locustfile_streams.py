@@ -0,0 +1,85 @@
+"""
+Holds many chat event streams open at once, to check that a few ASGI workers
+serve hundreds of concurrent streams. Run it against the stream service, e.g.
+
+    locust -f locustfile_streams.py --host=http://localhost:8001 --headless -u 500 -r 50 -t 2m
+
+Streams refused because a worker is at MAX_CONCURRENT_STREAMS are reported
+as "chat_output_stream [busy]" instead of failures.
+"""
+import json
+import os
+import time
+
+from locust import HttpUser, between, events, task
+
+STREAM_MODEL = os.environ.get("STREAM_MODEL", "google/gemma-4-26B-A4B-it")
+STREAM_PROMPT = os.environ.get(
+    "STREAM_PROMPT", "Write a short paragraph about the monsoon."
+)
+
+
+class ChatStreamUser(HttpUser):
+    wait_time = between(1, 3)
+    host = os.environ.get("API_URL", "http://localhost:8001")
+
+    def on_start(self):
+        # The token can come from the environment, since the stream service
+        # may not be the one serving the login
+        self.token = os.environ.get("TEST_ACCESS_TOKEN")
+        if self.token:
+            return
+        response = self.client.post(
+            "/users/auth/jwt/create",
+            json={
+                "email": os.environ.get("TEST_EMAIL", ""),
+                "password": os.environ.get("TEST_EMAIL_PASSWORD", ""),
+            },
+        )
+        if response.status_code == 200:
+            self.token = response.json().get("access")
+
+    @task
+    def chat_output_stream(self):
+        start = time.perf_counter()
+        with self.client.post(
+            "/functions/chat_output_stream",
+            json={"message": STREAM_PROMPT, "history": [], "model": STREAM_MODEL},
+            headers={"Authorization": f"JWT {self.token}"},
+            stream=True,
+            catch_response=True,
+        ) as response:
+            if response.status_code == 503:
+                response.success()
+                events.request.fire(
+                    request_type="POST",
+                    name="chat_output_stream [busy]",
+                    response_time=(time.perf_counter() - start) * 1000,
+                    response_length=0,
+                    exception=None,
+                    context={},
+                )
+                return
+            if response.status_code != 200:
+                response.failure(f"Status {response.status_code}")
+                return
+
+            tokens = 0
+            done = False
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                event = json.loads(line[len("data: ") :])
+                if "error" in event:
+                    response.failure(event["error"])
+                    return
+                if event.get("done"):
+                    done = True
+                    break
+                tokens += 1
+            if not done:
+                response.failure("Stream ended before the done event")
+            elif not tokens:
+                response.failure("Stream sent no tokens")
+            else:
+                response.success()
@@ -136,6 +136,19 @@ DATABASES = {
     }
 }
 
+# Read replica of the default database, for analytics, reports and downloads
+if os.getenv("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.getenv("DB_REPLICA_NAME", os.getenv("DB_NAME")),
+        "HOST": os.getenv("DB_REPLICA_HOST"),
+        "PORT": os.getenv("DB_REPLICA_PORT", os.getenv("DB_PORT")),
+        # The test database of the default one stands for the replica in tests
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["utils.db_routing.ReplicaRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -184,11 +197,17 @@ MEDIA_URL = "/media/"
 STATIC_URL = "/static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
 
+# Uploaded dataset files waiting to be read by the upload task, on a
+# directory shared by the web and celery containers
+DATASET_UPLOAD_ROOT = os.getenv(
+    "DATASET_UPLOAD_ROOT", os.path.join(BASE_DIR, "dataset_uploads")
+)
+
 AUTH_USER_MODEL = "users.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ),
     "DEFAULT_PAGINATION_CLASS": "anudesh_backend.pagination.CustomPagination",
@@ -308,6 +327,9 @@ CELERY_TIMEZONE = "Asia/Kolkata"
 CELERY_BROKER_URL = "redis://redis:6379/0"
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
 
+# Number of days the celery task results are kept for
+TASK_RESULT_RETENTION_DAYS = int(os.getenv("TASK_RESULT_RETENTION_DAYS", "30"))
+
 
 # Project lock TTL for task pulling(in seconds)
 PROJECT_LOCK_TTL = 5
@@ -0,0 +1,142 @@
+"""
+Set based removal of duplicate dataset items.
+
+Duplicate groups are found with a single GROUP BY on the chosen fields. In
+every group the item with the most annotations survives (the oldest one on
+ties), the annotation counts of a chunk of groups being fetched with one
+aggregate query. The other items, their tasks and annotations are deleted in
+batches, each batch in its own transaction.
+"""
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import transaction
+from django.db.models import Count
+
+from tasks.models import (
+    Annotation,
+    Task,
+    ANNOTATOR_ANNOTATION,
+    REVIEWER_ANNOTATION,
+    SUPER_CHECKER_ANNOTATION,
+)
+
+GROUPS_CHUNK_SIZE = 1000
+DELETE_BATCH_SIZE = 500
+
+# Annotations protect their parent annotation from deletion, so children
+# have to be deleted first.
+ANNOTATION_DELETE_ORDER = [
+    SUPER_CHECKER_ANNOTATION,
+    REVIEWER_ANNOTATION,
+    ANNOTATOR_ANNOTATION,
+]
+
+
+class DeduplicationReport:
+    def __init__(self, total_groups=0):
+        self.total_groups = total_groups
+        self.processed_groups = 0
+        self.dataset_items = 0
+        self.tasks = 0
+        self.annotations = 0
+
+    def as_dict(self):
+        return {
+            "total_groups": self.total_groups,
+            "processed_groups": self.processed_groups,
+            "dataset_items": self.dataset_items,
+            "tasks": self.tasks,
+            "annotations": self.annotations,
+        }
+
+
+def get_duplicate_groups(dataset_items, fields):
+    """
+    Returns a queryset of the lists of ids of the dataset items sharing the
+    same values of fields, for the values shared by more than one item.
+    """
+    return (
+        dataset_items.values(*fields)
+        .annotate(item_count=Count("id"), item_ids=ArrayAgg("id", ordering="id"))
+        .filter(item_count__gt=1)
+        .order_by()
+        .values_list("item_ids", flat=True)
+    )
+
+
+def get_annotation_counts(item_ids):
+    return dict(
+        Annotation.objects.filter(task__input_data_id__in=item_ids)
+        .values_list("task__input_data_id")
+        .annotate(count=Count("id"))
+    )
+
+
+def pick_losers(groups):
+    """
+    Returns the ids of the items to delete from the groups, and their
+    annotation count. The survivor of a group is its item with the most
+    annotations, the one with the lowest id on ties.
+    """
+    annotation_counts = get_annotation_counts(
+        [item_id for group in groups for item_id in group]
+    )
+    losers = []
+    for group in groups:
+        survivor = max(
+            group, key=lambda item_id: (annotation_counts.get(item_id, 0), -item_id)
+        )
+        losers += [item_id for item_id in group if item_id != survivor]
+    return losers, sum(annotation_counts.get(item_id, 0) for item_id in losers)
+
+
+def delete_dataset_items(dataset_model, item_ids):
+    """
+    Deletes the dataset items with their tasks and annotations.
+    """
+    with transaction.atomic():
+        annotations = Annotation.objects.filter(task__input_data_id__in=item_ids)
+        for annotation_type in ANNOTATION_DELETE_ORDER:
+            annotations.filter(annotation_type=annotation_type).delete()
+        # Deleted before the items, as the cascade skips the counter updates
+        # of Task.objects.delete()
+        Task.objects.filter(input_data_id__in=item_ids).delete()
+        dataset_model.objects.filter(id__in=item_ids).delete()
+
+
+def deduplicate_dataset_items(
+    dataset_model, dataset_items, fields, dry_run=False, progress_callback=None
+):
+    """
+    Deletes the duplicates of dataset_items on fields and returns a
+    DeduplicationReport. With dry_run nothing is deleted, the report then
+    holds what would have been deleted. progress_callback is called with the
+    report after every chunk of groups.
+    """
+    duplicate_groups = get_duplicate_groups(dataset_items, fields)
+    report = DeduplicationReport(total_groups=duplicate_groups.count())
+    groups = []
+    for group in duplicate_groups.iterator(chunk_size=GROUPS_CHUNK_SIZE):
+        groups.append(group)
+        if len(groups) == GROUPS_CHUNK_SIZE:
+            _deduplicate_groups(dataset_model, groups, report, dry_run)
+            groups = []
+            if progress_callback:
+                progress_callback(report)
+    if groups:
+        _deduplicate_groups(dataset_model, groups, report, dry_run)
+        if progress_callback:
+            progress_callback(report)
+    return report
+
+
+def _deduplicate_groups(dataset_model, groups, report, dry_run):
+    losers, annotation_count = pick_losers(groups)
+    report.processed_groups += len(groups)
+    report.dataset_items += len(losers)
+    report.annotations += annotation_count
+    report.tasks += Task.objects.filter(input_data_id__in=losers).count()
+    if dry_run:
+        return
+    for start in range(0, len(losers), DELETE_BATCH_SIZE):
+        delete_dataset_items(dataset_model, losers[start : start + DELETE_BATCH_SIZE])
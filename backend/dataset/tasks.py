@@ -3,11 +3,15 @@ from base64 import b64decode
 from celery import shared_task
 from tablib import Dataset
 
-from .resources import RESOURCE_MAP
-
 from dataset.models import DatasetInstance
 from django.apps import apps
-from tasks.models import Task, Annotation
+from .deduplication import deduplicate_dataset_items
+from .upload import (
+    EmptyUploadError,
+    delete_upload_file,
+    iter_upload_rows,
+    run_upload,
+)
 
 #### CELERY SHARED TASKS
 
@@ -16,37 +20,51 @@ from tasks.models import Task, Annotation
     bind=True,
 )
 def upload_data_to_data_instance(
-    self, dataset_string, pk, dataset_type, content_type, deduplicate=False
+    self,
+    pk,
+    dataset_type,
+    content_type,
+    file_name=None,
+    dataset_string=None,
+    deduplicate=False,
 ):
     # sourcery skip: raise-specific-error
     """Celery background task to upload the data to the dataset instance through file upload.
-    First perform a batch upload and if that fails then move on to an iterative format to find rows with errors.
+    The rows are uploaded in chunks, and the rows with errors are found by splitting the chunks that fail.
 
 
     Args:
-        dataset_string (str): The data to be uploaded in string format
         pk (int): Primary key of the dataset instance
         dataset_type (str): The type of the dataset instance
         content_type (str): The file format of the uploaded file
+        file_name (str): Storage name of the uploaded file, deleted once uploaded
+        dataset_string (str): The data to be uploaded in string format (base64 for xls and xlsx), if no file_name is given
         deduplicate (bool): Whether to deduplicate the data or not
     """
 
-    # Create a new tablib Dataset and load the data into this dataset
-    if content_type in ["xls", "xlsx"]:
-        imported_data = Dataset().load(b64decode(dataset_string), format=content_type)
-    else:
-        imported_data = Dataset().load(dataset_string, format=content_type)
-
-    # If deduplicate is True then remove duplicate rows from the imported data
-    if deduplicate:
-        imported_data.remove_duplicates()
-
-    # Add the instance_id column to all rows in the dataset
-    imported_data.append_col([pk] * len(imported_data), header="instance_id")
-
     try:
-        data_headers = imported_data.dict[0].keys()
-    except Exception as e:
+        if file_name is not None:
+            rows = iter_upload_rows(file_name, content_type)
+        else:
+            # Tasks queued before the uploads were stored carry the data itself
+            if content_type in ["xls", "xlsx"]:
+                imported_data = Dataset().load(
+                    b64decode(dataset_string), format=content_type
+                )
+            else:
+                imported_data = Dataset().load(dataset_string, format=content_type)
+            rows = [imported_data.headers] + list(imported_data)
+
+        progress = run_upload(
+            pk,
+            dataset_type,
+            rows,
+            deduplicate=deduplicate,
+            progress_callback=lambda progress: self.update_state(
+                state="PROGRESS", meta=progress.as_dict()
+            ),
+        )
+    except EmptyUploadError as e:
         self.update_state(
             state="FAILURE",
             meta={
@@ -54,56 +72,36 @@ def upload_data_to_data_instance(
             },
         )
         raise e
-
-    # Declare the appropriate resource map based on dataset type
-    resource = RESOURCE_MAP[dataset_type]()
-
-    # Perform a full batch upload of the data and return success if all checks are passed
-    try:
-        resource.import_data(imported_data, raise_errors=True)
-        return f"All {len(imported_data.dict)} rows uploaded together."
-
-    # If checks are failed, check which lines have an issue
-    except:
-        # Add row numbers to the dataset
-        imported_data.append_col(range(1, len(imported_data) + 1), header="row_number")
-
-        # List with row numbers that couldn't be uploaded
-        failed_rows = []
-
-        # Iterate through the dataset and upload each row to the database
-        for row in imported_data.dict:
-            # Remove row number column from the row being uploaded
-            row_number = row["row_number"]
-            del row["row_number"]
-
-            # Convert row to a tablib dataset
-            row_dataset = Dataset()
-            row_dataset.headers = data_headers
-
-            # Add the row to the dataset
-            row_dataset.append(tuple(row.values()))
-
-            upload_result = resource.import_data(
-                row_dataset, raise_errors=False, dry_run=True
-            )
-
-            # check if the upload result has errors
-            if upload_result.has_errors() or upload_result.has_validation_errors():
-                failed_rows.append(row_number)
-
-        # Upload which rows have an error
-        self.update_state(
-            state="FAILURE",
-            meta={
-                "failed_line_numbers": failed_rows,
-            },
-        )
-        raise Exception(f"Upload failed for lines: {failed_rows}")
+    finally:
+        if file_name is not None:
+            delete_upload_file(file_name)
+
+    if not progress.failed_rows:
+        return f"All {progress.uploaded} rows uploaded."
+
+    # Upload which rows have an error
+    self.update_state(
+        state="FAILURE",
+        meta={
+            "failed_line_numbers": progress.failed_rows,
+            "uploaded_rows": progress.uploaded,
+        },
+    )
+    raise Exception(
+        f"Uploaded {progress.uploaded} rows. Upload failed for lines: {progress.failed_rows}"
+    )
 
 
 @shared_task(bind=True)
-def deduplicate_dataset_instance_items(self, pk, deduplicate_field_list):
+def deduplicate_dataset_instance_items(self, pk, deduplicate_field_list, dry_run=False):
+    """Celery background task to delete the duplicate items of a dataset instance.
+    Of the items sharing the same values of the fields, the one with the most annotations is kept.
+
+    Args:
+        pk (int): Primary key of the dataset instance
+        deduplicate_field_list (list): The fields on which items are compared
+        dry_run (bool): Only report what would be deleted
+    """
     if len(deduplicate_field_list) == 0:
         return "Field list cannot be empty"
     try:
@@ -113,53 +111,17 @@ def deduplicate_dataset_instance_items(self, pk, deduplicate_field_list):
     dataset_type = dataset_instance.dataset_type
     dataset_model = apps.get_model("dataset", dataset_type)
     dataset_items = dataset_model.objects.filter(instance_id=dataset_instance)
-    duplicate_data_tracking_dict = {}
-    tasks_count = 0
-    annotations_count = 0
-    dataset_items_count = 0
-    for dataset_item in dataset_items:
-        dataset_item_field_value = []
-        for field in deduplicate_field_list:
-            dataset_item_field_value.append(getattr(dataset_item, field))
-        dict_key = tuple(dataset_item_field_value)
-        if dict_key not in duplicate_data_tracking_dict:
-            related_tasks = Task.objects.filter(input_data__id=dataset_item.id)
-            related_tasks_ids = [task.id for task in related_tasks]
-            related_annos = Annotation.objects.filter(
-                task__id__in=related_tasks_ids
-            ).order_by("-id")
-            duplicate_data_tracking_dict[dict_key] = [
-                related_annos,
-                dataset_item,
-                len(related_tasks_ids),
-            ]
-        else:
-            print(duplicate_data_tracking_dict[dict_key])
-            related_tasks = Task.objects.filter(input_data=dataset_item.id)
-            related_tasks_ids = [task.id for task in related_tasks]
-            related_annos1 = Annotation.objects.filter(
-                task__id__in=related_tasks_ids
-            ).order_by("-id")
-            related_annos2 = duplicate_data_tracking_dict[dict_key][0]
-            if related_annos1.count() <= related_annos2.count():
-                annotations_count += related_annos1.count()
-                tasks_count += len(related_tasks_ids)
-                for anno in related_annos1:
-                    anno.delete()
-                dataset_item.delete()
-                dataset_items_count += 1
-            else:
-                dataset_item2 = duplicate_data_tracking_dict[dict_key][1]
-                annotations_count += related_annos2.count()
-                tasks_count += duplicate_data_tracking_dict[dict_key][2]
-                for anno in related_annos2:
-                    anno.delete()
-                dataset_item2.delete()
-                dataset_items_count += 1
-                duplicate_data_tracking_dict[dict_key] = [
-                    related_annos1,
-                    dataset_item,
-                    len(related_tasks_ids),
-                ]
-
-    return f"Deleted {dataset_items_count} duplicate dataset items and {tasks_count} related tasks and {annotations_count} related annotations"
+
+    def report_progress(report):
+        self.update_state(state="PROGRESS", meta=report.as_dict())
+
+    report = deduplicate_dataset_items(
+        dataset_model,
+        dataset_items,
+        deduplicate_field_list,
+        dry_run=dry_run,
+        progress_callback=report_progress,
+    )
+    if dry_run:
+        return f"Found {report.dataset_items} duplicate dataset items with {report.tasks} related tasks and {report.annotations} related annotations"
+    return f"Deleted {report.dataset_items} duplicate dataset items and {report.tasks} related tasks and {report.annotations} related annotations"
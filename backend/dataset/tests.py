@@ -1,3 +1,59 @@
-from django.test import TestCase
+import contextlib
+import io
+from unittest import mock
+
+from django.db import IntegrityError
+from django.test import SimpleTestCase
+
+from .upload import (
+    EmptyUploadError,
+    insert_with_bisection,
+    iter_csv_rows,
+    iter_upload_chunks,
+    run_upload,
+)
 
 # Create your tests here.
+
+
+class UploadTestcase(SimpleTestCase):
+    def test_chunks_number_rows_and_deduplicate(self):
+        rows = [("a", "1"), ("b", "2"), ("a", "1"), ("c", "3")]
+        chunks = list(iter_upload_chunks(rows, deduplicate=True, chunk_size=2))
+        self.assertEqual(
+            chunks, [[(1, ("a", "1")), (2, ("b", "2"))], [(4, ("c", "3"))]]
+        )
+
+    def test_bisection_finds_failing_rows(self):
+        inserted = []
+
+        def bulk_insert(items):
+            if "bad" in items:
+                raise IntegrityError("bad row")
+            inserted.extend(items)
+
+        built = [
+            (number, "bad" if number in (3, 11) else number) for number in range(1, 17)
+        ]
+        with mock.patch(
+            "dataset.upload.transaction.atomic",
+            return_value=contextlib.nullcontext(),
+        ), mock.patch(
+            "dataset.upload.multi_inheritance_table_bulk_insert",
+            side_effect=bulk_insert,
+        ) as insert:
+            count, failed_rows = insert_with_bisection(built)
+
+        self.assertEqual(failed_rows, [3, 11])
+        self.assertEqual(count, 14)
+        self.assertEqual(len(inserted), 14)
+        # Fewer inserts than one per row
+        self.assertLess(insert.call_count, 16)
+
+    def test_headers_only_upload_is_empty(self):
+        rows = iter_csv_rows(io.BytesIO(b"prompt,output\r\n\r\n"), ",")
+        with mock.patch("dataset.upload.DatasetInstance.objects.get"), mock.patch(
+            "dataset.upload.RowBuilder"
+        ):
+            with self.assertRaises(EmptyUploadError):
+                run_upload(1, "Interaction", rows)
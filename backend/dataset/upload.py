@@ -0,0 +1,279 @@
+"""
+Chunked upload of a dataset file into a dataset instance.
+
+The uploaded file is saved under DATASET_UPLOAD_ROOT by the upload view and
+read back, then deleted, by the celery task, csv and tsv files a line at a
+time. Rows are
+converted and validated a chunk at a time with the widgets of the import
+resource of the dataset type, checking the foreign keys of a chunk with one
+query per key, and the valid rows of a chunk are inserted with a single bulk
+insert. A chunk whose insert fails is split in halves until the failing rows
+are found, so that a bad row costs a few inserts instead of a dry run of
+every row of the file.
+"""
+import csv
+import io
+import logging
+import os
+import uuid
+
+import tablib
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import FileSystemStorage
+from django.db import DatabaseError, transaction
+from import_export.widgets import ForeignKeyWidget, ManyToManyWidget
+
+from utils.custom_bulk_create import multi_inheritance_table_bulk_insert
+from .models import DatasetInstance
+from .resources import RESOURCE_MAP
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1000
+# Formats read a line at a time, the others are loaded whole by tablib
+CSV_DELIMITERS = {"csv": ",", "tsv": "\t"}
+
+
+upload_storage = FileSystemStorage(location=settings.DATASET_UPLOAD_ROOT)
+
+
+class EmptyUploadError(ValueError):
+    pass
+
+
+class UploadProgress:
+    def __init__(self):
+        self.processed = 0
+        self.uploaded = 0
+        self.failed_rows = []
+
+    def as_dict(self):
+        return {
+            "processed_rows": self.processed,
+            "uploaded_rows": self.uploaded,
+            "failed_rows": len(self.failed_rows),
+        }
+
+
+def save_upload_file(dataset_file, pk, content_type):
+    """
+    Saves the uploaded file for the upload task, returning its storage name.
+    """
+    name = os.path.join(str(pk), f"{uuid.uuid4().hex}.{content_type}")
+    return upload_storage.save(name, dataset_file)
+
+
+def delete_upload_file(name):
+    upload_storage.delete(name)
+
+
+def iter_csv_rows(upload_file, delimiter):
+    """
+    Yields the headers and then the rows of a csv file, padded to the width
+    of the headers and without the empty rows, as tablib loads them.
+    """
+    reader = csv.reader(
+        io.TextIOWrapper(upload_file, encoding="utf-8-sig", newline=""),
+        delimiter=delimiter,
+    )
+    headers = next(reader, None)
+    if headers is None:
+        return
+    yield headers
+    for row in reader:
+        if row:
+            yield row + [""] * (len(headers) - len(row))
+
+
+def iter_upload_rows(name, content_type):
+    """
+    Yields the headers and then the rows of the stored upload file.
+    """
+    with upload_storage.open(name, "rb") as upload_file:
+        if content_type in CSV_DELIMITERS:
+            yield from iter_csv_rows(upload_file, CSV_DELIMITERS[content_type])
+            return
+        content = upload_file.read()
+    if content_type not in ("xls", "xlsx"):
+        content = content.decode("utf-8-sig")
+    dataset = tablib.Dataset().load(content, format=content_type)
+    yield dataset.headers
+    yield from dataset
+
+
+def iter_upload_chunks(rows, deduplicate=False, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Yields lists of (row number, row values) of the rows, chunk_size at a
+    time. Rows are numbered from 1 after the headers, and repeated rows are
+    left out if deduplicate is set.
+    """
+    seen_rows = set()
+    chunk = []
+    for row_number, row in enumerate(rows, start=1):
+        row = tuple(row)
+        if deduplicate:
+            if row in seen_rows:
+                continue
+            seen_rows.add(row)
+        chunk.append((row_number, row))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class RowBuilder:
+    """
+    Builds the dataset items of rows with the fields of an import resource.
+    Foreign keys given as ids are set directly and checked for a whole chunk
+    at once, instead of being fetched row by row by their widgets.
+    """
+
+    def __init__(self, dataset_type, instance_id):
+        resource = RESOURCE_MAP[dataset_type]()
+        self.model = resource._meta.model
+        self.instance_id = instance_id
+        self.fields, self.foreign_keys = [], []
+        for field in resource.get_import_fields():
+            if not field.attribute or field.attribute == "instance_id":
+                continue
+            if isinstance(field.widget, ManyToManyWidget):
+                continue
+            if isinstance(field.widget, ForeignKeyWidget) and field.widget.field in (
+                "pk",
+                "id",
+            ):
+                model_field = self.model._meta.get_field(field.attribute)
+                self.foreign_keys.append((field, model_field))
+            else:
+                self.fields.append(field)
+        self.exclude_from_validation = [
+            model_field.name for _, model_field in self.foreign_keys
+        ] + ["instance_id"]
+
+    def build(self, headers, values):
+        """
+        Returns the unsaved item of a row, raising ValueError or
+        ValidationError if the row is invalid.
+        """
+        if len(values) != len(headers):
+            raise ValueError("The row does not have as many values as the headers")
+        row = dict(zip(headers, values))
+        item = self.model()
+        item.instance_id_id = self.instance_id
+        for field in self.fields:
+            if field.column_name in row:
+                field.save(item, row)
+        for field, model_field in self.foreign_keys:
+            value = row.get(field.column_name)
+            setattr(
+                item,
+                model_field.attname,
+                None if value in (None, "") else int(float(value)),
+            )
+        item.full_clean(exclude=self.exclude_from_validation, validate_unique=False)
+        return item
+
+    def has_missing_foreign_keys(self, items):
+        """
+        Returns a list telling for each item whether one of its foreign keys
+        does not exist.
+        """
+        missing = [False] * len(items)
+        for _, model_field in self.foreign_keys:
+            values = [getattr(item, model_field.attname) for item in items]
+            ids = set(values) - {None}
+            if not ids:
+                continue
+            existing = set(
+                model_field.related_model.objects.filter(pk__in=ids).values_list(
+                    "pk", flat=True
+                )
+            )
+            for index, value in enumerate(values):
+                if value is not None and value not in existing:
+                    missing[index] = True
+        return missing
+
+    def build_chunk(self, headers, chunk):
+        """
+        Returns the (row number, item) of the valid rows of a chunk and the
+        row numbers of the invalid ones.
+        """
+        built, failed_rows = [], []
+        for row_number, values in chunk:
+            try:
+                built.append((row_number, self.build(headers, values)))
+            except (ValidationError, ValueError, TypeError) as e:
+                logger.info("Row %s of the upload is invalid: %s", row_number, e)
+                failed_rows.append(row_number)
+        missing = self.has_missing_foreign_keys([item for _, item in built])
+        failed_rows += [
+            row_number
+            for (row_number, _), is_missing in zip(built, missing)
+            if is_missing
+        ]
+        built = [
+            row_item for row_item, is_missing in zip(built, missing) if not is_missing
+        ]
+        return built, failed_rows
+
+
+def insert_with_bisection(built):
+    """
+    Bulk inserts the (row number, item) of built, splitting a batch in halves
+    when its insert fails. Returns the number of items inserted and the row
+    numbers of the items that could not be inserted.
+    """
+    if not built:
+        return 0, []
+    try:
+        with transaction.atomic():
+            multi_inheritance_table_bulk_insert([item for _, item in built])
+        return len(built), []
+    except DatabaseError as e:
+        if len(built) == 1:
+            logger.info("Row %s of the upload failed: %s", built[0][0], e)
+            return 0, [built[0][0]]
+
+    middle = len(built) // 2
+    first_inserted, first_failed = insert_with_bisection(built[:middle])
+    last_inserted, last_failed = insert_with_bisection(built[middle:])
+    return first_inserted + last_inserted, first_failed + last_failed
+
+
+def run_upload(
+    pk,
+    dataset_type,
+    rows,
+    deduplicate=False,
+    progress_callback=None,
+    chunk_size=UPLOAD_CHUNK_SIZE,
+):
+    """
+    Uploads the rows (headers first) into the dataset instance pk, a chunk
+    at a time. progress_callback is called with the UploadProgress after
+    every chunk. Returns the UploadProgress. Raises EmptyUploadError if there
+    are no headers or no rows.
+    """
+    DatasetInstance.objects.get(pk=pk)
+    rows = iter(rows)
+    headers = next(rows, None)
+    if not headers:
+        raise EmptyUploadError("Empty Dataset Uploaded.")
+    headers = list(headers)
+    builder = RowBuilder(dataset_type, pk)
+    progress = UploadProgress()
+    for chunk in iter_upload_chunks(rows, deduplicate, chunk_size):
+        built, failed_rows = builder.build_chunk(headers, chunk)
+        inserted, failed_inserts = insert_with_bisection(built)
+        progress.processed += len(chunk)
+        progress.uploaded += inserted
+        progress.failed_rows += sorted(failed_rows + failed_inserts)
+        if progress_callback:
+            progress_callback(progress)
+    if not progress.processed:
+        raise EmptyUploadError("Empty Dataset Uploaded.")
+    return progress
@@ -1,7 +1,5 @@
-import ast
 import json
 import re
-from base64 import b64encode
 from urllib.parse import parse_qsl
 
 from django.apps import apps
@@ -10,6 +8,13 @@ from django.http import StreamingHttpResponse, JsonResponse, HttpResponse
 from django.forms.models import model_to_dict
 from django.shortcuts import get_object_or_404
 from django_celery_results.models import TaskResult
+from functions.jobs import get_job_date_time, get_job_task_ids, get_latest_job
+from functions.models import (
+    PROJECT_ENTITY,
+    DATASET_INSTANCE_ENTITY,
+    EXPORT_JOB,
+    UPLOAD_JOB,
+)
 from users.serializers import UserFetchSerializer
 from filters import filter
 from projects.serializers import ProjectSerializer
@@ -39,6 +44,7 @@ from . import resources
 from .models import *
 from .serializers import *
 from .tasks import upload_data_to_data_instance, deduplicate_dataset_instance_items
+from .upload import delete_upload_file, save_upload_file
 import dataset
 from tasks.models import (
     Task,
@@ -50,25 +56,6 @@ from tasks.models import (
 
 
 ## Utility functions used inside the view functions
-def extract_status_date_time_from_task_queryset(task_queryset):
-    # Sort the tasks by newest items first by date
-    task_queryset = task_queryset.order_by("-date_done")
-
-    # Get the export task status and last update date
-    task_status = task_queryset.first().as_dict()["status"]
-    task_datetime = task_queryset.first().as_dict()["date_done"]
-
-    # Remove quotes from the status if it is present in the string
-    if '"' in task_status:
-        task_status = task_status.strip('"')
-
-    # Extract date and time from the datetime object
-    task_date = task_datetime.date()
-    task_time = f"{str(task_datetime.time().replace(microsecond=0))} UTC"
-
-    return task_status, task_date, task_time
-
-
 def get_project_export_status(pk):
     """Function to return status of the project export background task.
 
@@ -81,28 +68,12 @@ def get_project_export_status(pk):
         str: Time when the last time project was exported
     """
 
-    # Create the keyword argument for project ID
-    project_id_keyword_arg = "'project_id': " + "'" + str(pk) + "'" + ","
-
-    # Check the celery project export status
-    task_queryset = TaskResult.objects.filter(
-        task_name__in=[
-            "projects.tasks.export_project_in_place",
-            "projects.tasks.export_project_new_record",
-        ],
-        # task_name = 'projects.tasks.export_project_in_place',
-        task_kwargs__contains=project_id_keyword_arg,
-    )
-
-    # If the celery TaskResults table returns
-    if task_queryset:
-        (
-            task_status,
-            task_date,
-            task_time,
-        ) = extract_status_date_time_from_task_queryset(task_queryset)
+    # Get the latest export job of the project
+    job = get_latest_job(PROJECT_ENTITY, pk, [EXPORT_JOB])
 
-        return task_status, task_date, task_time
+    if job is not None:
+        task_date, task_time = get_job_date_time(job)
+        return job.status, task_date, task_time
 
     return (
         "Success",
@@ -123,46 +94,17 @@ def get_dataset_upload_status(dataset_instance_pk):
         str: Time when the last time dataset was uploaded
     """
 
-    # Create the keyword argument for dataset instance ID
-    instance_id_keyword_arg = "{'pk': " + "'" + str(dataset_instance_pk) + "'" + ","
-
-    # Check the celery project export status
-    task_queryset = TaskResult.objects.filter(
-        task_name="dataset.tasks.upload_data_to_data_instance",
-        task_kwargs__contains=instance_id_keyword_arg,
-    )
-
-    # If the celery TaskResults table returns data
-    if task_queryset:
-        (
-            task_status,
-            task_date,
-            task_time,
-        ) = extract_status_date_time_from_task_queryset(task_queryset)
+    # Get the latest upload job of the dataset instance
+    job = get_latest_job(DATASET_INSTANCE_ENTITY, dataset_instance_pk, [UPLOAD_JOB])
 
-        # Sort the tasks by newest items first by date
-        task_queryset = task_queryset.order_by("-date_done")
-
-        # Get the export task status and last update date
-        task_status = task_queryset.first().as_dict()["status"]
-        task_datetime = task_queryset.first().as_dict()["date_done"]
-        task_result = task_queryset.first().as_dict()["result"]
-
-        # Convert task result
-        if "exc_message" in task_result:
-            task_result = ast.literal_eval(task_result)["exc_message"]
-
-        # Remove quotes from the status if it is present in the string
-        if '"' in task_status:
-            task_status = task_status.strip('"')
+    if job is not None:
+        task_status = job.status
+        task_date, task_time = get_job_date_time(job)
+        task_result = job.result if job.result is not None else "None"
 
         if '"' in task_result:
             task_result = task_result.strip('"')
 
-        # Extract date and time from the datetime object
-        task_date = task_datetime.date()
-        task_time = f"{str(task_datetime.time().replace(microsecond=0))} UTC"
-
         # Get the error messages if the task is a failure
         if task_status == "FAILURE":
             task_status = "Ingestion Failed!"
@@ -367,13 +309,9 @@ class DatasetInstanceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Read the dataset as a string from the dataset pointer
+        # Store the file for the upload task, which reads it in chunks
         try:
-            if content_type in ["xls", "xlsx"]:
-                # xls and xlsx files cannot be decoded as a string
-                dataset_string = b64encode(dataset.read()).decode()
-            else:
-                dataset_string = dataset.read().decode()
+            file_name = save_upload_file(dataset, pk, content_type)
         except Exception as e:
             return Response(
                 {
@@ -384,13 +322,18 @@ class DatasetInstanceViewSet(viewsets.ModelViewSet):
             )
 
         # Uplod the dataset to the dataset instance
-        upload_data_to_data_instance.delay(
-            pk=pk,
-            dataset_type=dataset_type,
-            dataset_string=dataset_string,
-            content_type=content_type,
-            deduplicate=if_deduplicate,
-        )
+        try:
+            upload_data_to_data_instance.delay(
+                pk=pk,
+                dataset_type=dataset_type,
+                file_name=file_name,
+                content_type=content_type,
+                deduplicate=if_deduplicate,
+            )
+        except Exception:
+            # The task deletes the file once it has read it
+            delete_upload_file(file_name)
+            raise
 
         # Get name of the dataset instance
         dataset_name = get_object_or_404(DatasetInstance, pk=pk).instance_name
@@ -481,22 +424,7 @@ class DatasetInstanceViewSet(viewsets.ModelViewSet):
                 .values_list("id", flat=True)
             )
 
-            # Create the project keywords list
-            project_id_keyword_args = [
-                "'project_id': " + "'" + str(pk) + "'" for pk in project_ids
-            ]
-
-            # Turn list of project ID keywords into list of Q objects
-            queries = [
-                Q(task_kwargs__contains=project_keyword)
-                for project_keyword in project_id_keyword_args
-            ]
-
-            # Handle exception when queries is empty
-            try:
-                query = queries.pop()
-
-            except IndexError:
+            if not project_ids:
                 return Response(
                     {
                         "message": "No projects associated with this task.",
@@ -504,24 +432,19 @@ class DatasetInstanceViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
-            # Convert the list of Q objects into a single query
-            for item in queries:
-                query |= item
-
             # Get the task queryset for the task name and all the corresponding projects for this dataset
             task_queryset = TaskResult.objects.filter(
-                query,
                 task_name=task_name,
+                task_id__in=get_job_task_ids(task_name, PROJECT_ENTITY, project_ids),
             )
 
         else:
-            # Create the keyword argument for dataset instance ID
-            instance_id_keyword_arg = "{'pk': " + "'" + str(pk) + "'" + ","
-
-            # Check the celery project export status
+            # Get the celery results of the jobs of the dataset instance
             task_queryset = TaskResult.objects.filter(
                 task_name=task_name,
-                task_kwargs__contains=instance_id_keyword_arg,
+                task_id__in=get_job_task_ids(
+                    task_name, DATASET_INSTANCE_ENTITY, [pk]
+                ),
             )
 
         # Sort the task queryset by date and time
@@ -783,7 +706,16 @@ class DatasetInstanceViewSet(viewsets.ModelViewSet):
                 type=openapi.TYPE_ARRAY,
                 items=openapi.Items(type=openapi.TYPE_STRING),
                 required=True,
-            )
+            ),
+            openapi.Parameter(
+                "dry_run",
+                openapi.IN_QUERY,
+                description=(
+                    "Only report the duplicates that would be removed, in the task result"
+                ),
+                type=openapi.TYPE_BOOLEAN,
+                required=False,
+            ),
         ],
         responses={200: "Duplicate removal started"},
     )
@@ -807,7 +739,10 @@ class DatasetInstanceViewSet(viewsets.ModelViewSet):
                 {"message": "Fields list cannot be empty."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        deduplicate_dataset_instance_items.delay(pk, deduplicate_fields_list)
+        dry_run = request.query_params.get("dry_run", "false").lower() == "true"
+        deduplicate_dataset_instance_items.delay(
+            pk, deduplicate_fields_list, dry_run=dry_run
+        )
         ret_dict = {"message": "Duplicate removal started"}
         ret_status = status.HTTP_200_OK
         return Response(ret_dict, status=ret_status)
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class FunctionsConfig(AppConfig):
     name = "functions"
+
+    def ready(self):
+        # Connects the celery signals recording the async jobs
+        from . import jobs  # noqa: F401
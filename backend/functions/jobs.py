@@ -0,0 +1,324 @@
+"""
+Registry of the async jobs of projects and dataset instances.
+
+The celery signals below record an AsyncJob row for every published task of
+ASYNC_JOBS, keyed by the entity found in the task kwargs, and keep its status
+up to date until the task finishes. The status helpers of the views read the
+latest job of an entity through the entity index of AsyncJob.
+"""
+import ast
+import datetime
+import json
+import logging
+
+from celery.signals import (
+    before_task_publish,
+    task_failure,
+    task_prerun,
+    task_revoked,
+    task_success,
+)
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django_celery_results.models import TaskResult
+
+from .models import (
+    AsyncJob,
+    PROJECT_ENTITY,
+    DATASET_INSTANCE_ENTITY,
+    TASK_CREATION_JOB,
+    EXPORT_JOB,
+    PULL_JOB,
+    UPLOAD_JOB,
+)
+
+logger = logging.getLogger(__name__)
+
+# Task name: (entity type, job kind, kwarg holding the entity id)
+ASYNC_JOBS = {
+    "projects.tasks.create_parameters_for_task_creation": (
+        PROJECT_ENTITY,
+        TASK_CREATION_JOB,
+        "project_id",
+    ),
+    "projects.tasks.export_project_in_place": (
+        PROJECT_ENTITY,
+        EXPORT_JOB,
+        "project_id",
+    ),
+    "projects.tasks.export_project_new_record": (
+        PROJECT_ENTITY,
+        EXPORT_JOB,
+        "project_id",
+    ),
+    "projects.tasks.add_new_data_items_into_project": (
+        PROJECT_ENTITY,
+        PULL_JOB,
+        "project_id",
+    ),
+    "dataset.tasks.upload_data_to_data_instance": (
+        DATASET_INSTANCE_ENTITY,
+        UPLOAD_JOB,
+        "pk",
+    ),
+}
+
+PRUNE_BATCH_SIZE = 5000
+
+
+def get_job_entity(task_name, task_kwargs):
+    """
+    Returns the (entity type, entity id, job kind) of a task, or None if the
+    task is not registered or its kwargs hold no entity id.
+    """
+    job = ASYNC_JOBS.get(task_name)
+    if job is None:
+        return None
+    entity_type, kind, kwarg = job
+    try:
+        entity_id = int((task_kwargs or {})[kwarg])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return entity_type, entity_id, kind
+
+
+def format_job_result(result):
+    if result is None or isinstance(result, str):
+        return result
+    return json.dumps(result, default=str)
+
+
+def record_job(task_name, task_id, task_kwargs, published=False, **fields):
+    """
+    Creates or updates the AsyncJob of a task. The publish record never
+    overwrites the one of a worker, since the worker may finish the task
+    before the publisher writes it.
+    """
+    entity = get_job_entity(task_name, task_kwargs)
+    if entity is None or not task_id:
+        return
+    entity_type, entity_id, kind = entity
+    jobs = AsyncJob.objects.filter(task_id=task_id)
+    try:
+        if not published and jobs.update(**fields):
+            return
+        with transaction.atomic():
+            AsyncJob.objects.create(
+                task_id=task_id,
+                task_name=task_name,
+                entity_type=entity_type,
+                entity_id=entity_id,
+                kind=kind,
+                **fields,
+            )
+    except IntegrityError:
+        if not published:
+            jobs.update(**fields)
+    except Exception:
+        # The job registry must never break the task itself
+        logger.exception("Could not record the async job %s", task_id)
+
+
+@before_task_publish.connect
+def record_published_job(sender=None, headers=None, body=None, **kwargs):
+    # Task message protocol 2 bodies are (args, kwargs, embed)
+    task_kwargs = body[1] if isinstance(body, (list, tuple)) else body.get("kwargs")
+    record_job(sender, (headers or {}).get("id"), task_kwargs, published=True)
+
+
+@task_prerun.connect
+def record_started_job(sender=None, task_id=None, kwargs=None, **extra):
+    record_job(sender.name, task_id, kwargs, status="STARTED")
+
+
+@task_success.connect
+def record_successful_job(sender=None, result=None, **kwargs):
+    record_job(
+        sender.name,
+        sender.request.id,
+        sender.request.kwargs,
+        status="SUCCESS",
+        result=format_job_result(result),
+        date_done=timezone.now(),
+    )
+
+
+@task_failure.connect
+def record_failed_job(sender=None, task_id=None, exception=None, kwargs=None, **extra):
+    record_job(
+        sender.name,
+        task_id,
+        kwargs,
+        status="FAILURE",
+        result=str(exception),
+        date_done=timezone.now(),
+    )
+
+
+@task_revoked.connect
+def record_revoked_job(sender=None, request=None, **kwargs):
+    record_job(
+        sender.name,
+        request.id,
+        request.kwargs,
+        status="REVOKED",
+        date_done=timezone.now(),
+    )
+
+
+def get_latest_job(entity_type, entity_id, kinds):
+    """
+    Returns the most recently published job of the entity among the job
+    kinds, or None.
+    """
+    return (
+        AsyncJob.objects.filter(
+            entity_type=entity_type, entity_id=entity_id, kind__in=kinds
+        )
+        .order_by("-created_at")
+        .first()
+    )
+
+
+def get_job_checkpoint(task_id):
+    """
+    Returns the checkpoint saved by a job, or None.
+    """
+    return (
+        AsyncJob.objects.filter(task_id=task_id)
+        .values_list("checkpoint", flat=True)
+        .first()
+    )
+
+
+def save_job_checkpoint(task_id, checkpoint):
+    AsyncJob.objects.filter(task_id=task_id).update(checkpoint=checkpoint)
+
+
+def get_job_task_ids(task_name, entity_type, entity_ids):
+    """
+    Returns a queryset of the celery task ids of the task run for the
+    entities, for filtering the celery results by their primary index.
+    """
+    return AsyncJob.objects.filter(
+        task_name=task_name, entity_type=entity_type, entity_id__in=entity_ids
+    ).values("task_id")
+
+
+def get_job_date_time(job):
+    """
+    Returns the date and the time (UTC) the job finished, or was published
+    if it is still running.
+    """
+    job_datetime = job.date_done or job.created_at
+    job_datetime = job_datetime.astimezone(datetime.timezone.utc)
+    return (
+        job_datetime.date(),
+        f"{str(job_datetime.time().replace(microsecond=0))} UTC",
+    )
+
+
+def parse_task_kwargs(task_kwargs):
+    """
+    Returns the kwargs dict of a celery TaskResult, stored as the (possibly
+    json quoted) repr of the kwargs.
+    """
+    try:
+        if task_kwargs.startswith('"'):
+            task_kwargs = json.loads(task_kwargs)
+        return ast.literal_eval(task_kwargs)
+    except (AttributeError, SyntaxError, ValueError):
+        return None
+
+
+def parse_task_result(task_result):
+    try:
+        result = json.loads(task_result)
+    except (TypeError, ValueError):
+        return task_result
+    if isinstance(result, dict) and "exc_message" in result:
+        exc_message = result["exc_message"]
+        if isinstance(exc_message, (list, tuple)):
+            return " ".join(str(message) for message in exc_message)
+        return str(exc_message)
+    return format_job_result(result)
+
+
+def backfill_jobs_from_task_results(batch_size=1000):
+    """
+    Records the jobs of the celery results stored before the registry
+    existed. Returns the number of jobs created.
+    """
+    created = 0
+    batch = []
+    task_results = (
+        TaskResult.objects.filter(task_name__in=list(ASYNC_JOBS))
+        .exclude(task_id__in=AsyncJob.objects.values("task_id"))
+        .values_list(
+            "task_id", "task_name", "task_kwargs", "status", "result", "date_done"
+        )
+    )
+    for (
+        task_id,
+        task_name,
+        task_kwargs,
+        status,
+        result,
+        date_done,
+    ) in task_results.iterator(chunk_size=batch_size):
+        entity = get_job_entity(task_name, parse_task_kwargs(task_kwargs))
+        if entity is None:
+            continue
+        entity_type, entity_id, kind = entity
+        batch.append(
+            AsyncJob(
+                task_id=task_id,
+                task_name=task_name,
+                entity_type=entity_type,
+                entity_id=entity_id,
+                kind=kind,
+                status=status,
+                result=parse_task_result(result),
+                created_at=date_done or timezone.now(),
+                date_done=date_done,
+            )
+        )
+        if len(batch) == batch_size:
+            AsyncJob.objects.bulk_create(batch, ignore_conflicts=True)
+            created += len(batch)
+            batch = []
+    AsyncJob.objects.bulk_create(batch, ignore_conflicts=True)
+    return created + len(batch)
+
+
+def prune_task_results(retention_days, batch_size=PRUNE_BATCH_SIZE):
+    """
+    Deletes the celery results finished more than retention_days ago, and the
+    jobs published before then that are not the latest of their entity.
+    Returns the number of results and jobs deleted.
+    """
+    cutoff = timezone.now() - datetime.timedelta(days=retention_days)
+    deleted_results = _delete_in_batches(
+        TaskResult.objects.filter(date_done__lt=cutoff), batch_size
+    )
+    newer_jobs = AsyncJob.objects.filter(
+        entity_type=OuterRef("entity_type"),
+        entity_id=OuterRef("entity_id"),
+        kind=OuterRef("kind"),
+        created_at__gt=OuterRef("created_at"),
+    )
+    deleted_jobs = _delete_in_batches(
+        AsyncJob.objects.filter(created_at__lt=cutoff).filter(Exists(newer_jobs)),
+        batch_size,
+    )
+    return deleted_results, deleted_jobs
+
+
+def _delete_in_batches(queryset, batch_size):
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += queryset.model.objects.filter(id__in=ids).delete()[0]
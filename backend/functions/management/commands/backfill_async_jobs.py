@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from functions.jobs import backfill_jobs_from_task_results
+
+
+class Command(BaseCommand):
+    help = "Record the async jobs of the celery task results stored before the job registry"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        created = backfill_jobs_from_task_results(options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Recorded {created} async jobs"))
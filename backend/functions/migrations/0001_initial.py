@@ -0,0 +1,68 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="AsyncJob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("task_id", models.CharField(max_length=255, unique=True)),
+                ("task_name", models.CharField(max_length=255)),
+                (
+                    "entity_type",
+                    models.CharField(
+                        choices=[
+                            ("project", "Project"),
+                            ("dataset_instance", "Dataset Instance"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                ("entity_id", models.IntegerField()),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("task_creation", "Task Creation"),
+                            ("export", "Export"),
+                            ("pull", "Pull New Data Items"),
+                            ("upload", "Upload"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                ("status", models.CharField(default="PENDING", max_length=50)),
+                ("result", models.TextField(blank=True, null=True)),
+                (
+                    "created_at",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("date_done", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="asyncjob",
+            index=models.Index(
+                fields=["entity_type", "entity_id", "kind", "-created_at"],
+                name="functions_job_entity_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="asyncjob",
+            index=models.Index(fields=["created_at"], name="functions_job_created_idx"),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("functions", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="asyncjob",
+            name="checkpoint",
+            field=models.JSONField(
+                blank=True,
+                help_text="Progress saved by the job, to resume it when it is retried",
+                null=True,
+            ),
+        ),
+    ]
@@ -1,3 +1,62 @@
 from django.db import models
+from django.utils import timezone
 
 # Create your models here.
+
+PROJECT_ENTITY = "project"
+DATASET_INSTANCE_ENTITY = "dataset_instance"
+
+ENTITY_TYPES = (
+    (PROJECT_ENTITY, "Project"),
+    (DATASET_INSTANCE_ENTITY, "Dataset Instance"),
+)
+
+TASK_CREATION_JOB = "task_creation"
+EXPORT_JOB = "export"
+PULL_JOB = "pull"
+UPLOAD_JOB = "upload"
+
+JOB_KINDS = (
+    (TASK_CREATION_JOB, "Task Creation"),
+    (EXPORT_JOB, "Export"),
+    (PULL_JOB, "Pull New Data Items"),
+    (UPLOAD_JOB, "Upload"),
+)
+
+
+class AsyncJob(models.Model):
+    """
+    Registry of the celery tasks run for a project or a dataset instance.
+
+    Rows are written by the celery signals of functions.jobs when a task is
+    published, started and finished, so that the latest job of an entity can
+    be read by index instead of searching the task kwargs in the celery
+    results table.
+    """
+
+    task_id = models.CharField(max_length=255, unique=True)
+    task_name = models.CharField(max_length=255)
+    entity_type = models.CharField(max_length=50, choices=ENTITY_TYPES)
+    entity_id = models.IntegerField()
+    kind = models.CharField(max_length=50, choices=JOB_KINDS)
+    status = models.CharField(max_length=50, default="PENDING")
+    result = models.TextField(null=True, blank=True)
+    checkpoint = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Progress saved by the job, to resume it when it is retried",
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+    date_done = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.entity_type} {self.entity_id} {self.kind} {self.status}"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["entity_type", "entity_id", "kind", "-created_at"],
+                name="functions_job_entity_idx",
+            ),
+            models.Index(fields=["created_at"], name="functions_job_created_idx"),
+        ]
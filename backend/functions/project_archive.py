@@ -0,0 +1,236 @@
+"""
+Zip archive of the downloads of many projects.
+
+The project downloads are written concurrently by a bounded pool of worker
+processes (threads inside celery prefork workers, whose daemonic billiard
+processes cannot have children), each to its own temporary file. As each download
+completes it is compressed into a single zip stream, and the stream is
+uploaded in blocks as it is produced, so the archive itself never touches
+the disk. The archive store is the Azure blob container of the downloads, or
+a local directory standing in for it (in tests, or when
+DOWNLOAD_ALL_PROJECTS_LOCAL_DIR is set).
+"""
+import base64
+import datetime
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from azure.storage.blob import (
+    BlobBlock,
+    BlobSasPermissions,
+    BlobServiceClient,
+    generate_blob_sas,
+)
+from billiard.process import current_process
+from django.db import connections
+
+from projects.export import EXPORT_FORMATS, write_project_export
+from projects.models import Project
+from utils.blob_functions import (
+    extract_account_key,
+    extract_account_name,
+    extract_endpoint_suffix,
+)
+from utils.db_routing import use_replica
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BLOCK_SIZE = 8 * 2**20
+ARCHIVE_URL_EXPIRY = datetime.timedelta(hours=1)
+ARCHIVE_WORKERS = int(os.getenv("DOWNLOAD_ALL_PROJECTS_WORKERS", "4"))
+
+
+class AzureArchiveStore:
+    """
+    Stores archives as block blobs of an Azure container.
+    """
+
+    def __init__(self, connection_string, container_name):
+        self.connection_string = connection_string
+        self.container_name = container_name
+        self.container_client = BlobServiceClient.from_connection_string(
+            connection_string
+        ).get_container_client(container_name)
+
+    def stage_block(self, name, block_id, data):
+        self.container_client.get_blob_client(name).stage_block(block_id, data)
+
+    def commit(self, name, block_ids):
+        self.container_client.get_blob_client(name).commit_block_list(
+            [BlobBlock(block_id=block_id) for block_id in block_ids]
+        )
+
+    def get_url(self, name):
+        account_name = extract_account_name(self.connection_string)
+        endpoint_suffix = extract_endpoint_suffix(self.connection_string)
+        sas_token = generate_blob_sas(
+            container_name=self.container_name,
+            blob_name=name,
+            account_name=account_name,
+            account_key=extract_account_key(self.connection_string),
+            permission=BlobSasPermissions(read=True),
+            expiry=datetime.datetime.now() + ARCHIVE_URL_EXPIRY,
+        )
+        return f"https://{account_name}.blob.{endpoint_suffix}/{self.container_name}/{name}?{sas_token}"
+
+
+class LocalArchiveStore:
+    """
+    Stores archives in a local directory, with the interface of
+    AzureArchiveStore.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def stage_block(self, name, block_id, data):
+        with open(self._path(name) + ".part", "ab") as part:
+            part.write(data)
+
+    def commit(self, name, block_ids):
+        os.replace(self._path(name) + ".part", self._path(name))
+
+    def get_url(self, name):
+        return "file://" + os.path.abspath(self._path(name))
+
+
+def get_archive_store():
+    local_directory = os.getenv("DOWNLOAD_ALL_PROJECTS_LOCAL_DIR")
+    if local_directory:
+        return LocalArchiveStore(local_directory)
+    return AzureArchiveStore(
+        os.getenv("AZURE_CONNECTION_STRING"),
+        os.getenv("CONTAINER_NAME_FOR_DOWNLOAD_ALL_PROJECTS"),
+    )
+
+
+class BlockUploadStream:
+    """
+    Write-only stream uploading what is written to an archive store in
+    blocks of block_size bytes. close() uploads the last block and commits
+    the archive.
+    """
+
+    def __init__(self, store, name, block_size=ARCHIVE_BLOCK_SIZE):
+        self.store = store
+        self.name = name
+        self.block_size = block_size
+        self.block_ids = []
+        self._buffer = bytearray()
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._stage(bytes(self._buffer[: self.block_size]))
+            del self._buffer[: self.block_size]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _stage(self, data):
+        # Block ids of a blob must all have the same length
+        block_id = base64.b64encode(f"{len(self.block_ids):08d}".encode()).decode()
+        self.store.stage_block(self.name, block_id, data)
+        self.block_ids.append(block_id)
+
+    def close(self):
+        if self._buffer or not self.block_ids:
+            self._stage(bytes(self._buffer))
+            self._buffer = bytearray()
+        self.store.commit(self.name, self.block_ids)
+
+
+def export_project_file(project_id, directory, export_type, task_statuses):
+    """
+    Writes the download of a project into directory. Returns the path of the
+    file, or None if the project has no tasks to download.
+    """
+    try:
+        with use_replica():
+            project = Project.objects.get(id=project_id)
+            title = project.title.replace(os.sep, "_")
+            path = os.path.join(
+                directory, f"{project.id} - {title}.{EXPORT_FORMATS[export_type][1]}"
+            )
+            with open(path, "w", encoding="utf-8", newline="") as project_file:
+                written = write_project_export(
+                    project,
+                    project_file,
+                    export_type=export_type,
+                    task_statuses=task_statuses,
+                    include_input_data_metadata_json=True,
+                )
+    finally:
+        # The connections of a pool thread are not closed by any request cycle
+        connections.close_all()
+    if not written:
+        os.remove(path)
+        return None
+    return path
+
+
+def build_projects_archive(
+    project_ids,
+    store,
+    name,
+    export_type="CSV",
+    task_statuses=None,
+    workers=None,
+):
+    """
+    Writes the downloads of the projects into the zip archive name of store.
+    Projects whose download fails are logged and left out. Returns the
+    number of projects in the archive.
+    """
+    workers = ARCHIVE_WORKERS if workers is None else workers
+    # Celery prefork workers are billiard processes, which multiprocessing
+    # does not see as daemonic
+    if current_process().daemon:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    else:
+        # Forked workers must open their own database connections
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=workers)
+
+    archived = 0
+    temp_dir = tempfile.mkdtemp()
+    stream = BlockUploadStream(store, name)
+    try:
+        with executor:
+            futures = {
+                executor.submit(
+                    export_project_file,
+                    project_id,
+                    temp_dir,
+                    export_type,
+                    task_statuses,
+                ): project_id
+                for project_id in project_ids
+            }
+            with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as archive:
+                for future in as_completed(futures):
+                    try:
+                        path = future.result()
+                    except Exception:
+                        logger.exception(
+                            "Could not download project %s", futures[future]
+                        )
+                        continue
+                    if path is None:
+                        continue
+                    archive.write(path, os.path.basename(path))
+                    os.remove(path)
+                    archived += 1
+        stream.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return archived
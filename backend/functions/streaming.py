@@ -0,0 +1,136 @@
+"""
+Server-sent event streams of the chat views.
+
+The streams are async generators served by the ASGI application, each
+holding one of MAX_CONCURRENT_STREAMS slots of the process while it is
+open; past the limit the views answer 503 so that the client retries on
+another worker. When the client disconnects, the ASGI handler cancels the
+stream, which closes the upstream model streams and frees the slot.
+Requests are authenticated from their access token, checked in the event
+loop, and the cached principal of its user.
+"""
+import asyncio
+import logging
+import os
+import threading
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.principal import get_principal_user
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENT_STREAMS = int(os.getenv("MAX_CONCURRENT_STREAMS", "256"))
+STREAM_RETRY_AFTER_SECONDS = 5
+
+
+class StreamSlot:
+    """
+    A slot of a StreamLimiter, released once however many times release()
+    is called.
+    """
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+        self.released = False
+
+    def release(self):
+        with self.limiter.lock:
+            if self.released:
+                return
+            self.released = True
+            self.limiter.active -= 1
+
+
+class StreamLimiter:
+    """
+    Counts the open streams of the process. The views of the WSGI
+    application run in threads, hence the lock.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Returns a StreamSlot, or None if all the slots are taken.
+        """
+        with self.lock:
+            if self.active >= self.limit:
+                return None
+            self.active += 1
+        return StreamSlot(self)
+
+
+stream_limiter = StreamLimiter(MAX_CONCURRENT_STREAMS)
+
+
+def get_raw_token(request):
+    auth_header = request.headers.get("Authorization", "")
+    parts = auth_header.split()
+    if len(parts) == 2 and parts[0] in api_settings.AUTH_HEADER_TYPES:
+        return parts[1]
+    return None
+
+
+async def get_stream_request_user(request):
+    """
+    Returns the user of the access token of the request, or of its session
+    when it has no token, None if the request is not authenticated. The
+    signature and expiry of the token are checked in the event loop, and its
+    user is read from their cached principal, which takes no database query
+    once cached.
+    """
+    raw_token = get_raw_token(request)
+    if raw_token is None:
+        user = await request.auser()
+        return user if user.is_authenticated else None
+    try:
+        token = AccessToken(raw_token)
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return None
+    user = await sync_to_async(get_principal_user)(user_id)
+    return user if user is not None and user.is_active else None
+
+
+async def _guarded_stream(stream, slot):
+    try:
+        async for chunk in stream:
+            yield chunk
+    except asyncio.CancelledError:
+        logger.info("Client disconnected from the event stream")
+        raise
+    finally:
+        try:
+            await stream.aclose()
+        finally:
+            slot.release()
+
+
+def event_stream_response(stream):
+    """
+    Returns the server-sent event response of the async generator stream,
+    or a 503 response if the process has too many open streams.
+    """
+    slot = stream_limiter.acquire()
+    if slot is None:
+        response = JsonResponse(
+            {"error": "Too many open streams, please retry"}, status=503
+        )
+        response["Retry-After"] = str(STREAM_RETRY_AFTER_SECONDS)
+        return response
+    response = StreamingHttpResponse(
+        _guarded_stream(stream, slot), content_type="text/event-stream"
+    )
+    # Frees the slot of a stream closed before it was iterated
+    response._resource_closers.append(slot.release)
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -1,7 +1,5 @@
 import datetime
-import zipfile
 import threading
-from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
 import pandas as pd
 from celery import shared_task
 from dataset import models as dataset_models
@@ -15,7 +13,7 @@ from projects.utils import (
     ocr_word_count,
     get_not_null_audio_transcription_duration,
 )
-from projects.views import get_task_count_unassigned, ProjectViewSet
+from projects.views import get_task_count_unassigned
 from anudesh_backend import settings
 from tasks.models import (
     Annotation,
@@ -26,34 +24,51 @@ from tasks.models import (
     SUPER_CHECKED,
     Task,
     ANNOTATED,
+    INCOMPLETE,
+    EXPORTED,
 )
-from tasks.views import SentenceOperationViewSet
+from tasks.analytics import refresh_dirty_rollups
+from .jobs import prune_task_results
+from .project_archive import build_projects_archive, get_archive_store
 from users.models import User
 from django.core.mail import EmailMessage
 from anudesh_backend.locks import Lock
-from utils.blob_functions import (
-    extract_account_name,
-    extract_account_key,
-    extract_endpoint_suffix,
-    test_container_connection,
-)
+from utils.blob_functions import test_container_connection
 from utils.custom_bulk_create import multi_inheritance_table_bulk_insert
+from utils.db_routing import replica_reads
+from utils.quality_metrics import character_edit_distance
 from workspaces.models import Workspace
 
 from django.db import transaction, DataError, IntegrityError
 from dataset.models import DatasetInstance
 from django.apps import apps
-from rest_framework.test import APIRequestFactory
-from django.http import QueryDict
-from rest_framework.request import Request
 from dataset.models import LANGUAGE_CHOICES
 import os
-import tempfile
+
+DOWNLOAD_ALL_PROJECTS_TASK_STATUSES = [
+    INCOMPLETE,
+    ANNOTATED,
+    REVIEWED,
+    SUPER_CHECKED,
+    EXPORTED,
+]
 
 
 ## CELERY SHARED TASKS
 
 
+@shared_task(name="refresh_analytics_rollups")
+def refresh_analytics_rollups():
+    """Refreshes the task count rollups of the tasks changed since the last run"""
+    return refresh_dirty_rollups()
+
+
+@shared_task(name="prune_celery_task_results")
+def prune_celery_task_results():
+    """Deletes the celery task results older than the retention period"""
+    return prune_task_results(settings.TASK_RESULT_RETENTION_DAYS)
+
+
 @shared_task(bind=True)
 def populate_draft_data_json(self, pk, fields_list):
     try:
@@ -86,6 +101,7 @@ def populate_draft_data_json(self, pk, fields_list):
 # get_modified_stats_result, get_stats_helper -> update_meta_stats -> calculate_ced_between_two_annotations,
 # calculate_wer_between_two_annotations, get_most_recent_annotation.
 @shared_task(queue="reports")
+@replica_reads
 def schedule_mail_for_project_reports(
     project_type,
     user_id,
@@ -672,33 +688,14 @@ def update_meta_stats(result_meta_stats, ann_obj, project_type):
 
 
 def calculate_ced_between_two_annotations(annotation1, annotation2):
-    sentence_operation = SentenceOperationViewSet()
     ced_list = []
     for i in range(len(annotation1.result)):
-        if "value" in annotation1.result[i]:
-            if "text" in annotation1.result[i]["value"]:
-                str1 = annotation1.result[i]["value"]["text"]
-            else:
-                continue
-        else:
-            continue
-        if "value" in annotation2.result[i]:
-            if "text" in annotation2.result[i]["value"]:
-                str2 = annotation2.result[i]["value"]["text"]
-            else:
-                continue
-        else:
-            continue
-        data = {"sentence1": str1, "sentence2": str2}
         try:
-            char_level_distance = (
-                sentence_operation.calculate_normalized_character_level_edit_distance(
-                    data
-                )
-            )
-            ced_list.append(
-                char_level_distance.data["normalized_character_level_edit_distance"]
-            )
+            str1 = annotation1.result[i]["value"]["text"]
+            str2 = annotation2.result[i]["value"]["text"]
+            if not str1:
+                continue
+            ced_list.append(character_edit_distance(str1, str2))
         except Exception as e:
             continue
     return ced_list
@@ -762,28 +759,9 @@ def schedule_mail_to_download_all_projects(
             print(f"Error while releasing the lock for {task_name}: {str(e)}")
         return 0
     user = User.objects.get(id=user_id)
-    with tempfile.TemporaryDirectory() as temp_dir:
-        for proj in proj_objs:
-            proj_view_set_obj = ProjectViewSet()
-            factory = APIRequestFactory()
-            url = f"/projects/{proj.id}/download"
-            query_params = QueryDict(mutable=True)
-            query_params["include_input_data_metadata_json"] = "true"
-            query_params["export_type"] = "CSV"
-            query_params["task_status"] = (
-                "incomplete,annotated,reviewed,super_checked,exported"
-            )
-            custom_request = Request(factory.get(url, data=query_params, timeout=15))
-            custom_request.user = user
-            try:
-                proj_file = proj_view_set_obj.download(custom_request, proj.id)
-            except Exception as e:
-                print(f"Downloading project timed out, Project id- {proj.id}")
-                continue
-            file_path = os.path.join(temp_dir, f"{proj.id} - {proj.title}.csv")
-            with open(file_path, "wb") as f:
-                f.write(proj_file.content)
-        url = upload_all_projects_to_blob_and_get_url(temp_dir)
+    url = upload_all_projects_to_blob_and_get_url(
+        [proj.id for proj in proj_objs], user_id
+    )
     if url:
         message = (
             "Dear "
@@ -820,60 +798,30 @@ def schedule_mail_to_download_all_projects(
         print(url)
 
 
-def upload_all_projects_to_blob_and_get_url(csv_files_directory):
+def upload_all_projects_to_blob_and_get_url(project_ids, user_id):
+    """
+    Builds the zip archive of the downloads of the projects in the download
+    container and returns a url to it valid for an hour, or None.
+    """
     date_time_string = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    zip_file_name = f"output_all_projects - {date_time_string}.zip"
-    AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_CONNECTION_STRING")
-    CONTAINER_NAME_FOR_DOWNLOAD_ALL_PROJECTS = os.getenv(
-        "CONTAINER_NAME_FOR_DOWNLOAD_ALL_PROJECTS"
-    )
-    try:
-        blob_service_client = BlobServiceClient.from_connection_string(
-            AZURE_STORAGE_CONNECTION_STRING
-        )
-        container_client = blob_service_client.get_container_client(
-            CONTAINER_NAME_FOR_DOWNLOAD_ALL_PROJECTS
+    zip_file_name = f"output_all_projects - {user_id} - {date_time_string}.zip"
+    if not os.getenv("DOWNLOAD_ALL_PROJECTS_LOCAL_DIR") and not (
+        test_container_connection(
+            os.getenv("AZURE_CONNECTION_STRING"),
+            os.getenv("CONTAINER_NAME_FOR_DOWNLOAD_ALL_PROJECTS"),
         )
-    except Exception as e:
-        return "Error in connecting to blob_service_client or container_client"
-    if not test_container_connection(
-        AZURE_STORAGE_CONNECTION_STRING, CONTAINER_NAME_FOR_DOWNLOAD_ALL_PROJECTS
     ):
         print("Azure Blob Storage connection test failed. Exiting...")
-        return "test_container_connection failed"
-    blob_url = ""
-    if os.path.exists(csv_files_directory):
-        zip_file_path_on_disk = csv_files_directory + "/" + f"{zip_file_name}"
-        try:
-            with zipfile.ZipFile(
-                zip_file_path_on_disk, "w", zipfile.ZIP_DEFLATED
-            ) as zipf:
-                for root, dirs, files in os.walk(csv_files_directory):
-                    for file in files:
-                        if file.endswith(".csv"):
-                            file_path = os.path.join(root, file)
-                            zipf.write(
-                                file_path,
-                                os.path.relpath(file_path, csv_files_directory),
-                            )
-        except Exception as e:
-            return "Error in creating zip file"
-        blob_client = container_client.get_blob_client(zip_file_name)
-        with open(zip_file_path_on_disk, "rb") as file:
-            blob_client.upload_blob(file, blob_type="BlockBlob")
-        try:
-            expiry = datetime.datetime.now() + datetime.timedelta(hours=1)
-            account_name = extract_account_name(AZURE_STORAGE_CONNECTION_STRING)
-            endpoint_suffix = extract_endpoint_suffix(AZURE_STORAGE_CONNECTION_STRING)
-            sas_token = generate_blob_sas(
-                container_name=CONTAINER_NAME_FOR_DOWNLOAD_ALL_PROJECTS,
-                blob_name=blob_client.blob_name,
-                account_name=account_name,
-                account_key=extract_account_key(AZURE_STORAGE_CONNECTION_STRING),
-                permission=BlobSasPermissions(read=True),
-                expiry=expiry,
-            )
-        except Exception as e:
-            return "Error in generating url"
-        blob_url = f"https://{account_name}.blob.{endpoint_suffix}/{CONTAINER_NAME_FOR_DOWNLOAD_ALL_PROJECTS}/{blob_client.blob_name}?{sas_token}"
-    return blob_url
+        return None
+    try:
+        store = get_archive_store()
+        build_projects_archive(
+            project_ids,
+            store,
+            zip_file_name,
+            task_statuses=DOWNLOAD_ALL_PROJECTS_TASK_STATUSES,
+        )
+        return store.get_url(zip_file_name)
+    except Exception as e:
+        print(f"Error in creating the archive of all projects: {e}")
+        return None
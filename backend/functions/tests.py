@@ -1,3 +1,82 @@
-from django.test import TestCase
+import datetime
+import os
+import tempfile
+import zipfile
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from .jobs import get_latest_job, prune_task_results, record_job
+from .models import AsyncJob, PROJECT_ENTITY, EXPORT_JOB
+from .project_archive import BlockUploadStream, LocalArchiveStore
+from .streaming import StreamLimiter
 
 # Create your tests here.
+
+EXPORT_TASK = "projects.tasks.export_project_in_place"
+
+
+class AsyncJobTestcase(TestCase):
+    def test_publish_does_not_overwrite_finished_job(self):
+        """
+        A worker may record the end of a task before the publisher records it.
+        """
+        record_job(EXPORT_TASK, "task-1", {"project_id": "5"}, status="SUCCESS")
+        record_job(EXPORT_TASK, "task-1", {"project_id": "5"}, published=True)
+
+        job = get_latest_job(PROJECT_ENTITY, 5, [EXPORT_JOB])
+        self.assertEqual(job.status, "SUCCESS")
+        self.assertEqual(job.entity_id, 5)
+
+    def test_unregistered_tasks_are_ignored(self):
+        record_job("projects.tasks.unknown", "task-2", {"project_id": 5})
+        record_job(EXPORT_TASK, "task-3", {"dataset_id": 5})
+        self.assertFalse(AsyncJob.objects.exists())
+
+    def test_prune_keeps_latest_job(self):
+        for task_id in ["old", "older"]:
+            record_job(EXPORT_TASK, task_id, {"project_id": 5}, published=True)
+        AsyncJob.objects.filter(task_id="older").update(
+            created_at=timezone.now() - datetime.timedelta(days=60)
+        )
+        AsyncJob.objects.filter(task_id="old").update(
+            created_at=timezone.now() - datetime.timedelta(days=40)
+        )
+
+        prune_task_results(retention_days=30)
+
+        self.assertEqual(
+            list(AsyncJob.objects.values_list("task_id", flat=True)), ["old"]
+        )
+
+
+class BlockUploadStreamTestcase(SimpleTestCase):
+    def test_zip_written_in_blocks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = LocalArchiveStore(directory)
+            stream = BlockUploadStream(store, "projects.zip", block_size=1024)
+            contents = os.urandom(10000).hex()
+            with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as archive:
+                archive.writestr("1 - Project.csv", contents)
+            stream.close()
+
+            self.assertGreater(len(stream.block_ids), 1)
+            self.assertEqual(len(set(map(len, stream.block_ids))), 1)
+            with zipfile.ZipFile(os.path.join(directory, "projects.zip")) as archive:
+                self.assertEqual(archive.read("1 - Project.csv").decode(), contents)
+
+
+class StreamLimiterTestcase(SimpleTestCase):
+    def test_slots_are_released_once(self):
+        limiter = StreamLimiter(2)
+        first, second = limiter.acquire(), limiter.acquire()
+        self.assertIsNone(limiter.acquire())
+
+        # The response closers and the stream both release the slot
+        first.release()
+        first.release()
+        self.assertEqual(limiter.active, 1)
+        self.assertIsNotNone(limiter.acquire())
+        self.assertIsNone(limiter.acquire())
+        second.release()
+        self.assertEqual(limiter.active, 1)
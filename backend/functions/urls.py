@@ -10,7 +10,9 @@ urlpatterns = [
     path("chat_output", chat_output),
     path("chat_output_stream", chat_output_stream),
     path("chat_output_stream_multi", chat_output_stream_multi),
+    path("llm_job_stream/<str:job_id>", llm_job_stream),
     path("upload_chat_image", upload_chat_image),
+    path("cache_stats", cache_stats),
 ]
 
 # urlpatterns = format_suffix_patterns(urlpatterns)
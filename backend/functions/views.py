@@ -23,63 +23,17 @@ from users.utils import (
 
 from tasks.models import *
 from utils.blob_functions import test_container_connection
-from django.http import StreamingHttpResponse, JsonResponse
-from asgiref.sync import sync_to_async
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
-def is_request_authenticated(request):
-    """
-    Authenticate a request using JWT.
-    Works with both DRF Request objects and raw Django HttpRequest
-    (used by async streaming views).
-    """
-    # First, try DRF's built-in JWTAuthentication (works with DRF Request objects)
-    try:
-        auth_tuple = JWTAuthentication().authenticate(request)
-        if auth_tuple is not None:
-            user, token = auth_tuple
-            return user.is_authenticated
-    except (InvalidToken, AuthenticationFailed):
-        return False
-    except Exception:
-        pass
-
-    # Fallback: manually extract JWT from the Authorization header.
-    # This handles raw Django HttpRequest objects in async views where
-    # DRF's JWTAuthentication silently fails because it expects a DRF Request.
-    auth_header = request.META.get("HTTP_AUTHORIZATION", "")
-    if not auth_header:
-        auth_header = request.headers.get("Authorization", "")
-
-    if auth_header:
-        parts = auth_header.split()
-        if len(parts) == 2 and parts[0].upper() == "JWT":
-            raw_token = parts[1]
-            try:
-                from rest_framework_simplejwt.tokens import UntypedToken
-                from django.contrib.auth import get_user_model
-                UntypedToken(raw_token)  # validates expiry & signature
-                # Decode to get user_id
-                from rest_framework_simplejwt.backends import TokenBackend
-                from django.conf import settings
-                tb = TokenBackend(
-                    algorithm="HS256",
-                    signing_key=settings.SECRET_KEY,
-                )
-                payload = tb.decode(raw_token, verify=True)
-                User = get_user_model()
-                user = User.objects.get(id=payload.get("user_id"))
-                return user.is_authenticated
-            except Exception:
-                return False
-
-    # Final fallback: check session-based auth
-    return getattr(request, "user", None) is not None and request.user.is_authenticated
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
+import time
+import redis.asyncio as aioredis
+from tasks.utils import llm_job_events_key, llm_job_owner_key
+from utils.llm_checks import get_llm_checks_cache_stats
 from utils.llm_interactions import get_model_output, stream_model_output, stream_all_models_output
 
+from .streaming import event_stream_response, get_stream_request_user
 from .tasks import (
     populate_draft_data_json,
     schedule_mail_for_project_reports,
@@ -130,6 +84,22 @@ def schedule_draft_data_json_population(request):
     return Response(ret_dict, status=ret_status)
 
 
+@api_view(["GET"])
+def cache_stats(request):
+    """
+    Hit and miss counters of the caches of the process serving the request.
+    """
+    if not (request.user.is_authenticated and request.user.is_superuser):
+        return Response(
+            {"message": "You do not have enough permissions to access this!"},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+    return Response(
+        {"pid": os.getpid(), "llm_checks": get_llm_checks_cache_stats()},
+        status=status.HTTP_200_OK,
+    )
+
+
 @api_view(["POST"])
 def schedule_project_reports_email(request):
     (
@@ -220,21 +190,14 @@ def schedule_project_reports_email(request):
         + str(language)
     )
     celery_lock = Lock(uid, task_name)
+    celery_lock_timeout = int(os.getenv("DEFAULT_CELERY_LOCK_TIMEOUT"))
     try:
-        lock_status = celery_lock.lockStatus()
+        lock_set = celery_lock.setLock(celery_lock_timeout)
     except Exception as e:
-        print(
-            f"Error while retrieving the status of the lock for {task_name} : {str(e)}"
-        )
-        lock_status = 0  # if lock status is not received successfully, it is assumed that the lock doesn't exist
-
-    if lock_status == 0:
-        celery_lock_timeout = int(os.getenv("DEFAULT_CELERY_LOCK_TIMEOUT"))
-        try:
-            celery_lock.setLock(celery_lock_timeout)
-        except Exception as e:
-            print(f"Error while setting the lock for {task_name}: {str(e)}")
+        print(f"Error while setting the lock for {task_name}: {str(e)}")
+        lock_set = True  # if the lock is not set successfully, it is assumed that the lock doesn't exist
 
+    if lock_set:
         schedule_mail_for_project_reports.delay(
             project_type,
             user_id,
@@ -451,7 +414,7 @@ _CHAT_SYSTEM_PROMPT = (
 @csrf_exempt
 @require_POST
 async def chat_output_stream(request):
-    if not await sync_to_async(is_request_authenticated)(request):
+    if await get_stream_request_user(request) is None:
         return JsonResponse({"error": "Unauthorized"}, status=401)
 
     data = json.loads(request.body)
@@ -473,10 +436,7 @@ async def chat_output_stream(request):
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
         yield f"data: {json.dumps({'done': True, 'finish_reason': finish_reason})}\n\n"
 
-    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
-    response["Cache-Control"] = "no-cache"
-    response["X-Accel-Buffering"] = "no"
-    return response
+    return event_stream_response(event_stream())
 
 
 @csrf_exempt
@@ -486,7 +446,7 @@ async def chat_output_stream_multi(request):
     SSE endpoint for streaming tokens from multiple LLM models concurrently.
     Each SSE event is tagged with the model name for frontend demultiplexing.
     """
-    if not await sync_to_async(is_request_authenticated)(request):
+    if await get_stream_request_user(request) is None:
         return JsonResponse({"error": "Unauthorized"}, status=401)
 
     data = json.loads(request.body)
@@ -514,10 +474,63 @@ async def chat_output_stream_multi(request):
             yield f"data: {json.dumps({'error': str(e)})}\n\n"
         yield f"data: {json.dumps({'done': True})}\n\n"
 
-    response = StreamingHttpResponse(event_stream(), content_type="text/event-stream")
-    response["Cache-Control"] = "no-cache"
-    response["X-Accel-Buffering"] = "no"
-    return response
+    return event_stream_response(event_stream())
+
+
+# Seconds to block on the job event stream before sending a keep-alive
+LLM_JOB_STREAM_BLOCK_SECONDS = 15
+LLM_JOB_STREAM_MAX_SECONDS = 600
+
+
+@csrf_exempt
+@require_GET
+async def llm_job_stream(request, job_id):
+    """
+    SSE endpoint relaying the events of an asynchronous LLM generation job
+    queued by AnnotationViewSet.partial_update with async_generation=True.
+    """
+    user = await get_stream_request_user(request)
+    if user is None:
+        return JsonResponse({"error": "Unauthorized"}, status=401)
+
+    redis_connection = aioredis.Redis(
+        host=os.getenv("REDIS_HOST"), port=os.getenv("REDIS_PORT"), db=0
+    )
+    try:
+        owner_id = await redis_connection.get(llm_job_owner_key(job_id))
+    finally:
+        await redis_connection.close()
+    # Jobs of other users are not found, as if they did not exist
+    if owner_id is None or owner_id.decode() != str(user.pk):
+        return JsonResponse({"error": "Job not found"}, status=404)
+
+    async def event_stream():
+        redis_connection = aioredis.Redis(
+            host=os.getenv("REDIS_HOST"), port=os.getenv("REDIS_PORT"), db=0
+        )
+        key = llm_job_events_key(job_id)
+        last_id = "0"
+        deadline = time.monotonic() + LLM_JOB_STREAM_MAX_SECONDS
+        yield ": keep-alive\n\n"
+        try:
+            while time.monotonic() < deadline:
+                entries = await redis_connection.xread(
+                    {key: last_id}, block=LLM_JOB_STREAM_BLOCK_SECONDS * 1000
+                )
+                if not entries:
+                    yield ": keep-alive\n\n"
+                    continue
+                for entry_id, fields in entries[0][1]:
+                    last_id = entry_id
+                    event = json.loads(fields[b"event"])
+                    yield f"data: {json.dumps(event)}\n\n"
+                    if event.get("done"):
+                        return
+            yield f"data: {json.dumps({'error': 'Timed out waiting for the job', 'done': True})}\n\n"
+        finally:
+            await redis_connection.close()
+
+    return event_stream_response(event_stream())
 
 
 @permission_classes([IsAuthenticated])
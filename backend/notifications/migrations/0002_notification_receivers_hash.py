@@ -0,0 +1,59 @@
+import hashlib
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import migrations, models
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def set_receivers_hash(apps, schema_editor):
+    Notification = apps.get_model("notifications", "Notification")
+    Receiver = Notification.reciever_user_id.through
+    rows = (
+        Receiver.objects.order_by("notification_id")
+        .values_list("notification_id", "user_id")
+        .iterator(chunk_size=BACKFILL_BATCH_SIZE)
+    )
+    notifications = []
+    for notification_id, receivers in groupby(rows, key=itemgetter(0)):
+        key = ",".join(
+            str(user_id) for user_id in sorted({user_id for _, user_id in receivers})
+        )
+        notifications.append(
+            Notification(
+                id=notification_id,
+                receivers_hash=hashlib.sha256(key.encode()).hexdigest(),
+            )
+        )
+        if len(notifications) == BACKFILL_BATCH_SIZE:
+            Notification.objects.bulk_update(notifications, ["receivers_hash"])
+            notifications = []
+    Notification.objects.bulk_update(notifications, ["receivers_hash"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("notifications", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notification",
+            name="receivers_hash",
+            field=models.CharField(
+                blank=True,
+                help_text="Hash of the sorted ids of the receivers, to find the same notification sent again.",
+                max_length=64,
+                null=True,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["notification_type", "title", "receivers_hash"],
+                name="notification_receivers_idx",
+            ),
+        ),
+        migrations.RunPython(set_receivers_hash, migrations.RunPython.noop),
+    ]
@@ -1,77 +1,140 @@
+import hashlib
+
 from celery import shared_task
+from celery.utils.log import get_task_logger
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
 
 from notifications.models import Notification
 from users.models import User
-from django.db import models, transaction
-from datetime import datetime
+
+logger = get_task_logger(__name__)
 
 NOTIFICATION_CREATED = {"message": "Notification created successfully"}
 NOTIFICATION_CREATION_FAILED = {"message": "Notification creation failed"}
 
+# Number of receivers whose inboxes are trimmed by one delete
+TRIM_BATCH_SIZE = 1000
 
-def delete_excess_Notification(user):
-    if user.notification_limit is not None:
-        user_notifications_count = len(
-            Notification.objects.filter(reciever_user_id=user)
-        )
-        if user_notifications_count >= user.notification_limit:
-            excess_notifications = Notification.objects.filter(
-                reciever_user_id=user
-            ).order_by("created_at")[
-                : user_notifications_count - user.notification_limit
-            ]
-            for excess_notification in excess_notifications:
-                excess_notification.reciever_user_id.remove(user)
-                if len(excess_notification.reciever_user_id.all()) == 0:
-                    excess_notification.delete()
-    return 0
+
+def get_receivers_hash(users_ids):
+    """
+    Returns the hash of the receivers of a notification, the same for any
+    order or repetition of users_ids.
+    """
+    key = ",".join(str(user_id) for user_id in sorted(set(users_ids)))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_notification_url(project_id=None, task_id=None):
+    if project_id and task_id:
+        return f"/projects/{project_id}/task/{task_id}"
+    if project_id:
+        return f"/projects/{project_id}"
+    if task_id:
+        return f"/task/{task_id}"
+    return None
+
+
+def trim_notification_inboxes(users_ids):
+    """
+    Removes the users from their notifications beyond their
+    notification_limit, oldest first, with one delete per batch of users.
+    The notifications left without receivers are deleted, and the others
+    that lost receivers are no longer aggregated.
+    """
+    # The table of the users is "user", a reserved word
+    receivers_table, notification_table, user_table = (
+        connection.ops.quote_name(model._meta.db_table)
+        for model in (Notification.reciever_user_id.through, Notification, User)
+    )
+    users_ids = list(users_ids)
+    trimmed_ids = set()
+    for start in range(0, len(users_ids), TRIM_BATCH_SIZE):
+        batch = users_ids[start : start + TRIM_BATCH_SIZE]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {receivers_table} WHERE id IN ("
+                "SELECT id FROM ("
+                "SELECT receiver.id, users.notification_limit, ROW_NUMBER() OVER ("
+                "PARTITION BY receiver.user_id "
+                "ORDER BY notification.created_at DESC, notification.id DESC"
+                ") AS position "
+                f"FROM {receivers_table} AS receiver "
+                f"JOIN {notification_table} AS notification "
+                "ON notification.id = receiver.notification_id "
+                f"JOIN {user_table} AS users ON users.id = receiver.user_id "
+                "WHERE receiver.user_id = ANY(%s) "
+                "AND users.notification_limit IS NOT NULL"
+                ") AS ranked WHERE position > notification_limit"
+                ") RETURNING notification_id",
+                [batch],
+            )
+            trimmed_ids.update(row[0] for row in cursor.fetchall())
+    if trimmed_ids:
+        trimmed = Notification.objects.filter(id__in=trimmed_ids)
+        trimmed.filter(reciever_user_id__isnull=True).delete()
+        trimmed.update(receivers_hash=None)
 
 
-# @shared_task
+@shared_task
 def create_notification_handler(
     title, notification_type, users_ids, project_id=None, task_id=None
 ):
-    if not notification_aggregated(title, notification_type, users_ids):
-        notitification_url = (
-            f"/projects/{project_id}/task/{task_id}"
-            if project_id and task_id
-            else (
-                f"/projects/{project_id}"
-                if project_id
-                else f"/task/{task_id}" if task_id else None
-            )
-        )
-        new_notif = Notification(
-            notification_type=notification_type,
-            title=title,
-            metadata_json="null",
-            on_click=notitification_url,
-        )
-        try:
-            with transaction.atomic():
-                new_notif.save()
-                for u_id in users_ids:
-                    receiver_user = User.objects.get(id=u_id)
-                    new_notif.reciever_user_id.add(receiver_user)
-                    delete_excess_Notification(receiver_user)
-        except Exception as e:
-            print(e, NOTIFICATION_CREATION_FAILED)
-        print(NOTIFICATION_CREATED)
-    else:
+    """
+    Creates a notification for the users, or brings the same notification
+    sent to the same users back to the top of their inboxes.
+    """
+    # Ids of users that no longer exist are dropped, the hash is the one of
+    # the receivers the notification is stored with
+    receivers_ids = list(
+        User.objects.filter(id__in=set(users_ids))
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+    receivers_hash = get_receivers_hash(receivers_ids)
+    if notification_aggregated(title, notification_type, receivers_ids, receivers_hash):
         print(NOTIFICATION_CREATED)
+        return 0
+
+    new_notif = Notification(
+        notification_type=notification_type,
+        title=title,
+        metadata_json="null",
+        on_click=get_notification_url(project_id, task_id),
+        receivers_hash=receivers_hash,
+    )
+    Receiver = Notification.reciever_user_id.through
+    try:
+        with transaction.atomic():
+            new_notif.save()
+            Receiver.objects.bulk_create(
+                [
+                    Receiver(notification_id=new_notif.id, user_id=user_id)
+                    for user_id in receivers_ids
+                ],
+                batch_size=TRIM_BATCH_SIZE,
+            )
+            trim_notification_inboxes(receivers_ids)
+    except DatabaseError:
+        logger.exception(NOTIFICATION_CREATION_FAILED["message"])
+        return 0
+    print(NOTIFICATION_CREATED)
     return 0
 
 
-def notification_aggregated(title, notification_type, users_ids):
-    users_ids.sort()
-    existing_notif = Notification.objects.filter(
-        notification_type=notification_type, title=title
+def notification_aggregated(title, notification_type, users_ids, receivers_hash=None):
+    """
+    Brings the notification of the same title and type already sent to the
+    same users to the top of their inboxes. Returns whether there was one.
+    """
+    if receivers_hash is None:
+        receivers_hash = get_receivers_hash(users_ids)
+    return (
+        Notification.objects.filter(
+            notification_type=notification_type,
+            title=title,
+            receivers_hash=receivers_hash,
+        ).update(created_at=timezone.now())
+        > 0
     )
-    for en in existing_notif:
-        existing_notif_receivers = en.reciever_user_id.all()
-        existing_notif_receivers_ids = [e.id for e in existing_notif_receivers]
-        if users_ids == sorted(existing_notif_receivers_ids):
-            en.created_at = datetime.now()
-            en.save()
-            return True
-    return False
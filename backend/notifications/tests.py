@@ -1,3 +1,73 @@
 from django.test import TestCase
 
+from users.models import User
+from .models import Notification
+from .tasks import create_notification_handler, get_receivers_hash
+
 # Create your tests here.
+
+
+class NotificationFanOutTestcase(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f"receiver{i}",
+                email=f"receiver{i}@email.com",
+                invited_by=None,
+            )
+            for i in range(3)
+        ]
+        self.users_ids = [user.id for user in self.users]
+
+    def test_same_receivers_are_aggregated(self):
+        create_notification_handler(
+            "Project published", "publish_project", self.users_ids
+        )
+        create_notification_handler(
+            "Project published", "publish_project", list(reversed(self.users_ids))
+        )
+        self.assertEqual(Notification.objects.count(), 1)
+        notification = Notification.objects.get()
+        self.assertEqual(
+            sorted(notification.reciever_user_id.values_list("id", flat=True)),
+            sorted(self.users_ids),
+        )
+
+        create_notification_handler(
+            "Project published", "publish_project", self.users_ids[:2]
+        )
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_inboxes_are_trimmed_to_the_limit(self):
+        limited = self.users[0]
+        limited.notification_limit = 2
+        limited.save()
+        for i in range(4):
+            create_notification_handler(
+                f"Project {i} updated", "project_update", [limited.id]
+            )
+        create_notification_handler(
+            "Project 4 updated", "project_update", self.users_ids
+        )
+
+        titles = Notification.objects.filter(reciever_user_id=limited).values_list(
+            "title", flat=True
+        )
+        self.assertEqual(sorted(titles), ["Project 3 updated", "Project 4 updated"])
+        # Notifications left without receivers are deleted
+        self.assertEqual(Notification.objects.count(), 2)
+        latest = Notification.objects.get(title="Project 4 updated")
+        self.assertEqual(latest.reciever_user_id.count(), 3)
+
+    def test_hash_is_the_one_of_the_stored_receivers(self):
+        missing_id = max(self.users_ids) + 1000
+        create_notification_handler(
+            "Task rejected", "task_reject", self.users_ids + [missing_id]
+        )
+        notification = Notification.objects.get()
+        self.assertEqual(
+            notification.receivers_hash, get_receivers_hash(self.users_ids)
+        )
+
+        create_notification_handler("Task rejected", "task_reject", self.users_ids)
+        self.assertEqual(Notification.objects.count(), 1)
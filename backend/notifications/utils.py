@@ -1,4 +1,3 @@
-from projects.serializers import ProjectSerializer
 from projects.models import Project
 
 """
@@ -18,31 +17,19 @@ def get_userids_from_project_id(
 ):
     try:
         project = Project.objects.get(pk=project_id)
-        serializer = ProjectSerializer(project, many=False)
-        ids = []
+        ids = set()
         if annotators_bool:
-            annotators = serializer.data["annotators"]
-            annotators_ids = [a.get("id") for a in annotators]
-            ids += annotators_ids
+            ids.update(project.annotators.values_list("id", flat=True))
         if reviewers_bool:
-            reviewers = serializer.data["annotation_reviewers"]
-            reviewers_ids = [r.get("id") for r in reviewers]
-            ids += reviewers_ids
+            ids.update(project.annotation_reviewers.values_list("id", flat=True))
         if super_checkers_bool:
-            super_checkers = serializer.data["review_supercheckers"]
-            super_checkers_ids = [s.get("id") for s in super_checkers]
-            ids += super_checkers_ids
+            ids.update(project.review_supercheckers.values_list("id", flat=True))
         if project_manager_bool:
-            project_workspace = project.workspace_id
-            project_workspace_managers = project_workspace.managers.all()
-            project_workspace_managers_ids = [p.id for p in project_workspace_managers]
-            ids += project_workspace_managers_ids
+            ids.update(project.workspace_id.managers.values_list("id", flat=True))
         if frozen_users_bool:
-            frozen_users = serializer.data["frozen_users"]
-            frozen_users_ids = [s.get("id") for s in frozen_users]
-            ids += frozen_users_ids
+            ids.update(project.frozen_users.values_list("id", flat=True))
 
-        return list(set(ids))
+        return list(ids)
     except Project.DoesNotExist:
         print(f"Project with id {project_id} does not exist.")
         return []
@@ -25,8 +25,8 @@ def createNotification(
     title, notification_type, users_ids, project_id=None, task_id=None
 ):
     """calling shared task of notification creation from tasks"""
-    create_notification_handler(
-        title, notification_type, users_ids, project_id, task_id
+    create_notification_handler.delay(
+        title, notification_type, list(users_ids), project_id, task_id
     )
     print(f"Creating notifications title- {title} for users_ids- {users_ids}")
     return 0
@@ -0,0 +1,136 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from organizations.models import Organization
+from organizations.reports import (
+    get_annotation_reports,
+    get_annotator_counts,
+    get_review_reports,
+    get_supercheck_reports,
+)
+from projects.models import REVIEW_STAGE
+from tasks.models import Annotation, Task, REVIEWER_ANNOTATION
+from users.models import User
+from utils.benchmark import (
+    count_queries,
+    create_synthetic_project,
+    median_time_ms,
+    rolled_back,
+)
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the organization user reports on organizations of growing
+    size. The number of queries must not grow with the number of users.
+    All fixtures are rolled back at the end.
+    """
+
+    help = "Benchmark the organization user reports for an increasing number of users"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            nargs="+",
+            type=int,
+            default=[10, 100, 1000],
+            help="Number of annotators in each synthetic organization",
+        )
+        parser.add_argument(
+            "--tasks-per-user",
+            type=int,
+            default=5,
+            help="Number of annotated and reviewed tasks of each annotator",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        end_date = timezone.now() + datetime.timedelta(days=1)
+        start_date = end_date - datetime.timedelta(days=30)
+        tasks_per_user = options["tasks_per_user"]
+
+        for num_users in options["users"]:
+            with rolled_back():
+                organization = Organization.objects.create(
+                    title=f"Benchmark organization ({num_users} users)"
+                )
+                users = User.objects.bulk_create(
+                    User(
+                        username=f"benchmark{i}",
+                        email=f"benchmark{i}@anudesh.local",
+                        organization=organization,
+                        participation_type=1,
+                    )
+                    for i in range(num_users)
+                )
+                reviewer = User.objects.create(
+                    username="benchmark_reviewer",
+                    email="benchmark_reviewer@anudesh.local",
+                    organization=organization,
+                    participation_type=1,
+                )
+                project = create_synthetic_project(
+                    num_users * tasks_per_user, annotators=users
+                )
+                project.organization_id = organization
+                project.project_stage = REVIEW_STAGE
+                project.save()
+                project.annotation_reviewers.add(reviewer)
+
+                tasks = list(Task.objects.filter(project_id=project).order_by("id"))
+                annotations = Annotation.objects.bulk_create(
+                    Annotation(
+                        task=task,
+                        completed_by=users[i // tasks_per_user],
+                        annotation_status="labeled",
+                        lead_time=i % 60,
+                        result=[],
+                    )
+                    for i, task in enumerate(tasks)
+                )
+                Annotation.objects.bulk_create(
+                    Annotation(
+                        task=annotation.task,
+                        completed_by=reviewer,
+                        annotation_status="accepted",
+                        annotation_type=REVIEWER_ANNOTATION,
+                        parent_annotation=annotation,
+                        result=[],
+                    )
+                    for annotation in annotations
+                )
+                Task.objects.filter(project_id=project).update(review_user=reviewer)
+
+                proj_ids = [project.id]
+                user_ids = [user.id for user in users]
+                reports = {
+                    "annotation": lambda: get_annotation_reports(
+                        proj_ids, user_ids, project.project_type, start_date, end_date
+                    ),
+                    "review": lambda: get_review_reports(
+                        proj_ids,
+                        [reviewer.id],
+                        project.project_type,
+                        start_date,
+                        end_date,
+                    ),
+                    "supercheck": lambda: get_supercheck_reports(
+                        proj_ids, [], project.project_type, start_date, end_date
+                    ),
+                    "analytics": lambda: get_annotator_counts(
+                        organization.id,
+                        user_ids,
+                        project.project_type,
+                        start_date,
+                        end_date,
+                        REVIEW_STAGE,
+                    ),
+                }
+                for name, report in reports.items():
+                    self.stdout.write(
+                        f"{num_users} users, {name}: "
+                        f"{median_time_ms(report, options['repeat']):.2f} ms, "
+                        f"{count_queries(report)} queries"
+                    )
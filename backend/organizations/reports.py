@@ -0,0 +1,381 @@
+"""
+Set based user reports of an organization.
+
+Every counter of a report is computed for all the users at once, with one
+grouped query per role, so the number of queries does not depend on the
+number of users in the organization.
+"""
+from collections import defaultdict
+
+from django.db.models import Avg, Count, Exists, OuterRef, Q
+
+from projects.models import Project, ANNOTATION_STAGE
+from tasks.models import (
+    Task,
+    Annotation,
+    ANNOTATOR_ANNOTATION,
+    REVIEWER_ANNOTATION,
+    SUPER_CHECKER_ANNOTATION,
+)
+from users.models import User
+from users.utils import get_role_name
+from utils.quality_metrics import get_annotation_pair_metrics
+
+ProjectAnnotators = Project.annotators.through
+ProjectReviewers = Project.annotation_reviewers.through
+ProjectSupercheckers = Project.review_supercheckers.through
+TaskAnnotationUsers = Task.annotation_users.through
+
+ACCEPTED_STATUSES = [
+    "accepted",
+    "accepted_with_minor_changes",
+    "accepted_with_major_changes",
+]
+REVIEWED_STATUSES = ACCEPTED_STATUSES + ["to_be_revised"]
+SUPERCHECKED_STATUSES = ["validated", "validated_with_changes", "rejected"]
+
+
+def get_participation_type_name(participation_type):
+    return (
+        "Full Time"
+        if participation_type == 1
+        else (
+            "Part Time"
+            if participation_type == 2
+            else "Contract Basis"
+            if participation_type == 4
+            else "N/A"
+        )
+    )
+
+
+def _has_word_error_rate(project_type):
+    return project_type is not None and project_type in "InstructionDrivenChat"
+
+
+def _is_member(through_model, project_ref, user_ref):
+    """
+    Filter on an annotation queryset keeping only the annotations of projects
+    where the user referenced by user_ref holds the role of through_model.
+    """
+    return Exists(
+        through_model.objects.filter(
+            project_id=OuterRef(project_ref), user_id=OuterRef(user_ref)
+        )
+    )
+
+
+def _average(values):
+    return sum(values) / len(values) if values else 0
+
+
+def _word_error_rates(annotations, user_field):
+    """
+    Returns a dict of user id to the word error rates between each annotation
+    and its parent, user_field being the lookup of the user of an annotation.
+    """
+    pair_metrics, _ = get_annotation_pair_metrics(annotations)
+    word_error_rates = defaultdict(list)
+    for annotation_id, user_id in annotations.values_list("id", user_field):
+        if annotation_id in pair_metrics:
+            word_error_rates[user_id].append(pair_metrics[annotation_id]["wer"])
+    return word_error_rates
+
+
+def _report_rows(user_ids, type_of_work, submitted_counts):
+    users = User.objects.filter(id__in=user_ids).only(
+        "id", "username", "email", "participation_type", "role", "languages"
+    )
+    return {
+        user.id: {
+            "Name": user.username,
+            "Email": user.email,
+            "Participation Type": get_participation_type_name(user.participation_type),
+            "Role": get_role_name(user.role),
+            "Type of Work": type_of_work,
+            "Submitted Tasks": submitted_counts.get(user.id, 0),
+            "Language": user.languages,
+        }
+        for user in users
+    }
+
+
+def get_annotation_reports(
+    proj_ids, user_ids, project_type, start_date=None, end_date=None
+):
+    """
+    Returns the annotation report of each user, computed over the projects in
+    proj_ids where the user is an annotator.
+    """
+    submitted_tasks = Annotation.objects.filter(
+        _is_member(ProjectAnnotators, "task__project_id", "completed_by_id"),
+        annotation_status="labeled",
+        task__project_id__in=proj_ids,
+        annotation_type=ANNOTATOR_ANNOTATION,
+        completed_by__in=user_ids,
+    )
+    if start_date:
+        submitted_tasks = submitted_tasks.filter(
+            updated_at__range=[start_date, end_date]
+        )
+    submitted_counts = dict(
+        submitted_tasks.values_list("completed_by").annotate(count=Count("id"))
+    )
+    reports = _report_rows(user_ids, "Annotator", submitted_counts)
+
+    if _has_word_error_rate(project_type):
+        word_error_rates = _word_error_rates(
+            Annotation.objects.filter(
+                parent_annotation__in=submitted_tasks,
+                annotation_status__in=ACCEPTED_STATUSES,
+            ),
+            "parent_annotation__completed_by",
+        )
+        for user_id, report in reports.items():
+            report["Average Word Error Rate A/R"] = round(
+                _average(word_error_rates[user_id]), 2
+            )
+    return list(reports.values())
+
+
+def get_review_reports(
+    proj_ids, user_ids, project_type, start_date=None, end_date=None
+):
+    """
+    Returns the review report of each user, computed over the projects in
+    proj_ids where the user is a reviewer.
+    """
+    review_annotations = Annotation.objects.filter(
+        _is_member(ProjectReviewers, "task__project_id", "task__review_user_id"),
+        task__project_id__in=proj_ids,
+        task__review_user__in=user_ids,
+        annotation_type=REVIEWER_ANNOTATION,
+    )
+    submitted_tasks = review_annotations.filter(annotation_status__in=REVIEWED_STATUSES)
+    if start_date:
+        submitted_tasks = submitted_tasks.filter(
+            updated_at__range=[start_date, end_date]
+        )
+    submitted_counts = dict(
+        submitted_tasks.values_list("task__review_user").annotate(count=Count("id"))
+    )
+    reports = _report_rows(user_ids, "Review", submitted_counts)
+
+    if _has_word_error_rate(project_type):
+        total_rev_annos = review_annotations.filter(
+            updated_at__range=[start_date, end_date]
+        )
+        ar_word_error_rates = _word_error_rates(
+            total_rev_annos.filter(annotation_status__in=ACCEPTED_STATUSES),
+            "task__review_user",
+        )
+        rs_word_error_rates = _word_error_rates(
+            Annotation.objects.filter(
+                parent_annotation__in=total_rev_annos,
+                task__task_status="super_checked",
+            ),
+            "task__review_user",
+        )
+        for user_id, report in reports.items():
+            report["Average Word Error Rate A/R"] = round(
+                _average(ar_word_error_rates[user_id]), 2
+            )
+            report["Average Word Error Rate R/S"] = round(
+                _average(rs_word_error_rates[user_id]), 2
+            )
+    return list(reports.values())
+
+
+def get_supercheck_reports(
+    proj_ids, user_ids, project_type, start_date=None, end_date=None
+):
+    """
+    Returns the supercheck report of each user, computed over the projects in
+    proj_ids where the user is a superchecker.
+    """
+    supercheck_annotations = Annotation.objects.filter(
+        _is_member(
+            ProjectSupercheckers, "task__project_id", "task__super_check_user_id"
+        ),
+        task__project_id__in=proj_ids,
+        task__super_check_user__in=user_ids,
+        annotation_type=SUPER_CHECKER_ANNOTATION,
+    )
+    submitted_tasks = supercheck_annotations.filter(
+        annotation_status__in=SUPERCHECKED_STATUSES
+    )
+    if start_date:
+        submitted_tasks = submitted_tasks.filter(
+            updated_at__range=[start_date, end_date]
+        )
+    submitted_counts = dict(
+        submitted_tasks.values_list("task__super_check_user").annotate(
+            count=Count("id")
+        )
+    )
+    reports = _report_rows(user_ids, "Supercheck", submitted_counts)
+
+    if _has_word_error_rate(project_type):
+        total_sup_annos = supercheck_annotations.filter(
+            updated_at__range=[start_date, end_date]
+        )
+        word_error_rates = _word_error_rates(total_sup_annos, "task__super_check_user")
+        # Superchecked tasks have always been weighted twice in the average
+        superchecked_word_error_rates = _word_error_rates(
+            total_sup_annos.filter(task__task_status="super_checked"),
+            "task__super_check_user",
+        )
+        for user_id, user_word_error_rates in superchecked_word_error_rates.items():
+            word_error_rates[user_id] += user_word_error_rates
+        for user_id, report in reports.items():
+            report["Average Word Error Rate R/S"] = round(
+                _average(word_error_rates[user_id]), 2
+            )
+    return list(reports.values())
+
+
+def get_project_members(proj_ids, through_model, participation_types):
+    """
+    Returns the ids of the users holding the role of through_model in any of
+    the projects, restricted to the given participation types.
+    """
+    return list(
+        through_model.objects.filter(
+            project_id__in=proj_ids,
+            user__participation_type__in=participation_types,
+        )
+        .values_list("user_id", flat=True)
+        .distinct()
+    )
+
+
+def get_annotator_counts(
+    pk,
+    annotator_ids,
+    project_type,
+    start_date,
+    end_date,
+    project_progress_stage,
+    tgt_language=None,
+):
+    """
+    Returns a dict of annotator id to the tuple returned by get_counts, for
+    all the annotators at once.
+    """
+    project_filter = Q(
+        project__organization_id_id=pk,
+        project__project_type=project_type,
+        user_id__in=annotator_ids,
+    )
+    if project_progress_stage != None:
+        project_filter &= Q(project__project_stage=project_progress_stage)
+    if tgt_language != None:
+        project_filter &= Q(project__tgt_language=tgt_language)
+    memberships = list(
+        ProjectAnnotators.objects.filter(project_filter).values_list(
+            "user_id", "project_id", "project__workspace_id"
+        )
+    )
+    proj_ids = {project_id for _, project_id, _ in memberships}
+    project_counts = defaultdict(int)
+    workspaces = defaultdict(set)
+    for user_id, _, workspace_id in memberships:
+        project_counts[user_id] += 1
+        if workspace_id is not None:
+            workspaces[user_id].add(workspace_id)
+
+    assigned_counts = dict(
+        TaskAnnotationUsers.objects.filter(
+            _is_member(ProjectAnnotators, "task__project_id", "user_id"),
+            task__project_id__in=proj_ids,
+            user_id__in=annotator_ids,
+        )
+        .values_list("user_id")
+        .annotate(count=Count("id"))
+    )
+
+    annotator_annotations = Annotation.objects.filter(
+        _is_member(ProjectAnnotators, "task__project_id", "completed_by_id"),
+        task__project_id__in=proj_ids,
+        annotation_type=ANNOTATOR_ANNOTATION,
+        updated_at__range=[start_date, end_date],
+        completed_by__in=annotator_ids,
+    )
+    status_counts = {
+        row["completed_by"]: row
+        for row in annotator_annotations.values("completed_by").annotate(
+            labeled=Count("id", filter=Q(annotation_status="labeled")),
+            skipped=Count("id", filter=Q(annotation_status="skipped")),
+            unlabeled=Count("id", filter=Q(annotation_status="unlabeled")),
+            draft=Count("id", filter=Q(annotation_status="draft")),
+            avg_lead_time=Avg("lead_time", filter=Q(annotation_status="labeled")),
+        )
+    }
+
+    in_review_stage = (
+        project_progress_stage != None and project_progress_stage > ANNOTATION_STAGE
+    )
+    review_counts = {}
+    reviewed_labeled_counts = {}
+    if in_review_stage:
+        review_counts = {
+            row["parent_annotation__completed_by"]: row
+            for row in Annotation.objects.filter(
+                _is_member(
+                    ProjectAnnotators,
+                    "task__project_id",
+                    "parent_annotation__completed_by_id",
+                ),
+                task__project_id__in=proj_ids,
+                annotation_type=REVIEWER_ANNOTATION,
+                parent_annotation__updated_at__range=[start_date, end_date],
+                parent_annotation__completed_by__in=annotator_ids,
+            )
+            .values("parent_annotation__completed_by")
+            .annotate(
+                **{
+                    status: Count(
+                        "parent_annotation",
+                        distinct=True,
+                        filter=Q(annotation_status=status),
+                    )
+                    for status in REVIEWED_STATUSES
+                }
+            )
+        }
+        reviewed_labeled_counts = dict(
+            Annotation.objects.filter(
+                parent_annotation__in=annotator_annotations.filter(
+                    annotation_status="labeled"
+                )
+            )
+            .exclude(annotation_status__in=["skipped", "draft"])
+            .values_list("parent_annotation__completed_by")
+            .annotate(count=Count("id"))
+        )
+
+    counts = {}
+    for annotator_id in annotator_ids:
+        status_count = status_counts.get(annotator_id, {})
+        review_count = review_counts.get(annotator_id, {})
+        labeled = status_count.get("labeled", 0)
+        counts[annotator_id] = (
+            assigned_counts.get(annotator_id, 0),
+            0 if in_review_stage else labeled,
+            review_count.get("accepted", 0),
+            review_count.get("to_be_revised", 0),
+            review_count.get("accepted_with_minor_changes", 0),
+            review_count.get("accepted_with_major_changes", 0),
+            (
+                labeled - reviewed_labeled_counts.get(annotator_id, 0)
+                if in_review_stage
+                else 0
+            ),
+            status_count.get("avg_lead_time") or 0,
+            status_count.get("skipped", 0),
+            status_count.get("unlabeled", 0),
+            status_count.get("draft", 0),
+            project_counts[annotator_id],
+            len(workspaces[annotator_id]),
+        )
+    return counts
@@ -5,6 +5,7 @@ import pandas as pd
 from django.conf import settings
 from django.core.mail import EmailMessage, EmailMultiAlternatives
 from tasks.views import SentenceOperationViewSet
+from utils.db_routing import replica_reads
 from utils.email_template import send_email_template_with_attachment
 
 from tasks.models import (
@@ -24,299 +25,22 @@ from projects.utils import (
     get_audio_transcription_duration,
     get_audio_segments_count,
     ocr_word_count,
-    calculate_word_error_rate_between_two_llm_prompts,
 )
-from workspaces.tasks import (
-    un_pack_annotation_tasks,
+from .reports import (
+    ProjectAnnotators,
+    ProjectReviewers,
+    ProjectSupercheckers,
+    get_annotation_reports,
+    get_annotator_counts,
+    get_project_members,
+    get_review_reports,
+    get_supercheck_reports,
 )
 from django.db.models import Q
 
 
-def get_all_annotation_reports(
-    proj_ids,
-    userid,
-    project_type,
-    start_date=None,
-    end_date=None,
-):
-    user = User.objects.get(pk=userid)
-    participation_type = user.participation_type
-    participation_type = (
-        "Full Time"
-        if participation_type == 1
-        else (
-            "Part Time"
-            if participation_type == 2
-            else "Contract Basis" if participation_type == 4 else "N/A"
-        )
-    )
-    role = get_role_name(user.role)
-    userName = user.username
-    email = user.email
-    user_lang = user.languages
-
-    if not start_date:
-        submitted_tasks = Annotation.objects.filter(
-            annotation_status="labeled",
-            task__project_id__in=proj_ids,
-            annotation_type=ANNOTATOR_ANNOTATION,
-            completed_by=userid,
-        )
-    else:
-        submitted_tasks = Annotation.objects.filter(
-            annotation_status="labeled",
-            task__project_id__in=proj_ids,
-            annotation_type=ANNOTATOR_ANNOTATION,
-            completed_by=userid,
-            updated_at__range=[start_date, end_date],
-        )
-    total_rev_annos = Annotation.objects.filter(
-        parent_annotation__in=submitted_tasks,
-        annotation_status__in=[
-            "accepted",
-            "accepted_with_minor_changes",
-            "accepted_with_major_changes",
-        ],
-    )
-    submitted_tasks_count = submitted_tasks.count()
-
-    total_word_error_rate_ar_list = []
-    if project_type in "InstructionDrivenChat":
-        for anno in total_rev_annos:
-            try:
-                total_word_error_rate_ar_list.append(
-                    calculate_word_error_rate_between_two_llm_prompts(
-                        anno.result, anno.parent_annotation.result
-                    )
-                )
-            except:
-                pass
-    if len(total_word_error_rate_ar_list) > 0:
-        avg_word_error_rate_ar = sum(total_word_error_rate_ar_list) / len(
-            total_word_error_rate_ar_list
-        )
-    else:
-        avg_word_error_rate_ar = 0
-
-    result = {
-        "Name": userName,
-        "Email": email,
-        "Participation Type": participation_type,
-        "Role": role,
-        "Type of Work": "Annotator",
-        "Submitted Tasks": submitted_tasks_count,
-        "Language": user_lang,
-    }
-    if project_type in "InstructionDrivenChat":
-        result["Average Word Error Rate A/R"] = round(avg_word_error_rate_ar, 2)
-
-    return result
-
-
-def get_all_review_reports(
-    proj_ids,
-    userid,
-    project_type,
-    start_date=None,
-    end_date=None,
-):
-    user = User.objects.get(pk=userid)
-    participation_type = user.participation_type
-    participation_type = (
-        "Full Time"
-        if participation_type == 1
-        else (
-            "Part Time"
-            if participation_type == 2
-            else "Contract Basis" if participation_type == 4 else "N/A"
-        )
-    )
-    role = get_role_name(user.role)
-    userName = user.username
-    email = user.email
-    user_lang = user.languages
-
-    if not start_date:
-        submitted_tasks = Annotation.objects.filter(
-            annotation_status__in=[
-                "accepted",
-                "to_be_revised",
-                "accepted_with_minor_changes",
-                "accepted_with_major_changes",
-            ],
-            task__project_id__in=proj_ids,
-            task__review_user=userid,
-            annotation_type=REVIEWER_ANNOTATION,
-        )
-    else:
-        submitted_tasks = Annotation.objects.filter(
-            annotation_status__in=[
-                "accepted",
-                "to_be_revised",
-                "accepted_with_minor_changes",
-                "accepted_with_major_changes",
-            ],
-            task__project_id__in=proj_ids,
-            task__review_user=userid,
-            annotation_type=REVIEWER_ANNOTATION,
-            updated_at__range=[start_date, end_date],
-        )
-
-    total_rev_annos = Annotation.objects.filter(
-        task__project_id__in=proj_ids,
-        task__review_user=userid,
-        annotation_type=REVIEWER_ANNOTATION,
-        updated_at__range=[start_date, end_date],
-    )
-    total_rev_sup_annos = Annotation.objects.filter(
-        parent_annotation__in=total_rev_annos
-    )
-    total_rev_annos_accepted = total_rev_annos.filter(
-        annotation_status__in=[
-            "accepted",
-            "accepted_with_minor_changes",
-            "accepted_with_major_changes",
-        ]
-    )
-    total_superchecked_annos = total_rev_sup_annos.filter(
-        task__task_status="super_checked"
-    )
-    submitted_tasks_count = submitted_tasks.count()
-    total_word_error_rate_ar_list = []
-    total_word_error_rate_rs_list = []
-    if project_type in "InstructionDrivenChat":
-        for anno in total_rev_annos_accepted:
-            try:
-                total_word_error_rate_ar_list.append(
-                    calculate_word_error_rate_between_two_llm_prompts(
-                        anno.result, anno.parent_annotation.result
-                    )
-                )
-            except:
-                pass
-        for anno in total_superchecked_annos:
-            try:
-                total_word_error_rate_rs_list.append(
-                    calculate_word_error_rate_between_two_llm_prompts(
-                        anno.result, anno.parent_annotation.result
-                    )
-                )
-            except:
-                pass
-    if len(total_word_error_rate_ar_list) > 0:
-        avg_word_error_rate_ar = sum(total_word_error_rate_ar_list) / len(
-            total_word_error_rate_ar_list
-        )
-    else:
-        avg_word_error_rate_ar = 0
-    if len(total_word_error_rate_rs_list) > 0:
-        avg_word_error_rate_rs = sum(total_word_error_rate_rs_list) / len(
-            total_word_error_rate_rs_list
-        )
-    else:
-        avg_word_error_rate_rs = 0
-
-    result = {
-        "Name": userName,
-        "Email": email,
-        "Participation Type": participation_type,
-        "Role": role,
-        "Type of Work": "Review",
-        "Submitted Tasks": submitted_tasks_count,
-        "Language": user_lang,
-    }
-    if project_type in "InstructionDrivenChat":
-        result["Average Word Error Rate A/R"] = round(avg_word_error_rate_ar, 2)
-        result["Average Word Error Rate R/S"] = round(avg_word_error_rate_rs, 2)
-
-    return result
-
-
-def get_all_supercheck_reports(
-    proj_ids, userid, project_type, start_date=None, end_date=None
-):
-    user = User.objects.get(pk=userid)
-    participation_type = (
-        "Full Time"
-        if user.participation_type == 1
-        else (
-            "Part Time"
-            if user.participation_type == 2
-            else "Contract Basis" if user.participation_type == 4 else "N/A"
-        )
-    )
-    role = get_role_name(user.role)
-    userName = user.username
-    email = user.email
-    user_lang = user.languages
-
-    if not start_date:
-        submitted_tasks = Annotation.objects.filter(
-            annotation_status__in=["validated", "validated_with_changes", "rejected"],
-            task__project_id__in=proj_ids,
-            task__super_check_user=userid,
-            annotation_type=SUPER_CHECKER_ANNOTATION,
-        )
-    else:
-        submitted_tasks = Annotation.objects.filter(
-            annotation_status__in=["validated", "validated_with_changes", "rejected"],
-            task__project_id__in=proj_ids,
-            task__super_check_user=userid,
-            annotation_type=SUPER_CHECKER_ANNOTATION,
-            updated_at__range=[start_date, end_date],
-        )
-    total_sup_annos = Annotation.objects.filter(
-        task__project_id__in=proj_ids,
-        task__super_check_user=userid,
-        annotation_type=SUPER_CHECKER_ANNOTATION,
-        updated_at__range=[start_date, end_date],
-    )
-    total_superchecked_annos = total_sup_annos.filter(task__task_status="super_checked")
-    submitted_tasks_count = submitted_tasks.count()
-
-    total_word_error_rate_rs_list = []
-    if project_type in "InstructionDrivenChat":
-        for anno in total_sup_annos:
-            try:
-                total_word_error_rate_rs_list.append(
-                    calculate_word_error_rate_between_two_llm_prompts(
-                        anno.result, anno.parent_annotation.result
-                    )
-                )
-            except:
-                pass
-        for anno in total_superchecked_annos:
-            try:
-                total_word_error_rate_rs_list.append(
-                    calculate_word_error_rate_between_two_llm_prompts(
-                        anno.result, anno.parent_annotation.result
-                    )
-                )
-            except:
-                pass
-    if len(total_word_error_rate_rs_list) > 0:
-        avg_word_error_rate = sum(total_word_error_rate_rs_list) / len(
-            total_word_error_rate_rs_list
-        )
-    else:
-        avg_word_error_rate = 0
-
-    result = {
-        "Name": userName,
-        "Email": email,
-        "Participation Type": participation_type,
-        "Role": role,
-        "Type of Work": "Supercheck",
-        "Submitted Tasks": submitted_tasks_count,
-        "Language": user_lang,
-    }
-    if project_type != None:
-        if project_type in "InstructionDrivenChat":
-            result["Average Word Error Rate R/S"] = round(avg_word_error_rate, 2)
-    return result
-
-
 @shared_task(queue="reports")
+@replica_reads
 def send_user_reports_mail_org(
     org_id,
     user_id,
@@ -367,81 +91,30 @@ def send_user_reports_mail_org(
     if not participation_types:
         participation_types = [1, 2, 4]
 
-    org_anno_list = []
-    org_reviewer_list = []
-    org_superchecker_list = []
-    for project in proj_objs:
-        anno_list = project.annotators.all()
-        reviewer_list = project.annotation_reviewers.all()
-        superchecker_list = project.review_supercheckers.all()
-        anno_ids = [
-            name.id
-            for name in anno_list
-            if (name.participation_type in participation_types)
-        ]
-        reviewer_ids = [
-            name.id
-            for name in reviewer_list
-            if (name.participation_type in participation_types)
-        ]
-        superchecker_ids = [
-            name.id
-            for name in superchecker_list
-            if (name.participation_type in participation_types)
-        ]
-        org_anno_list.extend(anno_ids)
-        org_reviewer_list.extend(reviewer_ids)
-        org_superchecker_list.extend(superchecker_ids)
-
-    org_anno_list = list(set(org_anno_list))
-    org_reviewer_list = list(set(org_reviewer_list))
-    org_superchecker_list = list(set(org_superchecker_list))
-
-    final_reports = []
-
-    for id in org_anno_list:
-        anno_projs = proj_objs.filter(annotators=id)
-        user_projs_ids = [user_proj.id for user_proj in anno_projs]
-        annotate_result = get_all_annotation_reports(
-            user_projs_ids,
-            id,
+    proj_ids = list(proj_objs.values_list("id", flat=True))
+    final_reports = (
+        get_annotation_reports(
+            proj_ids,
+            get_project_members(proj_ids, ProjectAnnotators, participation_types),
             project_type,
             start_date,
             end_date,
         )
-        final_reports.append(annotate_result)
-
-    for id in org_reviewer_list:
-        review_projs = proj_objs.filter(annotation_reviewers=id)
-        user_projs_ids = [
-            user_proj.id
-            for user_proj in review_projs
-            # if user_proj.project_stage > ANNOTATION_STAGE
-        ]
-        review_result = get_all_review_reports(
-            user_projs_ids,
-            id,
+        + get_review_reports(
+            proj_ids,
+            get_project_members(proj_ids, ProjectReviewers, participation_types),
             project_type,
             start_date,
             end_date,
         )
-        final_reports.append(review_result)
-
-    for id in org_superchecker_list:
-        supercheck_projs = proj_objs.filter(review_supercheckers=id)
-        user_projs_ids = [
-            user_proj.id
-            for user_proj in supercheck_projs
-            # if user_proj.project_stage > REVIEW_STAGE
-        ]
-        supercheck_result = get_all_supercheck_reports(
-            user_projs_ids,
-            id,
+        + get_supercheck_reports(
+            proj_ids,
+            get_project_members(proj_ids, ProjectSupercheckers, participation_types),
             project_type,
             start_date,
             end_date,
         )
-        final_reports.append(supercheck_result)
+    )
 
     final_reports = sorted(final_reports, key=lambda x: x["Name"], reverse=False)
 
@@ -501,130 +174,15 @@ def get_counts(
     project_progress_stage,
     tgt_language=None,
 ):
-    annotated_tasks = 0
-    accepted = 0
-    to_be_revised = 0
-    accepted_wt_minor_changes = 0
-    accepted_wt_major_changes = 0
-    labeled = 0
-    if tgt_language == None:
-        if project_progress_stage == None:
-            projects_objs = Project.objects.filter(
-                organization_id_id=pk,
-                project_type=project_type,
-                annotators=annotator,
-            )
-        else:
-            projects_objs = Project.objects.filter(
-                organization_id_id=pk,
-                project_type=project_type,
-                project_stage=project_progress_stage,
-                annotators=annotator,
-            )
-    else:
-        if project_progress_stage == None:
-            projects_objs = Project.objects.filter(
-                organization_id_id=pk,
-                project_type=project_type,
-                tgt_language=tgt_language,
-                annotators=annotator,
-            )
-        else:
-            projects_objs = Project.objects.filter(
-                organization_id_id=pk,
-                project_type=project_type,
-                project_stage=project_progress_stage,
-                tgt_language=tgt_language,
-                annotators=annotator,
-            )
-    project_count = projects_objs.count()
-    try:
-        no_of_workspaces_objs = len(
-            set([each_proj.workspace_id.id for each_proj in projects_objs])
-        )
-    except Exception as e:
-        no_of_workspaces_objs = 0
-    proj_ids = [eachid["id"] for eachid in projects_objs.values("id")]
-
-    all_tasks_in_project = Task.objects.filter(
-        Q(project_id__in=proj_ids) & Q(annotation_users=annotator)
-    )
-    assigned_tasks = all_tasks_in_project.count()
-
-    if project_progress_stage != None and project_progress_stage > ANNOTATION_STAGE:
-        (
-            accepted,
-            to_be_revised,
-            accepted_wt_minor_changes,
-            accepted_wt_major_changes,
-            labeled,
-            avg_lead_time,
-        ) = un_pack_annotation_tasks(
-            proj_ids,
-            annotator,
-            start_date,
-            end_date,
-            is_translation_project,
-            project_type,
-        )
-
-    else:
-        labeled_annotations = Annotation.objects.filter(
-            task__project_id__in=proj_ids,
-            annotation_status="labeled",
-            annotation_type=ANNOTATOR_ANNOTATION,
-            updated_at__range=[start_date, end_date],
-            completed_by=annotator,
-        )
-
-        annotated_tasks = labeled_annotations.count()
-        lead_time_annotated_tasks = [
-            eachtask.lead_time for eachtask in labeled_annotations
-        ]
-        avg_lead_time = 0
-        if len(lead_time_annotated_tasks) > 0:
-            avg_lead_time = sum(lead_time_annotated_tasks) / len(
-                lead_time_annotated_tasks
-            )
-
-    total_skipped_tasks = Annotation.objects.filter(
-        task__project_id__in=proj_ids,
-        annotation_status="skipped",
-        annotation_type=ANNOTATOR_ANNOTATION,
-        updated_at__range=[start_date, end_date],
-        completed_by=annotator,
-    )
-    all_pending_tasks_in_project = Annotation.objects.filter(
-        task__project_id__in=proj_ids,
-        annotation_status="unlabeled",
-        annotation_type=ANNOTATOR_ANNOTATION,
-        updated_at__range=[start_date, end_date],
-        completed_by=annotator,
-    )
-
-    all_draft_tasks_in_project = Annotation.objects.filter(
-        task__project_id__in=proj_ids,
-        annotation_status="draft",
-        annotation_type=ANNOTATOR_ANNOTATION,
-        updated_at__range=[start_date, end_date],
-        completed_by=annotator,
-    )
-
-    return (
-        assigned_tasks,
-        annotated_tasks,
-        accepted,
-        to_be_revised,
-        accepted_wt_minor_changes,
-        accepted_wt_major_changes,
-        labeled,
-        avg_lead_time,
-        total_skipped_tasks.count(),
-        all_pending_tasks_in_project.count(),
-        all_draft_tasks_in_project.count(),
-        project_count,
-        no_of_workspaces_objs,
-    )
+    return get_annotator_counts(
+        pk,
+        [annotator.id],
+        project_type,
+        start_date,
+        end_date,
+        project_progress_stage,
+        tgt_language,
+    )[annotator.id]
 
 
 def get_translation_quality_reports(
@@ -818,6 +376,7 @@ def get_translation_quality_reports(
 
 
 @shared_task(queue="reports")
+@replica_reads
 def send_project_analytics_mail_org(
     org_id,
     tgt_language,
@@ -1143,6 +702,7 @@ def send_project_analytics_mail_org(
 
 
 @shared_task(queue="reports")
+@replica_reads
 def send_user_analytics_mail_org(
     org_id,
     tgt_language,
@@ -1183,6 +743,16 @@ def send_user_analytics_mail_org(
             if (ann_user.participation_type in [1, 2, 4])
         ]
 
+        annotator_counts = get_annotator_counts(
+            pk,
+            [annotator.id for annotator in annotators],
+            project_type,
+            start_date,
+            end_date,
+            project_progress_stage,
+            None if tgt_language == None else tgt_language,
+        )
+
         result = []
         for annotator in annotators:
             participation_type = annotator.participation_type
@@ -1220,16 +790,7 @@ def send_user_analytics_mail_org(
                 total_draft_tasks_count,
                 no_of_projects,
                 no_of_workspaces_objs,
-            ) = get_counts(
-                pk,
-                annotator,
-                project_type,
-                start_date,
-                end_date,
-                is_translation_project,
-                project_progress_stage,
-                None if tgt_language == None else tgt_language,
-            )
+            ) = annotator_counts[annotator.id]
 
             if (
                 project_progress_stage != None
@@ -1,3 +1,75 @@
-from django.test import TestCase
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.test import TransactionTestCase
+
+from utils.db_routing import (
+    REPLICA_DB_ALIAS,
+    REPLICA_MAX_LAG,
+    iter_on_replica,
+    lag_monitor,
+    replica_reads,
+    use_replica,
+)
+from .models import Organization
 
 # Create your tests here.
+
+
+@skipUnless(
+    REPLICA_DB_ALIAS in settings.DATABASES,
+    "Needs a second database configured with DB_REPLICA_HOST",
+)
+class ReplicaRoutingTestcase(TransactionTestCase):
+    """
+    The test replica mirrors the test database of the default one, so the
+    tests check the database each query is routed to.
+    """
+
+    # The runner collects the databases of skipped classes too
+    databases = {DEFAULT_DB_ALIAS} | (
+        {REPLICA_DB_ALIAS} if REPLICA_DB_ALIAS in settings.DATABASES else set()
+    )
+
+    def setUp(self):
+        lag_monitor.reset()
+
+    def read_database(self):
+        return Organization.objects.all().db
+
+    def test_reads_go_to_the_replica_when_opted_in(self):
+        self.assertEqual(self.read_database(), DEFAULT_DB_ALIAS)
+        with use_replica():
+            self.assertEqual(self.read_database(), REPLICA_DB_ALIAS)
+        self.assertEqual(replica_reads(self.read_database)(), REPLICA_DB_ALIAS)
+
+    def test_streamed_reads_go_to_the_replica(self):
+        rows = (self.read_database() for _ in range(2))
+        self.assertEqual(
+            list(iter_on_replica(rows)), [REPLICA_DB_ALIAS, REPLICA_DB_ALIAS]
+        )
+        # The routing does not leak into the consumer of the stream
+        self.assertEqual(self.read_database(), DEFAULT_DB_ALIAS)
+
+    def test_writes_stay_on_the_primary(self):
+        with use_replica():
+            organization = Organization.objects.create(title="Written organization")
+        self.assertEqual(organization._state.db, DEFAULT_DB_ALIAS)
+
+    def test_replica_reads_see_the_rows(self):
+        Organization.objects.create(title="Primary organization")
+        with use_replica():
+            titles = list(Organization.objects.values_list("title", flat=True))
+        self.assertEqual(titles, ["Primary organization"])
+
+    def test_lagging_replica_falls_back_to_the_primary(self):
+        with mock.patch.object(
+            lag_monitor, "measure", return_value=REPLICA_MAX_LAG + 1
+        ):
+            with use_replica():
+                self.assertEqual(self.read_database(), DEFAULT_DB_ALIAS)
+
+    def test_reads_in_a_transaction_stay_on_the_primary(self):
+        with transaction.atomic(), use_replica():
+            self.assertEqual(self.read_database(), DEFAULT_DB_ALIAS)
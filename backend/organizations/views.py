@@ -21,6 +21,7 @@ from django.db.models import Avg, Count, F, FloatField, Q, Value, Subquery
 from django.db.models.functions import Cast, Coalesce
 from regex import R
 from tasks.models import Annotation
+from tasks.analytics import get_cumulative_task_counts, get_periodical_task_counts
 from projects.utils import is_valid_date, no_of_words, ocr_word_count
 from datetime import datetime, timezone, timedelta
 import pandas as pd
@@ -45,13 +46,14 @@ from projects.utils import (
     get_audio_transcription_duration,
     get_audio_segments_count,
 )
+from .reports import get_annotator_counts
 from .tasks import (
-    get_counts,
     send_user_reports_mail_org,
     send_project_analytics_mail_org,
     send_user_analytics_mail_org,
 )
 from projects.registry_helper import ProjectRegistry
+from utils.db_routing import replica_reads
 
 
 def get_task_count(proj_ids, status, annotator, return_count=True):
@@ -518,6 +520,7 @@ class OrganizationViewSet(viewsets.ModelViewSet):
         name="Get Organization level  users analytics ",
         url_name="user_analytics",
     )
+    @replica_reads
     def user_analytics(self, request, pk=None):
         try:
             organization = Organization.objects.get(pk=pk)
@@ -800,6 +803,16 @@ class OrganizationViewSet(viewsets.ModelViewSet):
                     if (ann_user.participation_type in [1, 2, 4])
                 ]
 
+                annotator_counts = get_annotator_counts(
+                    pk,
+                    [annotator.id for annotator in annotators],
+                    project_type,
+                    start_date,
+                    end_date,
+                    project_progress_stage,
+                    None if tgt_language == None else tgt_language,
+                )
+
                 result = []
                 for annotator in annotators:
                     participation_type = annotator.participation_type
@@ -837,16 +850,7 @@ class OrganizationViewSet(viewsets.ModelViewSet):
                         total_draft_tasks_count,
                         no_of_projects,
                         no_of_workspaces_objs,
-                    ) = get_counts(
-                        pk,
-                        annotator,
-                        project_type,
-                        start_date,
-                        end_date,
-                        is_translation_project,
-                        project_progress_stage,
-                        None if tgt_language == None else tgt_language,
-                    )
+                    ) = annotator_counts[annotator.id]
 
                     if (
                         project_progress_stage != None
@@ -952,6 +956,7 @@ class OrganizationViewSet(viewsets.ModelViewSet):
         name="Get Organization level  Project analytics ",
         url_name="project_analytics",
     )
+    @replica_reads
     def project_analytics(self, request, pk=None):
         try:
             organization = Organization.objects.get(pk=pk)
@@ -1285,6 +1290,7 @@ class OrganizationViewSet(viewsets.ModelViewSet):
         name="Get Cumulative tasks completed ",
         url_name="cumulative_tasks_count",
     )
+    @replica_reads
     def cumulative_tasks_count(self, request, pk=None):
         try:
             organization = Organization.objects.get(pk=pk)
@@ -1325,10 +1331,16 @@ class OrganizationViewSet(viewsets.ModelViewSet):
         languages = list(set([proj.tgt_language for proj in proj_objs_languages]))
         general_lang = []
         other_lang = []
+        if metainfo != True:
+            cumulative_counts = get_cumulative_task_counts(
+                proj_objs, reviewer_reports, supercheck_reports
+            )
         for lang in languages:
             proj_lang_filter = proj_objs.filter(tgt_language=lang)
             tasks_count = 0
-            if reviewer_reports == True:
+            if metainfo != True:
+                tasks_count = cumulative_counts.get(lang, 0)
+            elif reviewer_reports == True:
                 tasks = Task.objects.filter(
                     project_id__in=proj_lang_filter,
                     project_id__tgt_language=lang,
@@ -1727,6 +1739,10 @@ class OrganizationViewSet(viewsets.ModelViewSet):
         languages = list(set([proj.tgt_language for proj in proj_objs_languages]))
 
         final_result = []
+        if metainfo != True:
+            periodical_counts = get_periodical_task_counts(
+                proj_objs, reviewer_reports, supercheck_reports, periodical_list
+            )
 
         for period in range(len(periodical_list) - 1):
             start_end_date = (
@@ -1749,7 +1765,9 @@ class OrganizationViewSet(viewsets.ModelViewSet):
             for lang in languages:
                 proj_lang_filter = proj_objs.filter(tgt_language=lang)
                 annotated_labeled_tasks_count = 0
-                if reviewer_reports == True:
+                if metainfo != True:
+                    annotated_labeled_tasks_count = periodical_counts[period][lang]
+                elif reviewer_reports == True:
                     tasks = Task.objects.filter(
                         project_id__in=proj_lang_filter,
                         task_status__in=[
@@ -2214,6 +2232,7 @@ class OrganizationPublicViewSet(viewsets.ModelViewSet):
         name="Get Cumulative tasks completed ",
         url_name="cumulative_tasks_count",
     )
+    @replica_reads
     def cumulative_tasks_count(self, request, pk=None):
         try:
             organization = Organization.objects.get(pk=pk)
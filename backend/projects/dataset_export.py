@@ -0,0 +1,224 @@
+"""
+Chunked export of the tasks of a project into dataset instances.
+
+The exportable tasks are processed in chunks of EXPORT_CHUNK_SIZE, ordered by
+id. The data items of a chunk are read and written in bulk, and its tasks are
+marked as exported in the same transaction. After each chunk the id of its
+last task is saved as the checkpoint of the celery job, so that a retried
+export resumes after the last committed chunk.
+"""
+import json
+import logging
+
+from django.db import transaction
+
+from dataset.models import Instruction, Interaction
+from functions.jobs import get_job_checkpoint, save_job_checkpoint
+from tasks.counters import get_loaded_counters, increment_updated_task_counters
+from tasks.models import Task, ANNOTATED, REVIEWED, SUPER_CHECKED, EXPORTED
+from utils.custom_bulk_create import multi_inheritance_table_bulk_insert
+from .models import REVIEW_STAGE, SUPERCHECK_STAGE
+from .utils import get_attributes_for_IDC, get_attributes_for_ModelInteractionEvaluation
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 500
+
+
+class ExportProgress:
+    def __init__(self, total=0, exported=0, excluded=0, last_task_id=0):
+        self.total = total
+        self.exported = exported
+        self.excluded = excluded
+        self.last_task_id = last_task_id
+
+    def as_dict(self):
+        return {
+            "total": self.total,
+            "exported": self.exported,
+            "excluded": self.excluded,
+            "last_task_id": self.last_task_id,
+        }
+
+
+def get_exportable_tasks(project):
+    """
+    Returns the tasks of the project accepted at its last stage.
+    """
+    if project.project_stage == REVIEW_STAGE:
+        task_status = REVIEWED
+    elif project.project_stage == SUPERCHECK_STAGE:
+        task_status = SUPER_CHECKED
+    else:
+        task_status = ANNOTATED
+    return Task.objects.filter(project_id__exact=project, task_status=task_status)
+
+
+def get_export_annotation_result(annotation):
+    annotation_result = annotation.result
+    annotation_result = (
+        json.loads(annotation_result)
+        if isinstance(annotation_result, str)
+        else annotation_result
+    )
+    return [
+        {
+            "user_id": annotation.completed_by.email,
+            "annotation_id": annotation.id,
+            "annotation_result": annotation_result,
+            "annotation_type": annotation.annotation_type,
+            "annotation_status": annotation.annotation_status,
+            "parent_annotation": annotation.parent_annotation_id,
+            "parent_annotation_id": annotation.parent_annotation_id,
+        }
+    ]
+
+
+def export_chunk_in_place(tasks, dataset_model, annotation_fields):
+    """
+    Writes the correct annotation of the tasks into the annotation fields of
+    their input data items. Returns the number of tasks exported and
+    excluded. Tasks without a correct annotation are excluded.
+    """
+    data_items = dataset_model.objects.in_bulk(
+        [task.input_data_id for task in tasks if task.input_data_id]
+    )
+    loaded_counters = get_loaded_counters(tasks)
+    exported_tasks, exported_items = [], []
+    for task in tasks:
+        data_item = data_items.get(task.input_data_id)
+        if task.correct_annotation is None or data_item is None:
+            continue
+        complete_result = get_export_annotation_result(task.correct_annotation)
+        for field in annotation_fields:
+            setattr(data_item, field, complete_result)
+        task.output_data_id = task.input_data_id
+        task.task_status = EXPORTED
+        exported_tasks.append(task)
+        exported_items.append(data_item)
+
+    dataset_model.objects.bulk_update(exported_items, annotation_fields)
+    Task.objects.bulk_update(exported_tasks, ["output_data", "task_status"])
+    increment_updated_task_counters(exported_tasks, loaded_counters)
+    return len(exported_tasks), len(tasks) - len(exported_tasks)
+
+
+def _assign_fields(data_item, fields, item_data):
+    for field in fields:
+        if field in item_data:
+            setattr(data_item, field, item_data[field])
+
+
+def export_chunk_new_record(
+    project,
+    tasks,
+    dataset_model,
+    export_dataset_instance,
+    annotation_fields,
+    task_annotation_fields,
+):
+    """
+    Writes the tasks into new data items of the export dataset instance, or
+    into their existing output data items. Returns the number of tasks
+    exported and excluded. Tasks whose data items cannot be built are
+    excluded.
+    """
+    project_type = project.project_type
+    fields = annotation_fields + task_annotation_fields
+    existing_items = dataset_model.objects.in_bulk(
+        [task.output_data_id for task in tasks if task.output_data_id]
+    )
+    instructions, interactions = {}, {}
+    if project_type == "InstructionDrivenChat":
+        instructions = Instruction.objects.in_bulk(
+            [(task.data or {}).get("instruction_id") for task in tasks]
+        )
+    elif project_type == "ModelInteractionEvaluation":
+        interactions = Interaction.objects.in_bulk(
+            [(task.data or {}).get("interaction_id") for task in tasks]
+        )
+
+    loaded_counters = get_loaded_counters(tasks)
+    exported_tasks, updated_items, new_items = [], [], []
+    for task in tasks:
+        try:
+            if project_type == "ModelInteractionEvaluation":
+                # One new data item per evaluated interaction
+                items_data = get_attributes_for_ModelInteractionEvaluation(
+                    task, interactions.get(task.data.get("interaction_id"))
+                )
+                data_item = None
+            else:
+                item_data = dict(task.data or {})
+                if project_type == "InstructionDrivenChat":
+                    item_data.update(
+                        get_attributes_for_IDC(
+                            project,
+                            task,
+                            instructions.get(task.data.get("instruction_id")),
+                        )
+                    )
+                items_data = [item_data]
+                data_item = existing_items.get(task.output_data_id)
+        except Exception:
+            logger.exception("Could not export task %s", task.id)
+            continue
+
+        if data_item is not None:
+            _assign_fields(data_item, fields, items_data[0])
+            updated_items.append(data_item)
+        else:
+            for item_data in items_data:
+                data_item = dataset_model()
+                data_item.instance_id = export_dataset_instance
+                _assign_fields(data_item, fields, item_data)
+                new_items.append((task, data_item))
+        task.task_status = EXPORTED
+        exported_tasks.append(task)
+
+    multi_inheritance_table_bulk_insert([data_item for _, data_item in new_items])
+    for task, data_item in new_items:
+        task.output_data_id = data_item.pk
+    model_fields = {field.name for field in dataset_model._meta.concrete_fields}
+    update_fields = [field for field in set(fields) if field in model_fields]
+    if update_fields:
+        dataset_model.objects.bulk_update(updated_items, update_fields)
+    Task.objects.bulk_update(exported_tasks, ["output_data", "task_status"])
+    increment_updated_task_counters(exported_tasks, loaded_counters)
+    return len(exported_tasks), len(tasks) - len(exported_tasks)
+
+
+def run_export(
+    project,
+    export_chunk,
+    job_id=None,
+    progress_callback=None,
+    chunk_size=EXPORT_CHUNK_SIZE,
+):
+    """
+    Runs export_chunk(tasks) over the exportable tasks of the project, a
+    chunk at a time, resuming after the checkpoint of the job job_id if it
+    has one. progress_callback is called with the ExportProgress after every
+    chunk. Returns the ExportProgress.
+    """
+    checkpoint = get_job_checkpoint(job_id) if job_id else None
+    tasks = get_exportable_tasks(project)
+    if checkpoint:
+        progress = ExportProgress(**checkpoint)
+    else:
+        progress = ExportProgress(total=tasks.count())
+
+    tasks = tasks.select_related("correct_annotation__completed_by").order_by("id")
+    while True:
+        chunk = list(tasks.filter(id__gt=progress.last_task_id)[:chunk_size])
+        if not chunk:
+            return progress
+        with transaction.atomic():
+            exported, excluded = export_chunk(chunk)
+            progress.exported += exported
+            progress.excluded += excluded
+            progress.last_task_id = chunk[-1].id
+            if job_id:
+                save_job_checkpoint(job_id, progress.as_dict())
+        if progress_callback:
+            progress_callback(progress)
@@ -1,6 +1,7 @@
 from functools import wraps
 from workspaces.models import Workspace
 from users.models import User
+from users.principal import is_workspace_manager
 from organizations.models import Organization
 from rest_framework.response import Response
 from rest_framework import status
@@ -70,12 +71,12 @@ def is_project_editor(f):
         if (
             (
                 request.user.role == User.ORGANIZATION_OWNER
-                and request.user.organization == project.organization_id
+                and request.user.organization_id == project.organization_id_id
             )
             or (
                 request.user.role == User.WORKSPACE_MANAGER
-                and request.user.organization == project.organization_id
-                and (request.user in project.workspace_id.managers.all())
+                and request.user.organization_id == project.organization_id_id
+                and is_workspace_manager(request.user, project.workspace_id_id)
             )
             or request.user.is_superuser
         ):
@@ -91,9 +92,7 @@ def is_project_annotator_or_reviewer(f):
     def wrapper(self, request, *args, **kwargs):
         if (
             request.user.role == User.ANNOTATOR or request.user.role == User.REVIEWER
-        ) and request.user.organization_id == User.objects.get(
-            pk=request.user.id
-        ).organization.id:
+        ) and request.user.organization_id is not None:
             return f(self, request, *args, **kwargs)
         return Response(PERMISSION_ERROR, status=status.HTTP_403_FORBIDDEN)
 
@@ -0,0 +1,341 @@
+"""
+Streaming project download.
+
+The tasks of a project are read in keyset paginated chunks, with the
+annotations, annotators and input data metadata of a chunk fetched by a
+handful of queries, and the rows are written out incrementally. Memory use
+is bounded by the chunk size instead of the size of the project. Streamed
+downloads read from the database replica when there is one.
+"""
+import csv
+import json
+import textwrap
+from datetime import datetime
+
+from django.http import StreamingHttpResponse
+
+from dataset import models as dataset_models
+from utils.db_routing import iter_on_replica
+from tasks.models import (
+    Annotation,
+    Task,
+    ANNOTATOR_ANNOTATION,
+    REVIEWER_ANNOTATION,
+    ANNOTATED,
+    REVIEWED,
+)
+from .prompts import get_prompt_maps
+
+EXPORT_CHUNK_SIZE = 1000
+# Size of the pieces of the response handed to the server
+STREAM_BUFFER_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {
+    "CSV": ("text/csv", "csv"),
+    "TSV": ("text/tab-separated-values", "tsv"),
+    "JSON": ("application/json", "json"),
+    "JSONL": ("application/x-ndjson", "jsonl"),
+}
+
+# Task fields of the exported rows, the same as model_to_dict without the users
+TASK_EXPORT_FIELDS = [
+    field for field in Task._meta.concrete_fields if field.name not in ("review_user",)
+]
+
+# Fallback annotation of the tasks without a correct annotation
+FALLBACK_ANNOTATION_TYPES = {
+    ANNOTATED: ANNOTATOR_ANNOTATION,
+    REVIEWED: REVIEWER_ANNOTATION,
+}
+
+
+def serialize_datetime(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+
+
+def iter_task_chunks(tasks, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields lists of the tasks ordered by id, chunk_size at a time, paginating
+    on the id instead of an offset.
+    """
+    tasks = tasks.select_related("correct_annotation__completed_by").order_by("id")
+    last_id = 0
+    while True:
+        chunk = list(tasks.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].id
+
+
+def get_fallback_annotations(tasks):
+    """
+    Returns a dict of task id to the annotation exported for the tasks that
+    have no correct annotation: their first annotator annotation if the task
+    is annotated, their first reviewer annotation if it is reviewed.
+    """
+    tasks_by_type = {}
+    for task in tasks:
+        annotation_type = FALLBACK_ANNOTATION_TYPES.get(task.task_status)
+        if task.correct_annotation_id is None and annotation_type is not None:
+            tasks_by_type.setdefault(annotation_type, []).append(task.id)
+
+    fallback_annotations = {}
+    for annotation_type, task_ids in tasks_by_type.items():
+        annotations = (
+            Annotation.objects.filter(
+                task_id__in=task_ids, annotation_type=annotation_type
+            )
+            .select_related("completed_by")
+            .order_by("-id")
+        )
+        for annotation in annotations:
+            fallback_annotations[annotation.task_id] = annotation
+    return fallback_annotations
+
+
+def get_input_data_metadata(project, tasks):
+    dataset_type = project.dataset_id.all()[0].dataset_type
+    dataset_model = getattr(dataset_models, dataset_type)
+    return dict(
+        dataset_model.objects.filter(
+            pk__in=[task.input_data_id for task in tasks]
+        ).values_list("pk", "metadata_json")
+    )
+
+
+def get_annotation_json(annotation, add_notes):
+    annotation_result = annotation.result
+    annotation_result = (
+        json.loads(annotation_result)
+        if isinstance(annotation_result, str)
+        else annotation_result
+    )
+    annotation_json = {
+        "user_id": annotation.completed_by.email,
+        "annotation_id": annotation.id,
+        "annotation_result": annotation_result,
+        "annotation_type": annotation.annotation_type,
+        "annotation_status": annotation.annotation_status,
+        "parent_annotation_id": annotation.parent_annotation_id,
+    }
+    notes = {
+        "annotation_id": annotation.id,
+        "annotation_notes": annotation.annotation_notes,
+        "review_notes": annotation.review_notes,
+        "supercheck_notes": annotation.supercheck_notes,
+    }
+    return annotation_json, notes if add_notes else None
+
+
+def iter_download_rows(
+    project,
+    tasks,
+    include_input_data_metadata_json=False,
+    add_notes=False,
+    chunk_size=EXPORT_CHUNK_SIZE,
+):
+    """
+    Yields the rows of the project download, one dict per task of tasks.
+    """
+    project_type = project.project_type
+    if project_type == "MultipleInteractionEvaluation":
+        result_key = "eval_form_json"
+    elif project_type == "ModelInteractionEvaluation":
+        result_key = "eval_form_output_json"
+    elif project_type == "ModelOutputEvaluation":
+        result_key = "form_output_json"
+    else:
+        result_key = "interactions_json"
+
+    # Index of the prompt map of the project type in get_prompt_maps()
+    if project_type == "InstructionDrivenChat":
+        prompt_map_index = 1
+    elif result_key == "interactions_json":
+        prompt_map_index = 0
+    else:
+        prompt_map_index = None
+
+    for chunk in iter_task_chunks(tasks, chunk_size):
+        fallback_annotations = get_fallback_annotations(chunk)
+        prompt_map = (
+            get_prompt_maps(chunk, use_cache=True)[prompt_map_index]
+            if prompt_map_index is not None
+            else {}
+        )
+        metadata = (
+            get_input_data_metadata(project, chunk)
+            if include_input_data_metadata_json
+            else {}
+        )
+
+        for task in chunk:
+            task_dict = {
+                field.name: field.value_from_object(task)
+                for field in TASK_EXPORT_FIELDS
+            }
+            data = task_dict["data"]
+            if data is None:
+                data = task_dict["data"] = {}
+
+            annotation = task.correct_annotation or fallback_annotations.get(task.id)
+            annotations, notes = [], []
+            if annotation is not None:
+                annotation_json, annotation_notes = get_annotation_json(
+                    annotation, add_notes
+                )
+                annotations.append(annotation_json)
+                if annotation_notes is not None:
+                    notes.append(annotation_notes)
+            data["annotator_email"] = (
+                annotation.completed_by.email
+                if annotation is not None and annotation.completed_by
+                else ""
+            )
+            if include_input_data_metadata_json:
+                data["input_data_metadata_json"] = metadata.get(task.input_data_id)
+
+            data[result_key] = annotations
+            if prompt_map_index is not None:
+                data["Prompts"] = prompt_map.get(task.id, "")
+            data["notes_json"] = notes
+            yield task_dict
+
+
+def _normalized(row):
+    # Same values as those of the json round trip of the in-memory export
+    return json.loads(json.dumps(row, default=serialize_datetime, ensure_ascii=False))
+
+
+class _Echo:
+    """
+    File-like object returning what is written, for csv.writer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Echo())
+    fieldnames = nested_fieldnames = None
+    for row in rows:
+        row = _normalized(row)
+        if fieldnames is None:
+            fieldnames = list(row.keys())
+            nested_fieldnames = list(row["data"].keys())
+            yield writer.writerow(_expand_names(fieldnames, nested_fieldnames))
+        yield writer.writerow(_expand_row(row, fieldnames, nested_fieldnames))
+
+
+def iter_tsv(rows):
+    fieldnames = nested_fieldnames = None
+    for row in rows:
+        row = _normalized(row)
+        if fieldnames is None:
+            fieldnames = list(row.keys())
+            nested_fieldnames = list(row["data"].keys())
+            yield "\t".join(_expand_names(fieldnames, nested_fieldnames))
+        yield "\n" + "\t".join(
+            str(field) for field in _expand_row(row, fieldnames, nested_fieldnames)
+        )
+
+
+def iter_json(rows):
+    separator = "[\n"
+    for row in rows:
+        yield separator + textwrap.indent(
+            json.dumps(row, default=serialize_datetime, indent=4), "    "
+        )
+        separator = ",\n"
+    yield "\n]" if separator != "[\n" else "[]"
+
+
+def iter_jsonl(rows):
+    for row in rows:
+        yield json.dumps(row, default=serialize_datetime, ensure_ascii=False) + "\n"
+
+
+def _expand_names(fieldnames, nested_fieldnames):
+    names = []
+    for fieldname in fieldnames:
+        if fieldname == "data":
+            names.extend(nested_fieldnames)
+        else:
+            names.append(fieldname)
+    return names
+
+
+def _expand_row(row, fieldnames, nested_fieldnames):
+    values = []
+    for fieldname in fieldnames:
+        if fieldname == "data":
+            values.extend(row["data"].get(key, "") for key in nested_fieldnames)
+        else:
+            values.append(row.get(fieldname))
+    return values
+
+
+EXPORT_WRITERS = {
+    "CSV": iter_csv,
+    "TSV": iter_tsv,
+    "JSON": iter_json,
+    "JSONL": iter_jsonl,
+}
+
+
+def iter_export(rows, export_type, buffer_size=STREAM_BUFFER_SIZE):
+    """
+    Yields the rows written in export_type, in pieces of about buffer_size
+    characters.
+    """
+    buffer, size = [], 0
+    for piece in EXPORT_WRITERS[export_type](rows):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= buffer_size:
+            yield "".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer)
+
+
+def write_project_export(
+    project,
+    out,
+    export_type="CSV",
+    task_statuses=None,
+    include_input_data_metadata_json=False,
+    add_notes=False,
+):
+    """
+    Writes the download of the tasks of the project (of task_statuses if
+    given) to the text file out. Returns False, writing nothing, if there
+    are no such tasks.
+    """
+    tasks = Task.objects.filter(project_id__exact=project)
+    if task_statuses:
+        tasks = tasks.filter(task_status__in=task_statuses)
+    if not tasks.exists():
+        return False
+    rows = iter_download_rows(
+        project,
+        tasks,
+        include_input_data_metadata_json=include_input_data_metadata_json,
+        add_notes=add_notes,
+    )
+    for piece in iter_export(rows, export_type):
+        out.write(piece)
+    return True
+
+
+def streaming_export_response(project, rows, export_type):
+    content_type, extension = EXPORT_FORMATS[export_type]
+    response = StreamingHttpResponse(
+        iter_on_replica(iter_export(rows, export_type)), content_type=content_type
+    )
+    response[
+        "Content-Disposition"
+    ] = f'attachment; filename="{project.title}.{extension}"'
+    return response
@@ -0,0 +1,130 @@
+"""
+Project listing helpers.
+
+The ids of the projects a user is a member of (as annotator, reviewer or
+super checker) are cached per user in a VersionedCache. The m2m_changed
+receivers of projects.models make the entries of a user stale in every
+process whenever their membership changes, and again once the transaction
+commits. Publication and archival are filtered in the query, so the index
+does not depend on them. The members shown by the listing serializers are
+prefetched and the most recent work of the user is a grouped subquery, so
+that listing runs a constant number of queries however many projects are
+listed.
+"""
+from django.db.models import F, Max, OuterRef, Prefetch, Q, Subquery
+
+from tasks.models import Annotation
+from users.models import User
+from utils.cache import VersionedCache
+from workspaces.models import Workspace
+from .models import Project
+
+PROJECT_INDEX_TTL = 24 * 60 * 60
+
+ANNOTATOR_MEMBERSHIP = "annotators"
+REVIEWER_MEMBERSHIP = "annotation_reviewers"
+SUPER_CHECKER_MEMBERSHIP = "review_supercheckers"
+
+# Memberships whose projects are listed for each role
+ROLE_MEMBERSHIPS = {
+    User.ANNOTATOR: (ANNOTATOR_MEMBERSHIP,),
+    User.REVIEWER: (ANNOTATOR_MEMBERSHIP, REVIEWER_MEMBERSHIP),
+    User.SUPER_CHECKER: (
+        ANNOTATOR_MEMBERSHIP,
+        REVIEWER_MEMBERSHIP,
+        SUPER_CHECKER_MEMBERSHIP,
+    ),
+    User.WORKSPACE_MANAGER: (ANNOTATOR_MEMBERSHIP, REVIEWER_MEMBERSHIP),
+}
+
+# Users nested in the listing, with the organization UserProfileSerializer shows
+LISTED_USERS = User.objects.select_related("organization__created_by")
+
+project_index_cache = VersionedCache("projects:user_index", PROJECT_INDEX_TTL)
+
+
+def compute_user_project_index(user_id):
+    index = {}
+    for membership in (
+        ANNOTATOR_MEMBERSHIP,
+        REVIEWER_MEMBERSHIP,
+        SUPER_CHECKER_MEMBERSHIP,
+    ):
+        through = getattr(Project, membership).through
+        index[membership] = list(
+            through.objects.filter(user_id=user_id).values_list("project_id", flat=True)
+        )
+    return index
+
+
+def get_user_project_index(user_id):
+    """
+    Returns a dict of membership (the Project field) to the ids of the
+    projects the user is a member of.
+    """
+    return project_index_cache.get_or_compute(
+        user_id, lambda: compute_user_project_index(user_id)
+    )
+
+
+def invalidate_user_project_index(user_ids):
+    project_index_cache.invalidate(user_ids)
+
+
+def get_member_project_ids(user, memberships):
+    index = get_user_project_index(user.id)
+    return {
+        project_id
+        for membership in memberships
+        for project_id in index.get(membership, [])
+    }
+
+
+def get_visible_projects(queryset, user):
+    """
+    Returns the projects of queryset listed for the user by their role.
+    """
+    if user.is_superuser:
+        return queryset
+    if user.role == User.ORGANIZATION_OWNER:
+        return queryset.filter(organization_id=user.organization)
+    memberships = ROLE_MEMBERSHIPS.get(user.role, (ANNOTATOR_MEMBERSHIP,))
+    visible = Q(pk__in=get_member_project_ids(user, memberships))
+    if user.role == User.WORKSPACE_MANAGER:
+        visible |= Q(
+            workspace_id__in=Workspace.objects.filter(managers=user).values("id")
+        )
+    return queryset.filter(visible)
+
+
+def order_by_most_recent_work(projects, user):
+    """
+    Orders the projects by the last annotation of the user in them, the
+    projects the user has not worked on last by their publication date.
+    """
+    last_worked_at = (
+        Annotation.objects.filter(completed_by=user, task__project_id=OuterRef("pk"))
+        .values("task__project_id")
+        .annotate(last_worked_at=Max("updated_at"))
+        .values("last_worked_at")
+    )
+    return projects.annotate(last_worked_at=Subquery(last_worked_at[:1])).order_by(
+        F("last_worked_at").desc(nulls_last=True),
+        F("published_at").desc(nulls_last=True),
+    )
+
+
+def prefetch_project_members(projects):
+    """
+    Fetches the users and datasets ProjectSerializer nests, in one query per
+    relation.
+    """
+    return projects.select_related(
+        "created_by__organization__created_by"
+    ).prefetch_related(
+        Prefetch("annotators", queryset=LISTED_USERS),
+        Prefetch("annotation_reviewers", queryset=LISTED_USERS),
+        Prefetch("review_supercheckers", queryset=LISTED_USERS),
+        Prefetch("frozen_users", queryset=LISTED_USERS),
+        "dataset_id",
+    )
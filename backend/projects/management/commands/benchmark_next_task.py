@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+
+from projects.utils import get_next_task
+from tasks.models import Task
+from users.models import User
+from utils.benchmark import (
+    count_queries,
+    create_synthetic_project,
+    median_time_ms,
+    rolled_back,
+)
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the next task resolver on synthetic projects of growing size.
+    All fixtures are rolled back at the end.
+    """
+
+    help = "Benchmark ProjectViewSet.next on projects of increasing size"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[1000, 10000, 100000],
+            help="Number of tasks in each synthetic project",
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            user = User.objects.create_user(
+                username="benchmark", email="benchmark@anudesh.local", password=None
+            )
+            for size in options["sizes"]:
+                project = create_synthetic_project(size, annotators=[user])
+                tasks = Task.objects.filter(project_id=project)
+                user.annotation_users.add(*tasks.values_list("id", flat=True))
+                middle_task_id = tasks.order_by("id").values_list("id", flat=True)[
+                    size // 2
+                ]
+
+                def resolve():
+                    return get_next_task(
+                        project.id,
+                        user,
+                        "annotation",
+                        {},
+                        current_task_id=middle_task_id,
+                    )
+
+                resolve()
+                self.stdout.write(
+                    f"{size} tasks: {median_time_ms(resolve, options['repeat']):.2f} ms, "
+                    f"{count_queries(resolve)} queries"
+                )
@@ -0,0 +1,78 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from projects.export import EXPORT_FORMATS, iter_download_rows, iter_export
+from tasks.models import Annotation, Task, ANNOTATED
+from users.models import User
+from utils.benchmark import create_synthetic_project, rolled_back
+
+
+class Command(BaseCommand):
+    """
+    Streams the download of synthetic projects of growing size into a sink
+    and reports the throughput, the number of queries and the peak memory
+    allocated by Python, which must not grow with the number of tasks.
+    All fixtures are rolled back at the end.
+    """
+
+    help = "Benchmark the streaming project download"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tasks",
+            nargs="+",
+            type=int,
+            default=[20000, 200000],
+            help="Number of annotated tasks in each synthetic project",
+        )
+        parser.add_argument(
+            "--export-type", choices=list(EXPORT_FORMATS), default="CSV"
+        )
+
+    def handle(self, *args, **options):
+        for num_tasks in options["tasks"]:
+            with rolled_back():
+                annotator = User.objects.create(
+                    username="benchmark_annotator",
+                    email="benchmark_annotator@anudesh.local",
+                )
+                project = create_synthetic_project(num_tasks, annotators=[annotator])
+                tasks = Task.objects.filter(project_id=project)
+                Annotation.objects.bulk_create(
+                    (
+                        Annotation(
+                            task_id=task_id,
+                            completed_by=annotator,
+                            annotation_status="labeled",
+                            result=[
+                                {"prompt": f"prompt {task_id}", "output": "output"}
+                            ],
+                        )
+                        for task_id in tasks.values_list("id", flat=True).iterator()
+                    ),
+                    batch_size=5000,
+                )
+                tasks.update(task_status=ANNOTATED)
+
+                size = 0
+                tracemalloc.start()
+                start = time.perf_counter()
+                with CaptureQueriesContext(connection) as context:
+                    rows = iter_download_rows(project, tasks, add_notes=True)
+                    for piece in iter_export(rows, options["export_type"]):
+                        size += len(piece)
+                elapsed = time.perf_counter() - start
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                self.stdout.write(
+                    f"{num_tasks} tasks: {elapsed:.2f} s "
+                    f"({num_tasks / elapsed:.0f} tasks/s), "
+                    f"{len(context.captured_queries)} queries, "
+                    f"{size / 2**20:.1f} MiB written, "
+                    f"peak {peak / 2**20:.1f} MiB"
+                )
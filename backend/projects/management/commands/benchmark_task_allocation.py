@@ -0,0 +1,76 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from projects.task_allocation import claim_annotation_tasks
+from tasks.models import Task
+from users.models import User
+from utils.benchmark import create_synthetic_project
+
+
+class Command(BaseCommand):
+    """
+    Simulates many annotators pulling tasks of the same project at once.
+    Every puller runs on its own database connection, so this needs a real
+    Postgres database. The fixtures are deleted at the end.
+    """
+
+    help = "Benchmark concurrent task pulls with claim_annotation_tasks"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tasks", type=int, default=20000)
+        parser.add_argument("--pullers", type=int, default=200)
+        parser.add_argument("--workers", type=int, default=32)
+        parser.add_argument("--pull-count", type=int, default=10)
+
+    def handle(self, *args, **options):
+        users = [
+            User.objects.create_user(
+                username=f"benchmark{i}", email=f"benchmark{i}@anudesh.local"
+            )
+            for i in range(options["pullers"])
+        ]
+        project = create_synthetic_project(options["tasks"], annotators=users)
+        try:
+
+            def pull(user):
+                start = time.perf_counter()
+                try:
+                    claimed = claim_annotation_tasks(
+                        project, user, options["pull_count"]
+                    )
+                finally:
+                    connection.close()
+                return claimed, time.perf_counter() - start
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+                results = list(executor.map(pull, users))
+            elapsed = time.perf_counter() - start
+
+            claimed_ids = [task_id for claimed, _ in results for task_id in claimed]
+            latencies = sorted(latency for _, latency in results)
+            duplicates = len(claimed_ids) - len(set(claimed_ids))
+            assigned_tasks = (
+                Task.annotation_users.through.objects.filter(
+                    task__project_id=project.id
+                )
+                .values("task_id")
+                .order_by()
+                .distinct()
+                .count()
+            )
+            self.stdout.write(
+                f"{len(users)} pullers claimed {len(claimed_ids)} tasks in {elapsed:.2f} s "
+                f"(p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+                f"max {latencies[-1] * 1000:.1f} ms)"
+            )
+            self.stdout.write(
+                f"Duplicate claims: {duplicates}, "
+                f"tasks with an annotator: {assigned_tasks}"
+            )
+        finally:
+            project.delete()
+            User.objects.filter(id__in=[user.id for user in users]).delete()
@@ -0,0 +1,85 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from dataset.models import DatasetInstance, Interaction
+from organizations.models import Organization
+from projects.models import Project
+from projects.tasks import create_tasks_from_dataitems, filter_data_items
+from utils.benchmark import rolled_back
+from utils.custom_bulk_create import multi_inheritance_table_bulk_insert
+
+PROJECT_TYPE = "ModelInteractionEvaluation"
+
+
+class Command(BaseCommand):
+    """
+    Creates the tasks of ModelInteractionEvaluation projects from synthetic
+    interaction datasets of growing size, streaming the items from
+    filter_data_items as task creation does, and reports the tasks created
+    per second and the number of queries, which must grow with the number of
+    chunks and not of items. All fixtures are rolled back at the end.
+    """
+
+    help = "Benchmark task creation from dataset items"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--items",
+            nargs="+",
+            type=int,
+            default=[10000, 100000],
+            help="Number of interactions in each synthetic dataset",
+        )
+        parser.add_argument("--annotators-per-task", type=int, default=1)
+
+    def handle(self, *args, **options):
+        for num_items in options["items"]:
+            with rolled_back():
+                organization = Organization.objects.create(
+                    title="Benchmark organization"
+                )
+                dataset = DatasetInstance.objects.create(
+                    instance_name=f"Benchmark dataset ({num_items} items)",
+                    organisation_id=organization,
+                    dataset_type="Interaction",
+                )
+                multi_inheritance_table_bulk_insert(
+                    [
+                        Interaction(
+                            instance_id=dataset,
+                            interactions_json=[
+                                {"prompt": f"prompt {i}", "output": "output"},
+                                {"prompt": "follow up", "output": "output"},
+                            ],
+                            no_of_turns=2,
+                            language="English",
+                            model="benchmark",
+                            time_taken=0,
+                        )
+                        for i in range(num_items)
+                    ]
+                )
+                project = Project.objects.create(
+                    title=f"Benchmark project ({num_items} items)",
+                    project_type=PROJECT_TYPE,
+                    organization_id=organization,
+                    required_annotators_per_task=options["annotators_per_task"],
+                )
+                project.dataset_id.add(dataset)
+
+                start = time.perf_counter()
+                with CaptureQueriesContext(connection) as context:
+                    items = filter_data_items(
+                        PROJECT_TYPE, [dataset.instance_id], "", iterator=True
+                    )
+                    created = create_tasks_from_dataitems(items, project)
+                elapsed = time.perf_counter() - start
+
+                self.stdout.write(
+                    f"{num_items} items: {created} tasks in {elapsed:.2f} s "
+                    f"({created / elapsed:.0f} tasks/s), "
+                    f"{len(context.captured_queries)} queries"
+                )
@@ -1,5 +1,7 @@
 from django.conf import settings
 from django.db import models
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
 from django.utils import timezone
 from users.models import User
 from organizations.models import Organization
@@ -389,3 +391,17 @@ class ProjectBookmark(models.Model):
         indexes = [
             models.Index(fields=["user", "-bookmarked_at"]),
         ]
+
+
+@receiver(m2m_changed, sender=Project.annotators.through)
+@receiver(m2m_changed, sender=Project.annotation_reviewers.through)
+@receiver(m2m_changed, sender=Project.review_supercheckers.through)
+def invalidate_project_members_index(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    from users.principal import get_changed_member_ids
+    from .listing import invalidate_user_project_index
+
+    invalidate_user_project_index(
+        get_changed_member_ids(sender, instance, action, reverse, pk_set)
+    )
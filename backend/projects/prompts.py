@@ -0,0 +1,219 @@
+"""
+Prompt summaries of the tasks of a project download.
+
+The annotations of a chunk of tasks are read with a single ordered query and
+grouped by task in one pass, and both prompt summaries (the one of the
+InstructionDrivenChat projects, and the one of the model interaction
+projects) are computed from them together. Summaries can be cached, keyed by
+the ids and updated_at of the annotations they were computed from, in which
+case the annotation results are only read for the tasks missing from the
+cache.
+"""
+import json
+
+from tasks.models import (
+    Annotation,
+    ANNOTATOR_ANNOTATION,
+    REVIEWER_ANNOTATION,
+    SUPER_CHECKER_ANNOTATION,
+    ANNOTATED,
+    REVIEWED,
+    SUPER_CHECKED,
+)
+from utils.cache import LayeredCache, content_hash
+
+PROMPTS_CHUNK_SIZE = 1000
+PROMPTS_CACHE_TTL = 7 * 24 * 60 * 60
+
+prompts_cache = LayeredCache("projects:prompts", PROMPTS_CACHE_TTL, maxsize=4096)
+
+# Annotations summarized for the tasks of these statuses, in id order. The
+# other tasks are summarized by their correct annotation.
+PROMPT_ANNOTATION_TYPES = {
+    SUPER_CHECKED: [
+        ANNOTATOR_ANNOTATION,
+        REVIEWER_ANNOTATION,
+        SUPER_CHECKER_ANNOTATION,
+    ],
+    REVIEWED: [ANNOTATOR_ANNOTATION, REVIEWER_ANNOTATION],
+}
+
+ANNOTATION_FIELDS = (
+    "id",
+    "task_id",
+    "annotation_type",
+    "completed_by__email",
+    "updated_at",
+)
+
+
+def iter_turn_prompts(annotation_result):
+    """
+    Prompts of an InstructionDrivenChat result, a list of turns.
+    """
+    for turn in annotation_result or []:
+        if isinstance(turn, dict):
+            yield turn.get("prompt")
+
+
+def iter_interaction_prompts(annotation_result):
+    """
+    Prompts of the interactions of every model of a result.
+    """
+    for block in annotation_result or []:
+        if not isinstance(block, dict):
+            continue
+        for model in block.get("model_interactions") or []:
+            for turn in model.get("interaction_json") or []:
+                yield turn.get("prompt")
+
+
+def format_prompts(annotations, results, iter_prompts):
+    """
+    Returns "user@email: prompt1, prompt2 | ..." with the distinct prompts of
+    every user, in the order of the annotations.
+    """
+    user_prompts = {}
+    for annotation in annotations:
+        user = annotation["completed_by__email"] or "unknown_user"
+        annotation_result = results.get(annotation["id"])
+        if isinstance(annotation_result, str):
+            annotation_result = json.loads(annotation_result)
+        prompts = user_prompts.setdefault(user, {})
+        for prompt in iter_prompts(annotation_result):
+            if prompt:
+                prompts[prompt] = None
+    return " | ".join(
+        f"{user}: {', '.join(prompts)}"
+        for user, prompts in user_prompts.items()
+        if prompts
+    )
+
+
+def select_prompt_annotations(task_status, correct_annotation_id, annotations, by_id):
+    """
+    Returns the annotations summarized for a task: all its annotations if it
+    is reviewed or super checked, else its correct annotation, else its first
+    annotator annotation if it is annotated.
+    """
+    annotation_types = PROMPT_ANNOTATION_TYPES.get(task_status)
+    if annotation_types is not None:
+        return [
+            annotation
+            for annotation in annotations
+            if annotation["annotation_type"] in annotation_types
+        ]
+    if correct_annotation_id is not None:
+        correct_annotation = by_id.get(correct_annotation_id)
+        return [correct_annotation] if correct_annotation else []
+    if task_status == ANNOTATED:
+        return [
+            annotation
+            for annotation in annotations
+            if annotation["annotation_type"] == ANNOTATOR_ANNOTATION
+        ][:1]
+    return []
+
+
+def _get_task_rows(tasks):
+    if hasattr(tasks, "values_list"):
+        return list(tasks.values_list("id", "task_status", "correct_annotation_id"))
+    return [(task.id, task.task_status, task.correct_annotation_id) for task in tasks]
+
+
+def _get_prompt_maps_chunk(task_rows, use_cache):
+    task_ids = [
+        task_id
+        for task_id, task_status, _ in task_rows
+        if task_status in PROMPT_ANNOTATION_TYPES or task_status == ANNOTATED
+    ]
+    correct_ids = [
+        correct_id for _, _, correct_id in task_rows if correct_id is not None
+    ]
+    fields = ANNOTATION_FIELDS if use_cache else ANNOTATION_FIELDS + ("result",)
+    annotation_rows = (
+        (
+            Annotation.objects.filter(task_id__in=task_ids)
+            | Annotation.objects.filter(id__in=correct_ids)
+        )
+        .order_by("task_id", "id")
+        .values(*fields)
+    )
+
+    by_task, by_id, results = {}, {}, {}
+    for annotation in annotation_rows:
+        by_task.setdefault(annotation["task_id"], []).append(annotation)
+        by_id[annotation["id"]] = annotation
+        if not use_cache:
+            results[annotation["id"]] = annotation.pop("result")
+
+    selected = {
+        task_id: select_prompt_annotations(
+            task_status, correct_id, by_task.get(task_id, []), by_id
+        )
+        for task_id, task_status, correct_id in task_rows
+    }
+
+    summaries, cache_keys = {}, {}
+    if use_cache:
+        cache_keys = {
+            task_id: content_hash(
+                [
+                    (
+                        annotation["id"],
+                        annotation["completed_by__email"],
+                        annotation["updated_at"],
+                    )
+                    for annotation in annotations
+                ]
+            )
+            for task_id, annotations in selected.items()
+            if annotations
+        }
+        cached = prompts_cache.get_many(list(set(cache_keys.values())))
+        summaries = {
+            task_id: cached[key] for task_id, key in cache_keys.items() if key in cached
+        }
+        # Only the results of the tasks missing from the cache are read
+        results = dict(
+            Annotation.objects.filter(
+                id__in=[
+                    annotation["id"]
+                    for task_id, annotations in selected.items()
+                    if task_id not in summaries
+                    for annotation in annotations
+                ]
+            ).values_list("id", "result")
+        )
+
+    computed = {}
+    for task_id, annotations in selected.items():
+        if task_id in summaries:
+            continue
+        summaries[task_id] = [
+            format_prompts(annotations, results, iter_interaction_prompts),
+            format_prompts(annotations, results, iter_turn_prompts),
+        ]
+        if task_id in cache_keys:
+            computed[cache_keys[task_id]] = summaries[task_id]
+    if computed:
+        prompts_cache.set_many(computed)
+    return summaries
+
+
+def get_prompt_maps(tasks, use_cache=False, chunk_size=PROMPTS_CHUNK_SIZE):
+    """
+    Returns the prompt summaries of tasks (a queryset or a list of tasks) as
+    two dicts of task id to summary: the one of the model interaction
+    projects, and the one of the InstructionDrivenChat projects.
+    """
+    prompt_map, idc_prompt_map = {}, {}
+    task_rows = _get_task_rows(tasks)
+    for start in range(0, len(task_rows), chunk_size):
+        summaries = _get_prompt_maps_chunk(
+            task_rows[start : start + chunk_size], use_cache
+        )
+        for task_id, (prompts, idc_prompts) in summaries.items():
+            prompt_map[task_id] = prompts
+            idc_prompt_map[task_id] = idc_prompts
+    return prompt_map, idc_prompt_map
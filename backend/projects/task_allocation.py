@@ -0,0 +1,349 @@
+"""
+Lock-free task allocation for the task pull endpoints.
+
+Eligible tasks are claimed with SELECT ... FOR UPDATE SKIP LOCKED inside a
+transaction, so concurrent pullers of the same project never wait on each
+other and never receive the same task. The M2M rows and base annotations of
+the claimed tasks are then written with bulk queries, and the task counters
+of the project are updated in the same transaction.
+"""
+from django.db import transaction
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Subquery
+
+from dataset.models import ACTIVE_LLM_MODELS
+from tasks.models import (
+    Annotation,
+    Task,
+    ANNOTATOR_ANNOTATION,
+    REVIEWER_ANNOTATION,
+    SUPER_CHECKER_ANNOTATION,
+    INCOMPLETE,
+    ANNOTATED,
+    REVIEWED,
+    UNLABELED,
+    SKIPPED,
+    DRAFT,
+    LABELED,
+    TO_BE_REVISED,
+    UNASSIGNED_COUNTER,
+)
+from tasks.counters import (
+    get_loaded_counters,
+    increment_counters,
+    increment_updated_task_counters,
+)
+
+from .utils import add_extra_task_data
+
+TaskAnnotationUsers = Task.annotation_users.through
+
+
+def _first_annotation_per_task(task_ids, annotation_type, ordering):
+    """
+    Returns a dict of task id to the first annotation of the given type,
+    according to ordering, fetched with a single query.
+    """
+    first_annotations = {}
+    annotations = Annotation.objects.filter(
+        task_id__in=task_ids, annotation_type=annotation_type
+    ).order_by("task_id", ordering)
+    for annotation in annotations:
+        first_annotations.setdefault(annotation.task_id, annotation)
+    return first_annotations
+
+
+def _dict_to_string(d):
+    return "{" + ", ".join(f"{key}: {value}" for key, value in d.items()) + "}"
+
+
+def _set_current_rating(task, annotation):
+    curr_response = {}
+    try:
+        for qa in annotation.result[0]["model_responses_json"]:
+            curr_response[qa["model_name"]] = int(
+                qa["questions_response"][0]["response"][0]
+            )
+    except Exception:
+        return
+    task.data["current_rating"] = _dict_to_string(curr_response)
+    if "curr_rating" in task.data:
+        del task.data["curr_rating"]
+
+
+def claim_annotation_tasks(project, user, count):
+    """
+    Assigns up to count unassigned tasks of the project to the annotator and
+    creates their base annotations. Returns the assigned task ids.
+    """
+    if count <= 0:
+        return []
+    worked_input_data = Annotation.objects.filter(
+        task__project_id=project.id,
+        completed_by=user,
+        annotation_type=ANNOTATOR_ANNOTATION,
+        annotation_status__in=[UNLABELED, SKIPPED, DRAFT, LABELED, TO_BE_REVISED],
+    ).values("task__input_data")
+    candidates = (
+        Task.objects.select_for_update(skip_locked=True)
+        .filter(project_id=project.id, task_status=INCOMPLETE)
+        .filter(~Exists(TaskAnnotationUsers.objects.filter(task_id=OuterRef("pk"))))
+        .filter(
+            ~Exists(
+                Annotation.objects.filter(
+                    task_id=OuterRef("pk"), annotation_type=ANNOTATOR_ANNOTATION
+                )
+            )
+        )
+        .exclude(input_data__in=worked_input_data)
+    )
+    if project.required_annotators_per_task > 1:
+        similar_task_count = (
+            Task.objects.filter(
+                project_id=OuterRef("project_id"),
+                input_data=OuterRef("input_data"),
+                task_status=ANNOTATED,
+            )
+            .exclude(id=OuterRef("id"))
+            .values("input_data")
+            .annotate(count=Count("id"))
+            .values("count")[:1]
+        )
+        candidates = candidates.annotate(
+            similar_annotated_count=Subquery(
+                similar_task_count, output_field=IntegerField()
+            )
+        ).order_by(F("similar_annotated_count").desc(nulls_last=True), "id")
+    else:
+        candidates = candidates.order_by("id")
+
+    with transaction.atomic():
+        # Several tasks can share a data item when more than one annotator is
+        # required per task; only one of them may go to the same annotator.
+        tasks, seen_input_data = [], set()
+        for task in candidates[: count * project.required_annotators_per_task]:
+            if task.input_data_id is not None:
+                if task.input_data_id in seen_input_data:
+                    continue
+                seen_input_data.add(task.input_data_id)
+            tasks.append(task)
+            if len(tasks) == count:
+                break
+        if not tasks:
+            return []
+
+        # A row lock may have been released by a concurrent puller that
+        # committed after our snapshot was taken, re-check the assignments.
+        already_assigned = set(
+            TaskAnnotationUsers.objects.filter(
+                task_id__in=[task.id for task in tasks]
+            ).values_list("task_id", flat=True)
+        )
+        tasks = [task for task in tasks if task.id not in already_assigned]
+
+        TaskAnnotationUsers.objects.bulk_create(
+            [TaskAnnotationUsers(task_id=task.id, user_id=user.id) for task in tasks]
+        )
+        increment_counters(project.id, {UNASSIGNED_COUNTER: -len(tasks)})
+        if project.project_type == "InstructionDrivenChat":
+            updated_tasks = []
+            for task in tasks:
+                if (
+                    task.data
+                    and "model" in task.data
+                    and task.data["model"] not in ACTIVE_LLM_MODELS
+                ):
+                    task.data["model"] = ACTIVE_LLM_MODELS[0]
+                    updated_tasks.append(task)
+            Task.objects.bulk_update(updated_tasks, ["data"])
+        Annotation.objects.bulk_create(
+            [Annotation(result=[], task=task, completed_by=user) for task in tasks]
+        )
+    return [task.id for task in tasks]
+
+
+def claim_review_tasks(
+    project, user, count, preferred_annotator_ids=None, allow_unireview=False
+):
+    """
+    Assigns up to count annotated tasks of the project to the reviewer and
+    creates their reviewer annotations. Returns the assigned task ids.
+    """
+    if count <= 0:
+        return []
+    annotator_annotations = Annotation.objects.filter(
+        task_id=OuterRef("pk"), annotation_type=ANNOTATOR_ANNOTATION
+    )
+    candidates = (
+        Task.objects.select_for_update(skip_locked=True)
+        .filter(project_id=project.id, task_status=ANNOTATED)
+        .filter(review_user__isnull=True)
+        .filter(Exists(annotator_annotations))
+        .filter(
+            ~Exists(
+                TaskAnnotationUsers.objects.filter(
+                    task_id=OuterRef("pk"), user_id=user.id
+                )
+            )
+        )
+    )
+    if preferred_annotator_ids:
+        candidates = candidates.filter(
+            Exists(
+                annotator_annotations.filter(completed_by__in=preferred_annotator_ids)
+            )
+        )
+    if project.required_annotators_per_task > 1 and allow_unireview:
+        labeled_task_count = (
+            Task.objects.filter(
+                project_id=OuterRef("project_id"),
+                input_data=OuterRef("input_data"),
+                task_status=ANNOTATED,
+            )
+            .values("input_data")
+            .annotate(count=Count("id"))
+            .values("count")[:1]
+        )
+        candidates = candidates.annotate(
+            labeled_task_count=Subquery(labeled_task_count, output_field=IntegerField())
+        ).order_by(F("labeled_task_count").desc(nulls_last=True), "id")
+    else:
+        candidates = candidates.annotate(
+            oldest_annotation_update=Subquery(
+                annotator_annotations.order_by("updated_at").values("updated_at")[:1]
+            )
+        ).order_by("oldest_annotation_update", "id")
+
+    with transaction.atomic():
+        tasks = list(candidates[:count])
+        if project.required_annotators_per_task > 1 and allow_unireview:
+            # Tasks of a data item are reviewed together; data items that
+            # still have incomplete tasks are skipped.
+            input_data_ids = {task.input_data_id for task in tasks}
+            incomplete_input_data = set(
+                Task.objects.filter(
+                    project_id=project.id,
+                    input_data_id__in=input_data_ids,
+                    task_status=INCOMPLETE,
+                    review_user__isnull=True,
+                ).values_list("input_data_id", flat=True)
+            )
+            tasks = [
+                task
+                for task in tasks
+                if task.input_data_id not in incomplete_input_data
+            ]
+            claimed_ids = {task.id for task in tasks}
+            tasks += list(
+                Task.objects.select_for_update(skip_locked=True)
+                .filter(
+                    project_id=project.id,
+                    input_data_id__in={task.input_data_id for task in tasks},
+                    task_status=ANNOTATED,
+                    review_user__isnull=True,
+                )
+                .exclude(id__in=claimed_ids)
+                .order_by("id")
+            )
+        if not tasks:
+            return []
+
+        task_ids = [task.id for task in tasks]
+        loaded_counters = get_loaded_counters(tasks)
+        parent_annotations = _first_annotation_per_task(
+            task_ids, ANNOTATOR_ANNOTATION, "updated_at"
+        )
+        existing_reviews = _first_annotation_per_task(
+            task_ids, REVIEWER_ANNOTATION, "id"
+        )
+        new_annotations = []
+        for task in tasks:
+            if project.project_type == "MultipleInteractionEvaluation":
+                add_extra_task_data(task, project)
+            parent_annotation = parent_annotations[task.id]
+            _set_current_rating(task, parent_annotation)
+            if task.id in existing_reviews:
+                task.review_user_id = existing_reviews[task.id].completed_by_id
+                continue
+            task.review_user = user
+            new_annotations.append(
+                Annotation(
+                    result=parent_annotation.result,
+                    task=task,
+                    completed_by=user,
+                    annotation_status="unreviewed",
+                    parent_annotation=parent_annotation,
+                    annotation_type=REVIEWER_ANNOTATION,
+                    annotation_notes=parent_annotation.annotation_notes,
+                )
+            )
+        Task.objects.bulk_update(tasks, ["review_user", "data"])
+        increment_updated_task_counters(tasks, loaded_counters)
+        Annotation.objects.bulk_create(new_annotations)
+    return task_ids
+
+
+def claim_supercheck_tasks(project, user, count):
+    """
+    Assigns up to count reviewed tasks of the project to the superchecker and
+    creates their superchecker annotations. Returns the assigned task ids.
+    """
+    if count <= 0:
+        return []
+    reviewer_annotations = Annotation.objects.filter(
+        task_id=OuterRef("pk"), annotation_type=REVIEWER_ANNOTATION
+    )
+    candidates = (
+        Task.objects.select_for_update(skip_locked=True)
+        .filter(project_id=project.id, task_status=REVIEWED)
+        .filter(super_check_user__isnull=True)
+        .exclude(review_user=user.id)
+        .filter(Exists(reviewer_annotations))
+        .filter(
+            ~Exists(
+                TaskAnnotationUsers.objects.filter(
+                    task_id=OuterRef("pk"), user_id=user.id
+                )
+            )
+        )
+        .annotate(
+            latest_review_update=Subquery(
+                reviewer_annotations.order_by("-updated_at").values("updated_at")[:1]
+            )
+        )
+        .order_by("-latest_review_update", "id")
+    )
+
+    with transaction.atomic():
+        tasks = list(candidates[:count])
+        if not tasks:
+            return []
+
+        task_ids = [task.id for task in tasks]
+        loaded_counters = get_loaded_counters(tasks)
+        parent_annotations = _first_annotation_per_task(
+            task_ids, REVIEWER_ANNOTATION, "-updated_at"
+        )
+        existing_superchecks = _first_annotation_per_task(
+            task_ids, SUPER_CHECKER_ANNOTATION, "id"
+        )
+        new_annotations = []
+        for task in tasks:
+            if task.id in existing_superchecks:
+                task.super_check_user_id = existing_superchecks[task.id].completed_by_id
+                continue
+            task.super_check_user = user
+            parent_annotation = parent_annotations[task.id]
+            new_annotations.append(
+                Annotation(
+                    result=parent_annotation.result,
+                    task=task,
+                    completed_by=user,
+                    annotation_status="unvalidated",
+                    parent_annotation=parent_annotation,
+                    annotation_type=SUPER_CHECKER_ANNOTATION,
+                )
+            )
+        Task.objects.bulk_update(tasks, ["super_check_user"])
+        increment_updated_task_counters(tasks, loaded_counters)
+        Annotation.objects.bulk_create(new_annotations)
+    return task_ids
@@ -1,11 +1,12 @@
 import random
 import json
 from copy import deepcopy
-from collections import OrderedDict
 from urllib.parse import parse_qsl
 from collections import deque
+from itertools import islice
 from celery import shared_task
 from celery.utils.log import get_task_logger
+from django.db import DatabaseError, transaction
 from dataset import models as dataset_models
 from django.forms.models import model_to_dict
 from filters import filter
@@ -14,17 +15,20 @@ from users.models import User
 from tasks.models import Annotation as Annotation_model
 from tasks.models import *
 from tasks.models import Task
+from tasks.counters import increment_created_task_counters
 from utils.monolingual.sentence_splitter import split_sentences
-from dataset.models import DatasetInstance
 from .models import *
 from .registry_helper import ProjectRegistry
+from .prompts import get_prompt_maps
+from .dataset_export import (
+    export_chunk_in_place,
+    export_chunk_new_record,
+    run_export,
+)
 from .utils import (
     conversation_wordcount,
     no_of_words,
     conversation_sentence_count,
-    get_attributes_for_IDC,
-    get_attributes_for_ModelInteractionEvaluation,
-    assign_attributes_and_save_dataitem,
 )
 from .annotation_registry import *
 import random
@@ -32,6 +36,8 @@ import random
 # Celery logger settings
 logger = get_task_logger(__name__)
 
+TASK_CREATION_CHUNK_SIZE = 1000
+
 
 ## Utility functions for the tasks
 def stringify_json(json):
@@ -45,169 +51,17 @@ def prompt_data_annotation_InstructionDrivenChat(tasks):
     Extract prompts per task for InstructionDrivenChat projects.
     Returns: { task_id: "user@email: prompt1, prompt2" }
     """
+    return get_prompt_maps(tasks)[1]
 
-    task_prompt_map = {}
-
-    for task in tasks:
-        correct_annotation = task.correct_annotation
-
-        if task.task_status == SUPER_CHECKED:
-            correct_annotation = list(
-                task.annotations.filter(
-                    annotation_type__in=[
-                        ANNOTATOR_ANNOTATION,
-                        REVIEWER_ANNOTATION,
-                        SUPER_CHECKER_ANNOTATION,
-                    ]
-                ).order_by("id")
-            )
-
-        elif task.task_status == REVIEWED:
-            correct_annotation = list(
-                task.annotations.filter(
-                    annotation_type__in=[
-                        ANNOTATOR_ANNOTATION,
-                        REVIEWER_ANNOTATION,
-                    ]
-                ).order_by("id")
-            )
-
-        elif task.task_status == ANNOTATED and correct_annotation is None:
-            correct_annotation = task.annotations.filter(
-                annotation_type=ANNOTATOR_ANNOTATION
-            ).first()
-
-        # normalize to list
-        annotations = (
-            correct_annotation
-            if isinstance(correct_annotation, list)
-            else [correct_annotation] if correct_annotation else []
-        )
-
-        user_prompts = {}
-        seen = {}
-
-        for a in annotations:
-            user = (
-                a.completed_by.email
-                if a.completed_by and a.completed_by.email
-                else "unknown_user"
-            )
 
-            annotation_result = a.result
-            annotation_result = (
-                json.loads(annotation_result)
-                if isinstance(annotation_result, str)
-                else annotation_result
-            )
-
-            user_prompts.setdefault(user, [])
-            seen.setdefault(user, set())
-
-            for turn in annotation_result or []:
-                prompt = turn.get("prompt")
-                if prompt and prompt not in seen[user]:
-                    user_prompts[user].append(prompt)
-                    seen[user].add(prompt)
-
-        formatted = [
-            f"{user}: {', '.join(prompts)}"
-            for user, prompts in user_prompts.items()
-            if prompts
-        ]
-
-        task_prompt_map[task.id] = " | ".join(formatted)
-
-    return task_prompt_map
 def prompt_data_annotation(tasks):
     """
     Runs correct_annotation logic on Task models
     and returns {task_id: formatted_prompts}
     """
+    return get_prompt_maps(tasks)[0]
 
-    task_prompt_map = {}
 
-    for task in tasks:
-        correct_annotation = task.correct_annotation
-
-        if task.task_status == SUPER_CHECKED:
-            correct_annotation = list(
-                task.annotations.filter(
-                    annotation_type__in=[
-                        ANNOTATOR_ANNOTATION,
-                        REVIEWER_ANNOTATION,
-                        SUPER_CHECKER_ANNOTATION,
-                    ]
-                ).order_by("id")
-            )
-
-        elif task.task_status == REVIEWED:
-            correct_annotation = list(
-                task.annotations.filter(
-                    annotation_type__in=[
-                        ANNOTATOR_ANNOTATION,
-                        REVIEWER_ANNOTATION,
-                    ]
-                ).order_by("id")
-            )
-
-        elif task.task_status == ANNOTATED:
-            if correct_annotation is None:
-                correct_annotation = task.annotations.filter(
-                    annotation_type=ANNOTATOR_ANNOTATION
-                ).first()
-
-        
-        annotations = (
-            correct_annotation
-            if isinstance(correct_annotation, list)
-            else [correct_annotation] if correct_annotation else []
-        )
-        
-        user_prompts = {}
-        seen = {}
-
-        for a in annotations:
-            user = (
-                a.completed_by.email
-                if a.completed_by and a.completed_by.email
-                else "unknown_user"
-            )
-            annotation_result = a.result
-            annotation_result = (
-                json.loads(annotation_result)
-                if isinstance(annotation_result, str)
-                else annotation_result
-            )
-
-            user = (
-                a.completed_by.email
-                if a.completed_by and a.completed_by.email
-                else "unknown_user"
-            )
-
-            user_prompts.setdefault(user, [])
-            seen.setdefault(user, set())
-
-            for block in annotation_result:
-                for model in block.get("model_interactions", []):
-                    for turn in model.get("interaction_json", []):
-                        prompt = turn.get("prompt")
-                        if prompt and prompt not in seen[user]:
-                            user_prompts[user].append(prompt)
-                            seen[user].add(prompt)
-
-        formatted = [
-            f"{user}: {', '.join(prompts)}"
-            for user, prompts in user_prompts.items()
-            if prompts
-        ]
-
-        task_prompt_map[task.id] = " | ".join(formatted)
-
-    return task_prompt_map
-      
-            
 def create_automatic_annotations(tasks, automatic_annotation_creation_mode):
     user = User.objects.get(id=1)
     project = tasks[0].project_id
@@ -313,131 +167,184 @@ def create_automatic_annotations(tasks, automatic_annotation_creation_mode):
                         task.save()
 
 
-def create_tasks_from_dataitems(items, project):
+def iter_item_chunks(items, chunk_size=TASK_CREATION_CHUNK_SIZE):
+    """
+    Yields lists of the items, chunk_size at a time, consuming items lazily.
+    """
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def get_parent_data(parent_class, items):
+    """
+    Returns a dict of parent id to the fields of the parents of the items,
+    fetched with a single query.
+    """
+    parent_ids = set()
+    for item in items:
+        if not item.get("parent_data"):
+            raise Exception("Item does not have a parent")
+        parent_ids.add(item["parent_data"])
+    parents = getattr(dataset_models, parent_class).objects.in_bulk(parent_ids)
+    if len(parents) != len(parent_ids):
+        raise Exception("Parent data not found")
+    return {pk: model_to_dict(parent) for pk, parent in parents.items()}
+
+
+def iter_model_sets(metadata_json):
+    """
+    Yields the models of successive tasks of a MultipleLLMInstructionDrivenChat
+    project: the fixed models and the next of the other models in turn,
+    shuffled.
+    """
+    llm_sets = metadata_json["models_set"]
+    fixed_llms = metadata_json["fixed_models"]
+    num_extra_llms = metadata_json["num_models"] - len(fixed_llms)
+    rotating_llms = deque([m for m in llm_sets if m not in fixed_llms])
+    while True:
+        extra_llms = [rotating_llms.popleft() for _ in range(num_extra_llms)]
+        selected_llms = fixed_llms + extra_llms
+        random.shuffle(selected_llms)
+        rotating_llms.extend(extra_llms)
+        yield selected_llms
+
+
+def get_sentence_splitting_prediction(item):
+    return [
+        {
+            "value": {
+                "text": ["\n".join(split_sentences(item["text"], item["language"]))]
+            },
+            "id": "0",
+            "from_name": "splitted_text",
+            "to_name": "text",
+            "type": "textarea",
+        }
+    ]
+
+
+def create_tasks_from_dataitems(items, project, chunk_size=TASK_CREATION_CHUNK_SIZE):
+    """
+    Creates the tasks of the project for the data items, chunk_size items at
+    a time. items can be any iterable of the dicts of filter_data_items,
+    including its iterator, and is consumed lazily. The input data and the
+    parents of a chunk are fetched with one query each, and the data of its
+    tasks is complete before their single bulk insert. The tasks are created
+    in one transaction, none of them are if an item fails. Returns the number
+    of tasks created.
+    """
     project_type = project.project_type
     registry_helper = ProjectRegistry.get_instance()
     input_dataset_info = registry_helper.get_input_dataset_and_fields(project_type)
     output_dataset_info = registry_helper.get_output_dataset_and_fields(project_type)
     variable_parameters = project.variable_parameters
-    project_type_lower = project_type.lower()
-    is_translation_project = "translation" in project_type_lower
-    is_conversation_project = "conversation" in project_type_lower
-    is_editing_project = "editing" in project_type_lower
-    is_audio_project = "audio" in project_type_lower
-
-    data_object = dataset_models.DatasetBase.objects.get(pk=items[0]["id"])
-    insta_id = data_object.instance_id_id
-    dataset_type1 = ""
-    dsi = DatasetInstance.objects.filter(instance_id=insta_id)
-    dataset_type1 = dsi[0].dataset_type
-
-    # Create task objects
-    tasks = []
-    for item in items:
-        data_id = item["id"]
-        if "variable_parameters" in output_dataset_info["fields"]:
-            for var_param in output_dataset_info["fields"]["variable_parameters"]:
-                item[var_param] = variable_parameters[var_param]
-        if "copy_from_input" in output_dataset_info["fields"]:
-            for input_field, output_field in output_dataset_info["fields"][
-                "copy_from_input"
-            ].items():
-                if output_field == input_field:
-                    continue
-                item[output_field] = item[input_field]
-                del item[input_field]
-        if "copy_from_parent" in input_dataset_info:
-            if not item.get("parent_data"):
-                raise Exception("Item does not have a parent")
-            try:
-                # get the parent class from the registry and get the parent object
-                parent_class = input_dataset_info["parent_class"]
-                parent_data = model_to_dict(
-                    getattr(dataset_models, parent_class).objects.get(
-                        id=item["parent_data"]
+    automatic_annotation_creation_mode = (
+        project.metadata_json.get("automatic_annotation_creation_mode")
+        if project.metadata_json is not None
+        else None
+    )
+    model_sets = (
+        iter_model_sets(project.metadata_json)
+        if project_type == "MultipleLLMInstructionDrivenChat"
+        else None
+    )
+    prediction_user = (
+        User.objects.get(email="prediction@ai4bharat.org")
+        if input_dataset_info["prediction"] is not None
+        else None
+    )
+
+    created = 0
+    # A failing chunk rolls back the tasks of the chunks before it, so that
+    # the project is never left with part of its tasks
+    with transaction.atomic():
+        for chunk in iter_item_chunks(items, chunk_size):
+            input_data = dataset_models.DatasetBase.objects.in_bulk(
+                [item["id"] for item in chunk]
+            )
+            parent_data = (
+                get_parent_data(input_dataset_info["parent_class"], chunk)
+                if "copy_from_parent" in input_dataset_info
+                else {}
+            )
+
+            tasks, predictions = [], []
+            for item in chunk:
+                data_id = item["id"]
+                if data_id not in input_data:
+                    raise dataset_models.DatasetBase.DoesNotExist(
+                        f"Data item {data_id} does not exist"
                     )
+                if "variable_parameters" in output_dataset_info["fields"]:
+                    for var_param in output_dataset_info["fields"][
+                        "variable_parameters"
+                    ]:
+                        item[var_param] = variable_parameters[var_param]
+                if "copy_from_input" in output_dataset_info["fields"]:
+                    for input_field, output_field in output_dataset_info["fields"][
+                        "copy_from_input"
+                    ].items():
+                        if output_field == input_field:
+                            continue
+                        item[output_field] = item[input_field]
+                        del item[input_field]
+                if "copy_from_parent" in input_dataset_info:
+                    parent = parent_data[item["parent_data"]]
+                    for input_field, output_field in input_dataset_info[
+                        "copy_from_parent"
+                    ].items():
+                        item[output_field] = parent[input_field]
+                if project_type == "ModelInteractionEvaluation":
+                    # Number the prompt output pairs of the interaction
+                    for i, interaction in enumerate(item["interactions_json"]):
+                        interaction["prompt_output_pair_id"] = i + 1
+
+                # Remove data id because it's not needed in task.data
+                if "id" in item:
+                    del item["id"]
+                prediction = (
+                    get_sentence_splitting_prediction(item)
+                    if prediction_user is not None
+                    and project_type == "SentenceSplitting"
+                    else None
                 )
-                for input_field, output_field in input_dataset_info[
-                    "copy_from_parent"
-                ].items():
-                    item[output_field] = parent_data[input_field]
-            except dataset_models.DatasetBase.DoesNotExist:
-                raise Exception("Parent data not found")
-        data = dataset_models.DatasetBase.objects.get(pk=data_id)
-
-        # Remove data id because it's not needed in task.data
-        if "id" in item:
-            del item["id"]
-        for _ in range(project.required_annotators_per_task):
-            task = Task(data=item, project_id=project, input_data=data)
-            tasks.append(task)
-    # Bulk create the tasks
-    Task.objects.bulk_create(tasks)
-
-    if (
-        project.metadata_json is not None
-        and "automatic_annotation_creation_mode" in project.metadata_json
-    ):
-        create_automatic_annotations(
-            tasks, project.metadata_json["automatic_annotation_creation_mode"]
-        )
-    if input_dataset_info["prediction"] is not None:
-        user_object = User.objects.get(email="prediction@ai4bharat.org")
-
-        predictions = []
-        prediction_field = input_dataset_info["prediction"]
-        for task, item in zip(tasks, items):
-            if project_type == "SentenceSplitting":
-                item[prediction_field] = [
-                    {
-                        "value": {
-                            "text": [
-                                "\n".join(
-                                    split_sentences(item["text"], item["language"])
-                                )
-                            ]
-                        },
-                        "id": "0",
-                        "from_name": "splitted_text",
-                        "to_name": "text",
-                        "type": "textarea",
-                    }
-                ]
-                prediction = Annotation_model(
-                    result=item[prediction_field], task=task, completed_by=user_object
-                )
-                predictions.append(prediction)
-        Annotation_model.objects.bulk_create(predictions)
-    if project_type == "ModelInteractionEvaluation":
-        for task in tasks:
-            """
-            adding prompt_output_pair_id field to the each object
-            present in the interactions_json field of task's data
-            """
-            interaction_data = task.data["interactions_json"]
-            for i in range(len(interaction_data)):
-                interaction_data[i]["prompt_output_pair_id"] = i + 1
-            task.data["interactions_json"] = interaction_data
-            task.save()
-    if project_type == "MultipleLLMInstructionDrivenChat":
-        llm_sets=project.metadata_json["models_set"]
-        fixed_llms=project.metadata_json["fixed_models"]
-        num_llms=project.metadata_json["num_models"]
-        num_extra_llms = num_llms - len(fixed_llms)
-        rotating_llms = deque([m for m in llm_sets if m not in fixed_llms])
-        for task in tasks:
-            extra_llms = [rotating_llms.popleft() for _ in range(num_extra_llms)]
-            selected_llms = fixed_llms + extra_llms
-            random.shuffle(selected_llms)
-            task.data["model"] = selected_llms
-            task.save()
-            rotating_llms.extend(extra_llms)
-            
-    return tasks
+                for _ in range(project.required_annotators_per_task):
+                    task = Task(
+                        data=dict(item),
+                        project_id=project,
+                        input_data=input_data[data_id],
+                    )
+                    if model_sets is not None:
+                        task.data["model"] = next(model_sets)
+                    tasks.append(task)
+                    if prediction is not None:
+                        predictions.append(
+                            Annotation_model(
+                                result=prediction,
+                                task=task,
+                                completed_by=prediction_user,
+                            )
+                        )
+
+            Task.objects.bulk_create(tasks)
+            increment_created_task_counters(tasks)
+            if automatic_annotation_creation_mode is not None:
+                create_automatic_annotations(tasks, automatic_annotation_creation_mode)
+            Annotation_model.objects.bulk_create(predictions)
+            created += len(tasks)
+    return created
 
 
 def filter_data_items(
-    project_type, dataset_instance_ids, filter_string, ids_to_exclude=None
+    project_type,
+    dataset_instance_ids,
+    filter_string,
+    ids_to_exclude=None,
+    iterator=False,
 ):
     """Function to apply filtering for tasks.
 
@@ -446,6 +353,7 @@ def filter_data_items(
         dataset_instance_ids (int): ID of the dataset that has been provided for the annotation task
         filter_string (str): _description_
         ids_to_exclude(list): List of ids that need to be filtered(excluded) from the result
+        iterator (bool): Return an iterator streaming the items from the database instead of a list
     """
 
     # Load the dataset model from the instance id using the project registry
@@ -471,16 +379,14 @@ def filter_data_items(
         )
     # Get the input dataset fields from the filtered items
     if input_dataset_info["prediction"] is not None:
-        filtered_items = list(
-            filtered_items.values(
-                "id", *input_dataset_info["fields"], input_dataset_info["prediction"]
-            )
+        filtered_items = filtered_items.values(
+            "id", *input_dataset_info["fields"], input_dataset_info["prediction"]
         )
     else:
-        filtered_items = list(
-            filtered_items.values("id", *input_dataset_info["fields"])
-        )
-    return filtered_items
+        filtered_items = filtered_items.values("id", *input_dataset_info["fields"])
+    if iterator:
+        return filtered_items.iterator(chunk_size=TASK_CREATION_CHUNK_SIZE)
+    return list(filtered_items)
 
 
 #### CELERY SHARED TASKS
@@ -510,8 +416,12 @@ def create_parameters_for_task_creation(
         automatic_annotation_creation_mode: Creation mode for tasks
     """
 
+    # Only sampling needs all the items at once, the others are streamed
     filtered_items = filter_data_items(
-        project_type, dataset_instance_ids, filter_string
+        project_type,
+        dataset_instance_ids,
+        filter_string,
+        iterator=sampling_mode not in (RANDOM, BATCH),
     )
 
     # Apply sampling
@@ -543,9 +453,15 @@ def create_parameters_for_task_creation(
     create_tasks_from_dataitems(sampled_items, project)
 
 
-@shared_task
+@shared_task(
+    bind=True,
+    acks_late=True,
+    autoretry_for=(DatabaseError,),
+    retry_backoff=True,
+    max_retries=3,
+)
 def export_project_in_place(
-    annotation_fields, project_id, project_type, get_request_data
+    self, annotation_fields, project_id, project_type, get_request_data
 ) -> None:
     """Function to export the output texts for a task into the dataset instance
 
@@ -565,94 +481,28 @@ def export_project_in_place(
     # Get project object
     project = Project.objects.get(pk=project_id)
 
-    # Get all the accepted tasks for the project
-    if project.project_stage == REVIEW_STAGE:
-        tasks = Task.objects.filter(
-            project_id__exact=project, task_status__in=[REVIEWED]
-        )
-    elif project.project_stage == SUPERCHECK_STAGE:
-        tasks = Task.objects.filter(
-            project_id__exact=project, task_status__in=[SUPER_CHECKED]
-        )
-    else:
-        tasks = Task.objects.filter(
-            project_id__exact=project, task_status__in=[ANNOTATED]
-        )
-
-    data_items = []
-
-    # List for storing tasks fetched with modified data to the task_dict
-    tasks_list = []
-
-    # List for storing the annotated tasks that have been accepted as correct annotation
-    annotated_tasks = []
-    export_excluded_task_ids = []
-    # required_annotators_per_task = project.required_annotators_per_task
-    for task in tasks:
-        task_dict = model_to_dict(task)
-        # Rename keys to match label studio converter
-        # task_dict['id'] = task_dict['task_id']
-        # del task_dict['task_id']
-        ann_list = []
-        # if required_annotators_per_task >= 2:
-        #     all_ann = Annotation.objects.filter(task=task)
-        #     for a in all_ann:
-        #         ann_list.append(a)
-        #     task_dict["annotations"] = ann_list
-        # elif task.correct_annotation is not None:
-        if task.correct_annotation is not None:
-            annotated_tasks.append(task)
-            annotation_dict = model_to_dict(task.correct_annotation)
-            # annotation_dict['result'] = annotation_dict['result_json']
-            # del annotation_dict['result_json']
-            task_dict["annotations"] = [OrderedDict(annotation_dict)]
-
-        del task_dict["annotation_users"]
-        del task_dict["review_user"]
-        tasks_list.append(OrderedDict(task_dict))
-        task.output_data = task.input_data
-        task.save()
-        data_item = dataset_model.objects.get(id__exact=task_dict["input_data"])
-        complete_result = []
-        for i in range(len(task_dict["annotations"])):
-            a = task_dict["annotations"][i]
-            annotation_result = a.result
-            annotation_result = (
-                json.loads(annotation_result)
-                if isinstance(annotation_result, str)
-                else annotation_result
-            )
-            uid = a.completed_by.email
-            try:
-                p_ann = a.parent_annotation.id
-            except Exception as e:
-                p_ann = None
-            single_dict = {
-                "user_id": uid,
-                "annotation_id": a.id,
-                "annotation_result": annotation_result,
-                "annotation_type": a.annotation_type,
-                "annotation_status": a.annotation_status,
-                "parent_annotation": a.parent_annotation,
-                "parent_annotation_id": p_ann,
-            }
-            complete_result.append(single_dict)
-        try:
-            for field in annotation_fields:
-                setattr(data_item, field, complete_result)
-        except Exception as e:
-            export_excluded_task_ids.append(task.id)
-        data_items.append(data_item)
-    dataset_model.objects.bulk_update(data_items, annotation_fields)
-
-    tasks = tasks.exclude(id__in=export_excluded_task_ids)
-    tasks.update(task_status=EXPORTED)
+    # Export the accepted tasks a chunk at a time, resuming a retried export
+    progress = run_export(
+        project,
+        lambda tasks: export_chunk_in_place(tasks, dataset_model, annotation_fields),
+        job_id=self.request.id,
+        progress_callback=lambda progress: self.update_state(
+            state="PROGRESS", meta=progress.as_dict()
+        ),
+    )
 
-    return f"Exported {len(data_items)} items."
+    return f"Exported {progress.exported} items."
 
 
-@shared_task
+@shared_task(
+    bind=True,
+    acks_late=True,
+    autoretry_for=(DatabaseError,),
+    retry_backoff=True,
+    max_retries=3,
+)
 def export_project_new_record(
+    self,
     annotation_fields,
     project_id,
     project_type,
@@ -685,102 +535,24 @@ def export_project_new_record(
     # Get project object
     project = Project.objects.get(pk=project_id)
 
-    # Get all the accepted tasks for the project
-
-    if project.project_stage == REVIEW_STAGE:
-        tasks = Task.objects.filter(
-            project_id__exact=project, task_status__in=[REVIEWED]
-        )
-    elif project.project_stage == SUPERCHECK_STAGE:
-        tasks = Task.objects.filter(
-            project_id__exact=project, task_status__in=[SUPER_CHECKED]
-        )
-    else:
-        tasks = Task.objects.filter(
-            project_id__exact=project, task_status__in=[ANNOTATED]
-        )
-
-    tasks_list = []
-    annotated_tasks = []
-    for task in tasks:
-        task_dict = model_to_dict(task)
-        # Rename keys to match label studio converter
-        # task_dict['id'] = task_dict['task_id']
-        # del task_dict['task_id']
-        annotated_tasks.append(task)
-        del task_dict["annotation_users"]
-        del task_dict["review_user"]
-        tasks_list.append(OrderedDict(task_dict))
-
-    project_type = project.project_type
-
-    for tl, task in zip(tasks_list, annotated_tasks):
-        if task.output_data is not None:
-            data_item = dataset_model.objects.get(id__exact=task.output_data.id)
-
-        else:
-            data_item = dataset_model()
-            data_item.instance_id = export_dataset_instance
-
-        if project_type == "InstructionDrivenChat":
-            extra_data = get_attributes_for_IDC(project, task)
-            tl["data"].update(extra_data)
-            assign_attributes_and_save_dataitem(
-                annotation_fields,
-                task_annotation_fields,
-                data_item,
-                tl["data"],
-                task,
-                project_type,
-            )
-
-        elif project_type == "ModelInteractionEvaluation":
-            item_data_list = get_attributes_for_ModelInteractionEvaluation(task)
-            for item in range(len(item_data_list)):
-                data_item = dataset_model()
-                data_item.instance_id = export_dataset_instance
-                assign_attributes_and_save_dataitem(
-                    annotation_fields,
-                    task_annotation_fields,
-                    data_item,
-                    item_data_list[item],
-                    task,
-                    project_type,
-                )
-
-        else:
-            assign_attributes_and_save_dataitem(
-                annotation_fields,
-                task_annotation_fields,
-                data_item,
-                tl["data"],
-                task,
-                project_type,
-            )
-
-    """
-    download_resources = True
-    tasks_df = DataExport.export_csv_file(
-        project, tasks_list, download_resources, get_request_data
+    # Export the accepted tasks a chunk at a time, resuming a retried export
+    progress = run_export(
+        project,
+        lambda tasks: export_chunk_new_record(
+            project,
+            tasks,
+            dataset_model,
+            export_dataset_instance,
+            annotation_fields,
+            task_annotation_fields,
+        ),
+        job_id=self.request.id,
+        progress_callback=lambda progress: self.update_state(
+            state="PROGRESS", meta=progress.as_dict()
+        ),
     )
-    tasks_annotations = json.loads(tasks_df.to_json(orient="records"))
-    for ta, task in zip(tasks_annotations, annotated_tasks):
-        # data_item = dataset_model.objects.get(id__exact=task.id.id)
-        if task.output_data is not None:
-            data_item = dataset_model.objects.get(id__exact=task.output_data.id)
-        else:
-            data_item = dataset_model()
-            data_item.instance_id = export_dataset_instance
-            data_item.parent_data = task.input_data
-        for field in annotation_fields:
-            setattr(data_item, field, ta[field])
-        for field in task_annotation_fields:
-            setattr(data_item, field, ta[field])
-        data_item.save()
-        task.output_data = data_item
-        task.save()
-    """
-    tasks.update(task_status=EXPORTED)
+
+    return f"Exported {progress.exported} items."
 
 
 @shared_task
@@ -794,6 +566,6 @@ def add_new_data_items_into_project(project_id, items):
 
     # Get project instance
     project = Project.objects.get(pk=project_id)
-    new_tasks = create_tasks_from_dataitems(items, project)
+    created = create_tasks_from_dataitems(items, project)
 
-    return f"Pulled {len(new_tasks)} new data items into project {project.title}"
+    return f"Pulled {created} new data items into project {project.title}"
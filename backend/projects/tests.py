@@ -1,3 +1,180 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from dataset.models import DatasetBase, DatasetInstance, Interaction
+from organizations.models import Organization
+from tasks.models import Task
+from users.models import User
+from utils.cache import redis_is_available
+from utils.custom_bulk_create import multi_inheritance_table_bulk_insert
+from .models import Project
+from .tasks import create_tasks_from_dataitems, filter_data_items
 
 # Create your tests here.
+
+
+class ProjectListingTestcase(APITestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(title="Listing Organization")
+        self.annotator = User.objects.create_user(
+            username="annotator", email="annotator@email.com", password="annotator"
+        )
+        self.annotator.organization = self.organization
+        self.annotator.save()
+        self.reviewer = User.objects.create_user(
+            username="reviewer", email="reviewer@email.com", password="reviewer"
+        )
+        self.reviewer.organization = self.organization
+        self.reviewer.save()
+        self.client.force_authenticate(self.annotator)
+
+    def create_projects(self, count):
+        for i in range(count):
+            project = Project.objects.create(
+                title=f"Listing project {i}",
+                project_type="InstructionDrivenChat",
+                organization_id=self.organization,
+                created_by=self.reviewer,
+                is_published=True,
+            )
+            project.annotators.add(self.annotator, self.reviewer)
+            project.annotation_reviewers.add(self.reviewer)
+
+    def count_list_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("project-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_list_query_count_is_constant(self):
+        """
+        Listing must not run queries per project.
+        """
+        self.create_projects(2)
+        few_queries, response = self.count_list_queries()
+        self.assertEqual(len(response.data), 2)
+
+        self.create_projects(8)
+        many_queries, response = self.count_list_queries()
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(few_queries, many_queries)
+
+        # The membership index of the user is now cached, under its version
+        # kept in redis
+        cached_queries, _ = self.count_list_queries()
+        if redis_is_available():
+            self.assertLess(cached_queries, many_queries)
+        sorted_queries, response = self.count_list_queries(
+            sort_type="most_recent_worked_projects"
+        )
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(cached_queries, sorted_queries)
+
+    def test_membership_change_updates_listing(self):
+        self.create_projects(1)
+        project = Project.objects.create(
+            title="Joined later",
+            project_type="InstructionDrivenChat",
+            organization_id=self.organization,
+            is_published=True,
+        )
+        _, response = self.count_list_queries()
+        self.assertEqual(len(response.data), 1)
+
+        self.annotator.project_users.add(project)
+        _, response = self.count_list_queries()
+        self.assertEqual(len(response.data), 2)
+
+        project.annotators.clear()
+        _, response = self.count_list_queries()
+        self.assertEqual(len(response.data), 1)
+
+
+class TaskCreationTestcase(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(title="Creation Organization")
+        self.dataset = DatasetInstance.objects.create(
+            instance_name="Creation dataset",
+            organisation_id=self.organization,
+            dataset_type="Interaction",
+        )
+
+    def create_interactions(self, count):
+        multi_inheritance_table_bulk_insert(
+            [
+                Interaction(
+                    instance_id=self.dataset,
+                    interactions_json=[
+                        {"prompt": f"prompt {i}", "output": "output"},
+                        {"prompt": "follow up", "output": "output"},
+                    ],
+                    no_of_turns=2,
+                    language="English",
+                    model="model",
+                    time_taken=0,
+                )
+                for i in range(count)
+            ]
+        )
+
+    def create_project(self, project_type, **kwargs):
+        project = Project.objects.create(
+            title="Creation project",
+            project_type=project_type,
+            organization_id=self.organization,
+            **kwargs,
+        )
+        project.dataset_id.add(self.dataset)
+        return project
+
+    def count_creation_queries(self, project, chunk_size):
+        items = filter_data_items(
+            project.project_type, [self.dataset.instance_id], "", iterator=True
+        )
+        with CaptureQueriesContext(connection) as queries:
+            created = create_tasks_from_dataitems(items, project, chunk_size)
+        return created, len(queries)
+
+    def test_queries_grow_with_chunks(self):
+        """
+        Creating tasks must not run queries per item.
+        """
+        self.create_interactions(4)
+        few_created, few_queries = self.count_creation_queries(
+            self.create_project("ModelInteractionEvaluation"), chunk_size=10
+        )
+        self.create_interactions(6)
+        many_created, many_queries = self.count_creation_queries(
+            self.create_project("ModelInteractionEvaluation"), chunk_size=10
+        )
+        self.assertEqual((few_created, many_created), (4, 10))
+        self.assertEqual(few_queries, many_queries)
+
+    def test_prompt_output_pairs_are_numbered(self):
+        self.create_interactions(3)
+        project = self.create_project(
+            "ModelInteractionEvaluation", required_annotators_per_task=2
+        )
+        items = filter_data_items(project.project_type, [self.dataset.instance_id], "")
+        self.assertEqual(create_tasks_from_dataitems(items, project, 2), 6)
+        for task in Task.objects.filter(project_id=project):
+            pair_ids = [
+                pair["prompt_output_pair_id"] for pair in task.data["interactions_json"]
+            ]
+            self.assertEqual(pair_ids, [1, 2])
+            self.assertIn("interaction_id", task.data)
+
+    def test_failed_item_rolls_back_the_created_tasks(self):
+        self.create_interactions(3)
+        project = self.create_project("ModelInteractionEvaluation")
+        items = list(
+            filter_data_items(project.project_type, [self.dataset.instance_id], "")
+        )
+        items.append(dict(items[-1], id=items[-1]["id"] + 1000))
+        with self.assertRaises(DatasetBase.DoesNotExist):
+            create_tasks_from_dataitems(items, project, 2)
+        self.assertFalse(Task.objects.filter(project_id=project).exists())
@@ -4,6 +4,8 @@ from typing import Tuple
 from dateutil.parser import parse as date_parse
 import re
 import nltk
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
 from projects.models import Project
 from rest_framework.response import Response
 from rest_framework import status
@@ -13,17 +15,21 @@ from users.models import User
 from dataset.models import Instruction, Interaction
 from tasks.models import (
     Annotation,
+    ANNOTATOR_ANNOTATION,
     REVIEWER_ANNOTATION,
     SUPER_CHECKER_ANNOTATION,
     ANNOTATED,
+    INCOMPLETE,
+    REVIEWED,
 )
 from tasks.views import SentenceOperationViewSet
 import datetime
 import yaml
 from yaml.loader import SafeLoader
-from jiwer import wer
 
 from utils.convert_result_to_chitralekha_format import create_memory
+from utils.quality_metrics import prompts_text, word_error_rate
+from utils.search import process_search_query
 
 nltk.download("punkt")
 
@@ -194,23 +200,9 @@ def get_audio_segments_count(annotation_result):
 def calculate_word_error_rate_between_two_llm_prompts(
     annotation_result1, annotation_result2
 ):
-    annotation_result1_text = ""
-    annotation_result2_text = ""
-
-    for result in annotation_result1:
-        try:
-            annotation_result1_text += result["prompt"]
-        except:
-            pass
-
-    for result in annotation_result2:
-        try:
-            annotation_result2_text += result["prompt"]
-        except:
-            pass
-    if len(annotation_result1_text) == 0 or len(annotation_result2_text) == 0:
-        return 0
-    return wer(annotation_result1_text, annotation_result2_text)
+    return word_error_rate(
+        prompts_text(annotation_result1), prompts_text(annotation_result2)
+    )
 
 
 def ocr_word_count(annotation_result):
@@ -226,13 +218,15 @@ def ocr_word_count(annotation_result):
     return word_count
 
 
-def get_attributes_for_IDC(project, task):
+def get_attributes_for_IDC(project, task, instruction=None):
     correct_ann_obj = task.correct_annotation
+    if instruction is None:
+        instruction = Instruction.objects.get(id=task.data["instruction_id"])
     result_dict = {
         "interactions_json": correct_ann_obj.result,
         "language": project.tgt_language,
         "datetime": correct_ann_obj.annotated_at,
-        "instruction_id": Instruction.objects.get(id=task.data["instruction_id"]),
+        "instruction_id": instruction,
         "time_taken": 0.0,
     }
     if correct_ann_obj.meta_stats and "number_of_turns" in correct_ann_obj.meta_stats:
@@ -247,12 +241,11 @@ def get_prompt_output_by_id(prompt_output_pair_id, task_data_dict):
     return None, None
 
 
-def get_attributes_for_ModelInteractionEvaluation(task):
+def get_attributes_for_ModelInteractionEvaluation(task, interaction=None):
     res = []
     if task.correct_annotation:
         correct_ann_obj = task.correct_annotation
         annotation_result_json = correct_ann_obj.result
-        interaction = Interaction.objects.get(id=task.data["interaction_id"])
     else:
         annotation_result_json = Annotation.objects.filter(task=task)[0].result
         annotation_result_json = (
@@ -260,6 +253,7 @@ def get_attributes_for_ModelInteractionEvaluation(task):
             if isinstance(annotation_result_json, str)
             else annotation_result_json
         )
+    if interaction is None:
         interaction = Interaction.objects.get(id=task.data["interaction_id"])
     for a in annotation_result_json:
         try:
@@ -620,3 +614,108 @@ def validate_metadata_json_format(data):
                 return False, "input_selections_list must be a list of strings."
 
     return True, "JSON format is valid."
+
+
+# Searchable task data fields are derived from the task data of a project,
+# which does not change shape once the tasks are created.
+TASK_SEARCH_FIELDS_CACHE_TTL = 60 * 60
+
+NEXT_TASK_ANNOTATION_TYPES = {
+    "annotation": ANNOTATOR_ANNOTATION,
+    "review": REVIEWER_ANNOTATION,
+    "supercheck": SUPER_CHECKER_ANNOTATION,
+}
+
+NEXT_TASK_DEFAULT_STATUS = {
+    "annotation": INCOMPLETE,
+    "review": ANNOTATED,
+    "supercheck": REVIEWED,
+}
+
+
+def get_searchable_task_fields(project_id):
+    """
+    Returns the keys of the task data for a project, cached per project.
+    """
+    cache_key = f"project_{project_id}_task_search_fields"
+    searchable_fields = cache.get(cache_key)
+    if searchable_fields is None:
+        task_data = (
+            Task.objects.filter(project_id=project_id)
+            .order_by("id")
+            .values_list("data", flat=True)
+            .first()
+        )
+        if not task_data:
+            return []
+        searchable_fields = list(task_data.keys())
+        cache.set(cache_key, searchable_fields, TASK_SEARCH_FIELDS_CACHE_TTL)
+    return searchable_fields
+
+
+def is_project_member(project_id, user_id):
+    """
+    Checks if the user is an annotator, reviewer or superchecker of the project
+    using EXISTS subqueries on the membership tables.
+    """
+    membership = None
+    for through_model in (
+        Project.annotators.through,
+        Project.annotation_reviewers.through,
+        Project.review_supercheckers.through,
+    ):
+        is_member = Exists(
+            through_model.objects.filter(project_id=OuterRef("pk"), user_id=user_id)
+        )
+        membership = is_member if membership is None else membership | is_member
+    return Project.objects.filter(pk=project_id).filter(membership).exists()
+
+
+def get_next_task(
+    project_id,
+    user,
+    mode,
+    search_params,
+    current_task_id=None,
+    task_status=None,
+    annotation_status=None,
+):
+    """
+    Resolves the next task for the user (annotation, review or supercheck mode)
+    with a single keyset query on the task id.
+    """
+    if mode not in NEXT_TASK_ANNOTATION_TYPES:
+        mode = "supercheck"
+    is_member = is_project_member(project_id, user.id)
+
+    tasks = Task.objects.filter(project_id=project_id)
+    if annotation_status is not None:
+        annotations = Annotation_model.objects.filter(
+            task_id=OuterRef("pk"),
+            annotation_status=annotation_status,
+            annotation_type=NEXT_TASK_ANNOTATION_TYPES[mode],
+        )
+        if is_member:
+            annotations = annotations.filter(completed_by=user.id)
+        tasks = tasks.filter(Exists(annotations))
+    else:
+        if task_status is None:
+            task_status = NEXT_TASK_DEFAULT_STATUS[mode]
+            is_member = is_member and not user.is_superuser
+        tasks = tasks.filter(task_status=task_status)
+        if is_member:
+            if mode == "annotation":
+                tasks = tasks.filter(annotation_users=user.id)
+            elif mode == "review":
+                tasks = tasks.filter(review_user=user.id)
+            else:
+                tasks = tasks.filter(super_check_user=user.id)
+
+    searchable_fields = get_searchable_task_fields(project_id)
+    if searchable_fields:
+        tasks = tasks.filter(
+            **process_search_query(search_params, "data", searchable_fields)
+        )
+    if current_task_id is not None:
+        tasks = tasks.filter(id__gt=current_task_id)
+    return tasks.order_by("id").first()
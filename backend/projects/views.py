@@ -18,8 +18,16 @@ from users.models import LANG_CHOICES
 from users.serializers import UserEmailSerializer
 from users.models import *
 from dataset.serializers import TaskResultSerializer, DatasetInstanceSerializer
+from utils.db_routing import replica_reads
 from utils.search import process_search_query
 from django_celery_results.models import TaskResult
+from functions.jobs import get_job_date_time, get_job_task_ids, get_latest_job
+from functions.models import (
+    PROJECT_ENTITY,
+    EXPORT_JOB,
+    PULL_JOB,
+    TASK_CREATION_JOB,
+)
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from users.models import User
@@ -34,9 +42,21 @@ from projects.serializers import (
 from tasks.models import Annotation as Annotation_model
 from tasks.models import *
 from tasks.models import Task
+from tasks.counters import get_project_counters, rebuild_project_counters
 from tasks.serializers import TaskSerializer
 from .models import *
 from .registry_helper import ProjectRegistry
+from .export import EXPORT_FORMATS, iter_download_rows, streaming_export_response
+from .listing import (
+    get_visible_projects,
+    order_by_most_recent_work,
+    prefetch_project_members,
+)
+from .task_allocation import (
+    claim_annotation_tasks,
+    claim_review_tasks,
+    claim_supercheck_tasks,
+)
 from dataset import models as dataset_models
 import notifications
 
@@ -50,6 +70,7 @@ from .utils import (
     filter_tasks_for_review_filter_criteria,
     add_extra_task_data,
     validate_metadata_json_format,
+    get_next_task,
 )
 
 from dataset.models import DatasetInstance, ACTIVE_LLM_MODELS
@@ -61,8 +82,6 @@ from .tasks import (
     export_project_in_place,
     export_project_new_record,
     filter_data_items,
-    prompt_data_annotation,
-    prompt_data_annotation_InstructionDrivenChat,
 )
 
 from .decorators import (
@@ -708,32 +727,6 @@ def get_supercheck_reports(proj_id, userid, start_date, end_date):
     return result
 
 
-def extract_latest_status_date_time_from_taskresult_queryset(taskresult_queryset):
-    """Function to extract the latest status and date time from the celery task results.
-
-    Args:
-        taskresult_queryset (Django Queryset): Celery task results queryset
-
-    Returns:
-        str: Complettion state of the latest celery task
-        str: Complettion date of the latest celery task
-        str: Complettion time of the latest celery task
-    """
-
-    # Sort the tasks by newest items first by date
-    taskresult_queryset = taskresult_queryset.order_by("-date_done")
-
-    # Get the export task status and last update date
-    task_status = taskresult_queryset.first().as_dict()["status"]
-    task_datetime = taskresult_queryset.first().as_dict()["date_done"]
-
-    # Extract date and time from the datetime object
-    task_date = task_datetime.date()
-    task_time = f"{str(task_datetime.time().replace(microsecond=0))} UTC"
-
-    return task_status, task_date, task_time
-
-
 def get_project_pull_status(pk):
     """Function to return status of the last pull data items task.
 
@@ -745,32 +738,16 @@ def get_project_pull_status(pk):
         str: Date when the last time project was exported
     """
 
-    # Create the keyword argument for project ID
-    project_id_keyword_arg = "'project_id': " + "'" + str(pk) + "'"
-
-    # Check the celery project export status
-    taskresult_queryset = TaskResult.objects.filter(
-        task_name="projects.tasks.add_new_data_items_into_project",
-        task_kwargs__contains=project_id_keyword_arg,
-    )
-
-    # If the celery TaskResults table returns
-    if taskresult_queryset:
-        # Sort the tasks by newest items first by date
-        taskresult_queryset = taskresult_queryset.order_by("-date_done")
-
-        # Get the export task status and last update date
-        task_status = taskresult_queryset.first().as_dict()["status"]
-        task_datetime = taskresult_queryset.first().as_dict()["date_done"]
-        task_result = taskresult_queryset.first().as_dict()["result"]
+    # Get the latest pull job of the project
+    job = get_latest_job(PROJECT_ENTITY, pk, [PULL_JOB])
 
+    if job is not None:
+        task_date, task_time = get_job_date_time(job)
+        task_result = job.result if job.result is not None else "No result."
         if '"' in task_result:
             task_result = task_result.strip('"')
-        # Extract date and time from the datetime object
-        task_date = task_datetime.date()
-        task_time = f"{str(task_datetime.time().replace(microsecond=0))} UTC"
 
-        return task_status, task_date, task_time, task_result
+        return job.status, task_date, task_time, task_result
     return (
         "Success",
         "Synchronously Completed. No Date.",
@@ -790,23 +767,12 @@ def get_project_export_status(pk):
         str: Date when the last time project was exported
     """
 
-    # Create the keyword argument for project ID
-    project_id_keyword_arg = "'project_id': " + "'" + str(pk) + "'" + ","
-
-    # Check the celery project export status
-    taskresult_queryset = TaskResult.objects.filter(
-        task_name__in=[
-            "projects.tasks.export_project_in_place",
-            "projects.tasks.export_project_new_record",
-        ],
-        task_kwargs__contains=project_id_keyword_arg,
-    )
+    # Get the latest export job of the project
+    job = get_latest_job(PROJECT_ENTITY, pk, [EXPORT_JOB])
 
-    # If the celery TaskResults table returns
-    if taskresult_queryset:
-        return extract_latest_status_date_time_from_taskresult_queryset(
-            taskresult_queryset
-        )
+    if job is not None:
+        task_date, task_time = get_job_date_time(job)
+        return job.status, task_date, task_time
     return (
         "Success",
         "Synchronously Completed. No Date.",
@@ -821,12 +787,8 @@ def get_task_creation_status(pk) -> str:
     Returns:
         str: Task Status
     """
-    # Check the celery task creation status
-    project_id_keyword_arg = "'project_id': " + str(pk)
-    taskresult_queryset = TaskResult.objects.filter(
-        task_name="projects.tasks.create_parameters_for_task_creation",
-        task_kwargs__contains=project_id_keyword_arg,
-    )
+    # Get the latest task creation job of the project
+    job = get_latest_job(PROJECT_ENTITY, pk, [TASK_CREATION_JOB])
     task_creation_status_modified = {
         "PENDING": "Task Creation Process Pending",
         "RECEIVED": "Task Creation Process Received",
@@ -836,10 +798,8 @@ def get_task_creation_status(pk) -> str:
         "RETRY": "Task Creation Process Retried",
         "REVOKED": "Task Creation Process Revoked",
     }
-    # If the celery TaskResults table returns
-    if taskresult_queryset:
-        task_creation_status = taskresult_queryset.first().as_dict()["status"]
-        return task_creation_status_modified[task_creation_status]
+    if job is not None:
+        return task_creation_status_modified[job.status]
     return ""
 
 
@@ -868,11 +828,8 @@ def get_task_count_unassigned(pk, user):
     project = Project.objects.get(pk=pk)
     required_annotators_per_task = project.required_annotators_per_task
     if required_annotators_per_task==1:
-        proj_tasks = Task.objects.filter(project_id=pk).exclude(annotation_users=user)
-        proj_tasks_unassigned = (
-            proj_tasks.annotate(num_annotators=Count("annotation_users"))
-        ).filter(num_annotators__lt=required_annotators_per_task)
-        return len(proj_tasks_unassigned)
+        # The tasks without annotators, none of which can be the user's
+        return get_project_counters(pk).get(UNASSIGNED_COUNTER, 0)
     
     if user.role==User.ADMIN:
         assigned_task_ids = Annotation_model.objects.filter(
@@ -940,8 +897,9 @@ def get_task_count_unassigned(pk, user):
         ).order_by("id")  
 
         # unique unassigned data items (as in the new design each annotator is given a seperate task of the same data item)
-        data_items_vs_tasks_map = {t.input_data.id: t for t in tasks}
-        data_items_of_unassigned_tasks = set(data_items_vs_tasks_map.keys())
+        data_items_of_unassigned_tasks = set(
+            tasks.values_list("input_data_id", flat=True)
+        )
 
         #  Identify assigned data items
         data_items_of_assigned_tasks = set(
@@ -959,9 +917,8 @@ def get_task_count_unassigned(pk, user):
 
         # Find unassigned data items that can still be assigned
         all_unassigned_data_items = data_items_of_unassigned_tasks - data_items_of_assigned_tasks
-        tasks = [data_items_vs_tasks_map[task_id] for task_id in all_unassigned_data_items]
-        assignable_tasks = tasks[:max_task_that_can_be_assigned] if max_task_that_can_be_assigned else tasks[:tasks_to_be_assigned]
-        return len(assignable_tasks)
+        limit = max_task_that_can_be_assigned or tasks_to_be_assigned
+        return max(min(len(all_unassigned_data_items), limit), 0)
 
 
 
@@ -1021,6 +978,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
             pk, request.user
         )
         project = Project.objects.get(id=pk)
+        counters = get_project_counters(pk)
         try:
             allow_unireview = project.metadata_json["allow_unireview"]
         except:
@@ -1042,21 +1000,27 @@ class ProjectViewSet(viewsets.ModelViewSet):
             )
             project_response.data["labeled_task_count"] = tasks
         else:
-            project_response.data["labeled_task_count"] = (
-                Task.objects.filter(project_id=pk)
+            # The tasks awaiting review, less those the user annotated
+            project_response.data["labeled_task_count"] = counters.get(
+                AWAITING_REVIEW_COUNTER, 0
+            ) - (
+                Task.objects.filter(project_id=pk, annotation_users=request.user.id)
                 .filter(task_status=ANNOTATED)
                 .filter(review_user__isnull=True)
-                .exclude(annotation_users=request.user.id)
                 .count()
             )
 
         # Add a field to specify the no. of reviewed tasks
-        project_response.data["reviewed_task_count"] = (
+        project_response.data["reviewed_task_count"] = counters.get(
+            AWAITING_SUPERCHECK_COUNTER, 0
+        ) - (
             Task.objects.filter(project_id=pk)
             .filter(task_status=REVIEWED)
             .filter(super_check_user__isnull=True)
-            .exclude(annotation_users=request.user.id)
-            .exclude(review_user=request.user.id)
+            .filter(
+                Q(annotation_users=request.user.id) | Q(review_user=request.user.id)
+            )
+            .distinct()
             .count()
         )
 
@@ -1067,68 +1031,18 @@ class ProjectViewSet(viewsets.ModelViewSet):
         List all Projects
         """
         try:
-            # projects = self.queryset.filter(annotators=request.user)
-            if request.user.is_superuser:
-                projects = self.queryset
-            elif request.user.role == User.ORGANIZATION_OWNER:
-                projects = self.queryset.filter(
-                    organization_id=request.user.organization
-                )
-            elif request.user.role == User.WORKSPACE_MANAGER:
-                projects = (
-                    self.queryset.filter(
-                        workspace_id__in=Workspace.objects.filter(
-                            managers=request.user
-                        ).values_list("id", flat=True)
-                    )
-                    | self.queryset.filter(annotators=request.user)
-                    | self.queryset.filter(annotation_reviewers=request.user)
-                )
-            elif request.user.role == User.SUPER_CHECKER:
-                projects = (
-                    self.queryset.filter(annotators=request.user)
-                    | self.queryset.filter(annotation_reviewers=request.user)
-                    | self.queryset.filter(review_supercheckers=request.user)
-                )
-            elif request.user.role == User.REVIEWER:
-                projects = self.queryset.filter(
-                    annotators=request.user
-                ) | self.queryset.filter(annotation_reviewers=request.user)
-            elif request.user.role == User.ANNOTATOR:
-                projects = self.queryset.filter(annotators=request.user)
-
+            projects = get_visible_projects(self.queryset, request.user)
             projects = projects.filter(is_published=True).filter(is_archived=False)
 
-            projects = projects.distinct()
-
             if (
                 "sort_type" in request.query_params
                 and request.query_params["sort_type"] == "most_recent_worked_projects"
             ):
-                annotations = Annotation_model.objects.filter(completed_by=request.user)
-                annotations = annotations.order_by("-updated_at")
-                project_ids = []
-                project_ids_set = set()
-                for annotation in annotations:
-                    project_id = annotation.task.project_id.id
-                    if project_id not in project_ids_set:
-                        project_ids.append(project_id)
-                        project_ids_set.add(project_id)
-                unannotated_projects = projects.exclude(pk__in=project_ids)
-                unannotated_projects = unannotated_projects.order_by(
-                    F("published_at").desc(nulls_last=True)
-                )
-                for project in unannotated_projects:
-                    project_ids.append(project.id)
-                preserved = Case(
-                    *[When(pk=pk, then=pos) for pos, pk in enumerate(project_ids)]
-                )
-                projects = Project.objects.filter(pk__in=project_ids).order_by(
-                    preserved
-                )
+                projects = order_by_most_recent_work(projects, request.user)
             else:
                 projects = projects.order_by(F("published_at").desc(nulls_last=True))
 
+            projects = prefetch_project_members(projects)
             projects_json = self.serializer_class(projects, many=True)
             return Response(projects_json.data, status=status.HTTP_200_OK)
         except Exception:
@@ -1252,37 +1166,12 @@ class ProjectViewSet(viewsets.ModelViewSet):
         List all projects with some optimizations.
         """
         try:
-            projects = self.queryset.filter(annotators=request.user)
-            if request.user.is_superuser:
-                projects = self.queryset
-            elif request.user.role == User.ORGANIZATION_OWNER:
-                projects = self.queryset.filter(
-                    organization_id=request.user.organization
-                )
-            elif request.user.role == User.WORKSPACE_MANAGER:
-                projects = (
-                    self.queryset.filter(
-                        workspace_id__in=Workspace.objects.filter(
-                            managers=request.user
-                        ).values_list("id", flat=True)
-                    )
-                    | self.queryset.filter(annotators=request.user)
-                    | self.queryset.filter(annotation_reviewers=request.user)
-                )
-            elif request.user.role == User.SUPER_CHECKER:
-                projects = (
-                    self.queryset.filter(annotators=request.user)
-                    | self.queryset.filter(annotation_reviewers=request.user)
-                    | self.queryset.filter(review_supercheckers=request.user)
-                )
-                projects = projects.filter(is_published=True).filter(is_archived=False)
-            elif request.user.role == User.REVIEWER:
-                projects = self.queryset.filter(
-                    annotators=request.user
-                ) | self.queryset.filter(annotation_reviewers=request.user)
-                projects = projects.filter(is_published=True).filter(is_archived=False)
-            elif request.user.role == User.ANNOTATOR:
-                projects = self.queryset.filter(annotators=request.user)
+            projects = get_visible_projects(self.queryset, request.user)
+            if request.user.role in (
+                User.SUPER_CHECKER,
+                User.REVIEWER,
+                User.ANNOTATOR,
+            ) and not request.user.is_superuser:
                 projects = projects.filter(is_published=True).filter(is_archived=False)
             if "guest_view" in request.query_params:
                 projects = (
@@ -1328,30 +1217,11 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 "sort_type" in request.query_params
                 and request.query_params["sort_type"] == "most_recent_worked_projects"
             ):
-                annotations = Annotation_model.objects.filter(completed_by=request.user)
-                annotations = annotations.order_by("-updated_at")
-                project_ids = []
-                project_ids_set = set()
-                for annotation in annotations:
-                    project_id = annotation.task.project_id.id
-                    if project_id not in project_ids_set:
-                        project_ids.append(project_id)
-                        project_ids_set.add(project_id)
-                unannotated_projects = projects.exclude(pk__in=project_ids)
-                unannotated_projects = unannotated_projects.order_by(
-                    F("published_at").desc(nulls_last=True)
-                )
-                for project in unannotated_projects:
-                    project_ids.append(project.id)
-                preserved = Case(
-                    *[When(pk=pk, then=pos) for pos, pk in enumerate(project_ids)]
-                )
-                projects = Project.objects.filter(pk__in=project_ids).order_by(
-                    preserved
-                )
+                projects = order_by_most_recent_work(projects, request.user)
             else:
                 projects = projects.order_by(F("published_at").desc(nulls_last=True))
 
+            projects = projects.select_related("created_by__organization__created_by")
             if "guest_view" in request.query_params:
                 included_projects = projects.filter(annotators=request.user)
                 excluded_projects = projects.exclude(annotators=request.user)
@@ -1440,6 +1310,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     }
                     task.save()
                 tasks.update(task_status="incomplete")  # unassign user from tasks
+                rebuild_project_counters([project.id])
                 # project.annotators.remove(user)
                 if freeze_user == True:
                     project.frozen_users.add(user)
@@ -1726,212 +1597,24 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 }
                 return Response(resp_dict, status=status.HTTP_403_FORBIDDEN)
 
-        if annotation_status != None:
-            if (
-                request.user in project.annotation_reviewers.all()
-                or request.user in project.annotators.all()
-                or request.user in project.review_supercheckers.all()
-            ):
-                if mode == "review":
-                    annotations = Annotation_model.objects.filter(
-                        task__project_id=pk,
-                        annotation_status=annotation_status,
-                        annotation_type=REVIEWER_ANNOTATION,
-                        completed_by=request.user.id,
-                    )
-                elif mode == "annotation":
-                    annotations = Annotation_model.objects.filter(
-                        task__project_id=pk,
-                        annotation_status=annotation_status,
-                        annotation_type=ANNOTATOR_ANNOTATION,
-                        completed_by=request.user.id,
-                    )
-                else:
-                    annotations = Annotation_model.objects.filter(
-                        task__project_id=pk,
-                        annotation_status=annotation_status,
-                        annotation_type=SUPER_CHECKER_ANNOTATION,
-                        completed_by=request.user.id,
-                    )
-            else:
-                if mode == "review":
-                    annotations = Annotation_model.objects.filter(
-                        task__project_id=pk,
-                        annotation_status=annotation_status,
-                        annotation_type=REVIEWER_ANNOTATION,
-                    )
-                elif mode == "annotation":
-                    annotations = Annotation_model.objects.filter(
-                        task__project_id=pk,
-                        annotation_status=annotation_status,
-                        annotation_type=ANNOTATOR_ANNOTATION,
-                    )
-                else:
-                    annotations = Annotation_model.objects.filter(
-                        task__project_id=pk,
-                        annotation_status=annotation_status,
-                        annotation_type=SUPER_CHECKER_ANNOTATION,
-                    )
-
-            tasks = Task.objects.filter(annotations__in=annotations)
-            tasks = tasks.distinct()
-            if len(tasks):
-                tasks = tasks.filter(
-                    **process_search_query(
-                        request.GET, "data", list(tasks.first().data.keys())
-                    )
-                )
-            ann_filter1 = annotations.filter(task__in=tasks)
-            task_ids = [an.task_id for an in ann_filter1]
-
-            queryset = Task.objects.filter(id__in=task_ids).order_by("id")
-            # required_annotators_per_task = project.required_annotators_per_task
-            # next_anno = ""
-            # if required_annotators_per_task > 1:
-            #     try:
-            #         curr_anno_id = int(request.data.get("current_annotation_id"))
-            #     except Exception as e:
-            #         ret_dict = {"message": "Please send the current_annotation_id"}
-            #         ret_status = status.HTTP_400_BAD_REQUEST
-            #         return Response(ret_dict, status=ret_status)
-            #     for task in queryset:
-            #         curr_task_anno = ann_filter1.filter(task=task).order_by("id")
-            #         ann_ids = [an.id for an in curr_task_anno]
-            #         if curr_anno_id != ann_ids[-1]:
-            #             for i, c in enumerate(ann_ids):
-            #                 if c == curr_anno_id:
-            #                     next_anno = ann_ids[i + 1]
-            # if next_anno:
-            #     queryset = queryset.filter(id=current_task_id)
-            # elif current_task_id != None:
-            if current_task_id != None:
-                queryset = queryset.filter(id__gt=current_task_id)
-            for task in queryset:
-                # if next_anno:
-                #     task_dict = TaskSerializer(task, many=False).data
-                #     task_dict["correct_annotation"] = next_anno
-                #     return Response(task_dict)
-                # elif required_annotators_per_task > 1:
-                #     next_anno = ann_filter1.filter(task=task).order_by("id")
-                #     task_dict = TaskSerializer(task, many=False).data
-                #     task_dict["correct_annotation"] = next_anno[0].id
-                #     return Response(task_dict)
-                task_dict = TaskSerializer(task, many=False).data
-                return Response(task_dict)
-            ret_dict = {"message": "No more tasks available!"}
-            ret_status = status.HTTP_204_NO_CONTENT
-            return Response(ret_dict, status=ret_status)
-        # Check if task_status is passed
-        if task_status != None:
-            if (
-                request.user in project.annotation_reviewers.all()
-                or request.user in project.annotators.all()
-                or request.user in project.review_supercheckers.all()
-            ):
-                if mode == "review":
-                    tasks = Task.objects.filter(
-                        project_id__exact=project.id,
-                        review_user=request.user.id,
-                        task_status=task_status,
-                    )
-                elif mode == "annotation":
-                    tasks = Task.objects.filter(
-                        project_id__exact=project.id,
-                        annotation_users=request.user.id,
-                        task_status=task_status,
-                    )
-                else:
-                    tasks = Task.objects.filter(
-                        project_id__exact=project.id,
-                        super_check_user=request.user.id,
-                        task_status=task_status,
-                    )
-            else:
-                tasks = Task.objects.filter(
-                    project_id__exact=project.id,
-                    task_status=task_status,
-                )
-
-            if len(tasks):
-                tasks = tasks.filter(
-                    **process_search_query(
-                        request.GET, "data", list(tasks.first().data.keys())
-                    )
-                )
-
-            queryset = tasks.order_by("id")
-
-            if current_task_id != None:
-                queryset = queryset.filter(id__gt=current_task_id)
-            for task in queryset:
-                task_dict = TaskSerializer(task, many=False).data
-                return Response(task_dict)
+        task = get_next_task(
+            project.id,
+            request.user,
+            mode,
+            request.GET,
+            current_task_id=current_task_id,
+            task_status=task_status,
+            annotation_status=annotation_status,
+        )
+        if task is not None:
+            task_dict = TaskSerializer(task, many=False).data
+            return Response(task_dict)
+        if annotation_status != None or task_status != None:
             ret_dict = {"message": "No more tasks available!"}
-            ret_status = status.HTTP_204_NO_CONTENT
-            return Response(ret_dict, status=ret_status)
-
         else:
-            # Check if there are unattended tasks
-            if (
-                request.user in project.annotation_reviewers.all()
-                or request.user in project.annotators.all()
-                or request.user in project.review_supercheckers.all()
-            ) and not request.user.is_superuser:
-                # Filter Tasks based on whether the request is in review mode or not
-                if mode == "review":
-                    tasks = Task.objects.filter(
-                        project_id__exact=project.id,
-                        review_user=request.user.id,
-                        task_status=ANNOTATED,
-                    )
-                elif mode == "annotation":
-                    tasks = Task.objects.filter(
-                        project_id__exact=project.id,
-                        annotation_users=request.user.id,
-                        task_status=INCOMPLETE,
-                    )
-                else:
-                    tasks = Task.objects.filter(
-                        project_id__exact=project.id,
-                        super_check_user=request.user.id,
-                        task_status=REVIEWED,
-                    )
-            else:
-                # TODO : Refactor code to reduce DB calls
-                # Filter Tasks based on whether the request is in review mode or not
-                if mode == "review":
-                    tasks = Task.objects.filter(
-                        project_id__exact=project.id,
-                        task_status=ANNOTATED,
-                    )
-                elif mode == "annotation":
-                    tasks = Task.objects.filter(
-                        project_id__exact=project.id,
-                        task_status=INCOMPLETE,
-                    )
-                else:
-                    tasks = Task.objects.filter(
-                        project_id__exact=project.id,
-                        task_status=REVIEWED,
-                    )
-
-            if len(tasks):
-                tasks = tasks.filter(
-                    **process_search_query(
-                        request.GET, "data", list(tasks.first().data.keys())
-                    )
-                )
-
-            unattended_tasks = tasks.order_by("id")
-
-            if current_task_id != None:
-                unattended_tasks = unattended_tasks.filter(id__gt=current_task_id)
-            for task in unattended_tasks:
-                task_dict = TaskSerializer(task, many=False).data
-                return Response(task_dict)
             ret_dict = {"message": "No more unlabeled tasks!"}
-            ret_status = status.HTTP_204_NO_CONTENT
-            return Response(ret_dict, status=ret_status)
+        ret_status = status.HTTP_204_NO_CONTENT
+        return Response(ret_dict, status=ret_status)
 
     @is_organization_owner_or_workspace_manager
     def create(self, request, *args, **kwargs):
@@ -2448,12 +2131,11 @@ class ProjectViewSet(viewsets.ModelViewSet):
         proj_annotations = Annotation_model.objects.filter(task__project_id=pk).filter(
             annotation_status__exact=UNLABELED, completed_by=cur_user
         )
-        annotation_tasks = [anno.task.id for anno in proj_annotations]
         pending_tasks = (
             Task.objects.filter(project_id=pk)
             .filter(annotation_users=cur_user.id)
             .filter(task_status__in=[INCOMPLETE, UNLABELED])
-            .filter(id__in=annotation_tasks)
+            .filter(id__in=proj_annotations.values("task_id"))
             .count()
         )
         # assigned_tasks_queryset = Task.objects.filter(project_id=pk).filter(annotation_users=cur_user.id)
@@ -2471,56 +2153,6 @@ class ProjectViewSet(viewsets.ModelViewSet):
             task_pull_count = request.data["num_tasks"]
             tasks_to_be_assigned = min(tasks_to_be_assigned, task_pull_count)
 
-        lock_set = False
-        while lock_set == False:
-            if project.is_locked(ANNOTATION_LOCK):
-                sleep(settings.PROJECT_LOCK_RETRY_INTERVAL)
-                continue
-            else:
-                try:
-                    project.set_lock(cur_user, ANNOTATION_LOCK)
-                    lock_set = True
-                except Exception as e:
-                    continue
-        # check if the project contains eligible tasks to pull
-        tasks = Task.objects.filter(project_id=pk)
-        if project.required_annotators_per_task > 1:
-            similar_task_count = (
-                Task.objects
-                .filter(
-                    project_id=OuterRef('project_id'),
-                    input_data=OuterRef('input_data'),
-                    task_status=ANNOTATED,
-                )
-                .exclude(id=OuterRef('id'))
-                .values('input_data')
-                .annotate(count=Count('id'))
-                .values('count')[:1]  # Get the count (or null if none)
-            )
-
-            tasks = (
-                Task.objects
-                .filter(project_id=pk)
-                .annotate(similar_annotated_count=Subquery(similar_task_count, output_field=IntegerField()))
-                .order_by('-similar_annotated_count')
-            )
-        else:
-            tasks = tasks.order_by("id")
-        tasks = (
-            tasks.filter(task_status__in=[INCOMPLETE])
-            .exclude(annotation_users=cur_user.id)
-            .annotate(annotator_count=Count("annotation_users"))
-        )
-        tasks = tasks.filter(
-            annotator_count__lt=project.required_annotators_per_task
-        ).distinct()
-        if not tasks:
-            project.release_lock(ANNOTATION_LOCK)
-            return Response(
-                {"message": "No tasks left for assignment in this project"},
-                status=status.HTTP_404_NOT_FOUND,
-            )
-        max_task_that_can_be_assigned = 0
         if project.max_tasks_per_user != -1:
             tasks_assigned_to_user = (
                 Task.objects.filter(project_id=pk)
@@ -2534,84 +2166,18 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     },
                     status=status.HTTP_200_OK,
                 )
-            else:
-                max_task_that_can_be_assigned = min(
-                    project.max_tasks_per_user - tasks_assigned_to_user,
-                    tasks_to_be_assigned,
-                )
-        proj_annotations_annotated = Annotation_model.objects.filter(
-            task__project_id=pk
-        ).filter(
-            annotation_status__in=[UNLABELED, SKIPPED, DRAFT, LABELED, TO_BE_REVISED],
-            completed_by=cur_user,
-            annotation_type=1,
-        )
-        (
-            data_items_of_unassigned_tasks,
-            data_items_of_assigned_tasks,
-            data_items_vs_tasks_map,
-        ) = (set(), set(), {})
-        for t in tasks:
-            if not t.annotation_users.all():
-                data_items_vs_tasks_map[t.input_data.id] = t
-                data_items_of_unassigned_tasks.add(t.input_data.id)
-        for anno in proj_annotations:
-            data_items_of_assigned_tasks.add(anno.task.input_data.id)
-        for anno_ann in proj_annotations_annotated:
-            data_items_of_assigned_tasks.add(anno_ann.task.input_data.id)
-        all_unassigned_data_items = (
-            data_items_of_unassigned_tasks - data_items_of_assigned_tasks
+            tasks_to_be_assigned = min(
+                project.max_tasks_per_user - tasks_assigned_to_user,
+                tasks_to_be_assigned,
+            )
+        assigned_task_ids = claim_annotation_tasks(
+            project, cur_user, tasks_to_be_assigned
         )
-        tasks = [data_items_vs_tasks_map[audt] for audt in all_unassigned_data_items]
-        if max_task_that_can_be_assigned:
-            tasks = tasks[:max_task_that_can_be_assigned]
-        else:
-            tasks = tasks[:tasks_to_be_assigned]
-        if not tasks:
-            project.release_lock(ANNOTATION_LOCK)
+        if not assigned_task_ids:
             return Response(
                 {"message": "No tasks left for assignment in this project"},
                 status=status.HTTP_404_NOT_FOUND,
             )
-        for task in tasks:
-            task.annotation_users.add(cur_user)
-            if project.project_type == "InstructionDrivenChat":
-                if task.data and "model" in task.data and task.data["model"] not in ACTIVE_LLM_MODELS:
-                    task.data["model"] = ACTIVE_LLM_MODELS[0]
-            task.save()
-            result = []
-            annotator_anno_count = Annotation_model.objects.filter(
-                task_id=task, annotation_type=ANNOTATOR_ANNOTATION
-            ).count()
-            if annotator_anno_count == 0:
-                cur_user_anno_count = Annotation_model.objects.filter(
-                    task_id=task,
-                    annotation_type=ANNOTATOR_ANNOTATION,
-                    completed_by=cur_user,
-                ).count()
-                if cur_user_anno_count == 0:
-                    base_annotation_obj = Annotation_model(
-                        result=result,
-                        task=task,
-                        completed_by=cur_user,
-                    )
-                    try:
-                        base_annotation_obj.save()
-                    except IntegrityError as e:
-                        print(
-                            f"Task, completed_by and parent_annotation fields are same while assigning new review task "
-                            f"for project id-{project.id}, user-{cur_user.email}"
-                        )
-            else:
-                cur_user_anno_count = Annotation_model.objects.filter(
-                    task_id=task,
-                    annotation_type=ANNOTATOR_ANNOTATION,
-                    completed_by=cur_user,
-                ).count()
-                if cur_user_anno_count == 0:
-                    task.annotation_users.remove(cur_user)
-                    task.save()
-        project.release_lock(ANNOTATION_LOCK)
         return Response(
             {"message": "Tasks assigned successfully"}, status=status.HTTP_200_OK
         )
@@ -2776,6 +2342,8 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     task.annotation_users.clear()
                     task.task_status = INCOMPLETE
                     task.save()
+                # The queryset updates above bypass the task counter signals
+                rebuild_project_counters([pk])
 
                 return Response(
                     {"message": "Tasks unassigned"}, status=status.HTTP_200_OK
@@ -2874,17 +2442,6 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 {"message": "You are not assigned to review this project"},
                 status=status.HTTP_403_FORBIDDEN,
             )
-        lock_set = False
-        while lock_set == False:
-            if project.is_locked(REVIEW_LOCK):
-                sleep(settings.PROJECT_LOCK_RETRY_INTERVAL)
-                continue
-            else:
-                try:
-                    project.set_lock(cur_user, REVIEW_LOCK)
-                    lock_set = True
-                except Exception as e:
-                    continue
         # Fetch preferred annotators from User model ----------------------
         preferred_task_json = getattr(cur_user, "preferred_task_by_json", {})
         preferred_annotators = preferred_task_json.get("preferred_annotators", {})
@@ -2892,159 +2449,21 @@ class ProjectViewSet(viewsets.ModelViewSet):
         preferred_annotator_ids = preferred_annotators.get(project_key, [])
 
         print(f"Reviewer {cur_user.id} preferred annotators for project {pk}: {preferred_annotator_ids}")
-        # check if the project contains eligible tasks to pull
-        tasks = (
-            Task.objects.filter(project_id=pk)
-            .filter(task_status=ANNOTATED)
-            .filter(review_user__isnull=True)
-            .exclude(annotation_users=cur_user.id)
-            .distinct()
-        )
-        if not tasks:
-            project.release_lock(REVIEW_LOCK)
-            return Response(
-                {"message": "No tasks available for review in this project"},
-                status=status.HTTP_404_NOT_FOUND,
-            )
-        # Filter tasks based on preferred annotators ----------------------
-        if preferred_annotator_ids:
-            annotation_filter_task_ids = Annotation_model.objects.filter(
-                annotation_type=ANNOTATOR_ANNOTATION,
-                completed_by__in=preferred_annotator_ids,
-                task__project_id=pk
-            ).values_list("task_id", flat=True).distinct()
-
-            tasks = tasks.filter(id__in=annotation_filter_task_ids)
-
         task_pull_count = project.tasks_pull_count_per_batch
         if "num_tasks" in dict(request.data):
             task_pull_count = request.data["num_tasks"]
-        if project.required_annotators_per_task > 1 and allow_unireview:
-            task_ids = (
-                Annotation_model.objects
-                .filter(task__in=tasks)
-                .filter(annotation_type=ANNOTATOR_ANNOTATION)
-                .filter(annotation_status="labeled")  # focus only on labeled ones
-                .values("task__input_data")  # group by input_data
-                .annotate(tasks_with_labeled_count=Count("task", distinct=True))  # count tasks sharing this input_data
-                .order_by("-tasks_with_labeled_count")  # order by that count
-                .values_list("task", flat=True)  # get task IDs back
-            )
-        else:
-        # Sort by oldest updated annotation;
-            task_ids = (
-                Annotation_model.objects.filter(task__in=tasks)
-                .filter(annotation_type=ANNOTATOR_ANNOTATION)
-                .distinct()
-                .order_by("updated_at")
-                .values_list("task", flat=True)
-            )
-        # tasks = tasks.order_by("id")
-        task_ids = list(task_ids)
-        task_ids = task_ids[:task_pull_count]
-        seen = set()
-        required_annotators_per_task = project.required_annotators_per_task
-        corrupted_tasks = set()
-        print("Before loop: ",task_ids)
-        if required_annotators_per_task > 1 and allow_unireview:
-            seen_tasks = set(task_ids)
-            for i in range(len(task_ids)):
-                ti = task_ids[i]
-                t = Task.objects.get(id=ti)
-                similar_tasks = (
-                    Task.objects.filter(input_data=t.input_data, project_id=project.id)
-                    .filter(task_status=ANNOTATED)
-                    .filter(review_user__isnull=True)
-                    .exclude(id=t.id)
-                )
-                corrupt_tasks = (
-                    Task.objects.filter(input_data=t.input_data, project_id=project.id)
-                    .filter(task_status=INCOMPLETE)
-                    .filter(review_user__isnull=True)
-                    .exclude(id=t.id)
-                )
-                
-                if corrupt_tasks:
-                    corrupted_tasks.add(task_ids[i])
-                    print(f"Corrupt tasks related to {ti} inside loop iteration {i}: ",corrupt_tasks)
-                    continue
-                for j in range(len(similar_tasks)):
-                    st = similar_tasks[j]
-                    if st.id not in seen_tasks:
-                        task_ids.append(st.id)
-                print(f"Task_id inside loop iteration {i}: ",ti)
-                
-                print(f"Similar tasks inside loop iteration {i}: ",similar_tasks)
-        print("Corrupted tasks after loop: ",corrupted_tasks)
-        print("Task_ids after loop: ",task_ids)
-        task_ids = [t for t in task_ids if t not in corrupted_tasks]
-        # task_ids = task_ids[:task_pull_count]
-        # if required_annotators_per_task > 1:
-        #     task_ids = filter_tasks_for_review_filter_criteria(task_ids)
+        task_ids = claim_review_tasks(
+            project,
+            cur_user,
+            task_pull_count,
+            preferred_annotator_ids=preferred_annotator_ids,
+            allow_unireview=allow_unireview,
+        )
         if len(task_ids) == 0:
-            project.release_lock(REVIEW_LOCK)
             return Response(
                 {"message": "No tasks available for review in this project"},
                 status=status.HTTP_404_NOT_FOUND,
             )
-            
-        is_MultipleInteractionEvaluation = (
-            project.project_type == "MultipleInteractionEvaluation"
-        )
-        #print(task_ids)
-        for task_id in task_ids:
-            if task_id in seen:
-                continue
-            seen.add(task_id)
-            task = Task.objects.get(pk=task_id)
-            if is_MultipleInteractionEvaluation:
-                add_extra_task_data(task, project)
-            task.review_user = cur_user
-            task.save()
-            rec_ann = (
-                Annotation_model.objects.filter(task_id=task_id)
-                .filter(annotation_type=ANNOTATOR_ANNOTATION)
-                .order_by("updated_at")
-            )
-            curr_response = {}
-            def dict_to_string(d):
-                return "{" + ", ".join(f"{key}: {value}" for key, value in d.items()) + "}"
-            try:
-                for qa in rec_ann[0].result[0]["model_responses_json"]:
-                    curr_response[qa["model_name"]] = int(qa["questions_response"][0]["response"][0])
-                task.data["current_rating"] = dict_to_string(curr_response)
-                if "curr_rating" in task.data:
-                    del task.data["curr_rating"]
-                task.save()
-            except:
-                True
-            reviewer_anno = Annotation_model.objects.filter(
-                task_id=task_id, annotation_type=REVIEWER_ANNOTATION
-            )
-            reviewer_anno_count = Annotation_model.objects.filter(
-                task_id=task_id, annotation_type=REVIEWER_ANNOTATION
-            ).count()
-            if reviewer_anno_count == 0:
-                base_annotation_obj = Annotation_model(
-                    result=rec_ann[0].result,
-                    task=task,
-                    completed_by=cur_user,
-                    annotation_status="unreviewed",
-                    parent_annotation=rec_ann[0],
-                    annotation_type=REVIEWER_ANNOTATION,
-                    annotation_notes=rec_ann[0].annotation_notes,
-                )
-                try:
-                    base_annotation_obj.save()
-                except IntegrityError as e:
-                    print(
-                        f"Task, completed_by and parent_annotation fields are same while assigning new review task "
-                        f"for project id-{project.id}, user-{cur_user.email}"
-                    )
-            else:
-                task.review_user = reviewer_anno[i].completed_by
-                task.save()
-        project.release_lock(REVIEW_LOCK)
         return Response(
             {
                 "message": "Tasks assigned successfully",
@@ -3132,6 +2551,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 tasks.update(review_user=None)
                 tasks.update(revision_loop_count=default_revision_loop_count_value())
                 tasks.update(task_status=ANNOTATED)
+                rebuild_project_counters([pk])
                 return Response(
                     {"message": "Tasks unassigned"}, status=status.HTTP_200_OK
                 )
@@ -3178,32 +2598,6 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 {"message": "You are not assigned to supercheck this project"},
                 status=status.HTTP_403_FORBIDDEN,
             )
-        lock_set = False
-        while lock_set == False:
-            if project.is_locked(SUPERCHECK_LOCK):
-                sleep(settings.PROJECT_LOCK_RETRY_INTERVAL)
-                continue
-            else:
-                try:
-                    project.set_lock(cur_user, SUPERCHECK_LOCK)
-                    lock_set = True
-                except Exception as e:
-                    continue
-        # check if the project contains eligible tasks to pull
-        tasks = (
-            Task.objects.filter(project_id=pk)
-            .filter(task_status=REVIEWED)
-            .filter(super_check_user__isnull=True)
-            .exclude(annotation_users=cur_user.id)
-            .exclude(review_user=cur_user.id)
-            .distinct()
-        )
-        if not tasks:
-            project.release_lock(SUPERCHECK_LOCK)
-            return Response(
-                {"message": "No tasks available for supercheck in this project"},
-                status=status.HTTP_404_NOT_FOUND,
-            )
         task_pull_count = project.tasks_pull_count_per_batch
         if "num_tasks" in dict(request.data):
             task_pull_count = request.data["num_tasks"]
@@ -3232,52 +2626,12 @@ class ProjectViewSet(viewsets.ModelViewSet):
         task_pull_count = min(
             task_pull_count, max_super_check_tasks_count - sup_exp_tasks_count
         )
-        # Sort by most recently updated annotation; temporary change
-        task_ids = (
-            Annotation_model.objects.filter(task__in=tasks)
-            .filter(annotation_type=REVIEWER_ANNOTATION)
-            .distinct()
-            .order_by("-updated_at")
-            .values_list("task", flat=True)
-        )
-        # tasks = tasks.order_by("id")
-        task_ids = list(task_ids)
-        task_ids = task_ids[:task_pull_count]
-        for task_id in task_ids:
-            task = Task.objects.get(pk=task_id)
-            task.super_check_user = cur_user
-            task.save()
-            rec_ann = (
-                Annotation_model.objects.filter(task_id=task_id)
-                .filter(annotation_type=REVIEWER_ANNOTATION)
-                .order_by("-updated_at")
-            )
-            superchecker_anno = Annotation_model.objects.filter(
-                task_id=task_id, annotation_type=SUPER_CHECKER_ANNOTATION
+        task_ids = claim_supercheck_tasks(project, cur_user, task_pull_count)
+        if not task_ids:
+            return Response(
+                {"message": "No tasks available for supercheck in this project"},
+                status=status.HTTP_404_NOT_FOUND,
             )
-            superchecker_anno_count = Annotation_model.objects.filter(
-                task_id=task_id, annotation_type=SUPER_CHECKER_ANNOTATION
-            ).count()
-            if superchecker_anno_count == 0:
-                base_annotation_obj = Annotation_model(
-                    result=rec_ann[0].result,
-                    task=task,
-                    completed_by=cur_user,
-                    annotation_status="unvalidated",
-                    parent_annotation=rec_ann[0],
-                    annotation_type=SUPER_CHECKER_ANNOTATION,
-                )
-                try:
-                    base_annotation_obj.save()
-                except IntegrityError as e:
-                    print(
-                        f"Task, completed_by and parent_annotation fields are same while assigning new review task "
-                        f"for project id-{project.id}, user-{cur_user.email}"
-                    )
-            else:
-                task.super_check_user = superchecker_anno[0].completed_by
-                task.save()
-        project.release_lock(SUPERCHECK_LOCK)
         return Response(
             {"message": "Tasks assigned successfully"}, status=status.HTTP_200_OK
         )
@@ -3347,6 +2701,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     task.revision_loop_count = rev_loop_count
                     task.task_status = REVIEWED
                     task.save()
+                rebuild_project_counters([pk])
                 return Response(
                     {"message": "Tasks unassigned"}, status=status.HTTP_200_OK
                 )
@@ -3410,6 +2765,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
         name="Get Reports  of a Project",
         url_name="get_analytics",
     )
+    @replica_reads
     def get_analytics(self, request, pk=None, *args, **kwargs):
         """
         Get Reports of a Project
@@ -4185,6 +3541,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
                         if len(anns) > 0:
                             tas.correct_annotation = anns[0]
                         tas.save()
+                    rebuild_project_counters([project.id])
                     return Response(
                         {"message": "Task moved to Annotation stage from Review stage"},
                         status=status.HTTP_200_OK,
@@ -4253,6 +3610,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
                         if len(anns) > 0:
                             tas.correct_annotation = anns[0]
                         tas.save()
+                    rebuild_project_counters([project.id])
                     return Response(
                         {
                             "message": "Project moved to Review stage from SuperCheck stage"
@@ -4445,7 +3803,6 @@ class ProjectViewSet(viewsets.ModelViewSet):
         """
         try:
             project = Project.objects.get(pk=pk)
-            project_type = dict(PROJECT_TYPE_CHOICES)[project.project_type]
 
             include_input_data_metadata_json = request.query_params.get(
                 "include_input_data_metadata_json", False
@@ -4459,132 +3816,28 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 export_type = request.query_params["export_type"]
             else:
                 export_type = "CSV"
+            if export_type not in EXPORT_FORMATS:
+                return HttpResponse("The format asked is inappropriate", status=404)
             tasks = Task.objects.filter(project_id__exact=project)
 
             if "task_status" in dict(request.query_params):
                 task_status = request.query_params["task_status"]
                 task_status = task_status.split(",")
                 tasks = tasks.filter(task_status__in=task_status)
-                
-            prompt_map = prompt_data_annotation(tasks)
-            prompt_map_InstructionDrivenChat = prompt_data_annotation_InstructionDrivenChat(tasks)
 
-            if len(tasks) == 0:
+            if not tasks.exists():
                 ret_dict = {"message": "No tasks in project!"}
                 ret_status = status.HTTP_200_OK
                 return Response(ret_dict, status=ret_status)
-            tasks_list = []
-            # required_annotators_per_task = project.required_annotators_per_task
-            for task in tasks:
-                ann_list = []
-                task_dict = model_to_dict(task)
-                # if export_type != "JSON":
-                #     task_dict["data"]["task_status"] = task.task_status
-                # Rename keys to match label studio converter
-                # task_dict['id'] = task_dict['task_id']
-                # del task_dict['task_id']
-               
-                correct_annotation = task.correct_annotation
-                if correct_annotation is None and task.task_status in [
-                    ANNOTATED,
-                ]:
-                    correct_annotation = task.annotations.all().filter(
-                        annotation_type=ANNOTATOR_ANNOTATION
-                    )[0]
-                if correct_annotation is None and task.task_status in [
-                    REVIEWED,
-                ]:
-                    correct_annotation = task.annotations.all().filter(
-                        annotation_type=REVIEWER_ANNOTATION
-                    )[0]
-                    
-                annotator_email = ""
-                # if correct_annotation is not None and required_annotators_per_task < 2:
-                if correct_annotation is not None:
-                    try:
-                        annotator_email = correct_annotation.completed_by.email
-                    except:
-                        pass
-                    task_dict["annotations"] = [correct_annotation]
-                # elif required_annotators_per_task >= 2:
-                #     all_ann = Annotation.objects.filter(task=task)
-                #     for a in all_ann:
-                #         ann_list.append(a)
-                #     task_dict["annotations"] = ann_list
-                else:
-                    task_dict["annotations"] = []
-
-                task_dict["data"]["annotator_email"] = annotator_email
 
-                if include_input_data_metadata_json:
-                    dataset_type = project.dataset_id.all()[0].dataset_type
-                    dataset_model = getattr(dataset_models, dataset_type)
-                    task_dict["data"]["input_data_metadata_json"] = (
-                        dataset_model.objects.get(
-                            pk=task_dict["input_data"]
-                        ).metadata_json
-                    )
-                del task_dict["annotation_users"]
-                del task_dict["review_user"]
-                tasks_list.append(OrderedDict(task_dict))
-
-            dataset_type = project.dataset_id.all()[0].dataset_type
-            is_MultipleInteractionEvaluation = (
-                project_type == "MultipleInteractionEvaluation"
+            # Stream the rows, the tasks being read a chunk at a time
+            rows = iter_download_rows(
+                project,
+                tasks,
+                include_input_data_metadata_json=include_input_data_metadata_json,
+                add_notes=add_notes,
             )
-            is_ModelOutputEvaluation = project_type == "ModelOutputEvaluation"
-            is_ModelInteractionEvaluation = project_type == "ModelInteractionEvaluation"
-            is_InstructionDrivenChat = project_type == "InstructionDrivenChat"
-            for task in tasks_list:
-                complete_result, notes = [], []
-                for i in range(len(task["annotations"])):
-                    a = task["annotations"][i]
-                    annotation_result = a.result
-                    annotation_result = (
-                        json.loads(annotation_result)
-                        if isinstance(annotation_result, str)
-                        else annotation_result
-                    )
-                    uid = a.completed_by.email
-                    try:
-                        p_ann = a.parent_annotation.id
-                    except Exception as e:
-                        p_ann = None
-                    single_dict = {
-                        "user_id": uid,
-                        "annotation_id": a.id,
-                        "annotation_result": annotation_result,
-                        "annotation_type": a.annotation_type,
-                        "annotation_status": a.annotation_status,
-                        "parent_annotation_id": p_ann,
-                    }
-                    complete_result.append(single_dict)
-                    if add_notes:
-                        notes.append(
-                            {
-                                "annotation_id": a.id,
-                                "annotation_notes": a.annotation_notes,
-                                "review_notes": a.review_notes,
-                                "supercheck_notes": a.supercheck_notes,
-                            }
-                        )
-                if is_MultipleInteractionEvaluation:
-                    task["data"]["eval_form_json"] = complete_result
-                elif is_ModelInteractionEvaluation:
-                    task["data"]["eval_form_output_json"] = complete_result
-                elif is_ModelOutputEvaluation:
-                    task["data"]["form_output_json"] = complete_result
-                elif is_InstructionDrivenChat:
-                    task["data"]["interactions_json"] = complete_result
-                    task["data"]["Prompts"] = prompt_map_InstructionDrivenChat.get(task["id"], "")
-                else:
-                    task["data"]["interactions_json"] = complete_result
-                    task["data"]["Prompts"] = prompt_map.get(task["id"], "")
-
-                    
-                task["data"]["notes_json"] = notes
-                del task["annotations"]
-            return DataExport.generate_export_file(project, tasks_list, export_type)
+            return streaming_export_response(project, rows, export_type)
         except Project.DoesNotExist:
             ret_dict = {"message": "Project does not exist!"}
             ret_status = status.HTTP_404_NOT_FOUND
@@ -4645,7 +3898,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
                         project_id__exact=project, task_status__in=[ANNOTATED]
                     )
 
-                if len(tasks) == 0:
+                if not tasks.exists():
                     ret_dict = {"message": "No tasks to export!"}
                     ret_status = status.HTTP_200_OK
                     return Response(ret_dict, status=ret_status)
@@ -4692,7 +3945,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
                     tasks = Task.objects.filter(
                         project_id__exact=project, task_status__in=[ANNOTATED]
                     )
-                if len(tasks) == 0:
+                if not tasks.exists():
                     ret_dict = {"message": "No tasks to export!"}
                     ret_status = status.HTTP_200_OK
                     return Response(ret_dict, status=ret_status)
@@ -4832,17 +4085,10 @@ class ProjectViewSet(viewsets.ModelViewSet):
                 },
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        # Handle 'create_parameter' task separately
-        if task_name == "projects.tasks.create_parameters_for_task_creation":
-            # Create the keyword argument for dataset instance ID
-            project_id_keyword_arg = "'project_id': " + str(pk) + "}"
-        else:
-            # Create the keyword argument for dataset instance ID
-            project_id_keyword_arg = "'project_id': " + "'" + str(pk) + "'"
-        # Check the celery project export status
+        # Get the celery results of the jobs of the project
         task_queryset = TaskResult.objects.filter(
             task_name=task_name,
-            task_kwargs__contains=project_id_keyword_arg,
+            task_id__in=get_job_task_ids(task_name, PROJECT_ENTITY, [pk]),
         )
 
         # Check if queryset is empty
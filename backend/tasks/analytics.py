@@ -0,0 +1,491 @@
+"""
+Materialized task count analytics.
+
+TaskCountRollup holds, for every project, the number of tasks per status and
+the number of annotations per (role, task status, annotation status, day).
+Saving or deleting a task or an annotation, and writing them in bulk through
+their querysets, marks the task as dirty in redis once the transaction
+commits. refresh_dirty_rollups() (run periodically by celery) recounts the
+dirty tasks only and applies the difference with the counts they were last
+applied with, kept in TaskRollupContribution, to the rollup rows. The rollups
+of a project are built in full on the first refresh of one of its tasks and
+by backfill_task_count_rollups.
+The periodical and cumulative task count endpoints then sum the rollup rows
+instead of counting annotations for every period and language.
+"""
+import bisect
+import datetime
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+from anudesh_backend.locks import get_redis_connection
+from tasks.counters import rebuild_project_counters
+from projects.models import Project
+from tasks.models import (
+    Annotation,
+    Task,
+    TaskCountRollup,
+    TaskRollupContribution,
+    ROLLUP_TASK,
+    ANNOTATOR_ANNOTATION,
+    REVIEWER_ANNOTATION,
+    SUPER_CHECKER_ANNOTATION,
+    TO_BE_REVISED,
+)
+
+DIRTY_TASKS_KEY = "analytics:dirty_tasks"
+DIRTY_COUNTER_PROJECTS_KEY = "analytics:dirty_counter_projects"
+REFRESH_BATCH_SIZE = 1000
+COUNTERS_REFRESH_BATCH_SIZE = 100
+
+ROLLUP_KEY_FIELDS = ("project_id", "role", "task_status", "annotation_status", "day")
+ROLLUP_PROJECT_FIELDS = {
+    "organization_id": "organization_id",
+    "workspace_id": "workspace_id",
+    "language": "tgt_language",
+    "project_type": "project_type",
+}
+
+
+def _add_on_commit(key, ids):
+    """
+    Adds the ids to the redis set key once the current transaction commits,
+    so that the refresh reads the rows as they were committed. Redis errors
+    are ignored, the consistency checks repair the rollups that were missed.
+    """
+    members = [str(member) for member in ids if member]
+    if not members:
+        return
+
+    def add():
+        try:
+            get_redis_connection().sadd(key, *members)
+        except Exception:
+            pass
+
+    transaction.on_commit(add)
+
+
+def mark_tasks_dirty(task_ids):
+    """
+    Queues the tasks for the refresh of the rollups of their projects.
+    """
+    _add_on_commit(DIRTY_TASKS_KEY, task_ids)
+
+
+def mark_project_counters_dirty(project_ids):
+    """
+    Queues the task counters of the projects for a rebuild, for the tasks
+    written in bulk.
+    """
+    _add_on_commit(DIRTY_COUNTER_PROJECTS_KEY, project_ids)
+
+
+def update_rollup_projects(project):
+    """
+    Copies the organization, workspace, language and project type of the
+    project to its rollup rows, when they changed.
+    """
+    values = {
+        field: getattr(project, attribute)
+        for field, attribute in ROLLUP_PROJECT_FIELDS.items()
+    }
+    TaskCountRollup.objects.filter(project_id=project.id).exclude(**values).update(
+        **values
+    )
+
+
+def compute_project_rollups(project_ids):
+    """
+    Returns a Counter of rollup key to count computed from the tasks and the
+    annotations of the projects.
+    """
+    counts = Counter()
+    tasks = (
+        Task.objects.filter(project_id__in=project_ids)
+        .values_list("project_id", "task_status")
+        .annotate(count=Count("id"))
+    )
+    for project_id, task_status, count in tasks:
+        counts[(project_id, ROLLUP_TASK, task_status, "", None)] = count
+
+    annotations = (
+        Annotation.objects.filter(task__project_id__in=project_ids)
+        .annotate(day=TruncDate("updated_at", tzinfo=datetime.timezone.utc))
+        .values_list(
+            "task__project_id",
+            "annotation_type",
+            "task__task_status",
+            "annotation_status",
+            "day",
+        )
+        .annotate(count=Count("id"))
+    )
+    for project_id, role, task_status, annotation_status, day, count in annotations:
+        counts[(project_id, role, task_status, annotation_status, day)] = count
+    return counts
+
+
+def compute_task_rollups(**task_filter):
+    """
+    Returns a dict of task id to its project id and a Counter of rollup key,
+    without the project, to count, for the tasks matching task_filter.
+    """
+    rollups = {}
+    for task_id, project_id, task_status in Task.objects.filter(
+        **task_filter
+    ).values_list("id", "project_id", "task_status"):
+        rollups[task_id] = (
+            project_id,
+            Counter({(ROLLUP_TASK, task_status, "", None): 1}),
+        )
+
+    annotations = (
+        Annotation.objects.filter(
+            **{f"task__{lookup}": value for lookup, value in task_filter.items()}
+        )
+        .annotate(day=TruncDate("updated_at", tzinfo=datetime.timezone.utc))
+        .values_list(
+            "task_id",
+            "annotation_type",
+            "task__task_status",
+            "annotation_status",
+            "day",
+        )
+        .annotate(count=Count("id"))
+    )
+    for task_id, role, task_status, annotation_status, day, count in annotations:
+        # Tasks created after they were read are left to their own refresh
+        if task_id in rollups:
+            rollups[task_id][1][(role, task_status, annotation_status, day)] = count
+    return rollups
+
+
+def dump_counts(counts):
+    return [
+        [role, task_status, annotation_status, day and day.isoformat(), count]
+        for (role, task_status, annotation_status, day), count in counts.items()
+    ]
+
+
+def load_counts(rows):
+    return Counter(
+        {
+            (
+                role,
+                task_status,
+                annotation_status,
+                day and datetime.date.fromisoformat(day),
+            ): count
+            for role, task_status, annotation_status, day, count in rows
+        }
+    )
+
+
+def get_stored_rollups(project_ids):
+    """
+    Returns a Counter of rollup key to count as stored for the projects.
+    """
+    rows = (
+        TaskCountRollup.objects.filter(project_id__in=project_ids)
+        .values_list(*ROLLUP_KEY_FIELDS)
+        .annotate(total=Sum("count"))
+    )
+    return Counter({tuple(row[:-1]): row[-1] for row in rows})
+
+
+def _lock_projects(project_ids):
+    """
+    Locks the rows of the projects until the end of the transaction, so that
+    the rollups of a project are written by one refresh or rebuild at a time.
+    Returns the ids of the projects that exist.
+    """
+    return list(
+        Project.objects.select_for_update()
+        .filter(id__in=project_ids)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+def _get_rollup_projects(project_ids):
+    return {
+        project["id"]: {
+            field: project[attribute]
+            for field, attribute in ROLLUP_PROJECT_FIELDS.items()
+        }
+        for project in Project.objects.filter(id__in=project_ids).values(
+            "id", *ROLLUP_PROJECT_FIELDS.values()
+        )
+    }
+
+
+def _rebuild_locked_project_rollups(project_ids):
+    projects = _get_rollup_projects(project_ids)
+    counts = Counter()
+    contributions = []
+    for task_id, (project_id, task_counts) in compute_task_rollups(
+        project_id__in=list(projects)
+    ).items():
+        for key, count in task_counts.items():
+            counts[(project_id,) + key] += count
+        contributions.append(
+            TaskRollupContribution(
+                task_id=task_id, project_id=project_id, counts=dump_counts(task_counts)
+            )
+        )
+    rollups = [
+        TaskCountRollup(
+            project_id=key[0],
+            role=key[1],
+            task_status=key[2],
+            annotation_status=key[3],
+            day=key[4],
+            count=count,
+            **projects[key[0]],
+        )
+        for key, count in counts.items()
+    ]
+    TaskCountRollup.objects.filter(project_id__in=project_ids).delete()
+    TaskRollupContribution.objects.filter(project_id__in=project_ids).delete()
+    TaskCountRollup.objects.bulk_create(rollups, batch_size=1000)
+    TaskRollupContribution.objects.bulk_create(contributions, batch_size=1000)
+    return len(rollups)
+
+
+def rebuild_project_rollups(project_ids):
+    """
+    Replaces the rollup rows of the projects with freshly computed ones.
+    Returns the number of rows written.
+    """
+    with transaction.atomic():
+        return _rebuild_locked_project_rollups(_lock_projects(project_ids))
+
+
+def apply_rollup_deltas(deltas):
+    """
+    Adds the deltas (rollup key to change) to the counts of the rollup rows.
+    Returns the number of rows written.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    project_ids = {key[0] for key in deltas}
+    days = [key[4] for key in deltas if key[4] is not None]
+    stored = defaultdict(list)
+    for rollup in TaskCountRollup.objects.filter(project_id__in=project_ids).filter(
+        Q(day__in=days) | Q(day__isnull=True)
+    ):
+        stored[tuple(getattr(rollup, field) for field in ROLLUP_KEY_FIELDS)].append(
+            rollup
+        )
+
+    projects = None
+    changed, created, deleted = [], [], []
+    for key, delta in deltas.items():
+        rollups = stored.get(key)
+        if rollups:
+            rollup, *duplicates = rollups
+            rollup.count = sum(duplicate.count for duplicate in rollups) + delta
+            deleted += [duplicate.id for duplicate in duplicates]
+            if rollup.count > 0:
+                changed.append(rollup)
+            else:
+                deleted.append(rollup.id)
+        elif delta > 0:
+            if projects is None:
+                projects = _get_rollup_projects(project_ids)
+            created.append(
+                TaskCountRollup(
+                    project_id=key[0],
+                    role=key[1],
+                    task_status=key[2],
+                    annotation_status=key[3],
+                    day=key[4],
+                    count=delta,
+                    **projects[key[0]],
+                )
+            )
+    TaskCountRollup.objects.filter(id__in=deleted).delete()
+    TaskCountRollup.objects.bulk_update(changed, ["count"], batch_size=1000)
+    TaskCountRollup.objects.bulk_create(created, batch_size=1000)
+    return len(changed) + len(created) + len(deleted)
+
+
+def refresh_task_rollups(task_ids):
+    """
+    Applies the change of the rollup counts of the tasks since they were last
+    applied, building the rollups of their projects that have none yet.
+    Returns the number of rollup rows written.
+    """
+    task_ids = list(task_ids)
+    with transaction.atomic():
+        project_ids = set(
+            Task.objects.filter(id__in=task_ids).values_list("project_id", flat=True)
+        ) | set(
+            TaskRollupContribution.objects.filter(task_id__in=task_ids).values_list(
+                "project_id", flat=True
+            )
+        )
+        project_ids = _lock_projects(project_ids)
+        built = set(
+            TaskRollupContribution.objects.filter(project_id__in=project_ids)
+            .values_list("project_id", flat=True)
+            .distinct()
+        )
+        unbuilt = [project_id for project_id in project_ids if project_id not in built]
+        rows = _rebuild_locked_project_rollups(unbuilt) if unbuilt else 0
+        if not built:
+            return rows
+
+        contributions = {
+            contribution.task_id: contribution
+            for contribution in TaskRollupContribution.objects.filter(
+                task_id__in=task_ids, project_id__in=built
+            )
+        }
+        current = compute_task_rollups(id__in=task_ids, project_id__in=built)
+        deltas = Counter()
+        for contribution in contributions.values():
+            for key, count in load_counts(contribution.counts).items():
+                deltas[(contribution.project_id,) + key] -= count
+        changed, created = [], []
+        for task_id, (project_id, task_counts) in current.items():
+            for key, count in task_counts.items():
+                deltas[(project_id,) + key] += count
+            contribution = contributions.get(task_id)
+            if contribution is None:
+                created.append(
+                    TaskRollupContribution(
+                        task_id=task_id,
+                        project_id=project_id,
+                        counts=dump_counts(task_counts),
+                    )
+                )
+            else:
+                contribution.counts = dump_counts(task_counts)
+                changed.append(contribution)
+        rows += apply_rollup_deltas(deltas)
+        TaskRollupContribution.objects.filter(
+            task_id__in=set(contributions) - set(current)
+        ).delete()
+        TaskRollupContribution.objects.bulk_update(changed, ["counts"], batch_size=1000)
+        TaskRollupContribution.objects.bulk_create(created, batch_size=1000)
+    return rows
+
+
+def _refresh_dirty(redis_connection, key, batch_size, refresh):
+    refreshed = 0
+    while True:
+        ids = redis_connection.spop(key, batch_size)
+        if not ids:
+            return refreshed
+        ids = [int(member) for member in ids]
+        try:
+            refresh(ids)
+        except Exception:
+            redis_connection.sadd(key, *ids)
+            raise
+        refreshed += len(ids)
+
+
+def refresh_dirty_rollups(batch_size=REFRESH_BATCH_SIZE):
+    """
+    Refreshes the rollups of the tasks and rebuilds the task counters of the
+    projects marked as dirty. Returns the number of tasks and of projects
+    refreshed.
+    """
+    redis_connection = get_redis_connection()
+    return {
+        "tasks": _refresh_dirty(
+            redis_connection, DIRTY_TASKS_KEY, batch_size, refresh_task_rollups
+        ),
+        "counter_projects": _refresh_dirty(
+            redis_connection,
+            DIRTY_COUNTER_PROJECTS_KEY,
+            COUNTERS_REFRESH_BATCH_SIZE,
+            rebuild_project_counters,
+        ),
+    }
+
+
+def find_inconsistent_projects(project_ids):
+    """
+    Returns the ids of the projects whose stored rollups differ from the
+    tasks and annotations.
+    """
+    expected = compute_project_rollups(project_ids)
+    stored = get_stored_rollups(project_ids)
+    return sorted(
+        {key[0] for key in set(expected) | set(stored) if expected[key] != stored[key]}
+    )
+
+
+def get_report_filters(reviewer_reports, supercheck_reports):
+    """
+    Returns the annotation role, the task statuses and the excluded annotation
+    statuses counted by the task count analytics of a report type.
+    """
+    if reviewer_reports == True:
+        return (
+            REVIEWER_ANNOTATION,
+            ["reviewed", "exported", "super_checked"],
+            [TO_BE_REVISED],
+        )
+    if supercheck_reports == True:
+        return SUPER_CHECKER_ANNOTATION, ["super_checked"], []
+    return (
+        ANNOTATOR_ANNOTATION,
+        ["annotated", "reviewed", "exported", "super_checked"],
+        [],
+    )
+
+
+def get_cumulative_task_counts(proj_objs, reviewer_reports, supercheck_reports):
+    """
+    Returns a dict of language to the number of completed tasks of proj_objs.
+    """
+    _, task_statuses, _ = get_report_filters(reviewer_reports, supercheck_reports)
+    return dict(
+        TaskCountRollup.objects.filter(
+            project__in=proj_objs, role=ROLLUP_TASK, task_status__in=task_statuses
+        )
+        .values_list("language")
+        .annotate(total=Sum("count"))
+    )
+
+
+def get_periodical_task_counts(
+    proj_objs, reviewer_reports, supercheck_reports, periodical_list
+):
+    """
+    Returns, for each period between consecutive dates of periodical_list, a
+    dict of language to the number of annotations completed in the period.
+    Periods are resolved on whole days (UTC).
+    """
+    role, task_statuses, excluded_statuses = get_report_filters(
+        reviewer_reports, supercheck_reports
+    )
+    period_counts = [defaultdict(int) for _ in range(len(periodical_list) - 1)]
+    if not period_counts:
+        return period_counts
+    boundaries = [period.date() for period in periodical_list]
+    rows = (
+        TaskCountRollup.objects.filter(
+            project__in=proj_objs,
+            role=role,
+            task_status__in=task_statuses,
+            day__gte=boundaries[0],
+            day__lt=boundaries[-1],
+        )
+        .exclude(annotation_status__in=excluded_statuses)
+        .values_list("language", "day")
+        .annotate(total=Sum("count"))
+    )
+    for language, day, total in rows:
+        period = bisect.bisect_right(boundaries, day) - 1
+        period_counts[period][language] += total
+    return period_counts
@@ -0,0 +1,271 @@
+"""
+Per-project task counters.
+
+ProjectTaskCounter holds, for every project, the number of its tasks per
+status, the unassigned tasks (with no annotation users), the annotated tasks
+awaiting a reviewer and the reviewed tasks awaiting a super checker. Saving,
+deleting and (un)assigning a task applies the change of its counters in the
+same transaction, through the signals of tasks.models and the deletes of its
+querysets. Bulk writes bypass the signals, so the counters of the projects whose tasks are written in bulk are
+also rebuilt by the periodic analytics refresh, and reconcile_task_counters
+rebuilds them on demand. The counters of a project are built on their first read.
+"""
+
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Value, When
+
+from projects.models import Project
+from tasks.models import (
+    ProjectTaskCounter,
+    Task,
+    TASK_STATUS,
+    ANNOTATED,
+    REVIEWED,
+    UNASSIGNED_COUNTER,
+    AWAITING_REVIEW_COUNTER,
+    AWAITING_SUPERCHECK_COUNTER,
+)
+
+COUNTER_NAMES = [task_status for task_status, _ in TASK_STATUS] + [
+    UNASSIGNED_COUNTER,
+    AWAITING_REVIEW_COUNTER,
+    AWAITING_SUPERCHECK_COUNTER,
+]
+
+
+def get_state_counters(task_status, review_user_id, super_check_user_id):
+    """
+    Returns the counters, other than unassigned, a task in this state is
+    counted in.
+    """
+    counters = [task_status]
+    if task_status == ANNOTATED and review_user_id is None:
+        counters.append(AWAITING_REVIEW_COUNTER)
+    elif task_status == REVIEWED and super_check_user_id is None:
+        counters.append(AWAITING_SUPERCHECK_COUNTER)
+    return tuple(counters)
+
+
+def get_task_counters(task):
+    return get_state_counters(
+        task.task_status, task.review_user_id, task.super_check_user_id
+    )
+
+
+def increment_counters(project_id, deltas):
+    """
+    Adds the deltas (counter name to change) to the counters of the project.
+    The counters of a project that are not built yet are left to the build.
+    """
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if deltas:
+        ProjectTaskCounter.objects.filter(
+            project_id=project_id, name__in=deltas
+        ).update(
+            count=F("count")
+            + Case(
+                *[When(name=name, then=Value(delta)) for name, delta in deltas.items()],
+                default=Value(0),
+            )
+        )
+
+
+def _increment_project_counters(project_deltas):
+    for project_id, deltas in project_deltas.items():
+        increment_counters(project_id, deltas)
+
+
+def increment_created_task_counters(tasks):
+    """
+    Counts the tasks written with bulk_create, which sends no signals. The
+    tasks have no annotation users yet.
+    """
+    project_deltas = defaultdict(Counter)
+    for task in tasks:
+        project_deltas[task.project_id_id].update(
+            task.get_counters() + (UNASSIGNED_COUNTER,)
+        )
+    _increment_project_counters(project_deltas)
+
+
+def get_loaded_counters(tasks):
+    """
+    Returns a dict of task id to the counters the tasks are counted in, to be
+    taken before they are changed and written with bulk_update.
+    """
+    return {task.id: task.get_counters() for task in tasks}
+
+
+def increment_updated_task_counters(tasks, loaded_counters):
+    """
+    Applies the counter changes of the tasks written with bulk_update, which
+    sends no signals, since loaded_counters were taken with
+    get_loaded_counters().
+    """
+    project_deltas = defaultdict(Counter)
+    for task in tasks:
+        project_deltas[task.project_id_id].update(task.get_counters())
+        project_deltas[task.project_id_id].subtract(loaded_counters[task.id])
+    _increment_project_counters(project_deltas)
+
+
+def get_assigned_task_ids(through, task_ids):
+    return set(
+        through.objects.filter(task_id__in=task_ids)
+        .values_list("task_id", flat=True)
+        .distinct()
+    )
+
+
+def get_assignment_changes(through, task_ids, assigned_before):
+    """
+    Returns a dict of project id to the change of its unassigned counter,
+    given the tasks among task_ids that had annotation users before a change
+    of the annotation users.
+    """
+    assigned_after = get_assigned_task_ids(through, task_ids)
+    changes = {task_id: -1 for task_id in assigned_after - assigned_before}
+    changes.update({task_id: 1 for task_id in assigned_before - assigned_after})
+    deltas = defaultdict(int)
+    for task_id, project_id in Task.objects.filter(id__in=changes).values_list(
+        "id", "project_id"
+    ):
+        deltas[project_id] += changes[task_id]
+    return deltas
+
+
+def decrement_deleted_task_counters(counts):
+    """
+    Removes the deleted tasks from the counters, given their counts taken
+    with count_tasks() before the delete.
+    """
+    project_deltas = defaultdict(Counter)
+    for (project_id, name), count in counts.items():
+        project_deltas[project_id][name] -= count
+    _increment_project_counters(project_deltas)
+
+
+def compute_project_counters(project_ids):
+    """
+    Returns a Counter of (project id, counter name) to count computed from
+    the tasks of the projects.
+    """
+    return count_tasks(Task.objects.filter(project_id__in=project_ids))
+
+
+def count_tasks(tasks):
+    """
+    Returns a Counter of (project id, counter name) to count computed from
+    the tasks of the queryset, with one grouped query per kind of counter.
+    """
+    counts = Counter()
+    tasks = tasks.order_by()
+    for project_id, task_status, count in tasks.values_list(
+        "project_id", "task_status"
+    ).annotate(count=Count("id")):
+        counts[(project_id, task_status)] = count
+
+    awaiting = (
+        tasks.values("project_id")
+        .annotate(
+            awaiting_review=Count(
+                "id", filter=Q(task_status=ANNOTATED, review_user__isnull=True)
+            ),
+            awaiting_supercheck=Count(
+                "id", filter=Q(task_status=REVIEWED, super_check_user__isnull=True)
+            ),
+        )
+        .values_list("project_id", "awaiting_review", "awaiting_supercheck")
+    )
+    for project_id, awaiting_review, awaiting_supercheck in awaiting:
+        counts[(project_id, AWAITING_REVIEW_COUNTER)] = awaiting_review
+        counts[(project_id, AWAITING_SUPERCHECK_COUNTER)] = awaiting_supercheck
+
+    unassigned = (
+        tasks.filter(annotation_users__isnull=True)
+        .values_list("project_id")
+        .annotate(count=Count("id"))
+    )
+    for project_id, count in unassigned:
+        counts[(project_id, UNASSIGNED_COUNTER)] = count
+    return counts
+
+
+def rebuild_project_counters(project_ids):
+    """
+    Sets the counters of the projects to the counts of their tasks. Returns
+    the number of counters changed. The counter rows are locked before the
+    tasks are counted, so the increment of a concurrent transaction is
+    either counted or applied after the rebuild, never both.
+    """
+    project_ids = list(
+        Project.objects.filter(id__in=project_ids).values_list("id", flat=True)
+    )
+    with transaction.atomic():
+        stored = {
+            (counter.project_id, counter.name): counter
+            for counter in ProjectTaskCounter.objects.select_for_update()
+            .filter(project_id__in=project_ids)
+            .order_by("id")
+        }
+        counts = compute_project_counters(project_ids)
+        changed, missing = [], []
+        for project_id in project_ids:
+            for name in COUNTER_NAMES:
+                count = counts[(project_id, name)]
+                counter = stored.get((project_id, name))
+                if counter is None:
+                    missing.append(
+                        ProjectTaskCounter(
+                            project_id=project_id, name=name, count=count
+                        )
+                    )
+                elif counter.count != count:
+                    counter.count = count
+                    changed.append(counter)
+        ProjectTaskCounter.objects.bulk_update(changed, ["count"], batch_size=1000)
+        ProjectTaskCounter.objects.bulk_create(
+            missing, batch_size=1000, ignore_conflicts=True
+        )
+    return len(changed) + len(missing)
+
+
+def find_inconsistent_projects(project_ids):
+    """
+    Returns the ids of the projects whose stored counters differ from the
+    counts of their tasks.
+    """
+    expected = compute_project_counters(project_ids)
+    stored = Counter(
+        {
+            (project_id, name): count
+            for project_id, name, count in ProjectTaskCounter.objects.filter(
+                project_id__in=project_ids
+            ).values_list("project_id", "name", "count")
+        }
+    )
+    return sorted(
+        {key[0] for key in set(expected) | set(stored) if expected[key] != stored[key]}
+    )
+
+
+def get_project_counters(project_id):
+    """
+    Returns a dict of counter name to count for the project, building its
+    counters if they do not exist yet.
+    """
+    counters = dict(
+        ProjectTaskCounter.objects.filter(project_id=project_id).values_list(
+            "name", "count"
+        )
+    )
+    if not counters:
+        rebuild_project_counters([project_id])
+        counters = dict(
+            ProjectTaskCounter.objects.filter(project_id=project_id).values_list(
+                "name", "count"
+            )
+        )
+    return counters
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from projects.models import Project
+from tasks.analytics import rebuild_project_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the task count rollups used by the task count analytics"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project-ids",
+            nargs="+",
+            type=int,
+            help="Only rebuild the rollups of these projects",
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+
+    def handle(self, *args, **options):
+        project_ids = options["project_ids"] or list(
+            Project.objects.order_by("id").values_list("id", flat=True)
+        )
+        batch_size = options["batch_size"]
+        rows = 0
+        for start in range(0, len(project_ids), batch_size):
+            rows += rebuild_project_rollups(project_ids[start : start + batch_size])
+            self.stdout.write(
+                f"{min(start + batch_size, len(project_ids))}/{len(project_ids)} projects"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {rows} rollup rows for {len(project_ids)} projects"
+            )
+        )
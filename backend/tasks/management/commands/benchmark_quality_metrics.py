@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from tasks.models import Annotation
+from utils.quality_metrics import (
+    QUALITY_METRICS_WORKERS,
+    get_annotation_pair_metrics,
+)
+
+
+class Command(BaseCommand):
+    """
+    Computes the quality metrics between annotations and their parents and
+    reports the throughput. With --no-cache the cached metrics are neither
+    read nor written, so every pair is computed.
+    """
+
+    help = "Benchmark the batch WER/CED/BLEU computation on existing annotations"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--project-ids", nargs="+", type=int)
+        parser.add_argument("--limit", type=int, default=10000)
+        parser.add_argument("--workers", type=int, default=QUALITY_METRICS_WORKERS)
+        parser.add_argument("--no-cache", action="store_true")
+
+    def handle(self, *args, **options):
+        annotations = Annotation.objects.filter(parent_annotation__isnull=False)
+        if options["project_ids"]:
+            annotations = annotations.filter(
+                task__project_id__in=options["project_ids"]
+            )
+        annotation_ids = list(
+            annotations.order_by("-id").values_list("id", flat=True)[: options["limit"]]
+        )
+        _, stats = get_annotation_pair_metrics(
+            Annotation.objects.filter(id__in=annotation_ids),
+            workers=options["workers"],
+            use_cache=not options["no_cache"],
+        )
+        self.stdout.write(
+            f"{stats.pairs} pairs ({stats.cached} cached, {stats.computed} computed) "
+            f"in {stats.elapsed:.2f} s: {stats.pairs_per_second:.0f} pairs/s"
+        )
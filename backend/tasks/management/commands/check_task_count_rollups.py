@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from projects.models import Project
+from tasks.analytics import find_inconsistent_projects, rebuild_project_rollups
+
+
+class Command(BaseCommand):
+    help = "Compare the task count rollups with the tasks and annotations"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project-ids",
+            nargs="+",
+            type=int,
+            help="Only check the rollups of these projects",
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Rebuild the rollups of the inconsistent projects",
+        )
+
+    def handle(self, *args, **options):
+        project_ids = options["project_ids"] or list(
+            Project.objects.order_by("id").values_list("id", flat=True)
+        )
+        batch_size = options["batch_size"]
+        inconsistent = []
+        for start in range(0, len(project_ids), batch_size):
+            inconsistent += find_inconsistent_projects(
+                project_ids[start : start + batch_size]
+            )
+        if not inconsistent:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Rollups of {len(project_ids)} projects are consistent"
+                )
+            )
+            return
+        self.stdout.write(
+            self.style.WARNING(
+                f"{len(inconsistent)} inconsistent projects: "
+                + ", ".join(str(project_id) for project_id in inconsistent)
+            )
+        )
+        if options["fix"]:
+            for start in range(0, len(inconsistent), batch_size):
+                rebuild_project_rollups(inconsistent[start : start + batch_size])
+            self.stdout.write(self.style.SUCCESS("Rebuilt the inconsistent projects"))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from projects.models import Project
+from tasks.counters import find_inconsistent_projects, rebuild_project_counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-project task counters from the tasks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--project-ids",
+            nargs="+",
+            type=int,
+            help="Only reconcile the counters of these projects",
+        )
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only report the inconsistent projects, without rebuilding",
+        )
+
+    def handle(self, *args, **options):
+        project_ids = options["project_ids"] or list(
+            Project.objects.order_by("id").values_list("id", flat=True)
+        )
+        batch_size = options["batch_size"]
+        inconsistent = []
+        for start in range(0, len(project_ids), batch_size):
+            batch = project_ids[start : start + batch_size]
+            inconsistent += find_inconsistent_projects(batch)
+            if not options["check"]:
+                rebuild_project_counters(batch)
+        if inconsistent:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{len(inconsistent)} inconsistent projects: "
+                    + ", ".join(str(project_id) for project_id in inconsistent)
+                )
+            )
+        if options["check"]:
+            if not inconsistent:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Counters of {len(project_ids)} projects are consistent"
+                    )
+                )
+            return
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt the counters of {len(project_ids)} projects")
+        )
@@ -0,0 +1,93 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("organizations", "0008_auto_20220930_0451"),
+        ("projects", "0063_projectbookmark"),
+        ("workspaces", "0017_alter_workspace_guest_workspace"),
+        ("tasks", "0050_alter_annotation_unique_together"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskCountRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "language",
+                    models.CharField(blank=True, max_length=100, null=True),
+                ),
+                ("project_type", models.CharField(max_length=100)),
+                (
+                    "role",
+                    models.PositiveSmallIntegerField(
+                        choices=[
+                            (0, "Task"),
+                            (1, "Annotator's Annotation"),
+                            (2, "Reviewer's Annotation"),
+                            (3, "Super Checker's Annotation"),
+                        ]
+                    ),
+                ),
+                ("task_status", models.CharField(max_length=100)),
+                (
+                    "annotation_status",
+                    models.CharField(blank=True, default="", max_length=100),
+                ),
+                ("day", models.DateField(blank=True, null=True)),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "organization",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="organizations.organization",
+                    ),
+                ),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="task_count_rollups",
+                        to="projects.project",
+                    ),
+                ),
+                (
+                    "workspace",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="workspaces.workspace",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["project", "role", "day"],
+                        name="tasks_rollup_project_idx",
+                    ),
+                    models.Index(
+                        fields=["organization", "project_type", "role", "day"],
+                        name="tasks_rollup_org_idx",
+                    ),
+                    models.Index(
+                        fields=["workspace", "project_type", "role", "day"],
+                        name="tasks_rollup_workspace_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes are built without locking the tables against writes, which
+    # cannot happen inside a transaction
+    atomic = False
+
+    dependencies = [
+        ("tasks", "0052_projecttaskcounter"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="task",
+            index=models.Index(
+                fields=["project_id", "task_status", "id"],
+                name="task_project_status_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(task_status="incomplete"),
+                fields=["project_id", "id"],
+                name="task_incomplete_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(
+                    ("review_user__isnull", True), ("task_status", "annotated")
+                ),
+                fields=["project_id", "id"],
+                name="task_awaiting_review_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(
+                    ("super_check_user__isnull", True), ("task_status", "reviewed")
+                ),
+                fields=["project_id", "id"],
+                name="task_awaiting_supercheck_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="task",
+            index=models.Index(
+                fields=["review_user", "project_id", "task_status"],
+                name="task_review_user_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="task",
+            index=models.Index(
+                fields=["super_check_user", "project_id", "task_status"],
+                name="task_super_check_user_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="task",
+            index=models.Index(
+                fields=["project_id", "input_data"], name="task_project_input_idx"
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="annotation",
+            index=models.Index(
+                fields=["task", "annotation_type", "annotation_status"],
+                name="annotation_task_type_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="annotation",
+            index=models.Index(
+                fields=[
+                    "completed_by",
+                    "annotation_type",
+                    "annotation_status",
+                    "updated_at",
+                ],
+                name="annotation_user_status_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="annotation",
+            index=models.Index(
+                fields=["annotation_type", "updated_at"],
+                name="annotation_type_updated_idx",
+            ),
+        ),
+    ]
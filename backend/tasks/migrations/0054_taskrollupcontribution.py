@@ -0,0 +1,27 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("projects", "0063_projectbookmark"),
+        ("tasks", "0053_task_annotation_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskRollupContribution",
+            fields=[
+                ("task_id", models.IntegerField(primary_key=True, serialize=False)),
+                ("counts", models.JSONField(default=list)),
+                (
+                    "project",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="task_rollup_contributions",
+                        to="projects.project",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -6,6 +6,7 @@ from copy import deepcopy
 from datetime import datetime, timedelta
 from django.http import HttpResponse
 from django.utils.timezone import now
+import functools
 import json
 
 from label_studio.core.version import get_git_version
@@ -19,11 +20,22 @@ from label_studio_tools.core.label_config import parse_config
 from django.conf import settings
 import pandas as pd
 
-from django.db import models
+from collections import Counter
+
+from django.db import connections, models, transaction
+from django.db.models import sql
+from django.db.models.signals import (
+    m2m_changed,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
 
 from users.models import User
 from dataset.models import DatasetBase, DatasetInstance
+from organizations.models import Organization
 from projects.models import Project
+from workspaces.models import Workspace
 
 # Create your models here.
 
@@ -109,6 +121,154 @@ def default_revision_loop_count_value():
     return dict
 
 
+# Task fields (and their attnames) the counters of a task depend on
+COUNTED_FIELDS = {
+    "task_status",
+    "review_user",
+    "review_user_id",
+    "super_check_user",
+    "super_check_user_id",
+}
+COUNTED_ATTNAMES = ("task_status", "review_user_id", "super_check_user_id")
+
+
+class RollupQuerySet(models.QuerySet):
+    """
+    QuerySet marking the tasks it writes in bulk as dirty for the task count
+    rollups, as bulk_create and update send no signals. bulk_update runs
+    through update, which reads the written tasks back with RETURNING.
+    Deletes read the tasks of the rows with one query before deleting them,
+    as delete receivers would keep Django from deleting the rows in bulk.
+    """
+
+    # Fields of the model holding the task and the project of its rows
+    task_field = "id"
+    project_field = None
+
+    def _task_fields(self):
+        return [
+            self.model._meta.get_field(name) if name else None
+            for name in (self.task_field, self.project_field)
+        ]
+
+    def _created_tasks(self, objs):
+        """
+        Returns the (task id, project id) pairs of the created objs.
+        """
+        task_field, project_field = self._task_fields()
+        return [
+            (
+                getattr(obj, task_field.attname),
+                getattr(obj, project_field.attname) if project_field else None,
+            )
+            for obj in objs
+            if getattr(obj, task_field.attname)
+        ]
+
+    def _mark_written(self, tasks):
+        from tasks.analytics import mark_tasks_dirty
+
+        mark_tasks_dirty({task_id for task_id, _ in tasks})
+
+    def _before_delete(self):
+        """
+        Returns the (task id, project id) pairs of the rows, read before they
+        are deleted. _after_delete is given the result after the delete.
+        """
+        fields = [field.attname for field in self._task_fields() if field]
+        return [
+            (row[0], row[1] if len(row) > 1 else None)
+            for row in self.order_by().values_list(*fields).distinct()
+        ]
+
+    def _after_delete(self, tasks):
+        from tasks.analytics import mark_tasks_dirty
+
+        mark_tasks_dirty({task_id for task_id, _ in tasks})
+
+    def _run_delete(self, delete):
+        with transaction.atomic(using=self.db):
+            deleted = self._before_delete()
+            result = delete()
+            self._after_delete(deleted)
+        return result
+
+    def delete(self):
+        return self._run_delete(super().delete)
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self._mark_written(self._created_tasks(objs))
+        return objs
+
+    def update(self, **kwargs):
+        """
+        Runs the UPDATE of QuerySet.update with a RETURNING clause, so that
+        the written tasks come from the statement itself instead of a read
+        of every matching row before it.
+        """
+        self._not_support_combined_queries("update")
+        if self.query.is_sliced:
+            raise TypeError("Cannot update a query once a slice has been taken.")
+        self._for_write = True
+        query = self.query.chain(sql.UpdateQuery)
+        query.add_update_values(kwargs)
+        # Clear any annotations so that they won't be present in subqueries.
+        query.annotations = {}
+        if query.related_updates:
+            raise ValueError("Fields of parent models cannot be updated in bulk")
+        compiler = query.get_compiler(self.db)
+        compiler.pre_sql_setup()
+        update_sql, params = compiler.as_sql()
+        tasks = []
+        if update_sql:
+            connection = connections[self.db]
+            returning = ", ".join(
+                connection.ops.quote_name(field.column) if field else "NULL"
+                for field in self._task_fields()
+            )
+            with transaction.mark_for_rollback_on_error(using=self.db):
+                with connection.cursor() as cursor:
+                    cursor.execute(f"{update_sql} RETURNING {returning}", params)
+                    tasks = cursor.fetchall()
+        self._result_cache = None
+        self._mark_written(tasks)
+        return len(tasks)
+
+    update.alters_data = True
+
+
+class TaskQuerySet(RollupQuerySet):
+    project_field = "project_id"
+
+    def _mark_written(self, tasks):
+        from tasks.analytics import mark_project_counters_dirty
+
+        super()._mark_written(tasks)
+        # The counters are only kept by the signals and the callers of the
+        # helpers of tasks.counters
+        mark_project_counters_dirty({project_id for _, project_id in tasks})
+
+    def _before_delete(self):
+        from tasks.counters import count_tasks
+
+        return super()._before_delete(), count_tasks(self)
+
+    def _after_delete(self, deleted):
+        from tasks.counters import decrement_deleted_task_counters
+
+        tasks, counts = deleted
+        super()._after_delete(tasks)
+        decrement_deleted_task_counters(counts)
+
+
+class AnnotationQuerySet(RollupQuerySet):
+    task_field = "task"
+
+
 class Task(models.Model):
     """
     Task Model
@@ -186,6 +346,61 @@ class Task(models.Model):
         help_text=("Has the revision_loop_count of both supercheck and review"),
     )
 
+    objects = TaskQuerySet.as_manager()
+
+    def get_counters(self):
+        from tasks.counters import get_task_counters
+
+        return get_task_counters(self)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_counted_state()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._remember_counted_state()
+
+    def _remember_counted_state(self):
+        if self.get_deferred_fields().isdisjoint(COUNTED_ATTNAMES):
+            self._loaded_counted_state = self._get_counted_state()
+
+    def _get_counted_state(self):
+        return tuple(getattr(self, attname) for attname in COUNTED_ATTNAMES)
+
+    def save(self, *args, **kwargs):
+        if (
+            not args
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+            and not self._state.adding
+            and self._get_counted_state() == self.__dict__.get("_loaded_counted_state")
+        ):
+            # The counted fields are unchanged since the load, so they are
+            # not written, which keeps pre_save from reading the saved
+            # counters
+            deferred_fields = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in COUNTED_FIELDS
+                and field.attname not in deferred_fields
+            ]
+        # The task counters are updated by pre_save and post_save in the same
+        # transaction
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+        self._remember_counted_state()
+
+    def delete(self, *args, **kwargs):
+        # Through the queryset, for its counter and rollup updates
+        return Task.objects.filter(pk=self.pk)._run_delete(
+            functools.partial(super().delete, *args, **kwargs)
+        )
+
     def assign(self, annotators):
         """
         Assign users to a task
@@ -202,6 +417,44 @@ class Task(models.Model):
     def __str__(self):
         return str(self.id)
 
+    class Meta:
+        indexes = [
+            # Next task and per status listings, in id order
+            models.Index(
+                fields=["project_id", "task_status", "id"],
+                name="task_project_status_idx",
+            ),
+            # Tasks claimed by annotators, reviewers and super checkers
+            models.Index(
+                fields=["project_id", "id"],
+                name="task_incomplete_idx",
+                condition=models.Q(task_status=INCOMPLETE),
+            ),
+            models.Index(
+                fields=["project_id", "id"],
+                name="task_awaiting_review_idx",
+                condition=models.Q(task_status=ANNOTATED, review_user__isnull=True),
+            ),
+            models.Index(
+                fields=["project_id", "id"],
+                name="task_awaiting_supercheck_idx",
+                condition=models.Q(task_status=REVIEWED, super_check_user__isnull=True),
+            ),
+            # Review and supercheck reports and queues of a user
+            models.Index(
+                fields=["review_user", "project_id", "task_status"],
+                name="task_review_user_idx",
+            ),
+            models.Index(
+                fields=["super_check_user", "project_id", "task_status"],
+                name="task_super_check_user_idx",
+            ),
+            # Tasks sharing a data item, for multiple annotators per task
+            models.Index(
+                fields=["project_id", "input_data"], name="task_project_input_idx"
+            ),
+        ]
+
 
 class Annotation(models.Model):
     """
@@ -270,6 +523,14 @@ class Annotation(models.Model):
         help_text="Meta statistics for the annotation result",
     )
 
+    objects = AnnotationQuerySet.as_manager()
+
+    def delete(self, *args, **kwargs):
+        # Through the queryset, for its rollup updates
+        return Annotation.objects.filter(pk=self.pk)._run_delete(
+            functools.partial(super().delete, *args, **kwargs)
+        )
+
     def __str__(self):
         return str(self.id)
 
@@ -279,6 +540,27 @@ class Annotation(models.Model):
             "completed_by",
             "parent_annotation",
         )
+        indexes = [
+            # Annotations of a task of one type, as the task queues look them up
+            models.Index(
+                fields=["task", "annotation_type", "annotation_status"],
+                name="annotation_task_type_idx",
+            ),
+            # Work of a user over a period, for the reports
+            models.Index(
+                fields=[
+                    "completed_by",
+                    "annotation_type",
+                    "annotation_status",
+                    "updated_at",
+                ],
+                name="annotation_user_status_idx",
+            ),
+            models.Index(
+                fields=["annotation_type", "updated_at"],
+                name="annotation_type_updated_idx",
+            ),
+        ]
 
 
 class Prediction(models.Model):
@@ -377,6 +659,203 @@ class Prediction(models.Model):
     #     db_table = 'prediction'
 
 
+ROLLUP_TASK = 0
+
+ROLLUP_ROLE = (
+    (ROLLUP_TASK, "Task"),
+    (ANNOTATOR_ANNOTATION, "Annotator's Annotation"),
+    (REVIEWER_ANNOTATION, "Reviewer's Annotation"),
+    (SUPER_CHECKER_ANNOTATION, "Super Checker's Annotation"),
+)
+
+
+class TaskCountRollup(models.Model):
+    """
+    Pre-aggregated task and annotation counts used by the task count analytics.
+
+    Annotation rows are bucketed on the day the annotation was last updated.
+    Task rows (role ROLLUP_TASK) have no day and count the tasks of a project
+    by status. The rows of a project are rebuilt by tasks.analytics.
+    """
+
+    organization = models.ForeignKey(
+        Organization, on_delete=models.CASCADE, null=True, blank=True
+    )
+    workspace = models.ForeignKey(
+        Workspace, on_delete=models.CASCADE, null=True, blank=True
+    )
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="task_count_rollups"
+    )
+    language = models.CharField(max_length=100, null=True, blank=True)
+    project_type = models.CharField(max_length=100)
+    role = models.PositiveSmallIntegerField(choices=ROLLUP_ROLE)
+    task_status = models.CharField(max_length=100)
+    annotation_status = models.CharField(max_length=100, blank=True, default="")
+    day = models.DateField(null=True, blank=True)
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.project_id} {self.role} {self.task_status} {self.day}"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["project", "role", "day"], name="tasks_rollup_project_idx"
+            ),
+            models.Index(
+                fields=["organization", "project_type", "role", "day"],
+                name="tasks_rollup_org_idx",
+            ),
+            models.Index(
+                fields=["workspace", "project_type", "role", "day"],
+                name="tasks_rollup_workspace_idx",
+            ),
+        ]
+
+
+class TaskRollupContribution(models.Model):
+    """
+    The rollup counts of a task as last applied to TaskCountRollup, which the
+    refresh of the rollups subtracts when the task changes. The task is not a
+    foreign key, so that the counts of a deleted task remain to be
+    subtracted.
+    """
+
+    task_id = models.IntegerField(primary_key=True)
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="task_rollup_contributions"
+    )
+    # [role, task status, annotation status, day, count] rows
+    counts = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"{self.project_id} {self.task_id}"
+
+
+UNASSIGNED_COUNTER = "unassigned"
+AWAITING_REVIEW_COUNTER = "awaiting_review"
+AWAITING_SUPERCHECK_COUNTER = "awaiting_supercheck"
+
+
+class ProjectTaskCounter(models.Model):
+    """
+    Number of tasks of a project in a state: one row per task status, and
+    the unassigned tasks (with no annotation users), the annotated tasks
+    awaiting a reviewer and the reviewed tasks awaiting a super checker.
+
+    The counters are incremented by the task signals below in the
+    transaction of the change, and rebuilt from the tasks by
+    tasks.counters for the changes that bypass the signals.
+    """
+
+    project = models.ForeignKey(
+        Project, on_delete=models.CASCADE, related_name="task_counters"
+    )
+    name = models.CharField(max_length=50)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.project_id} {self.name} {self.count}"
+
+    class Meta:
+        unique_together = ("project", "name")
+
+
+@receiver(post_save, sender=Task)
+def mark_task_dirty(sender, instance, **kwargs):
+    from tasks.analytics import mark_tasks_dirty
+
+    mark_tasks_dirty([instance.id])
+
+
+@receiver(pre_save, sender=Task)
+def record_saved_task_counters(sender, instance, update_fields, **kwargs):
+    from tasks.counters import get_state_counters
+
+    if instance._state.adding or (
+        update_fields is not None and COUNTED_FIELDS.isdisjoint(update_fields)
+    ):
+        return
+    # Locked until the save commits, so concurrent saves apply their changes
+    # one after the other
+    state = (
+        Task.objects.select_for_update()
+        .filter(pk=instance.pk)
+        .values_list("task_status", "review_user_id", "super_check_user_id")
+        .first()
+    )
+    if state is not None:
+        instance._saved_counters = get_state_counters(*state)
+
+
+@receiver(post_save, sender=Task)
+def increment_saved_task_counters(sender, instance, created, **kwargs):
+    from tasks.counters import increment_counters
+
+    saved_counters = instance.__dict__.pop("_saved_counters", None)
+    deltas = Counter(instance.get_counters())
+    if created:
+        deltas[UNASSIGNED_COUNTER] += 1
+    elif saved_counters is None:
+        return
+    else:
+        deltas.subtract(saved_counters)
+    increment_counters(instance.project_id_id, deltas)
+
+
+@receiver(m2m_changed, sender=Task.annotation_users.through)
+def update_unassigned_task_counters(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    from tasks.counters import (
+        get_assigned_task_ids,
+        get_assignment_changes,
+        increment_counters,
+    )
+
+    if action.startswith("pre_"):
+        if not reverse:
+            task_ids = {instance.pk}
+        elif pk_set is not None:
+            task_ids = set(pk_set)
+        else:
+            task_ids = set(
+                sender.objects.filter(user_id=instance.pk).values_list(
+                    "task_id", flat=True
+                )
+            )
+        instance._assignment_before = (
+            task_ids,
+            get_assigned_task_ids(sender, task_ids),
+        )
+        return
+    task_ids, assigned_before = instance.__dict__.pop(
+        "_assignment_before", (set(), set())
+    )
+    if not task_ids:
+        return
+    for project_id, delta in get_assignment_changes(
+        sender, task_ids, assigned_before
+    ).items():
+        increment_counters(project_id, {UNASSIGNED_COUNTER: delta})
+
+
+@receiver(post_save, sender=Annotation)
+def mark_annotation_task_dirty(sender, instance, **kwargs):
+    from tasks.analytics import mark_tasks_dirty
+
+    mark_tasks_dirty([instance.task_id])
+
+
+@receiver(post_save, sender=Project)
+def update_project_rollups(sender, instance, created, **kwargs):
+    from tasks.analytics import update_rollup_projects
+
+    if not created:
+        update_rollup_projects(instance)
+
+
 EXPORT_DIR = "/usr"
 UPLOAD_DIR = "/usr"
 MEDIA_ROOT = "/usr"
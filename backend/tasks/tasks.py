@@ -0,0 +1,89 @@
+from celery import shared_task
+from celery.utils.log import get_task_logger
+from django.db import transaction
+from rest_framework.response import Response
+
+from tasks.models import Annotation
+from tasks.utils import (
+    append_multiple_llm_interactions,
+    compute_meta_stats_for_instruction_driven_chat,
+    compute_meta_stats_for_multiple_llm_idc,
+    publish_llm_job_event,
+)
+
+logger = get_task_logger(__name__)
+
+NO_PROMPT_MESSAGE = "Please make sure you have entered a prompt and the system has responded with an answer"
+
+
+@shared_task(bind=True)
+def generate_llm_output(self, annotation_id, prompt, prompt_output_pair_id=None):
+    """
+    Generates the LLM output(s) for a prompt of an InstructionDrivenChat or
+    MultipleLLMInstructionDrivenChat annotation and appends them to the
+    annotation result. Progress is published to the job event stream read by
+    functions.views.llm_job_stream.
+    """
+    # Imported here as tasks.views imports this module
+    from tasks.views import get_all_llm_output, get_llm_output
+
+    job_id = self.request.id
+    try:
+        annotation = Annotation.objects.select_related("task__project_id").get(
+            pk=annotation_id
+        )
+        task = annotation.task
+        project = task.project_id
+        publish_llm_job_event(job_id, {"status": "started"})
+
+        if project.project_type == "MultipleLLMInstructionDrivenChat":
+            output = get_all_llm_output(
+                prompt,
+                task,
+                annotation,
+                project.metadata_json,
+                task.data.get("model", []),
+            )
+        else:
+            output = get_llm_output(prompt, task, annotation, project.metadata_json)
+
+        if output == -1 or isinstance(output, Response):
+            message = NO_PROMPT_MESSAGE if output == -1 else output.data["message"]
+            publish_llm_job_event(job_id, {"error": message, "done": True})
+            logger.info(
+                f"LLM generation failed for annotation {annotation_id}: {message}"
+            )
+            return {"error": message}
+
+        if isinstance(output, dict):
+            for model_name, model_output in output.items():
+                publish_llm_job_event(
+                    job_id, {"model": model_name, "output": model_output}
+                )
+
+        # Other autosaves may have changed the annotation during the generation
+        with transaction.atomic():
+            annotation = Annotation.objects.select_for_update().get(pk=annotation_id)
+            if not isinstance(annotation.result, list):
+                annotation.result = []
+            if project.project_type == "MultipleLLMInstructionDrivenChat":
+                append_multiple_llm_interactions(
+                    annotation.result, prompt, output, prompt_output_pair_id
+                )
+                annotation.meta_stats = compute_meta_stats_for_multiple_llm_idc(
+                    annotation.result
+                )
+            else:
+                annotation.result.append({"prompt": prompt, "output": output})
+                annotation.meta_stats = compute_meta_stats_for_instruction_driven_chat(
+                    annotation.result
+                )
+            annotation.save(update_fields=["result", "meta_stats", "updated_at"])
+
+        publish_llm_job_event(job_id, {"output": output, "done": True})
+        return {"output": output}
+    except Exception as e:
+        # The stream client would otherwise wait for a done event until it
+        # times out
+        publish_llm_job_event(job_id, {"error": str(e), "done": True})
+        raise
@@ -1,3 +1,289 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+
+import billiard
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from organizations.models import Organization
+from organizations.tasks import get_counts
+from projects.models import Project, REVIEW_STAGE
+from projects.task_allocation import claim_annotation_tasks
+from projects.utils import get_next_task
+from projects.views import get_review_reports
+from users.models import User
+from utils.quality_metrics import PROCESS_POOL_MIN_PAIRS, compute_text_pair_metrics
+from utils.query_plans import find_full_scans
+from .analytics import (
+    find_inconsistent_projects as find_inconsistent_rollups,
+    get_stored_rollups,
+    refresh_task_rollups,
+)
+from .counters import (
+    find_inconsistent_projects,
+    get_project_counters,
+    increment_created_task_counters,
+)
+from .models import (
+    Annotation,
+    Task,
+    ANNOTATED,
+    ACCEPTED,
+    ANNOTATOR_ANNOTATION,
+    INCOMPLETE,
+    LABELED,
+    REVIEWER_ANNOTATION,
+    ROLLUP_TASK,
+    UNASSIGNED_COUNTER,
+    AWAITING_REVIEW_COUNTER,
+)
 
 # Create your tests here.
+
+
+class ProjectTaskCounterTestcase(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(
+            title="Counted project", project_type="InstructionDrivenChat"
+        )
+        self.user = User.objects.create_user(
+            username="counted", email="counted@email.com", password="counted"
+        )
+        get_project_counters(self.project.id)
+
+    def assertConsistent(self):
+        self.assertEqual(find_inconsistent_projects([self.project.id]), [])
+
+    def test_counters_follow_task_changes(self):
+        tasks = [Task(project_id=self.project, data={}) for _ in range(3)]
+        Task.objects.bulk_create(tasks)
+        increment_created_task_counters(tasks)
+        Task.objects.create(project_id=self.project, data={})
+        counters = get_project_counters(self.project.id)
+        self.assertEqual(counters[INCOMPLETE], 4)
+        self.assertEqual(counters[UNASSIGNED_COUNTER], 4)
+
+        task = Task.objects.get(id=tasks[0].id)
+        task.annotation_users.add(self.user)
+        task.task_status = ANNOTATED
+        task.save()
+        self.user.annotation_users.add(tasks[1].id)
+        counters = get_project_counters(self.project.id)
+        self.assertEqual(counters[UNASSIGNED_COUNTER], 2)
+        self.assertEqual(counters[AWAITING_REVIEW_COUNTER], 1)
+        self.assertConsistent()
+
+        task.annotation_users.clear()
+        Task.objects.get(id=tasks[2].id).delete()
+        counters = get_project_counters(self.project.id)
+        self.assertEqual(counters[INCOMPLETE], 2)
+        self.assertEqual(counters[UNASSIGNED_COUNTER], 2)
+        self.assertConsistent()
+
+    def test_saves_and_deletes_run_a_fixed_number_of_queries(self):
+        task = Task.objects.create(project_id=self.project, data={})
+        task = Task.objects.get(id=task.id)
+        task.data = {"prompt": "changed"}
+        # The counted fields are unchanged, so only the UPDATE runs
+        with self.assertNumQueries(1):
+            task.save()
+
+        queries = []
+        for count in (10, 100):
+            created = Task.objects.bulk_create(
+                Task(project_id=self.project, data={}) for _ in range(count)
+            )
+            increment_created_task_counters(created)
+            with CaptureQueriesContext(connection) as context:
+                Task.objects.filter(project_id=self.project).delete()
+            queries.append(len(context.captured_queries))
+        self.assertEqual(queries[0], queries[1])
+        self.assertConsistent()
+
+
+class TaskCountRollupTestcase(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(
+            title="Rolled up project", project_type="InstructionDrivenChat"
+        )
+        self.user = User.objects.create_user(
+            username="rolled", email="rolled@email.com", password="rolled"
+        )
+        self.tasks = Task.objects.bulk_create(
+            Task(project_id=self.project, data={}) for _ in range(3)
+        )
+
+    def assertConsistent(self):
+        self.assertEqual(find_inconsistent_rollups([self.project.id]), [])
+
+    def test_refresh_applies_the_changed_tasks(self):
+        # Builds the rollups of the project on its first refresh
+        refresh_task_rollups([self.tasks[0].id])
+        self.assertConsistent()
+
+        task = self.tasks[0]
+        task.task_status = ANNOTATED
+        task.save()
+        Annotation.objects.create(
+            task=task,
+            completed_by=self.user,
+            result=[],
+            annotation_status=LABELED,
+            annotation_type=ANNOTATOR_ANNOTATION,
+        )
+        Task.objects.filter(id=self.tasks[1].id).delete()
+        refresh_task_rollups([task.id, self.tasks[1].id])
+        self.assertConsistent()
+        stored = get_stored_rollups([self.project.id])
+        self.assertEqual(
+            stored[(self.project.id, ROLLUP_TASK, INCOMPLETE, "", None)], 1
+        )
+        self.assertEqual(stored[(self.project.id, ROLLUP_TASK, ANNOTATED, "", None)], 1)
+
+        Annotation.objects.filter(task=task).update(annotation_status=ACCEPTED)
+        refresh_task_rollups([task.id])
+        self.assertConsistent()
+
+    def test_bulk_update_marks_the_written_tasks(self):
+        Annotation.objects.create(
+            task=self.tasks[0],
+            completed_by=self.user,
+            result=[],
+            annotation_status=LABELED,
+            annotation_type=ANNOTATOR_ANNOTATION,
+        )
+        with mock.patch("tasks.analytics.mark_tasks_dirty") as mark_tasks_dirty:
+            with mock.patch(
+                "tasks.analytics.mark_project_counters_dirty"
+            ) as mark_project_counters_dirty, self.assertNumQueries(1):
+                rows = Task.objects.filter(project_id=self.project).update(
+                    task_status=ANNOTATED
+                )
+            self.assertEqual(rows, 3)
+            mark_tasks_dirty.assert_called_once_with({task.id for task in self.tasks})
+            mark_project_counters_dirty.assert_called_once_with({self.project.id})
+
+            mark_tasks_dirty.reset_mock()
+            rows = Annotation.objects.filter(task__project_id=self.project).update(
+                annotation_status=ACCEPTED
+            )
+            self.assertEqual(rows, 1)
+            mark_tasks_dirty.assert_called_once_with({self.tasks[0].id})
+
+
+class QueryPlanTestcase(TestCase):
+    """
+    The hot queries on tasks and annotations must each be served by an
+    index, checked on the plans of a seeded database.
+    """
+
+    def setUp(self):
+        self.organization = Organization.objects.create(title="Plan Organization")
+        self.annotator = User.objects.create_user(
+            username="planned", email="planned@email.com", password="planned"
+        )
+        self.reviewer = User.objects.create_user(
+            username="planner", email="planner@email.com", password="planner"
+        )
+        self.project = Project.objects.create(
+            title="Planned project",
+            project_type="InstructionDrivenChat",
+            organization_id=self.organization,
+            project_stage=REVIEW_STAGE,
+            is_published=True,
+        )
+        self.project.annotators.add(self.annotator)
+        self.project.annotation_reviewers.add(self.reviewer)
+        Task.objects.bulk_create(
+            Task(project_id=self.project, data={"text": f"task {i}"}) for i in range(20)
+        )
+        for task in Task.objects.filter(project_id=self.project)[:10]:
+            task.annotation_users.add(self.annotator)
+            task.task_status = ANNOTATED
+            task.review_user = self.reviewer
+            task.save()
+            annotation = Annotation.objects.create(
+                task=task,
+                completed_by=self.annotator,
+                result=[],
+                annotation_status=LABELED,
+                annotation_type=ANNOTATOR_ANNOTATION,
+            )
+            Annotation.objects.create(
+                task=task,
+                completed_by=self.reviewer,
+                result=[],
+                annotation_status=ACCEPTED,
+                annotation_type=REVIEWER_ANNOTATION,
+                parent_annotation=annotation,
+            )
+        self.end = timezone.now() + timedelta(days=1)
+        self.start = self.end - timedelta(days=7)
+
+    def assertIndexed(self, func):
+        full_scans = find_full_scans(
+            func, {Task._meta.db_table, Annotation._meta.db_table}
+        )
+        self.assertEqual([(sql, node["Relation Name"]) for sql, node in full_scans], [])
+
+    def test_next_task(self):
+        self.assertIndexed(
+            lambda: get_next_task(self.project.id, self.annotator, "annotation", {})
+        )
+        self.assertIndexed(
+            lambda: get_next_task(self.project.id, self.reviewer, "review", {})
+        )
+
+    def test_assign_new_tasks(self):
+        self.assertIndexed(
+            lambda: claim_annotation_tasks(self.project, self.annotator, 5)
+        )
+
+    def test_review_reports(self):
+        self.assertIndexed(
+            lambda: get_review_reports(
+                self.project.id, self.reviewer.id, self.start, self.end
+            )
+        )
+
+    def test_annotator_counts(self):
+        self.assertIndexed(
+            lambda: get_counts(
+                self.organization.id,
+                self.annotator,
+                self.project.project_type,
+                self.start,
+                self.end,
+                False,
+                REVIEW_STAGE,
+            )
+        )
+
+
+def compute_metrics_in_child(text_pairs, queue):
+    try:
+        queue.put(compute_text_pair_metrics(text_pairs, workers=2))
+    except Exception as e:
+        queue.put(e)
+
+
+class QualityMetricsPoolTestcase(SimpleTestCase):
+    def test_pool_batches_run_in_daemonic_processes(self):
+        """
+        Celery prefork workers are daemonic billiard processes, which cannot
+        start a process pool.
+        """
+        text_pairs = [
+            (f"prompt {i} of the child", f"prompt {i} of the parent")
+            for i in range(PROCESS_POOL_MIN_PAIRS)
+        ]
+        queue = billiard.Queue()
+        process = billiard.Process(
+            target=compute_metrics_in_child, args=(text_pairs, queue), daemon=True
+        )
+        process.start()
+        metrics = queue.get(timeout=60)
+        process.join()
+        self.assertEqual(metrics, compute_text_pair_metrics(text_pairs, workers=1))
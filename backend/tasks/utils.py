@@ -27,6 +27,7 @@ Queued_Task_name = {
     "projects.tasks.create_parameters_for_task_creation": "Create Tasks for new Project",
     "projects.tasks.export_project_in_place": "Export Project In Place",
     "projects.tasks.export_project_new_record": "Export Project New Record",
+    "tasks.tasks.generate_llm_output": "Generate LLM Output for Chat Annotation",
     "send_mail_task": "Daily User Mails Scheduler",
     "send_user_reports_mail": "Send User Reports Mail ",
     "workspaces.tasks.send_project_analysis_reports_mail_ws": "Send Project Analysis Reports Mail At Workspace Level",
@@ -116,6 +117,75 @@ def compute_meta_stats_for_multiple_llm_idc(conversation_history):
 
     return meta_stats
 
+# Events of asynchronous LLM generation jobs are kept in a redis stream per job
+LLM_JOB_EVENTS_TTL = 60 * 60
+LLM_JOB_EVENTS_MAXLEN = 1000
+
+
+def llm_job_events_key(job_id):
+    return f"llm_job:{job_id}:events"
+
+
+def llm_job_owner_key(job_id):
+    return f"llm_job:{job_id}:owner"
+
+
+def record_llm_job_owner(job_id, user_id):
+    """
+    Records the user who queued an LLM generation job, the only one allowed
+    to read its event stream.
+    """
+    from anudesh_backend.locks import get_redis_connection
+
+    get_redis_connection().set(
+        llm_job_owner_key(job_id), str(user_id), ex=LLM_JOB_EVENTS_TTL
+    )
+
+
+def publish_llm_job_event(job_id, event):
+    """
+    Appends an event (dict) to the event stream of an LLM generation job.
+    """
+    from anudesh_backend.locks import get_redis_connection
+
+    key = llm_job_events_key(job_id)
+    redis_connection = get_redis_connection()
+    pipeline = redis_connection.pipeline()
+    pipeline.xadd(
+        key, {"event": json.dumps(event)}, maxlen=LLM_JOB_EVENTS_MAXLEN, approximate=True
+    )
+    pipeline.expire(key, LLM_JOB_EVENTS_TTL)
+    pipeline.execute()
+
+
+def append_multiple_llm_interactions(result, prompt, model_outputs, prompt_output_pair_id):
+    """
+    Appends the outputs of a prompt to the interactions of each model in a
+    MultipleLLMInstructionDrivenChat annotation result.
+    """
+    if not result:
+        result.append({"eval_form": [], "model_interactions": []})
+    result_entry = result[0]
+    if "model_interactions" not in result_entry:
+        result_entry["model_interactions"] = []
+    for model_name, model_output in model_outputs.items():
+        new_interaction = {
+            "prompt": prompt,
+            "output": model_output,
+            "preferred_response": False,
+            "prompt_output_pair_id": prompt_output_pair_id,
+        }
+        for model_entry in result_entry["model_interactions"]:
+            if model_entry.get("model_name") == model_name:
+                model_entry["interaction_json"].append(new_interaction)
+                break
+        else:
+            result_entry["model_interactions"].append(
+                {"model_name": model_name, "interaction_json": [new_interaction]}
+            )
+    return result
+
+
 def query_flower(filters=None):
     try:
         load_dotenv()
@@ -2,6 +2,7 @@ from datetime import datetime, timezone
 from locale import normalize
 from urllib.parse import unquote
 import ast
+import uuid
 from django.http import JsonResponse
 from rest_framework import viewsets
 from rest_framework import mixins
@@ -21,6 +22,8 @@ from tasks.serializers import (
 )
 from tasks.utils import compute_meta_stats_for_instruction_driven_chat, compute_meta_stats_for_multiple_llm_idc, query_flower
 from tasks.utils import Queued_Task_name, convert_audio_base64_to_mp3
+from tasks.utils import publish_llm_job_event, record_llm_job_owner
+from tasks.tasks import generate_llm_output
 from utils.pagination import paginate_queryset
 from notifications.views import createNotification
 from notifications.utils import get_userids_from_project_id
@@ -1698,6 +1701,63 @@ class AnnotationViewSet(
 
         return annotation_response
 
+    def enqueue_llm_generation(self, request, annotation_obj, task):
+        """
+        Saves the autosave fields of a chat annotation and queues the LLM
+        generation for the prompt. The output is streamed to the client by
+        functions.views.llm_job_stream and appended to the annotation result
+        by the celery task.
+        """
+        project_type = task.project_id.project_type
+        prompt = request.data.get("result")
+        if project_type not in [
+            "InstructionDrivenChat",
+            "MultipleLLMInstructionDrivenChat",
+        ] or not isinstance(prompt, str):
+            return Response(
+                {"message": "Asynchronous generation is only supported for chat prompts."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if prompt in [None, "Null", 0, "None", "", " "]:
+            ret_dict = {
+                "message": "Please make sure you have entered a prompt and the system has responded with an answer"
+            }
+            return Response(ret_dict, status=status.HTTP_403_FORBIDDEN)
+
+        if annotation_obj.annotation_type == ANNOTATOR_ANNOTATION:
+            is_owner = task.annotation_users.filter(id=request.user.id).exists()
+            notes_field = "annotation_notes"
+        elif annotation_obj.annotation_type == REVIEWER_ANNOTATION:
+            is_owner = task.review_user_id == request.user.id
+            notes_field = "review_notes"
+        else:
+            is_owner = task.super_check_user_id == request.user.id
+            notes_field = "supercheck_notes"
+        if not is_owner:
+            ret_dict = {"message": "You are trying to impersonate another user :("}
+            return Response(ret_dict, status=status.HTTP_403_FORBIDDEN)
+
+        update_fields_list = ["updated_at"]
+        if "lead_time" in dict(request.data):
+            annotation_obj.lead_time = request.data["lead_time"]
+            update_fields_list.append("lead_time")
+        if notes_field in dict(request.data):
+            setattr(annotation_obj, notes_field, request.data[notes_field])
+            update_fields_list.append(notes_field)
+        annotation_obj.save(update_fields=update_fields_list)
+
+        job_id = str(uuid.uuid4())
+        record_llm_job_owner(job_id, request.user.id)
+        publish_llm_job_event(job_id, {"status": "queued"})
+        generate_llm_output.apply_async(
+            args=(annotation_obj.id, prompt, request.data.get("prompt_output_pair_id")),
+            task_id=job_id,
+        )
+        return Response(
+            {"message": "LLM generation queued", "job_id": job_id},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
     def partial_update(self, request, pk=None):
         try:
             annotation_obj = Annotation.objects.get(id=pk)
@@ -1727,6 +1787,9 @@ class AnnotationViewSet(
             if request.data["auto_save"] == True:
                 auto_save = True
 
+        if auto_save and request.data.get("async_generation") == True:
+            return self.enqueue_llm_generation(request, annotation_obj, task)
+
         if annotation_obj.annotation_type == REVIEWER_ANNOTATION:
             is_revised = False
             if annotation_obj.annotation_status == TO_BE_REVISED:
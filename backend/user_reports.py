@@ -5,13 +5,17 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "anudesh_backend.settings")
 django.setup()
 import schedule
 import requests
-import time
 from requests.auth import HTTPBasicAuth
 import json
 from users.models import User
 from projects.models import Project
-from datetime import datetime, timedelta
-from users.views import AnalyticsViewSet
+from datetime import datetime, time, timedelta
+from users.analytics import (
+    ANNOTATION_REPORTS,
+    REVIEW_REPORTS,
+    SUPERCHECK_REPORTS,
+    compute_user_analytics,
+)
 from django.db.models import Q
 import pandas as pd
 from django.core.mail import send_mail
@@ -21,72 +25,65 @@ import numpy as np
 
 
 def calculate_reports():
-    analytics = AnalyticsViewSet()
-    proj = Project.objects.all()
-
-    use = User.objects.filter(
+    reporting_users = User.objects.filter(
         role__in=[User.ANNOTATOR, User.REVIEWER, User.SUPER_CHECKER]
     )
-
-    all_annotators = [list(proj1.annotators.all()) for proj1 in proj]
-    all_annotators_flat_list = [num for sublist in all_annotators for num in sublist]
-    final_annot_unique_list = list(set(all_annotators_flat_list))
-    final_annot_unique_list = [
-        annot for annot in final_annot_unique_list if annot in use
-    ]
-
-    all_reviewers = [list(proj1.annotation_reviewers.all()) for proj1 in proj]
-    all_reviewers_flat_list = [num for sublist in all_reviewers for num in sublist]
-    final_reviewer_unique_list = list(set(all_reviewers_flat_list))
-    final_reviewer_unique_list = [
-        reviewer for reviewer in final_reviewer_unique_list if reviewer in use
-    ]
-
-    all_supercheckers = [list(proj1.review_supercheckers.all()) for proj1 in proj]
-    all_supercheckers_flat_list = [
-        num for sublist in all_supercheckers for num in sublist
-    ]
-    final_superchecker_unique_list = list(set(all_supercheckers_flat_list))
-    final_superchecker_unique_list = [
-        superchecker
-        for superchecker in final_superchecker_unique_list
-        if superchecker in use
-    ]
-
-    yest_date = f"{(datetime.now() - timedelta(days = 1) ):%Y-%m-%d}"
-
-    final_user_unique_list = list(
-        set(
-            final_annot_unique_list
-            + final_reviewer_unique_list
-            + final_superchecker_unique_list
+    annotator_ids = set(
+        Project.annotators.through.objects.filter(user__in=reporting_users).values_list(
+            "user_id", flat=True
         )
-    )  # list of all annotators and reviewers
-
-    for user in final_user_unique_list:
-        user1 = User.objects.get(id=user.id)
+    )
+    reviewer_ids = set(
+        Project.annotation_reviewers.through.objects.filter(
+            user__in=reporting_users
+        ).values_list("user_id", flat=True)
+    )
+    superchecker_ids = set(
+        Project.review_supercheckers.through.objects.filter(
+            user__in=reporting_users
+        ).values_list("user_id", flat=True)
+    )
 
-        if not user1.enable_mail:
-            continue
+    yesterday = (datetime.now() - timedelta(days=1)).date()
+    start_date = datetime.combine(yesterday, time(0, 0))
+    end_date = datetime.combine(yesterday, time(23, 59))
 
-        userId = user.id
+    # list of all annotators and reviewers
+    users = list(
+        User.objects.filter(
+            id__in=annotator_ids | reviewer_ids | superchecker_ids, enable_mail=True
+        )
+    )
+    user_ids = [user.id for user in users]
+    annotation_analytics = compute_user_analytics(
+        [user_id for user_id in user_ids if user_id in annotator_ids],
+        ANNOTATION_REPORTS,
+        "all",
+        start_date,
+        end_date,
+    )
+    review_analytics = compute_user_analytics(
+        [user_id for user_id in user_ids if user_id in reviewer_ids],
+        REVIEW_REPORTS,
+        "all",
+        start_date,
+        end_date,
+    )
+    supercheck_analytics = compute_user_analytics(
+        [user_id for user_id in user_ids if user_id in superchecker_ids],
+        SUPERCHECK_REPORTS,
+        "all",
+        start_date,
+        end_date,
+    )
 
-        if user in final_annot_unique_list:
-            data = {
-                "user_id": userId,
-                "project_type": "all",
-                "reports_type": "annotation",
-                "start_date": yest_date,
-                "end_date": yest_date,
-            }
-            try:
-                res = analytics.get_user_analytics(data)
-            except:
-                continue
+    for user in users:
+        is_annotator = user.id in annotator_ids
+        is_reviewer = user.id in reviewer_ids
+        is_superchecker = user.id in superchecker_ids
 
-            final_data = res.data
-            if "total_summary" not in final_data or "project_summary" not in final_data:
-                continue
+        if is_annotator:
+            final_data = annotation_analytics.summary(user.id)
 
             if len(final_data["project_summary"]) > 0:
                 df = pd.DataFrame.from_records(final_data["project_summary"])
@@ -117,22 +114,8 @@ def calculate_reports():
                 index=False,
             )
 
-        if user in final_reviewer_unique_list:
-            data = {
-                "user_id": userId,
-                "project_type": "all",
-                "reports_type": "review",
-                "start_date": yest_date,
-                "end_date": yest_date,
-            }
-            try:
-                res = analytics.get_user_analytics(data)
-            except:
-                continue
-
-            final_data = res.data
-            if "total_summary" not in final_data or "project_summary" not in final_data:
-                continue
+        if is_reviewer:
+            final_data = review_analytics.summary(user.id)
 
             if len(final_data["project_summary"]) > 0:
                 df = pd.DataFrame.from_records(final_data["project_summary"])
@@ -163,23 +146,8 @@ def calculate_reports():
                 index=False,
             )
 
-        if user in final_superchecker_unique_list:
-            data = {
-                "user_id": userId,
-                "project_type": "all",
-                "reports_type": "supercheck",
-                "start_date": yest_date,
-                "end_date": yest_date,
-            }
-
-            try:
-                res = analytics.get_user_analytics(data)
-            except:
-                continue
-
-            final_data = res.data
-            if "total_summary" not in final_data or "project_summary" not in final_data:
-                continue
+        if is_superchecker:
+            final_data = supercheck_analytics.summary(user.id)
 
             if len(final_data["project_summary"]) > 0:
                 df = pd.DataFrame.from_records(final_data["project_summary"])
@@ -218,11 +186,7 @@ def calculate_reports():
             + " are ready.\n Thanks for contributing on Anudesh!"
         )
 
-        if (
-            user in final_annot_unique_list
-            and user in final_reviewer_unique_list
-            and user in final_superchecker_unique_list
-        ):
+        if is_annotator and is_reviewer and is_superchecker:
             email_to_send = (
                 "<p>"
                 + message
@@ -244,7 +208,7 @@ def calculate_reports():
                 + "<br><h2><b>Project-wise Reports</b></h2>"
                 + html_table_df_supercheck
             )
-        elif user in final_annot_unique_list and user in final_reviewer_unique_list:
+        elif is_annotator and is_reviewer:
             email_to_send = (
                 "<p>"
                 + message
@@ -260,7 +224,7 @@ def calculate_reports():
                 + "<br><h2><b>Project-wise Reports</b></h2>"
                 + html_table_df_review
             )
-        elif user in final_annot_unique_list and user in final_superchecker_unique_list:
+        elif is_annotator and is_superchecker:
             email_to_send = (
                 "<p>"
                 + message
@@ -276,10 +240,7 @@ def calculate_reports():
                 + "<br><h2><b>Project-wise Reports</b></h2>"
                 + html_table_df_supercheck
             )
-        elif (
-            user in final_reviewer_unique_list
-            and user in final_superchecker_unique_list
-        ):
+        elif is_reviewer and is_superchecker:
             email_to_send = (
                 "<p>"
                 + message
@@ -295,7 +256,7 @@ def calculate_reports():
                 + "<br><h2><b>Project-wise Reports</b></h2>"
                 + html_table_df_supercheck
             )
-        elif user in final_annot_unique_list:
+        elif is_annotator:
             email_to_send = (
                 "<p>"
                 + message
@@ -304,7 +265,7 @@ def calculate_reports():
                 + "<br><h><b>Project-wise Reports</b></h>"
                 + html_table_df_annotation
             )
-        elif user in final_superchecker_unique_list:
+        elif is_superchecker:
             email_to_send = (
                 "<p>"
                 + message
@@ -0,0 +1,329 @@
+"""
+Set based user analytics.
+
+The annotation, review or supercheck metrics of users in each of their
+projects are computed for many users at once, with one grouped query per
+metric, so the number of queries does not depend on the number of users.
+They are returned as a UserAnalytics, which holds one row per user and
+project as a list per column and formats the summary of each user that the
+user analytics view returns and the daily digest mails.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, Q, Sum
+
+from projects.models import Project
+from projects.utils import (
+    convert_seconds_to_hours,
+    get_audio_project_types,
+    get_audio_transcription_duration,
+    ocr_word_count,
+)
+from tasks.models import (
+    Annotation,
+    ANNOTATOR_ANNOTATION,
+    REVIEWER_ANNOTATION,
+    SUPER_CHECKER_ANNOTATION,
+)
+
+ANNOTATION_REPORTS = "annotation"
+REVIEW_REPORTS = "review"
+SUPERCHECK_REPORTS = "supercheck"
+
+# Project membership, annotation type and filter of the submitted
+# annotations of each type of report
+REPORTS = {
+    ANNOTATION_REPORTS: (
+        Project.annotators.through,
+        ANNOTATOR_ANNOTATION,
+        Q(
+            task__annotation_users=F("completed_by"),
+            task__task_status__in=[
+                "annotated",
+                "reviewed",
+                "exported",
+                "super_checked",
+            ],
+        ),
+    ),
+    REVIEW_REPORTS: (
+        Project.annotation_reviewers.through,
+        REVIEWER_ANNOTATION,
+        Q(
+            task__review_user=F("completed_by"),
+            task__task_status__in=["reviewed", "exported", "super_checked"],
+        )
+        & ~Q(annotation_status__in=["to_be_revised", "draft", "skipped"]),
+    ),
+    SUPERCHECK_REPORTS: (
+        Project.review_supercheckers.through,
+        SUPER_CHECKER_ANNOTATION,
+        Q(
+            task__super_check_user=F("completed_by"),
+            task__task_status__in=["exported", "super_checked"],
+        ),
+    ),
+}
+
+# Names of the submitted tasks and average lead time in each type of report
+REPORT_KEYS = {
+    ANNOTATION_REPORTS: ("Annotated Tasks", "Avg Annotation Time (sec)"),
+    REVIEW_REPORTS: ("Reviewed Tasks", "Avg Review Time (sec)"),
+    SUPERCHECK_REPORTS: ("SuperChecked Tasks", "Avg SuperCheck Time (sec)"),
+}
+
+COLUMNS = (
+    "user_id",
+    "project_id",
+    "project_name",
+    "project_type",
+    "submitted",
+    "draft",
+    "skipped",
+    "to_be_revised",
+    "rejected",
+    "lead_time",
+    "word_count",
+    "duration",
+)
+
+USER_PROJECT = ("completed_by", "task__project_id")
+
+
+def get_reports_type(reports_type):
+    if reports_type in (REVIEW_REPORTS, SUPERCHECK_REPORTS):
+        return reports_type
+    return ANNOTATION_REPORTS
+
+
+class UserAnalytics:
+    """
+    Metrics of users in their projects, one row per user and project, stored
+    as a list per column.
+    """
+
+    def __init__(self, reports_type, project_type, audio_project_types):
+        self.reports_type = reports_type
+        self.project_type = project_type
+        self.audio_project_types = audio_project_types
+        self.columns = {column: [] for column in COLUMNS}
+        self._user_rows = defaultdict(list)
+
+    def append(self, **row):
+        self._user_rows[row["user_id"]].append(len(self.columns["user_id"]))
+        for column in COLUMNS:
+            self.columns[column].append(row[column])
+
+    def user_rows(self, user_id):
+        for index in self._user_rows.get(user_id, []):
+            yield {column: values[index] for column, values in self.columns.items()}
+
+    def summary(self, user_id):
+        """
+        Returns the total and project-wise summaries of the user.
+        """
+        submitted_key, lead_time_key = REPORT_KEYS[self.reports_type]
+        total_submitted = total_lead_time = total_word_count = total_duration = 0
+        project_summary = []
+        for row in self.user_rows(user_id):
+            total_submitted += row["submitted"]
+            total_lead_time += row["lead_time"]
+            total_word_count += row["word_count"]
+            total_duration += row["duration"]
+            if not row["submitted"]:
+                continue
+
+            is_audio_project = row["project_type"] in self.audio_project_types
+            result = {
+                "Project Name": row["project_name"],
+                submitted_key: row["submitted"],
+                "Draft Tasks": row["draft"],
+                "Skipped Tasks": row["skipped"],
+            }
+            if is_audio_project:
+                result["Total Segments Duration"] = convert_seconds_to_hours(
+                    row["duration"]
+                )
+            else:
+                result["Word Count"] = row["word_count"]
+            result[lead_time_key] = round(row["lead_time"] / row["submitted"], 2)
+            if self.reports_type == REVIEW_REPORTS:
+                result["To Be Revised Tasks"] = row["to_be_revised"]
+                result["Rejected Tasks"] = row["rejected"]
+            elif self.reports_type == SUPERCHECK_REPORTS:
+                result["Rejected"] = row["rejected"]
+            project_summary.append(result)
+        project_summary.sort(key=lambda result: result[submitted_key], reverse=True)
+
+        total_result = {
+            submitted_key: total_submitted,
+            "Word Count": total_word_count,
+            "Total Segments Duration": convert_seconds_to_hours(total_duration),
+            lead_time_key: (
+                round(total_lead_time / total_submitted, 2) if total_submitted else 0
+            ),
+        }
+        if (self.project_type or " ").lower() != "all":
+            if self.project_type in self.audio_project_types:
+                del total_result["Word Count"]
+            else:
+                del total_result["Total Segments Duration"]
+
+        return {"total_summary": [total_result], "project_summary": project_summary}
+
+
+def _grouped(queryset, group_by, **aggregates):
+    """
+    Returns a dict of the values of group_by to the aggregates of the
+    annotations of queryset.
+    """
+    rows = queryset.values_list(*group_by).annotate(**aggregates)
+    width = len(group_by)
+    return {
+        tuple(row[:width]): row[width:] if len(aggregates) > 1 else row[width]
+        for row in rows
+    }
+
+
+def _word_counts_and_durations(submitted, project_types, audio_project_types):
+    """
+    Returns the word counts and the durations in seconds of the submitted
+    annotations, by user and project.
+    """
+    word_counts = defaultdict(int)
+    durations = defaultdict(float)
+    result_project_ids = [
+        project_id
+        for project_id, project_type in project_types.items()
+        if project_type in audio_project_types or "OCRTranscription" in project_type
+    ]
+    textual_project_ids = [
+        project_id
+        for project_id in project_types
+        if project_id not in result_project_ids
+    ]
+
+    if textual_project_ids:
+        for user_id, project_id, word_count in submitted.filter(
+            task__project_id__in=textual_project_ids
+        ).values_list(*USER_PROJECT, "task__data__word_count"):
+            if isinstance(word_count, (int, float)):
+                word_counts[(user_id, project_id)] += word_count
+
+    if result_project_ids:
+        for user_id, project_id, result in submitted.filter(
+            task__project_id__in=result_project_ids
+        ).values_list(*USER_PROJECT, "result"):
+            if project_types[project_id] in audio_project_types:
+                try:
+                    durations[
+                        (user_id, project_id)
+                    ] += get_audio_transcription_duration(result)
+                except:
+                    pass
+            else:
+                word_counts[(user_id, project_id)] += ocr_word_count(result)
+    return word_counts, durations
+
+
+def compute_user_analytics(user_ids, reports_type, project_type, start_date, end_date):
+    """
+    Returns the UserAnalytics of the users over the projects of project_type
+    ("all" for every type) where they hold the role of reports_type, counting
+    the work updated between start_date and end_date.
+    """
+    reports_type = get_reports_type(reports_type)
+    through, annotation_type, submitted_filter = REPORTS[reports_type]
+    audio_project_types = set(get_audio_project_types())
+    analytics = UserAnalytics(reports_type, project_type, audio_project_types)
+
+    memberships = through.objects.filter(user_id__in=user_ids)
+    if project_type != "all":
+        memberships = memberships.filter(project__project_type=project_type)
+    memberships = list(
+        memberships.order_by("user_id", "project_id").values_list(
+            "user_id", "project_id", "project__title", "project__project_type"
+        )
+    )
+    if not memberships:
+        return analytics
+    project_types = {
+        project_id: member_project_type
+        for _, project_id, _, member_project_type in memberships
+    }
+
+    annotations = Annotation.objects.filter(
+        annotation_type=annotation_type,
+        completed_by__in=user_ids,
+        task__project_id__in=list(project_types),
+        updated_at__range=[start_date, end_date],
+    )
+    submitted = annotations.filter(submitted_filter)
+    submitted_counts = _grouped(
+        submitted, USER_PROJECT, count=Count("id"), lead_time=Sum("lead_time")
+    )
+    status_counts = _grouped(
+        annotations.filter(annotation_status__in=["draft", "skipped"]),
+        USER_PROJECT,
+        draft=Count("id", filter=Q(annotation_status="draft")),
+        skipped=Count("id", filter=Q(annotation_status="skipped")),
+    )
+    word_counts, durations = _word_counts_and_durations(
+        submitted, project_types, audio_project_types
+    )
+
+    to_be_revised_counts = rejected_counts = {}
+    if reports_type == REVIEW_REPORTS:
+        to_be_revised_counts = _grouped(
+            Annotation.objects.filter(
+                task__project_id__in=list(project_types),
+                task__review_user__in=user_ids,
+                annotation_status="to_be_revised",
+                annotation_type=REVIEWER_ANNOTATION,
+                updated_at__range=[start_date, end_date],
+            ),
+            ("task__review_user", "task__project_id"),
+            count=Count("id"),
+        )
+        # Review annotations rejected, as their supercheck
+        rejected_counts = _grouped(
+            Annotation.objects.filter(
+                task__project_id__in=list(project_types),
+                annotation_status="rejected",
+                annotation_type=SUPER_CHECKER_ANNOTATION,
+                parent_annotation__updated_at__range=[start_date, end_date],
+                parent_annotation__completed_by__in=user_ids,
+                parent_annotation__annotation_status="rejected",
+            ),
+            ("parent_annotation__completed_by", "task__project_id"),
+            count=Count("parent_annotation", distinct=True),
+        )
+    elif reports_type == SUPERCHECK_REPORTS:
+        rejected_counts = _grouped(
+            annotations.filter(
+                task__super_check_user=F("completed_by"),
+                annotation_status="rejected",
+            ),
+            USER_PROJECT,
+            count=Count("id"),
+        )
+
+    for user_id, project_id, project_name, member_project_type in memberships:
+        key = (user_id, project_id)
+        submitted_count, lead_time = submitted_counts.get(key, (0, 0))
+        draft_count, skipped_count = status_counts.get(key, (0, 0))
+        analytics.append(
+            user_id=user_id,
+            project_id=project_id,
+            project_name=project_name,
+            project_type=member_project_type,
+            submitted=submitted_count,
+            draft=draft_count,
+            skipped=skipped_count,
+            to_be_revised=to_be_revised_counts.get(key, 0),
+            rejected=rejected_counts.get(key, 0),
+            lead_time=lead_time or 0,
+            word_count=word_counts[key],
+            duration=durations[key],
+        )
+    return analytics
@@ -0,0 +1,92 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.models import Annotation, Task
+from users.analytics import ANNOTATION_REPORTS, compute_user_analytics
+from users.models import User
+from utils.benchmark import (
+    count_queries,
+    create_synthetic_project,
+    median_time_ms,
+    rolled_back,
+)
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the user analytics of a growing number of annotators, computed
+    at once and summarized for each of them as the daily digest does. The
+    number of queries must not grow with the number of users. All fixtures
+    are rolled back at the end.
+    """
+
+    help = "Benchmark the batch user analytics for an increasing number of users"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            nargs="+",
+            type=int,
+            default=[1, 1000],
+            help="Number of annotators of the synthetic project",
+        )
+        parser.add_argument(
+            "--tasks-per-user",
+            type=int,
+            default=5,
+            help="Number of annotated tasks of each annotator",
+        )
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        end_date = timezone.now() + datetime.timedelta(days=1)
+        start_date = end_date - datetime.timedelta(days=1)
+        tasks_per_user = options["tasks_per_user"]
+
+        for num_users in options["users"]:
+            with rolled_back():
+                users = User.objects.bulk_create(
+                    User(
+                        username=f"benchmark{i}",
+                        email=f"benchmark{i}@anudesh.local",
+                        participation_type=1,
+                    )
+                    for i in range(num_users)
+                )
+                project = create_synthetic_project(
+                    num_users * tasks_per_user, annotators=users
+                )
+                tasks = list(Task.objects.filter(project_id=project).order_by("id"))
+                Task.objects.filter(project_id=project).update(task_status="annotated")
+                Task.annotation_users.through.objects.bulk_create(
+                    Task.annotation_users.through(
+                        task_id=task.id, user_id=users[i // tasks_per_user].id
+                    )
+                    for i, task in enumerate(tasks)
+                )
+                Annotation.objects.bulk_create(
+                    Annotation(
+                        task=task,
+                        completed_by=users[i // tasks_per_user],
+                        annotation_status="labeled",
+                        lead_time=i % 60,
+                        result=[],
+                    )
+                    for i, task in enumerate(tasks)
+                )
+
+                user_ids = [user.id for user in users]
+
+                def summarize():
+                    analytics = compute_user_analytics(
+                        user_ids, ANNOTATION_REPORTS, "all", start_date, end_date
+                    )
+                    return [analytics.summary(user_id) for user_id in user_ids]
+
+                self.stdout.write(
+                    f"{num_users} users: "
+                    f"{median_time_ms(summarize, options['repeat']):.2f} ms, "
+                    f"{count_queries(summarize)} queries"
+                )
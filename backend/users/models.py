@@ -11,7 +11,7 @@ from datetime import datetime, timedelta
 
 from django.core.mail import send_mail, EmailMultiAlternatives
 from django.db import models
-from django.db.models.signals import post_delete
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.postgres.fields import ArrayField
 from django.contrib.auth.base_user import AbstractBaseUser
@@ -485,3 +485,11 @@ class CustomPeriodicTask(models.Model):
 @receiver(post_delete, sender=CustomPeriodicTask)
 def delete_celery_task(sender, instance, **kwargs):
     instance.celery_task.delete()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_principal(sender, instance, **kwargs):
+    from .principal import invalidate_principals
+
+    invalidate_principals([instance.pk])
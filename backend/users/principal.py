@@ -0,0 +1,132 @@
+"""
+Cached principals of the users.
+
+The principal of a user is their row, without the password hash, with the
+ids of the workspaces they are a member or manager of. The JWT
+authentication and the workspace permission decorators read it instead of
+querying the user and membership tables on every request.
+
+Principals are cached in a VersionedCache under the user id. Changes to the
+user or to their workspace memberships invalidate it (see the receivers of
+users.models and workspaces.models).
+"""
+from django.db import DEFAULT_DB_ALIAS
+
+from utils.cache import VersionedCache
+from .models import User
+
+PRINCIPAL_TTL = 24 * 60 * 60
+
+# The password hash is left deferred, it is loaded if a view needs it
+CACHED_USER_FIELDS = [
+    field for field in User._meta.concrete_fields if field.attname != "password"
+]
+
+principal_cache = VersionedCache("users:principal", PRINCIPAL_TTL, maxsize=4096)
+
+
+def invalidate_principals(user_ids):
+    """
+    Makes the cached principals of the users stale in every process.
+    """
+    principal_cache.invalidate(user_ids)
+
+
+def get_changed_member_ids(sender, instance, action, reverse, pk_set):
+    """
+    Returns the ids of the users whose membership changes with an m2m_changed
+    signal of a many to many field to User.
+    """
+    if action == "pre_clear" and not reverse:
+        # The cleared users are not passed to post_clear
+        return sender.objects.filter(
+            **{f"{instance._meta.model_name}_id": instance.pk}
+        ).values_list("user_id", flat=True)
+    if action in ("post_add", "post_remove", "post_clear"):
+        return [instance.pk] if reverse else pk_set or []
+    return []
+
+
+def compute_principal(user_id):
+    from workspaces.models import Workspace
+
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        return None
+    return {
+        "user": {
+            field.attname: (
+                None
+                if field.value_from_object(user) is None
+                else field.value_to_string(user)
+            )
+            for field in CACHED_USER_FIELDS
+        },
+        "workspaces": list(
+            Workspace.members.through.objects.filter(user_id=user_id).values_list(
+                "workspace_id", flat=True
+            )
+        ),
+        "managed_workspaces": list(
+            Workspace.managers.through.objects.filter(user_id=user_id).values_list(
+                "workspace_id", flat=True
+            )
+        ),
+    }
+
+
+def get_principal(user_id):
+    """
+    Returns the principal of the user as a dict, or None if there is no such
+    user.
+    """
+    return principal_cache.get_or_compute(user_id, lambda: compute_principal(user_id))
+
+
+def get_principal_user(user_id):
+    """
+    Returns the User of the principal, without querying the database when the
+    principal is cached, or None if there is no such user.
+    """
+    principal = get_principal(user_id)
+    if principal is None:
+        return None
+    values = []
+    for field in CACHED_USER_FIELDS:
+        value = principal["user"][field.attname]
+        values.append(None if value is None else field.to_python(value))
+    user = User.from_db(
+        DEFAULT_DB_ALIAS, [field.attname for field in CACHED_USER_FIELDS], values
+    )
+    user._principal = principal
+    return user
+
+
+def get_user_principal(user):
+    """
+    Returns the principal of the user, the one they were authenticated with
+    if they come from get_principal_user.
+    """
+    principal = getattr(user, "_principal", None)
+    if principal is None:
+        principal = get_principal(user.pk)
+    return principal
+
+
+def _contains_id(ids, object_id):
+    try:
+        return int(object_id) in ids
+    except (TypeError, ValueError):
+        return False
+
+
+def is_workspace_member(user, workspace_id):
+    return _contains_id(get_user_principal(user)["workspaces"], workspace_id)
+
+
+def is_workspace_manager(user, workspace_id):
+    return _contains_id(get_user_principal(user)["managed_workspaces"], workspace_id)
+
+
+def get_principal_cache_stats():
+    return principal_cache.stats()
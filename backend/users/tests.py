@@ -1,8 +1,23 @@
+from datetime import timedelta
+from unittest import skipUnless
 from urllib import response
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.urls import reverse
+from tasks.models import Annotation, Task
+from utils.benchmark import create_synthetic_project
+from utils.cache import redis_is_available
+from .analytics import ANNOTATION_REPORTS, compute_user_analytics
+from .authentication import CachedJWTAuthentication
 from .models import User
+from .principal import get_principal_user, is_workspace_member
 from .views import *
 
 
@@ -79,3 +94,111 @@ class UserTestcase(APITestCase):
     #     self.client.logout()
     #     self.assertEqual(response.status_code, status.HTTP_200_OK)
     #     self.assertEqual(response.data, {"message": "User profile edited"})
+
+
+@skipUnless(redis_is_available(), "Needs redis for the principal versions")
+class PrincipalTestcase(TestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(title="Principal Organization")
+        self.user = User.objects.create_user(
+            username="principal", email="principal@email.com", password="principal"
+        )
+        self.user.organization = self.organization
+        self.user.save()
+        self.authentication = CachedJWTAuthentication()
+        self.token = self.authentication.get_validated_token(
+            str(AccessToken.for_user(self.user))
+        )
+
+    def test_cached_authentication_takes_no_query(self):
+        self.authentication.get_user(self.token)
+        with self.assertNumQueries(0):
+            user = self.authentication.get_user(self.token)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.email, self.user.email)
+        self.assertEqual(user.organization_id, self.organization.id)
+        self.assertEqual(user.date_joined, self.user.date_joined)
+
+        # Saving the cached user does not touch the deferred password hash
+        user.first_name = "Cached"
+        user.save()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("principal"))
+
+    def test_changes_invalidate_the_principal(self):
+        workspace = Workspace.objects.create(
+            organization=self.organization, workspace_name="Principal Workspace"
+        )
+        self.assertFalse(
+            is_workspace_member(get_principal_user(self.user.pk), workspace.pk)
+        )
+        workspace.members.add(self.user)
+        self.assertTrue(
+            is_workspace_member(get_principal_user(self.user.pk), workspace.pk)
+        )
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.get_user(self.token)
+
+
+class UserAnalyticsTestcase(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                username=f"analytics{i}",
+                email=f"analytics{i}@email.com",
+                invited_by=None,
+            )
+            for i in range(3)
+        ]
+        self.project = create_synthetic_project(6, annotators=self.users)
+        for i, task in enumerate(
+            Task.objects.filter(project_id=self.project).order_by("id")
+        ):
+            # The first user submits four tasks, the second one and drafts one
+            user = self.users[0] if i < 4 else self.users[1]
+            task.task_status = "annotated" if i < 5 else "incomplete"
+            task.save()
+            task.annotation_users.add(user)
+            Annotation.objects.create(
+                task=task,
+                completed_by=user,
+                annotation_status="labeled" if i < 5 else "draft",
+                lead_time=10 * (i + 1),
+                result=[],
+            )
+        self.end_date = timezone.now() + timedelta(days=1)
+        self.start_date = self.end_date - timedelta(days=2)
+
+    def compute(self, users):
+        return compute_user_analytics(
+            [user.id for user in users],
+            ANNOTATION_REPORTS,
+            "all",
+            self.start_date,
+            self.end_date,
+        )
+
+    def test_summaries_of_each_user(self):
+        analytics = self.compute(self.users)
+
+        summary = analytics.summary(self.users[0].id)
+        self.assertEqual(summary["total_summary"][0]["Avg Annotation Time (sec)"], 25.0)
+        self.assertEqual(summary["project_summary"][0]["Annotated Tasks"], 4)
+
+        summary = analytics.summary(self.users[1].id)
+        self.assertEqual(summary["total_summary"][0]["Annotated Tasks"], 1)
+        self.assertEqual(summary["project_summary"][0]["Draft Tasks"], 1)
+
+        summary = analytics.summary(self.users[2].id)
+        self.assertEqual(summary["total_summary"][0]["Annotated Tasks"], 0)
+        self.assertEqual(summary["project_summary"], [])
+
+    def test_query_count_does_not_depend_on_users(self):
+        with CaptureQueriesContext(connection) as one_user:
+            self.compute(self.users[:1])
+        with CaptureQueriesContext(connection) as all_users:
+            self.compute(self.users)
+        self.assertEqual(len(one_user), len(all_users))
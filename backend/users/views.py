@@ -29,18 +29,12 @@ from .serializers import (
     OrganizationSerializer,
     ChangePasswordWithoutOldPassword,
 )
-from tasks.models import Annotation as Annotation_model
 from organizations.models import Invite, Organization
 from organizations.serializers import InviteGenerationSerializer
 from organizations.decorators import is_organization_owner
 from users.models import LANG_CHOICES, User, CustomPeriodicTask
 from rest_framework.decorators import action
-from tasks.models import (
-    Task,
-    ANNOTATOR_ANNOTATION,
-    REVIEWER_ANNOTATION,
-    SUPER_CHECKER_ANNOTATION,
-)
+from tasks.models import Task
 from workspaces.models import Workspace
 from projects.models import Project
 from tasks.models import Annotation
@@ -50,16 +44,13 @@ from django_celery_beat.models import PeriodicTask, CrontabSchedule
 from projects.utils import (
     no_of_words,
     is_valid_date,
-    convert_seconds_to_hours,
-    get_audio_project_types,
-    get_audio_transcription_duration,
-    ocr_word_count,
 )
 from datetime import datetime
 import calendar
 from django.conf import settings
 from django.core.mail import send_mail, EmailMultiAlternatives
 from workspaces.views import WorkspaceCustomViewSet
+from .analytics import compute_user_analytics
 from .utils import generate_random_string, get_role_name
 from rest_framework_simplejwt.tokens import RefreshToken
 from dotenv import load_dotenv
@@ -1395,37 +1386,15 @@ class AnalyticsViewSet(viewsets.ViewSet):
         PERMISSION_ERROR = {
             "message": "You do not have enough permissions to access this view!"
         }
-        emails = User.objects.all()
-        emails_list = emails.values_list("email", flat=True)
-        try:
-            user_email = request.user.email
-            if user_email not in emails_list:
-                return Response(PERMISSION_ERROR, status=status.HTTP_400_BAD_REQUEST)
-        except:
-            if type(request) == dict:
-                pass
-            else:
-                return Response(PERMISSION_ERROR, status=status.HTTP_400_BAD_REQUEST)
+        if not request.user.is_authenticated:
+            return Response(PERMISSION_ERROR, status=status.HTTP_400_BAD_REQUEST)
+
+        start_date = request.data.get("start_date")
+        end_date = request.data.get("end_date")
+        user_id = request.data.get("user_id")
+        reports_type = request.data.get("reports_type")
+        project_type = request.data.get("project_type")
 
-        try:
-            start_date = request.data.get("start_date")
-            end_date = request.data.get("end_date")
-            user_id = request.data.get("user_id")
-            reports_type = request.data.get("reports_type")
-            project_type = request.data.get("project_type")
-        except:
-            start_date = request["start_date"]
-            end_date = request["end_date"]
-            user_id = request["user_id"]
-            reports_type = request["reports_type"]
-            project_type = request["project_type"]
-
-        review_reports = False
-        supercheck_reports = False
-        if reports_type == "review":
-            review_reports = True
-        elif reports_type == "supercheck":
-            supercheck_reports = True
         start_date = start_date + " 00:00"
         end_date = end_date + " 23:59"
 
@@ -1450,387 +1419,15 @@ class AnalyticsViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        project_type_lower = (project_type or " ").lower()
-        is_textual_project = (
-            False if project_type in get_audio_project_types() else True
-        ) 
-
-        try:
-            user = User.objects.get(id=user_id)
-        except User.DoesNotExist:
+        if not User.objects.filter(id=user_id).exists():
             return Response(
                 {"message": "User not found"}, status=status.HTTP_404_NOT_FOUND
             )
 
-        if review_reports:
-            if project_type == "all":
-                project_objs = Project.objects.filter(  
-                    annotation_reviewers=user_id,
-                )
-            else:
-                project_objs = Project.objects.filter(
-                    annotation_reviewers=user_id,
-                    project_type=project_type,
-                )
-                
-        elif supercheck_reports:
-            if project_type == "all":
-                project_objs = Project.objects.filter(  
-                    review_supercheckers=user_id,
-                )
-                
-            else:
-                project_objs = Project.objects.filter(
-                    review_supercheckers=user_id,
-                    project_type=project_type,
-                )
-                
-        else:
-            if project_type == "all":
-                project_objs = Project.objects.filter(
-                    annotators=user_id,
-                )
-            else:
-                project_objs = Project.objects.filter(
-                    annotators=user_id,
-                    project_type=project_type,
-                )
-
-        all_annotated_lead_time_list = []
-        all_annotated_lead_time_count = 0
-        total_annotated_tasks_count = 0
-        all_tasks_word_count = 0
-        all_projects_total_duration = 0
-        
-        
-        total_draft_tasks = 0
-        total_skipped_tasks = 0
-        total_to_be_revised_tasks = 0
-        total_rejected_tasks = 0
-        total_rejected_task_by_reviewer = 0
-        
-        
-        project_wise_summary = []
-        for proj in project_objs:
-            project_name = proj.title
-            project_type = proj.project_type
-            is_textual_project = (
-                False if project_type in get_audio_project_types() else True
-            )
-            annotated_labeled_tasks = []
-           
-            if review_reports:
-                labeld_tasks_objs = Task.objects.filter(
-                    Q(project_id=proj.id)
-                    & Q(review_user=user_id)
-                    & Q(
-                        task_status__in=[
-                            "reviewed",
-                            "exported",
-                            "super_checked",
-                        ]
-                    )
-                )
-                
-
-                annotated_task_ids = list(
-                    labeld_tasks_objs.values_list("id", flat=True)
-                )
-                
-                annotated_labeled_tasks = Annotation.objects.filter(
-                    task_id__in=annotated_task_ids,
-                    annotation_type=REVIEWER_ANNOTATION,
-                    updated_at__range=[start_date, end_date],
-                    completed_by=user_id,
-                ).exclude(annotation_status__in=["to_be_revised", "draft", "skipped"])
-                
-            
-            elif supercheck_reports:
-                labeld_tasks_objs = Task.objects.filter(
-                    Q(project_id=proj.id)
-                    & Q(super_check_user=user_id)
-                    & Q(
-                        task_status__in=[
-                            "exported",
-                            "super_checked",
-                        ]
-                    )
-                )
-                
-                annotated_task_ids = list(
-                    labeld_tasks_objs.values_list("id", flat=True)
-                )
-                
-                annotated_labeled_tasks = Annotation.objects.filter(
-                    task_id__in=annotated_task_ids,
-                    annotation_type=SUPER_CHECKER_ANNOTATION,
-                    updated_at__range=[start_date, end_date],
-                    completed_by=user_id,
-                )
-                
-            else:
-                
-                labeld_tasks_objs = Task.objects.filter(
-                    Q(project_id=proj.id)
-                    & Q(annotation_users=user_id)
-                    & Q(
-                        task_status__in=[
-                            "annotated",
-                            "reviewed",
-                            "exported",
-                            "super_checked",
-                        ]
-                    )
-                )
-                
-                annotated_task_ids = list(
-                    labeld_tasks_objs.values_list("id", flat=True)
-                )
-                
-                annotated_labeled_tasks = Annotation.objects.filter(
-                    task_id__in=annotated_task_ids,
-                    annotation_type=ANNOTATOR_ANNOTATION,
-                    updated_at__range=[start_date, end_date],
-                    completed_by=user_id,
-                )
-                
-            annotated_tasks_count = annotated_labeled_tasks.count()
-            total_annotated_tasks_count += annotated_tasks_count
-
-           
-            annotation_type = (
-                REVIEWER_ANNOTATION if review_reports else
-                SUPER_CHECKER_ANNOTATION if supercheck_reports else
-                ANNOTATOR_ANNOTATION
-            )
-
-
-            draft_tasks_count = Annotation.objects.filter(
-                task__project_id=proj.id,
-                annotation_type=annotation_type,
-                updated_at__range=[start_date, end_date],
-                completed_by=user_id,
-                annotation_status="draft",
-            ).count()
-            
-
-            skipped_tasks_count = Annotation.objects.filter(
-                task__project_id=proj.id,
-                annotation_type=annotation_type,
-                updated_at__range=[start_date, end_date],
-                completed_by=user_id,
-                annotation_status="skipped",
-            ).count()
-            
-
-            to_be_revised_tasks_count = 0
-            rejected_tasks_count_by_reviewer = 0
-            if review_reports:
-                to_be_revised_tasks_count = Annotation.objects.filter(
-                    task__project_id=proj.id,
-                    task__review_user=user_id,
-                    annotation_status="to_be_revised",
-                    annotation_type=REVIEWER_ANNOTATION,
-                    updated_at__range=[start_date, end_date],
-                ).count()
-
-                superchecker_rejected_annos = Annotation_model.objects.filter(
-                    task__project_id=proj.id,
-                    annotation_status="rejected",
-                    annotation_type=SUPER_CHECKER_ANNOTATION,
-                    parent_annotation__updated_at__range=[start_date, end_date],
-                )
-
-                parent_anno_ids = [
-                    ann.parent_annotation_id for ann in superchecker_rejected_annos
-                ]
-
-                rejected_tasks_count_by_reviewer = Annotation_model.objects.filter(
-                    id__in=parent_anno_ids, completed_by=user_id, annotation_status="rejected"
-                ).count()
-
-            rejected_tasks_count = 0
-            if supercheck_reports:
-                rejected_tasks_count = Annotation.objects.filter(
-                    task__project_id=proj.id,
-                    task__super_check_user=user_id,
-                    annotation_type=SUPER_CHECKER_ANNOTATION,
-                    updated_at__range=[start_date, end_date],
-                    completed_by=user_id,
-                    annotation_status="rejected",
-                ).count()
-               
-
-            total_draft_tasks += draft_tasks_count
-            total_skipped_tasks += skipped_tasks_count
-            total_to_be_revised_tasks += to_be_revised_tasks_count
-            
-            total_rejected_task_by_reviewer += rejected_tasks_count_by_reviewer
-            
-            total_rejected_tasks += rejected_tasks_count
-            
-            avg_lead_time = 0
-            lead_time_annotated_tasks = [
-                eachtask.lead_time for eachtask in annotated_labeled_tasks
-            ]
-            all_annotated_lead_time_list.extend(lead_time_annotated_tasks)
-            if len(lead_time_annotated_tasks) > 0:
-                avg_lead_time = sum(lead_time_annotated_tasks) / len(
-                    lead_time_annotated_tasks
-                )
-                avg_lead_time = round(avg_lead_time, 2)
-                
-            
-            total_word_count = 0
-            if "OCRTranscription" in project_type:
-                for each_anno in annotated_labeled_tasks:
-                    total_word_count += ocr_word_count(each_anno.result)
-            elif is_textual_project:
-                total_word_count_list = []
-                for each_task in annotated_labeled_tasks:
-                    try:
-                        total_word_count_list.append(each_task.task.data["word_count"])
-                    except:
-                        pass
-
-                total_word_count = sum(total_word_count_list)
-            all_tasks_word_count += total_word_count
-
-            total_duration = "00:00:00"
-            if project_type in get_audio_project_types():
-                total_duration_list = []
-                for each_task in annotated_labeled_tasks:
-                    try:
-                        total_duration_list.append(
-                            get_audio_transcription_duration(each_task.result)
-                        )
-                    except:
-                        pass
-                total_duration = convert_seconds_to_hours(sum(total_duration_list))
-                all_projects_total_duration += sum(total_duration_list)
-
-            result = {
-                "Project Name": project_name,
-                (
-                    "Reviewed Tasks"
-                    if review_reports
-                    else (
-                        "SuperChecked Tasks"
-                        if supercheck_reports
-                        else "Annotated Tasks"
-                    )
-                ): annotated_tasks_count,
-                "Draft Tasks": draft_tasks_count,
-                "Skipped Tasks": skipped_tasks_count,
-                "Word Count": total_word_count,
-                "Total Segments Duration": total_duration,
-                (
-                    "Avg Review Time (sec)"
-                    if review_reports
-                    else (
-                        "Avg SuperCheck Time (sec)"
-                        if supercheck_reports
-                        else "Avg Annotation Time (sec)"
-                    )
-                ): avg_lead_time,
-            }
-            
-            if review_reports:
-                result["To Be Revised Tasks"] = to_be_revised_tasks_count
-                result["Rejected Tasks"] = rejected_tasks_count_by_reviewer
-
-            if supercheck_reports:
-                result["Rejected"] = rejected_tasks_count
-
-            print("result", result)
-
-            if project_type in get_audio_project_types():
-                del result["Word Count"]
-            elif is_textual_project:
-                del result["Total Segments Duration"]
-            else:
-                del result["Word Count"]
-                del result["Total Segments Duration"]
-
-            if (
-                result[
-                    (
-                        "Reviewed Tasks"
-                        if review_reports
-                        else (
-                            "SuperChecked Tasks"
-                            if supercheck_reports
-                            else "Annotated Tasks"
-                        )
-                    )
-                ]
-                > 0
-            ):
-                project_wise_summary.append(result)
-        
-        
-        project_wise_summary = sorted(
-            project_wise_summary,
-            key=lambda x: x[
-                (
-                    "Reviewed Tasks"
-                    if review_reports
-                    else (
-                        "SuperChecked Tasks"
-                        if supercheck_reports
-                        else "Annotated Tasks"
-                    )
-                )
-            ],
-            reverse=True,
+        analytics = compute_user_analytics(
+            [user_id], reports_type, project_type, start_date, end_date
         )
-
-        if total_annotated_tasks_count > 0:
-            all_annotated_lead_time_count = (
-                sum(all_annotated_lead_time_list) / total_annotated_tasks_count
-            )
-            all_annotated_lead_time_count = round(all_annotated_lead_time_count, 2)
-
-        # total_summary = {}
-        # if is_translation_project or project_type == "SemanticTextualSimilarity_Scale5":
-        
-        total_result = {
-            (
-                "Reviewed Tasks"
-                if review_reports
-                else ("SuperChecked Tasks" if supercheck_reports else "Annotated Tasks")
-            ): total_annotated_tasks_count,
-            "Word Count": all_tasks_word_count,
-            "Total Segments Duration": convert_seconds_to_hours(
-                all_projects_total_duration
-            ),
-            (
-                "Avg Review Time (sec)"
-                if review_reports
-                else (
-                    "Avg SuperCheck Time (sec)"
-                    if supercheck_reports
-                    else "Avg Annotation Time (sec)"
-                )
-            ): round(all_annotated_lead_time_count, 2),
-        }
-        
-        if project_type_lower != "all" and project_type in get_audio_project_types():
-            del total_result["Word Count"]
-        elif project_type_lower != "all" and is_textual_project:
-            del total_result["Total Segments Duration"]
-        elif project_type_lower != "all":
-            del total_result["Word Count"]
-            del total_result["Total Segments Duration"]
-
-        total_summary = [total_result]
-        
-        final_result = {
-            "total_summary": total_summary,
-            "project_summary": project_wise_summary,
-        }
-        
-        return Response(final_result)
+        return Response(analytics.summary(int(user_id)))
 
     @action(
         detail=True,
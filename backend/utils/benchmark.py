@@ -0,0 +1,70 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """
+    Run the block inside a transaction that is always rolled back, so that
+    benchmark fixtures never leak into the database.
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback()
+    except _Rollback:
+        pass
+
+
+def median_time_ms(func, repeat=5):
+    """
+    Returns the median wall time of func() in milliseconds.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def count_queries(func):
+    """
+    Returns the number of database queries executed by func().
+    """
+    with CaptureQueriesContext(connection) as context:
+        func()
+    return len(context.captured_queries)
+
+
+def create_synthetic_project(
+    num_tasks, annotators=(), project_type="InstructionDrivenChat", batch_size=5000
+):
+    """
+    Creates a project with num_tasks tasks assigned to nobody.
+    """
+    from projects.models import Project
+    from tasks.models import Task
+
+    project = Project.objects.create(
+        title=f"Benchmark project ({num_tasks} tasks)",
+        project_type=project_type,
+    )
+    if annotators:
+        project.annotators.add(*annotators)
+    Task.objects.bulk_create(
+        (
+            Task(project_id=project, data={"text": f"benchmark task {i}"})
+            for i in range(num_tasks)
+        ),
+        batch_size=batch_size,
+    )
+    return project
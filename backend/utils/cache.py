@@ -0,0 +1,255 @@
+import hashlib
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.db import transaction
+
+from anudesh_backend.locks import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(*parts):
+    """
+    Returns a stable hash of JSON serializable parts, used as a cache key.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LayeredCache:
+    """
+    Two level cache: an in-process LRU in front of redis (with TTL).
+
+    Values must be JSON serializable. None is never cached. Concurrent misses
+    for the same key within a process are coalesced, so that only one of the
+    callers computes the value while the others wait for it. Redis errors
+    are ignored, the cache then only works in-process.
+    """
+
+    def __init__(self, namespace, ttl, maxsize=1024):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _redis_key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def _get_local(self, key):
+        with self._lock:
+            if key in self._local:
+                self._local.move_to_end(key)
+                self.hits += 1
+                return self._local[key]
+        return None
+
+    def _set_local(self, key, value):
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+    def get(self, key):
+        value = self._get_local(key)
+        if value is not None:
+            return value
+        try:
+            raw_value = get_redis_connection().get(self._redis_key(key))
+        except Exception:
+            raw_value = None
+        if raw_value is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        value = json.loads(raw_value)
+        with self._lock:
+            self.redis_hits += 1
+        self._set_local(key, value)
+        return value
+
+    def set(self, key, value):
+        if value is None:
+            return
+        self._set_local(key, value)
+        try:
+            get_redis_connection().set(
+                self._redis_key(key), json.dumps(value), ex=self.ttl
+            )
+        except Exception:
+            pass
+
+    def get_many(self, keys):
+        """
+        Returns a dict of key to cached value for the keys that are cached,
+        with one redis round trip for the keys missing in-process.
+        """
+        values, missing = {}, []
+        for key in keys:
+            value = self._get_local(key)
+            if value is None:
+                missing.append(key)
+            else:
+                values[key] = value
+        if not missing:
+            return values
+        try:
+            raw_values = get_redis_connection().mget(
+                [self._redis_key(key) for key in missing]
+            )
+        except Exception:
+            raw_values = [None] * len(missing)
+        for key, raw_value in zip(missing, raw_values):
+            if raw_value is None:
+                with self._lock:
+                    self.misses += 1
+                continue
+            values[key] = json.loads(raw_value)
+            with self._lock:
+                self.redis_hits += 1
+            self._set_local(key, values[key])
+        return values
+
+    def set_many(self, values):
+        values = {key: value for key, value in values.items() if value is not None}
+        for key, value in values.items():
+            self._set_local(key, value)
+        if not values:
+            return
+        try:
+            pipeline = get_redis_connection().pipeline(transaction=False)
+            for key, value in values.items():
+                pipeline.set(self._redis_key(key), json.dumps(value), ex=self.ttl)
+            pipeline.execute()
+        except Exception:
+            pass
+
+    def delete(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+        try:
+            get_redis_connection().delete(self._redis_key(key))
+        except Exception:
+            pass
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            event = self._in_flight.get(key)
+            is_leader = event is None
+            if is_leader:
+                event = self._in_flight[key] = threading.Event()
+        if not is_leader:
+            event.wait()
+            value = self._get_local(key)
+            return value if value is not None else compute()
+
+        try:
+            value = compute()
+            self.set(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            event.set()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.redis_hits + self.misses
+            return {
+                "hits": self.hits,
+                "redis_hits": self.redis_hits,
+                "misses": self.misses,
+                "size": len(self._local),
+                "hit_rate": (
+                    (self.hits + self.redis_hits) / lookups if lookups else 0.0
+                ),
+            }
+
+
+def redis_is_available():
+    try:
+        return get_redis_connection().ping()
+    except Exception:
+        return False
+
+
+class VersionedCache:
+    """
+    LayeredCache of values computed for an id, under the id and a version
+    token of the id kept in redis.
+
+    Invalidating an id replaces its token, which makes the entries every
+    process cached for the older token unreachable, since deleting a key does
+    not clear the in-process cache of the other processes. When redis cannot
+    be reached the token is unknown and values are computed without caching.
+    """
+
+    def __init__(self, namespace, ttl, maxsize=1024):
+        self.namespace = namespace
+        self.cache = LayeredCache(namespace, ttl, maxsize=maxsize)
+
+    def _version_key(self, id):
+        return f"{self.namespace}:version:{id}"
+
+    def get_version(self, id):
+        """
+        Returns the version token of the id, or None if redis cannot be
+        reached.
+        """
+        try:
+            connection = get_redis_connection()
+            key = self._version_key(id)
+            version = connection.get(key)
+            if version is None:
+                # Random rather than counted, so that a flushed redis does not
+                # bring back the entries cached for an earlier version
+                connection.set(key, uuid.uuid4().hex, nx=True)
+                version = connection.get(key)
+        except Exception:
+            return None
+        return version.decode() if version is not None else None
+
+    def get_or_compute(self, id, compute):
+        version = self.get_version(id)
+        if version is None:
+            return compute()
+        return self.cache.get_or_compute(f"{id}:{version}", compute)
+
+    def _replace_versions(self, ids):
+        try:
+            pipeline = get_redis_connection().pipeline(transaction=False)
+            for id in ids:
+                pipeline.set(self._version_key(id), uuid.uuid4().hex)
+            pipeline.execute()
+        except Exception:
+            logger.warning("Could not invalidate %s of %s", self.namespace, ids)
+
+    def invalidate(self, ids):
+        """
+        Makes the cached values of the ids stale in every process. Inside a
+        transaction the versions are replaced again once it commits, as other
+        requests still read the rows as they were before it and would cache
+        them for the new version.
+        """
+        ids = list(ids)
+        if not ids:
+            return
+        self._replace_versions(ids)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self._replace_versions(ids))
+
+    def stats(self):
+        return self.cache.stats()
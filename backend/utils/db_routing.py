@@ -0,0 +1,152 @@
+"""
+Read replica routing.
+
+Analytics, reports and project downloads run long aggregate scans that only
+read. Code run inside use_replica() (or a function decorated with
+replica_reads) reads from the REPLICA_DB_ALIAS database when it is
+configured, and everything else, writes included, uses the default
+database. The replication lag of the replica is checked at most every
+REPLICA_LAG_CHECK_INTERVAL seconds per process, and reads fall back to the
+default database while the replica lags more than REPLICA_MAX_LAG seconds
+or cannot be reached. Reads inside a transaction of the default database
+stay on it, so that they see its writes.
+"""
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA_DB_ALIAS = "replica"
+REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "30"))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_LAG_CHECK_INTERVAL", "10"))
+
+# Seconds the replica is behind: zero if it has replayed all it received or
+# is not a standby, else the age of the last transaction replayed
+REPLICA_LAG_QUERY = (
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) "
+    "END"
+)
+
+_replica_reads = contextvars.ContextVar("replica_reads", default=False)
+
+
+@contextmanager
+def use_replica():
+    """
+    Reads the database from the replica inside the block.
+    """
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads(func):
+    """
+    Decorator of a view or task whose reads go to the replica.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with use_replica():
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def iter_on_replica(iterable):
+    """
+    Yields the items of iterable, read from the replica, for the streamed
+    responses consumed after their view has returned.
+    """
+    iterator = iter(iterable)
+    while True:
+        # Only around next(), a context variable set across a yield would
+        # leak into the consumer
+        with use_replica():
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+class ReplicaLagMonitor:
+    """
+    Process-wide cache of the replication lag of the replica.
+    """
+
+    def __init__(self, alias=REPLICA_DB_ALIAS, interval=REPLICA_LAG_CHECK_INTERVAL):
+        self.alias = alias
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._lag = None
+        self._checked_at = None
+
+    def measure(self):
+        """
+        Returns the lag of the replica in seconds, infinite if it cannot be
+        reached.
+        """
+        try:
+            with connections[self.alias].cursor() as cursor:
+                cursor.execute(REPLICA_LAG_QUERY)
+                return float(cursor.fetchone()[0])
+        except DatabaseError:
+            logger.warning("Could not measure the lag of the database replica")
+            return float("inf")
+
+    def get_lag(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._checked_at is None or now - self._checked_at >= self.interval:
+                self._lag = self.measure()
+                self._checked_at = now
+            return self._lag
+
+    def reset(self):
+        with self._lock:
+            self._lag = self._checked_at = None
+
+
+lag_monitor = ReplicaLagMonitor()
+
+
+def replica_is_usable():
+    return (
+        REPLICA_DB_ALIAS in settings.DATABASES
+        and lag_monitor.get_lag() <= REPLICA_MAX_LAG
+    )
+
+
+class ReplicaRouter:
+    """
+    Sends the reads made with use_replica() to the replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get():
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        if replica_is_usable():
+            return REPLICA_DB_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same rows
+        return True
@@ -8,44 +8,79 @@ from pydantic import BaseModel, Field
 
 from dataset.models import Interaction
 from tasks.models import Annotation
+from utils.cache import LayeredCache, content_hash
+
+
+# The checks are deterministic enough for a prompt to be re-used across the
+# autosaves of an annotation, so their responses are cached by content hash.
+LLM_CHECKS_CACHE_TTL = int(os.getenv("LLM_CHECKS_CACHE_TTL", 7 * 24 * 60 * 60))
+
+domain_intent_cache = LayeredCache("llm_checks:domain_intent", LLM_CHECKS_CACHE_TTL)
+lid_cache = LayeredCache("llm_checks:lid", LLM_CHECKS_CACHE_TTL, maxsize=4096)
+
+_domain_intent_client = None
+_triton_session = None
+
+
+def _get_domain_intent_client():
+    global _domain_intent_client
+    if _domain_intent_client is None:
+        model = os.getenv("LLM_INTERACTIONS_OPENAI_ENGINE_GPT35")
+        _domain_intent_client = OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=f"{os.getenv('LLM_INTERACTIONS_OPENAI_API_BASE')}openai/deployments/{model}"
+        )
+    return _domain_intent_client
+
+
+def _get_triton_session():
+    global _triton_session
+    if _triton_session is None:
+        _triton_session = requests.Session()
+        _triton_session.headers.update(
+            {
+                "Authorization": os.getenv("LLM_CHECKS_TRITON_SERVER_URL_AUTH"),
+                "Content-Type": "application/json",
+            }
+        )
+    return _triton_session
+
+
+def get_llm_checks_cache_stats():
+    return {
+        "domain_intent": domain_intent_cache.stats(),
+        "lid": lid_cache.stats(),
+    }
 
 
 def get_response_for_domain_and_intent(prompt):
     model = os.getenv("LLM_INTERACTIONS_OPENAI_ENGINE_GPT35")
 
-    client = OpenAI(
-        api_key=os.getenv("OPENAI_API_KEY"),
-        base_url=f"{os.getenv('LLM_INTERACTIONS_OPENAI_API_BASE')}openai/deployments/{model}"
-    )
+    def compute():
+        response = _get_domain_intent_client().chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.1,
+            max_tokens=256,
+            frequency_penalty=0,
+            presence_penalty=0,
+            extra_query={"api-version": os.getenv("LLM_INTERACTIONS_OPENAI_API_VERSION")},
+        )
+        return response.choices[0].message.content.strip()
 
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.1,
-        max_tokens=256,
-        frequency_penalty=0,
-        presence_penalty=0,
-        extra_query={"api-version": os.getenv("LLM_INTERACTIONS_OPENAI_API_VERSION")},
-    )
+    return domain_intent_cache.get_or_compute(content_hash(model, prompt), compute)
 
-    return response.choices[0].message.content.strip()
 
-def get_lid(text):
+def _request_lid(texts):
     """
-    Determine the language and script of the given text using the IndicLID model.
+    Runs IndicLID on a batch of texts with a single inference request.
     """
 
     # The inference server URL
     TRITON_SERVER_URL = os.getenv("LLM_CHECKS_TRITON_SERVER_URL")
 
-    # Authentication header
-    headers = {
-        "Authorization": os.getenv("LLM_CHECKS_TRITON_SERVER_URL_AUTH"),
-        "Content-Type": "application/json",
-    }
-
     # Prepare the input data
-    input_data = np.array([[text]], dtype=object).tolist()
+    input_data = np.array([[text] for text in texts], dtype=object).tolist()
 
     # Prepare the request body
     body = json.dumps(
@@ -53,7 +88,7 @@ def get_lid(text):
             "inputs": [
                 {
                     "name": "TEXT",
-                    "shape": [1, 1],
+                    "shape": [len(texts), 1],
                     "datatype": "BYTES",
                     "data": input_data,
                 }
@@ -63,7 +98,7 @@ def get_lid(text):
     )
 
     # Make the request
-    response = requests.post(TRITON_SERVER_URL, headers=headers, data=body)
+    response = _get_triton_session().post(TRITON_SERVER_URL, data=body)
 
     # Check if the request was successful
     if response.status_code != 200:
@@ -72,9 +107,55 @@ def get_lid(text):
 
     # Extract results from the response
     output_data = json.loads(response.text)
-    languages = json.loads(output_data["outputs"][0]["data"][0])
+    return [json.loads(languages)[1] for languages in output_data["outputs"][0]["data"]]
+
+
+def get_lid(text):
+    """
+    Determine the language and script of the given text using the IndicLID model.
+    """
 
-    return languages[1]
+    def compute():
+        detected = _request_lid([text])
+        return detected[0] if detected else None
+
+    return lid_cache.get_or_compute(content_hash(text), compute)
+
+
+def get_lid_batch(texts):
+    """
+    Determine the language and script of each of the given texts using the
+    IndicLID model. Only the texts missing from the cache are sent to the
+    server, in one request. Returns None if the request fails.
+    """
+    keys = {text: content_hash(text) for text in texts}
+    cached = lid_cache.get_many(set(keys.values()))
+    results = {text: cached.get(key) for text, key in keys.items()}
+    missing = [text for text, result in results.items() if result is None]
+    if missing:
+        detected = _request_lid(missing)
+        if detected is None:
+            return None
+        results.update(zip(missing, detected))
+        lid_cache.set_many({keys[text]: results[text] for text in missing})
+    return [results[text] for text in texts]
+
+
+def prompts_lang_check(prompts, lang_type):
+    """
+    Checks the prompts against the language and script criteria of lang_type,
+    with one IndicLID request for the prompts that are not cached. Returns
+    the result of prompt_lang_check for each prompt.
+    """
+    detected = get_lid_batch(prompts)
+    if detected is None:
+        return [(False, "Could not detect the language of the prompt")] * len(
+            prompts
+        )
+    return [
+        _lang_check(detected_language, detected_script, lang_type)
+        for detected_language, detected_script in detected
+    ]
 
 
 def prompt_lang_check(prompt, lang_type):
@@ -89,10 +170,10 @@ def prompt_lang_check(prompt, lang_type):
     Returns:
     - bool: True if criteria are met, False otherwise.
     """
+    return prompts_lang_check([prompt], lang_type)[0]
 
-    # get detected language and script from IndicLID
 
-    detected_language, detected_script = get_lid(prompt)
+def _lang_check(detected_language, detected_script, lang_type):
     flag_lan, flag_scr = True, True
     temp_lang, temp_scr = "", ""
     # Type 1 : Prompts in English
@@ -41,6 +41,8 @@ import os
 
 
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from openai import OpenAI, AsyncOpenAI
 import requests
 from rest_framework import status
@@ -217,57 +219,102 @@ MAX_TOKENS_BY_PROVIDER = {
     "deepinfra": 6144,
 }
 
-def get_google_ai_studio_output(system_prompt, user_prompt, history, model):
-    try:
-        client = OpenAI(
-            api_key=os.getenv("GOOGLE_AI_STUDIO_API_KEY"),
-            base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-        )
+# Per-model request timeout (in seconds) for the non-streaming calls
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+
+# Upper bound on the number of models queried in parallel per process
+LLM_FANOUT_MAX_WORKERS = int(os.getenv("LLM_FANOUT_MAX_WORKERS", "8"))
+
+# Pooled sync clients, shared by all threads of the process. They do not
+# retry, so that a call never outlives its timeout and the slot it holds in
+# the fan-out executor is freed by the time get_all_model_output gives up.
+_google_sync_client = None
+_deepinfra_sync_client = None
+_fanout_executor = None
+_sync_clients_lock = threading.Lock()
+
+
+def _get_google_sync_client() -> OpenAI:
+    global _google_sync_client
+    if _google_sync_client is None:
+        with _sync_clients_lock:
+            if _google_sync_client is None:
+                _google_sync_client = OpenAI(
+                    api_key=os.getenv("GOOGLE_AI_STUDIO_API_KEY"),
+                    base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
+                    max_retries=0,
+                )
+    return _google_sync_client
+
+
+def _get_deepinfra_sync_client() -> OpenAI:
+    global _deepinfra_sync_client
+    if _deepinfra_sync_client is None:
+        with _sync_clients_lock:
+            if _deepinfra_sync_client is None:
+                _deepinfra_sync_client = OpenAI(
+                    api_key=os.getenv("DEEPINFRA_API_KEY"),
+                    base_url=os.getenv("DEEPINFRA_BASE_URL"),
+                    max_retries=0,
+                )
+    return _deepinfra_sync_client
+
+
+def _get_fanout_executor() -> ThreadPoolExecutor:
+    global _fanout_executor
+    if _fanout_executor is None:
+        with _sync_clients_lock:
+            if _fanout_executor is None:
+                _fanout_executor = ThreadPoolExecutor(
+                    max_workers=LLM_FANOUT_MAX_WORKERS,
+                    thread_name_prefix="llm-fanout",
+                )
+    return _fanout_executor
+
+
+def _llm_error_response(err_msg):
+    if "InvalidRequestError" in err_msg:
+        message = "Prompt violates LLM policy. Please enter a new prompt."
+        st = status.HTTP_400_BAD_REQUEST
+    elif "KeyError" in err_msg:
+        message = "Invalid response from the LLM"
+        st = status.HTTP_500_INTERNAL_SERVER_ERROR
+    else:
+        message = f"An error occurred while interacting with LLM: {err_msg}"
+        st = status.HTTP_500_INTERNAL_SERVER_ERROR
+    return Response({"message": message}, status=st)
+
+
+def _build_messages(system_prompt, user_prompt, history):
+    messages = [{"role": "system", "content": system_prompt}]
+    messages.extend(process_history(history))
+    messages.append({"role": "user", "content": user_prompt})
+    return messages
 
-        history_messages = process_history(history)
-        messages = [{"role": "system", "content": system_prompt}]
-        messages.extend(history_messages)
-        messages.append({"role": "user", "content": user_prompt})
 
-        response = client.chat.completions.create(
+def get_google_ai_studio_output(system_prompt, user_prompt, history, model, timeout=LLM_REQUEST_TIMEOUT):
+    try:
+        response = _get_google_sync_client().chat.completions.create(
             model=model,
-            messages=messages,
+            messages=_build_messages(system_prompt, user_prompt, history),
             temperature=0.7,
             max_tokens=MAX_TOKENS_BY_PROVIDER["google_ai_studio"],
+            timeout=timeout,
         )
 
         return response.choices[0].message.content.strip()
 
     except Exception as e:
-        err_msg = str(e)
-        if "InvalidRequestError" in err_msg:
-            message = "Prompt violates LLM policy. Please enter a new prompt."
-            st = status.HTTP_400_BAD_REQUEST
-        elif "KeyError" in err_msg:
-            message = "Invalid response from the LLM"
-            st = status.HTTP_500_INTERNAL_SERVER_ERROR
-        else:
-            message = f"An error occurred while interacting with LLM: {err_msg}"
-            st = status.HTTP_500_INTERNAL_SERVER_ERROR
-        return Response({"message": message}, status=st)
+        return _llm_error_response(str(e))
 
-def get_deepinfra_output(system_prompt, user_prompt, history, model):
+def get_deepinfra_output(system_prompt, user_prompt, history, model, timeout=LLM_REQUEST_TIMEOUT):
     try:
-        client = OpenAI(
-            api_key=os.getenv("DEEPINFRA_API_KEY"),
-            base_url=os.getenv("DEEPINFRA_BASE_URL")
-        )
-
-        history_messages = process_history(history)
-        messages = [{"role": "system", "content": system_prompt}]
-        messages.extend(history_messages)
-        messages.append({"role": "user", "content": user_prompt})
-
-        response = client.chat.completions.create(
+        response = _get_deepinfra_sync_client().chat.completions.create(
             model=model,
-            messages=messages,
+            messages=_build_messages(system_prompt, user_prompt, history),
             temperature=0.7,
             max_tokens=MAX_TOKENS_BY_PROVIDER["deepinfra"],
+            timeout=timeout,
         )
 
         output = response.choices[0].message.content.strip()
@@ -275,37 +322,28 @@ def get_deepinfra_output(system_prompt, user_prompt, history, model):
         return cleaned_response
 
     except Exception as e:
-        err_msg = str(e)
-        if "InvalidRequestError" in err_msg:
-            message = "Prompt violates LLM policy. Please enter a new prompt."
-            st = status.HTTP_400_BAD_REQUEST
-        elif "KeyError" in err_msg:
-            message = "Invalid response from the LLM"
-            st = status.HTTP_500_INTERNAL_SERVER_ERROR
-        else:
-            message = f"An error occurred while interacting with LLM: {err_msg}"
-            st = status.HTTP_500_INTERNAL_SERVER_ERROR
-        return Response({"message": message}, status=st)
+        return _llm_error_response(str(e))
     
-def get_model_output(system_prompt, user_prompt, history, model="google/gemma-4-26B-A4B-it"):
+def get_model_output(system_prompt, user_prompt, history, model="google/gemma-4-26B-A4B-it", timeout=LLM_REQUEST_TIMEOUT):
     # Assume that translation happens outside (and the prompt is already translated)
     out = ""
     if model in GOOGLE_AI_STUDIO_MODELS:
-        out = get_google_ai_studio_output(system_prompt, user_prompt, history, model)
+        out = get_google_ai_studio_output(system_prompt, user_prompt, history, model, timeout)
     else:
-        out = get_deepinfra_output(system_prompt, user_prompt, history, model)
+        out = get_deepinfra_output(system_prompt, user_prompt, history, model, timeout)
     return out
 
-def get_all_model_output(system_prompt_data, user_prompt, history, models_to_run, default_system_prompt=""):
-    results = {}
+def get_all_model_output(system_prompt_data, user_prompt, history, models_to_run, default_system_prompt="", timeout=LLM_REQUEST_TIMEOUT):
+    """
+    Queries all models in parallel, so the wall time is that of the slowest model.
 
+    Returns a dict of model name to output for the models that responded in
+    time. Models that fail or time out are left out of the result; the error
+    Response of the first model is only returned when no model responded.
+    """
+    futures = {}
     for model in models_to_run:
         system_prompt = system_prompt_data.get(model) or system_prompt_data.get("default") or default_system_prompt if isinstance(system_prompt_data, dict) else system_prompt_data
-        # print("history:", history)
-        # model_history = next(
-        #     (entry["interaction_json"] for entry in history if entry.get("model_name") == model),
-        #     []
-        # )
         model_history = next(
             (
                 interaction["interaction_json"]
@@ -314,14 +352,27 @@ def get_all_model_output(system_prompt_data, user_prompt, history, models_to_run
             ),
             []
         )
-        if model in GOOGLE_AI_STUDIO_MODELS:
-            results[model] = get_google_ai_studio_output(system_prompt, user_prompt, model_history, model)
+        futures[model] = _get_fanout_executor().submit(
+            get_model_output, system_prompt, user_prompt, model_history, model, timeout
+        )
+
+    # The HTTP timeout bounds each call, as the clients do not retry, and the
+    # extra second covers queueing. Calls still queued then are cancelled.
+    wait(futures.values(), timeout=timeout + 1)
+    results, errors = {}, []
+    for model, future in futures.items():
+        if not future.done():
+            future.cancel()
+            errors.append(_llm_error_response(f"Request to {model} timed out"))
+            continue
+        output = future.result()
+        if isinstance(output, Response):
+            errors.append(output)
         else:
-            results[model] = get_deepinfra_output(system_prompt, user_prompt, model_history, model)
+            results[model] = output
 
-        if isinstance(results[model], Response):
-            return results[model]
-    
+    if errors and not results:
+        return errors[0]
     return results
 
 # ── Async streaming generators (Django 5 + ASGI) ────────────────────────────
@@ -498,14 +549,15 @@ async def stream_all_models_output(system_prompt_data, user_prompt, model_intera
     tasks = [asyncio.create_task(_stream_single_model(m)) for m in models_to_run]
 
     models_remaining = len(models_to_run)
-    while models_remaining > 0:
-        item = await queue.get()
-        if item.get("done"):
-            models_remaining -= 1
-        yield item
-
-    # Ensure all tasks are cleaned up
-    for t in tasks:
-        if not t.done():
-            t.cancel()
+    try:
+        while models_remaining > 0:
+            item = await queue.get()
+            if item.get("done"):
+                models_remaining -= 1
+            yield item
+    finally:
+        # Ensure all tasks are cleaned up, also when the consumer goes away
+        for t in tasks:
+            if not t.done():
+                t.cancel()
 
@@ -0,0 +1,207 @@
+"""
+Batch quality metrics between annotations and their parent annotations.
+
+The metrics of each (child, parent) pair (WER, CED and BLEU on the prompts of
+the results) are cached in a LayeredCache, keyed by the annotation id and the
+update times of both annotations, so that the results of the cached pairs are
+not even read. The missing ones are computed in bulk, across a process pool
+for large batches run by celery tasks or the management commands (in the
+calling process inside celery prefork workers, whose daemonic billiard
+processes cannot have children).
+"""
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import sacrebleu
+from billiard.process import current_process
+from celery import current_task
+from rapidfuzz.distance import Levenshtein
+
+from utils.cache import LayeredCache
+
+QUALITY_METRICS_TTL = 30 * 24 * 60 * 60
+# Batches smaller than this are not worth the start up cost of the pool
+PROCESS_POOL_MIN_PAIRS = 2000
+PROCESS_POOL_CHUNKSIZE = 500
+FETCH_BATCH_SIZE = 2000
+QUALITY_METRICS_WORKERS = int(
+    os.getenv("QUALITY_METRICS_WORKERS", min(4, os.cpu_count() or 1))
+)
+
+pair_metrics_cache = LayeredCache("quality_metrics", QUALITY_METRICS_TTL, maxsize=10000)
+
+
+def prompts_text(annotation_result):
+    text = ""
+    for result in annotation_result or []:
+        try:
+            text += result["prompt"]
+        except:
+            pass
+    return text
+
+
+def _words(text):
+    # Same normalization as the default transform of jiwer.wer
+    return [word for word in re.sub(r"\s\s+", " ", text).strip().split(" ") if word]
+
+
+def word_error_rate(reference, hypothesis):
+    """
+    Word error rate of hypothesis against reference, equal to jiwer.wer but
+    without its per call overhead. Returns 0 if any of the texts is empty.
+    """
+    reference_words = _words(reference)
+    hypothesis_words = _words(hypothesis)
+    if not reference or not hypothesis or not reference_words:
+        return 0
+    return Levenshtein.distance(reference_words, hypothesis_words) / len(
+        reference_words
+    )
+
+
+def character_edit_distance(reference, hypothesis):
+    """
+    Levenshtein distance between the texts normalized by the length of
+    reference. Returns 0 if reference is empty.
+    """
+    if not reference:
+        return 0
+    return Levenshtein.distance(reference, hypothesis) / len(reference)
+
+
+def bleu_score(reference, hypothesis):
+    if not reference or not hypothesis:
+        return 0
+    return sacrebleu.sentence_bleu(hypothesis, [reference]).score
+
+
+def text_pair_metrics(texts):
+    child_text, parent_text = texts
+    return {
+        "wer": word_error_rate(child_text, parent_text),
+        "ced": character_edit_distance(child_text, parent_text),
+        "bleu": bleu_score(child_text, parent_text),
+    }
+
+
+class PairMetricsStats:
+    """
+    Counters of a batch metrics run.
+    """
+
+    def __init__(self):
+        self.pairs = 0
+        self.cached = 0
+        self.computed = 0
+        self.elapsed = 0.0
+
+    @property
+    def pairs_per_second(self):
+        return self.pairs / self.elapsed if self.elapsed else 0.0
+
+    def as_dict(self):
+        return {
+            "pairs": self.pairs,
+            "cached": self.cached,
+            "computed": self.computed,
+            "elapsed": self.elapsed,
+            "pairs_per_second": self.pairs_per_second,
+        }
+
+
+def compute_text_pair_metrics(text_pairs, workers=None):
+    """
+    Returns the metrics of each (child text, parent text) pair, in order.
+    Pairs are computed across workers processes, by default only inside a
+    celery task, as web workers must not fork a pool per request.
+    """
+    if workers is None:
+        workers = QUALITY_METRICS_WORKERS if current_task else 1
+    # Celery prefork workers are billiard processes, which multiprocessing
+    # does not see as daemonic
+    if current_process().daemon:
+        workers = 1
+    if workers <= 1 or len(text_pairs) < PROCESS_POOL_MIN_PAIRS:
+        return [text_pair_metrics(texts) for texts in text_pairs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(
+                text_pair_metrics, text_pairs, chunksize=PROCESS_POOL_CHUNKSIZE
+            )
+        )
+
+
+def pair_metrics_key(annotation_id, updated_at, parent_updated_at):
+    return f"{annotation_id}:{updated_at.isoformat()}:{parent_updated_at.isoformat()}"
+
+
+def get_annotation_pair_metrics(annotations, workers=None, use_cache=True):
+    """
+    Returns a dict of annotation id to the metrics between the annotation and
+    its parent annotation, and the PairMetricsStats of the run. Annotations
+    without a parent are skipped. Unless use_cache is False, cached metrics
+    are reused and the newly computed ones are cached.
+    """
+    start = time.perf_counter()
+    stats = PairMetricsStats()
+    metrics, pending = {}, []
+    rows = list(
+        annotations.filter(parent_annotation__isnull=False).values_list(
+            "id", "updated_at", "parent_annotation__updated_at"
+        )
+    )
+    for batch_start in range(0, len(rows), FETCH_BATCH_SIZE):
+        keys = {
+            annotation_id: pair_metrics_key(annotation_id, *updated_at)
+            for annotation_id, *updated_at in rows[
+                batch_start : batch_start + FETCH_BATCH_SIZE
+            ]
+        }
+        cached = pair_metrics_cache.get_many(keys.values()) if use_cache else {}
+        missing = []
+        for annotation_id, key in keys.items():
+            if key in cached:
+                metrics[annotation_id] = cached[key]
+            else:
+                missing.append(annotation_id)
+        for annotation in (
+            annotations.filter(id__in=missing)
+            .select_related("parent_annotation")
+            .only("id", "result", "parent_annotation__result")
+        ):
+            texts = (
+                prompts_text(annotation.result),
+                prompts_text(annotation.parent_annotation.result),
+            )
+            pending.append((keys[annotation.id], annotation.id, texts))
+
+    computed = compute_text_pair_metrics([texts for _, _, texts in pending], workers)
+    for (_, annotation_id, _), pair_metrics in zip(pending, computed):
+        metrics[annotation_id] = pair_metrics
+    if use_cache:
+        for batch_start in range(0, len(pending), FETCH_BATCH_SIZE):
+            pair_metrics_cache.set_many(
+                {
+                    key: metrics[annotation_id]
+                    for key, annotation_id, _ in pending[
+                        batch_start : batch_start + FETCH_BATCH_SIZE
+                    ]
+                }
+            )
+
+    stats.pairs = len(metrics)
+    stats.cached = stats.pairs - len(pending)
+    stats.computed = len(pending)
+    stats.elapsed = time.perf_counter() - start
+    return metrics, stats
+
+
+def get_annotation_word_error_rates(annotations):
+    """
+    Returns the word error rates between the annotations and their parents.
+    """
+    metrics, _ = get_annotation_pair_metrics(annotations)
+    return [pair_metrics["wer"] for pair_metrics in metrics.values()]
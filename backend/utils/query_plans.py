@@ -0,0 +1,62 @@
+"""
+Query plan checks.
+
+The queries run by a block are captured and explained with sequential scans
+disabled, so that the planner uses an index whenever one can serve a query,
+however small the tables of the test database are. A scan of a checked table
+that is still sequential, or an index scan without an index condition, reads
+the whole table: no index serves that query.
+"""
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+FULL_INDEX_SCANS = ("Index Scan", "Index Only Scan")
+
+
+def explain(sql):
+    """
+    Returns the plan of the query sql, explained with sequential scans
+    disabled.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SET enable_seqscan = off")
+        try:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.execute("RESET enable_seqscan")
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+def iter_plan_nodes(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from iter_plan_nodes(child)
+
+
+def is_full_scan(node):
+    if node["Node Type"] == "Seq Scan":
+        return True
+    return node["Node Type"] in FULL_INDEX_SCANS and "Index Cond" not in node
+
+
+def find_full_scans(func, tables):
+    """
+    Runs func() and returns the (sql, scan node) of the full scans of tables
+    in the plans of the SELECT queries it ran.
+    """
+    with CaptureQueriesContext(connection) as context:
+        func()
+    full_scans = []
+    for query in context.captured_queries:
+        sql = query["sql"]
+        if not sql.lstrip().upper().startswith("SELECT"):
+            continue
+        for node in iter_plan_nodes(explain(sql)):
+            if node.get("Relation Name") in tables and is_full_scan(node):
+                full_scans.append((sql, node))
+    return full_scans
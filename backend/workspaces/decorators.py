@@ -1,6 +1,7 @@
 from functools import wraps
 from workspaces.models import Workspace
 from users.models import User
+from users.principal import is_workspace_manager, is_workspace_member
 from organizations.models import Organization
 from rest_framework.response import Response
 from rest_framework import status
@@ -35,12 +36,13 @@ def is_particular_workspace_manager(f):
         if (
             (
                 request.user.role == User.WORKSPACE_MANAGER
-                and request.user in Workspace.objects.get(pk=pk).managers.all()
+                and is_workspace_manager(request.user, pk)
             )
             or (
                 request.user.role == User.ORGANIZATION_OWNER
-                and Workspace.objects.get(pk=pk).organization
-                == request.user.organization
+                and Workspace.objects.filter(
+                    pk=pk, organization_id=request.user.organization_id
+                ).exists()
             )
             or request.user.is_superuser
         ):
@@ -69,17 +71,14 @@ def workspace_is_archived(f):
 def belongs_to_workspace(f):
     @wraps(f)
     def wrapper(self, request, pk=None, *args, **kwargs):
-        try:
-            workspace = Workspace.objects.get(pk=pk)
-        except Workspace.DoesNotExist:
-            return Response(WORKSPACE_ERROR, status=status.HTTP_404_NOT_FOUND)
-        if request.user in workspace.users.all() or (
-            request.user in workspace.managers.all()
+        if is_workspace_member(request.user, pk) or (
+            is_workspace_manager(request.user, pk)
             and request.user.role == User.WORKSPACE_MANAGER
         ):
             return f(self, request, pk, *args, **kwargs)
-        else:
-            return Response(NOT_IN_WORKSPACE_ERROR, status=status.HTTP_403_FORBIDDEN)
+        if not Workspace.objects.filter(pk=pk).exists():
+            return Response(WORKSPACE_ERROR, status=status.HTTP_404_NOT_FOUND)
+        return Response(NOT_IN_WORKSPACE_ERROR, status=status.HTTP_403_FORBIDDEN)
 
     return wrapper
 
@@ -93,7 +92,7 @@ def is_particular_organization_owner(f):
         except Workspace.DoesNotExist:
             return Response(WORKSPACE_ERROR, status=status.HTTP_404_NOT_FOUND)
         if (
-            request.user.organization == workspace.organization
+            request.user.organization_id == workspace.organization_id
             and request.user.role == User.ORGANIZATION_OWNER
         ) or (request.user.is_superuser):
             return f(self, request, pk, *args, **kwargs)
@@ -117,7 +116,7 @@ def is_workspace_creator(f):
 
             if not organization:
                 return Response(NO_ORGANIZATION_FOUND, status=404)
-            elif request.user.organization != organization:
+            elif request.user.organization_id != organization.id:
                 return Response(NO_ORGANIZATION_OWNER_ERROR, status=403)
             return f(self, request, pk, *args, **kwargs)
         else:
@@ -2,6 +2,8 @@ from django.contrib.auth import password_validation
 from django.contrib.auth.hashers import make_password, check_password
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
 from organizations.models import Organization
 from anudesh_backend.mixins import DummyModelMixin
 from anudesh_backend import settings
@@ -103,3 +105,26 @@ class Workspace(models.Model, DummyModelMixin):
 
     class Meta:
         ordering = ["pk"]
+
+
+@receiver(m2m_changed, sender=Workspace.members.through)
+@receiver(m2m_changed, sender=Workspace.managers.through)
+def invalidate_workspace_members_principals(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    from users.principal import get_changed_member_ids, invalidate_principals
+
+    invalidate_principals(
+        get_changed_member_ids(sender, instance, action, reverse, pk_set)
+    )
+
+
+@receiver(pre_delete, sender=Workspace)
+def invalidate_deleted_workspace_principals(sender, instance, **kwargs):
+    from users.principal import invalidate_principals
+
+    # The memberships are deleted with the workspace without m2m_changed
+    invalidate_principals(
+        set(instance.members.values_list("id", flat=True))
+        | set(instance.managers.values_list("id", flat=True))
+    )
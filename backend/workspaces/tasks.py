@@ -8,6 +8,8 @@ from organizations.models import Organization
 from tasks.models import Task
 from django.db.models import Q
 from anudesh_backend.locks import Lock
+from utils.db_routing import replica_reads
+from utils.quality_metrics import get_annotation_word_error_rates
 from tasks.models import (
     Annotation,
     ANNOTATOR_ANNOTATION,
@@ -77,15 +79,7 @@ def get_all_annotation_reports(
     submitted_tasks_count = submitted_tasks.count()
     total_word_error_rate_ar_list = []
     if project_type in "InstructionDrivenChat":
-        for anno in total_rev_annos:
-            try:
-                total_word_error_rate_ar_list.append(
-                    calculate_word_error_rate_between_two_llm_prompts(
-                        anno.result, anno.parent_annotation.result
-                    )
-                )
-            except:
-                pass
+        total_word_error_rate_ar_list += get_annotation_word_error_rates(total_rev_annos)
     if len(total_word_error_rate_ar_list) > 0:
         avg_word_error_rate_ar = sum(total_word_error_rate_ar_list) / len(
             total_word_error_rate_ar_list
@@ -181,24 +175,8 @@ def get_all_review_reports(
     total_word_error_rate_ar_list = []
     total_word_error_rate_rs_list = []
     if project_type in "InstructionDrivenChat":
-        for anno in total_rev_annos_accepted:
-            try:
-                total_word_error_rate_ar_list.append(
-                    calculate_word_error_rate_between_two_llm_prompts(
-                        anno.result, anno.parent_annotation.result
-                    )
-                )
-            except:
-                pass
-        for anno in total_superchecked_annos:
-            try:
-                total_word_error_rate_rs_list.append(
-                    calculate_word_error_rate_between_two_llm_prompts(
-                        anno.result, anno.parent_annotation.result
-                    )
-                )
-            except:
-                pass
+        total_word_error_rate_ar_list += get_annotation_word_error_rates(total_rev_annos_accepted)
+        total_word_error_rate_rs_list += get_annotation_word_error_rates(total_superchecked_annos)
     if len(total_word_error_rate_ar_list) > 0:
         avg_word_error_rate_ar = sum(total_word_error_rate_ar_list) / len(
             total_word_error_rate_ar_list
@@ -273,24 +251,8 @@ def get_all_supercheck_reports(
 
     total_word_error_rate_rs_list = []
     if project_type in "InstructionDrivenChat":
-        for anno in total_sup_annos:
-            try:
-                total_word_error_rate_rs_list.append(
-                    calculate_word_error_rate_between_two_llm_prompts(
-                        anno.result, anno.parent_annotation.result
-                    )
-                )
-            except:
-                pass
-        for anno in total_superchecked_annos:
-            try:
-                total_word_error_rate_rs_list.append(
-                    calculate_word_error_rate_between_two_llm_prompts(
-                        anno.result, anno.parent_annotation.result
-                    )
-                )
-            except:
-                pass
+        total_word_error_rate_rs_list += get_annotation_word_error_rates(total_sup_annos)
+        total_word_error_rate_rs_list += get_annotation_word_error_rates(total_superchecked_annos)
     if len(total_word_error_rate_rs_list) > 0:
         avg_word_error_rate = sum(total_word_error_rate_rs_list) / len(
             total_word_error_rate_rs_list
@@ -315,6 +277,7 @@ def get_all_supercheck_reports(
 
 
 @shared_task(queue="reports")
+@replica_reads
 def send_user_reports_mail_ws(
     ws_id,
     user_id,
@@ -502,6 +465,7 @@ def send_user_reports_mail_ws(
 
 
 @shared_task(queue="reports")
+@replica_reads
 def send_project_analysis_reports_mail_ws(
     pk,
     user_id,
@@ -1001,24 +965,8 @@ def get_supercheck_reports(proj_ids, userid, start_date, end_date, project_type=
     if project_type != None:
         total_word_error_rate_rs_list = []
         if project_type in "InstructionDrivenChat":
-            for anno in total_sup_annos:
-                try:
-                    total_word_error_rate_rs_list.append(
-                        calculate_word_error_rate_between_two_llm_prompts(
-                            anno.result, anno.parent_annotation.result
-                        )
-                    )
-                except:
-                    pass
-            for anno in total_superchecked_annos:
-                try:
-                    total_word_error_rate_rs_list.append(
-                        calculate_word_error_rate_between_two_llm_prompts(
-                            anno.result, anno.parent_annotation.result
-                        )
-                    )
-                except:
-                    pass
+            total_word_error_rate_rs_list += get_annotation_word_error_rates(total_sup_annos)
+            total_word_error_rate_rs_list += get_annotation_word_error_rates(total_superchecked_annos)
         if len(total_word_error_rate_rs_list) > 0:
             avg_word_error_rate = sum(total_word_error_rate_rs_list) / len(
                 total_word_error_rate_rs_list
@@ -1224,24 +1172,8 @@ def get_review_reports(
         total_word_error_rate_ar_list = []
         total_word_error_rate_rs_list = []
         if project_type in "InstructionDrivenChat":
-            for anno in total_rev_annos_accepted:
-                try:
-                    total_word_error_rate_ar_list.append(
-                        calculate_word_error_rate_between_two_llm_prompts(
-                            anno.result, anno.parent_annotation.result
-                        )
-                    )
-                except:
-                    pass
-            for anno in total_superchecked_annos:
-                try:
-                    total_word_error_rate_rs_list.append(
-                        calculate_word_error_rate_between_two_llm_prompts(
-                            anno.result, anno.parent_annotation.result
-                        )
-                    )
-                except:
-                    pass
+            total_word_error_rate_ar_list += get_annotation_word_error_rates(total_rev_annos_accepted)
+            total_word_error_rate_rs_list += get_annotation_word_error_rates(total_superchecked_annos)
         if len(total_word_error_rate_ar_list) > 0:
             avg_word_error_rate_ar = sum(total_word_error_rate_ar_list) / len(
                 total_word_error_rate_ar_list
@@ -1457,6 +1389,7 @@ def un_pack_annotation_tasks(
 
 
 @shared_task(queue="reports")
+@replica_reads
 def send_user_analysis_reports_mail_ws(
     pk,
     user_id,
@@ -1,7 +1,10 @@
+from types import SimpleNamespace
 from urllib import response
+from django.test import TestCase
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.urls import reverse
+from .decorators import belongs_to_workspace
 from .models import Workspace
 from .views import *
 from users.models import User
@@ -83,3 +86,45 @@ class UserTestcase(APITestCase):
         self.client.logout()
         # Checking if the response is correct
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class BelongsToWorkspaceTestcase(TestCase):
+    """
+    belongs_to_workspace used to read workspace.users, which does not exist,
+    and failed with a 500 for every request.
+    """
+
+    def setUp(self):
+        self.organization = Organization.objects.create(title="Member Organization")
+        self.workspace = Workspace.objects.create(
+            organization=self.organization, workspace_name="Member Workspace"
+        )
+        self.member = User.objects.create_user(
+            username="member", email="member@email.com"
+        )
+        self.manager = User.objects.create_user(
+            username="manager", email="manager@email.com"
+        )
+        self.manager.role = User.WORKSPACE_MANAGER
+        self.manager.save()
+        self.outsider = User.objects.create_user(
+            username="outsider", email="outsider@email.com"
+        )
+        self.workspace.members.add(self.member)
+        self.workspace.managers.add(self.manager)
+        self.view = belongs_to_workspace(lambda view, request, pk: "allowed")
+
+    def call(self, user, pk):
+        return self.view(None, SimpleNamespace(user=user), pk)
+
+    def test_members_and_managers_are_allowed(self):
+        self.assertEqual(self.call(self.member, self.workspace.pk), "allowed")
+        self.assertEqual(self.call(self.manager, self.workspace.pk), "allowed")
+
+    def test_other_users_are_forbidden(self):
+        response = self.call(self.outsider, self.workspace.pk)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_missing_workspace_is_not_found(self):
+        response = self.call(self.outsider, self.workspace.pk + 1000)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
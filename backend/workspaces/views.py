@@ -20,6 +20,7 @@ from tasks.models import (
     REVIEWER_ANNOTATION,
     SUPER_CHECKER_ANNOTATION,
 )
+from tasks.analytics import get_cumulative_task_counts, get_periodical_task_counts
 from anudesh_backend.locks import Lock
 from projects.utils import is_valid_date
 from datetime import datetime, timezone, timedelta
@@ -65,6 +66,7 @@ from .tasks import (
     get_supercheck_reports,
 )
 from projects.registry_helper import ProjectRegistry
+from utils.db_routing import replica_reads
 
 
 # Create your views here.
@@ -706,6 +708,7 @@ class WorkspaceCustomViewSet(viewsets.ViewSet):
         url_name="project_analytics",
     )
     @is_particular_workspace_manager
+    @replica_reads
     def project_analytics(self, request, pk=None):
         """
         API for getting project_analytics of a workspace
@@ -730,19 +733,13 @@ class WorkspaceCustomViewSet(viewsets.ViewSet):
                 + str(project_type)
             )
             celery_lock = Lock(user_id, task_name)
+            celery_lock_timeout = int(os.getenv("DEFAULT_CELERY_LOCK_TIMEOUT"))
             try:
-                lock_status = celery_lock.lockStatus()
+                lock_set = celery_lock.setLock(celery_lock_timeout)
             except Exception as e:
-                print(
-                    f"Error while retrieving the status of the lock for {task_name} : {str(e)}"
-                )
-                lock_status = 0  # if lock status is not received successfully, it is assumed that the lock doesn't exist
-            if lock_status == 0:
-                celery_lock_timeout = int(os.getenv("DEFAULT_CELERY_LOCK_TIMEOUT"))
-                try:
-                    celery_lock.setLock(celery_lock_timeout)
-                except Exception as e:
-                    print(f"Error while setting the lock for {task_name}: {str(e)}")
+                print(f"Error while setting the lock for {task_name}: {str(e)}")
+                lock_set = True  # if the lock is not set successfully, it is assumed that the lock doesn't exist
+            if lock_set:
                 send_project_analysis_reports_mail_ws.delay(
                     pk=pk,
                     user_id=user_id,
@@ -1141,6 +1138,7 @@ class WorkspaceCustomViewSet(viewsets.ViewSet):
         url_path="user_analytics",
         url_name="user_analytics",
     )
+    @replica_reads
     def user_analytics(self, request, pk=None):
         """
         API for getting user_analytics of a workspace
@@ -1279,19 +1277,13 @@ class WorkspaceCustomViewSet(viewsets.ViewSet):
                 + str(reports_type)
             )
             celery_lock = Lock(user_id, task_name)
+            celery_lock_timeout = int(os.getenv("DEFAULT_CELERY_LOCK_TIMEOUT"))
             try:
-                lock_status = celery_lock.lockStatus()
+                lock_set = celery_lock.setLock(celery_lock_timeout)
             except Exception as e:
-                print(
-                    f"Error while retrieving the status of the lock for {task_name} : {str(e)}"
-                )
-                lock_status = 0  # if lock status is not received successfully, it is assumed that the lock doesn't exist
-            if lock_status == 0:
-                celery_lock_timeout = int(os.getenv("DEFAULT_CELERY_LOCK_TIMEOUT"))
-                try:
-                    celery_lock.setLock(celery_lock_timeout)
-                except Exception as e:
-                    print(f"Error while setting the lock for {task_name}: {str(e)}")
+                print(f"Error while setting the lock for {task_name}: {str(e)}")
+                lock_set = True  # if the lock is not set successfully, it is assumed that the lock doesn't exist
+            if lock_set:
                 send_user_analysis_reports_mail_ws.delay(
                     pk=pk,
                     user_id=user_id,
@@ -1732,6 +1724,7 @@ class WorkspaceCustomViewSet(viewsets.ViewSet):
         name="Get Cumulative tasks completed ",
         url_name="cumulative_tasks_count_all",
     )
+    @replica_reads
     def cumulative_tasks_count_all(self, request, pk=None):
         try:
             ws = Workspace.objects.get(pk=pk)
@@ -2051,6 +2044,7 @@ class WorkspaceCustomViewSet(viewsets.ViewSet):
         name="Get Cumulative tasks completed ",
         url_name="cumulative_tasks_count",
     )
+    @replica_reads
     def cumulative_tasks_count(self, request, pk=None):
         try:
             ws = Workspace.objects.get(pk=pk)
@@ -2091,10 +2085,16 @@ class WorkspaceCustomViewSet(viewsets.ViewSet):
         languages = list(set([proj.tgt_language for proj in proj_objs_languages]))
         general_lang = []
         other_lang = []
+        if metainfo != True:
+            cumulative_counts = get_cumulative_task_counts(
+                proj_objs, reviewer_reports, supercheck_reports
+            )
         for lang in languages:
             proj_lang_filter = proj_objs.filter(tgt_language=lang)
             tasks_count = 0
-            if reviewer_reports == True:
+            if metainfo != True:
+                tasks_count = cumulative_counts.get(lang, 0)
+            elif reviewer_reports == True:
                 tasks = Task.objects.filter(
                     project_id__in=proj_lang_filter,
                     project_id__tgt_language=lang,
@@ -2514,6 +2514,10 @@ class WorkspaceCustomViewSet(viewsets.ViewSet):
         languages = list(set([proj.tgt_language for proj in proj_objs_languages]))
 
         final_result = []
+        if metainfo != True:
+            periodical_counts = get_periodical_task_counts(
+                proj_objs, reviewer_reports, supercheck_reports, periodical_list
+            )
 
         for period in range(len(periodical_list) - 1):
             start_end_date = (
@@ -2536,7 +2540,9 @@ class WorkspaceCustomViewSet(viewsets.ViewSet):
             for lang in languages:
                 proj_lang_filter = proj_objs.filter(tgt_language=lang)
                 annotated_labeled_tasks_count = 0
-                if reviewer_reports == True:
+                if metainfo != True:
+                    annotated_labeled_tasks_count = periodical_counts[period][lang]
+                elif reviewer_reports == True:
                     tasks = Task.objects.filter(
                         project_id__in=proj_lang_filter,
                         task_status__in=[
@@ -2986,19 +2992,13 @@ class WorkspaceCustomViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
         celery_lock = Lock(user_id, task_name)
+        celery_lock_timeout = int(os.getenv("DEFAULT_CELERY_LOCK_TIMEOUT"))
         try:
-            lock_status = celery_lock.lockStatus()
+            lock_set = celery_lock.setLock(celery_lock_timeout)
         except Exception as e:
-            print(
-                f"Error while retrieving the status of the lock for {task_name} : {str(e)}"
-            )
-            lock_status = 0  # if lock status is not received successfully, it is assumed that the lock doesn't exist
-        if lock_status == 0:
-            celery_lock_timeout = int(os.getenv("DEFAULT_CELERY_LOCK_TIMEOUT"))
-            try:
-                celery_lock.setLock(celery_lock_timeout)
-            except Exception as e:
-                print(f"Error while setting the lock for {task_name}: {str(e)}")
+            print(f"Error while setting the lock for {task_name}: {str(e)}")
+            lock_set = True  # if the lock is not set successfully, it is assumed that the lock doesn't exist
+        if lock_set:
 
             send_user_reports_mail_ws.delay(
                 ws_id=workspace.id,